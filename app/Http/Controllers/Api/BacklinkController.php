@@ -34,7 +34,35 @@ public function store(Request $request)
             return response()->json(['error' => 'Unauthorized'], 401);
         }
 
-        $validator = Validator::make($request->all(), [
+        $outcome = self::createOpportunity($request->all());
+
+        if (isset($outcome['errors'])) {
+            return response()->json(['errors' => $outcome['errors']], 422);
+        }
+
+        if (isset($outcome['error'])) {
+            return response()->json([
+                'error' => $outcome['error'],
+                'message' => $outcome['message'],
+            ], $outcome['status']);
+        }
+
+        return response()->json([
+            'message' => 'Backlink opportunity created successfully',
+            'opportunity' => $outcome['opportunity']->load('backlink'),
+        ], 201);
+    }
+
+    /**
+     * Validate and create a backlink opportunity from a worker payload
+     * (shared by store() and the batched task report endpoint)
+     *
+     * @return array ['opportunity' => BacklinkOpportunity] on success, otherwise
+     *               ['errors' => validation errors] or ['error', 'message', 'status']
+     */
+    public static function createOpportunity(array $data): array
+    {
+        $validator = Validator::make($data, [
             'campaign_id' => 'required|exists:campaigns,id',
             'backlink_id' => 'required|exists:backlinks,id', // Reference to backlinks store
             'url' => 'nullable|url', // Actual backlink URL (may differ from store URL)
@@ -47,41 +75,39 @@ public function store(Request $request)
         ]);
 
         if ($validator->fails()) {
-            return response()->json(['errors' => $validator->errors()], 422);
+            return ['errors' => $validator->errors()];
         }
 
         // Get the backlink from store
-        $backlink = Backlink::findOrFail($request->backlink_id);
+        $backlink = Backlink::findOrFail($data['backlink_id']);
         
         // Use actual URL or fallback to store URL
-        $actualUrl = $request->url ?? $backlink->url;
+        $actualUrl = $data['url'] ?? $backlink->url;
 
         // Check domain rate limit (max 1 backlink per domain per day per campaign)
-        if (!RateLimitingService::checkDomainRateLimit($actualUrl, $request->campaign_id)) {
-            return response()->json([
+        if (!RateLimitingService::checkDomainRateLimit($actualUrl, $data['campaign_id'])) {
+            return [
                 'error' => 'Rate limit exceeded: Maximum 1 backlink per domain per day for this campaign',
                 'message' => 'This domain has already received a backlink today for this campaign. Please try again tomorrow.',
-            ], 429);
+                'status' => 429,
+            ];
         }
 
         // Create opportunity (campaign-specific)
         $opportunity = BacklinkOpportunity::create([
-            'campaign_id' => $request->campaign_id,
-            'backlink_id' => $request->backlink_id,
+            'campaign_id' => $data['campaign_id'],
+            'backlink_id' => $data['backlink_id'],
             'url' => $actualUrl,
-            'type' => $request->type,
-            'keyword' => $request->keyword,
-            'anchor_text' => $request->anchor_text,
-            'status' => $request->status,
-            'site_account_id' => $request->site_account_id,
-            'error_message' => $request->error_message,
-            'verified_at' => $request->status === 'verified' ? now() : null,
+            'type' => $data['type'],
+            'keyword' => $data['keyword'] ?? null,
+            'anchor_text' => $data['anchor_text'] ?? null,
+            'status' => $data['status'],
+            'site_account_id' => $data['site_account_id'] ?? null,
+            'error_message' => $data['error_message'] ?? null,
+            'verified_at' => $data['status'] === 'verified' ? now() : null,
         ]);
 
-        return response()->json([
-            'message' => 'Backlink opportunity created successfully',
-            'opportunity' => $opportunity->load('backlink'),
-        ], 201);
+        return ['opportunity' => $opportunity];
     }
 
     /**
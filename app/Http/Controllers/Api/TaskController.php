@@ -7,14 +7,70 @@
 use App\Models\Setting;
 use App\Services\RateLimitingService;
 use Illuminate\Http\Request;
+use Illuminate\Support\Facades\Cache;
+use Illuminate\Support\Facades\DB;
 use Illuminate\Support\Facades\Validator;
 
 class TaskController extends Controller
 {
+    /**
+     * First and longest delay between a long-polling claim's checks for pending
+     * tasks (the delay doubles after each empty check)
+     */
+    const CLAIM_WAIT_CHECK_INTERVAL_MS = 250;
+    const CLAIM_WAIT_MAX_CHECK_INTERVAL_MS = 2000;
+
+    /**
+     * Oldest candidates per claimed slot considered when spreading a type's share across campaigns
+     */
+    const CLAIM_CAMPAIGN_CANDIDATES = 3;
+
+    /**
+     * Cache key for the slots each task type is still owed from earlier weighted claims
+     */
+    const CLAIM_TYPE_CREDIT_CACHE_KEY = 'task_claim_type_credit';
+
     /**
      * Get pending tasks
      */
     public function getPendingTasks(Request $request)
+    {
+        if ($error = $this->rejectWorkerRequest($request, $request->header('X-Worker-ID', 'unknown'))) {
+            return $error;
+        }
+
+        $limit = $request->get('limit', 10);
+        $type = $request->get('type');
+
+        $query = AutomationTask::pending()
+            ->with('campaign:id,name,settings')
+            ->orderBy('created_at', 'asc');
+
+        if ($type) {
+            $query->ofType($type);
+        }
+
+        $tasks = $query->limit($limit)->get();
+
+        return response()->json([
+            'tasks' => $tasks->map(function ($task) {
+                return [
+                    'id' => $task->id,
+                    'type' => $task->type,
+                    'campaign_id' => $task->campaign_id,
+                    'payload' => $task->payload,
+                    'created_at' => $task->created_at->toISOString(),
+                ];
+            }),
+        ]);
+    }
+
+    /**
+     * Token and per-worker rate limit checks shared by the task fetching endpoints
+     *
+     * @return \Illuminate\Http\JsonResponse|null Error response, or null if the request may proceed
+     */
+    private function rejectWorkerRequest(Request $request, string $workerId)
     {
         // Validate API token
         $apiToken = trim($request->header('X-API-Token', ''));
@@ -49,7 +105,6 @@ public function getPendingTasks(Request $request)
 
         // Check API rate limit (per worker). Default to a generous hourly limit to
         // avoid throttling automation workers; can be tuned via settings.
-        $workerId = $request->header('X-Worker-ID', 'unknown');
         // 120 requests/min middleware already applies; align hourly cap accordingly.
         $maxRequests = Setting::get('api_api_rate_limit', 7200);
 
@@ -66,30 +121,7 @@ public function getPendingTasks(Request $request)
             ], 429);
         }
 
-        $limit = $request->get('limit', 10);
-        $type = $request->get('type');
-
-        $query = AutomationTask::pending()
-            ->with('campaign:id,name,settings')
-            ->orderBy('created_at', 'asc');
-
-        if ($type) {
-            $query->ofType($type);
-        }
-
-        $tasks = $query->limit($limit)->get();
-
-        return response()->json([
-            'tasks' => $tasks->map(function ($task) {
-                return [
-                    'id' => $task->id,
-                    'type' => $task->type,
-                    'campaign_id' => $task->campaign_id,
-                    'payload' => $task->payload,
-                    'created_at' => $task->created_at->toISOString(),
-                ];
-            }),
-        ]);
+        return null;
     }
 
     /**
@@ -115,9 +147,20 @@ public function updateTaskStatus(Request $request, $id)
 
         $task = AutomationTask::findOrFail($id);
 
+        return response()->json($this->applyStatus($task, $request->all()));
+    }
+
+    /**
+     * Apply a worker status update to a task (shared by updateTaskStatus and reportResults)
+     *
+     * @param array $data Validated input: status, optional result and error_message
+     * @return array Response payload
+     */
+    private function applyStatus(AutomationTask $task, array $data): array
+    {
         // Handle failed status with retry logic
-        if ($request->status === 'failed') {
-            $errorMessage = $request->error_message ?? 'Unknown error';
+        if ($data['status'] === 'failed') {
+            $errorMessage = $data['error_message'] ?? 'Unknown error';
 
             // Truncate error message if too long (database column limit)
             if (strlen($errorMessage) > 1000) {
@@ -128,8 +171,8 @@ public function updateTaskStatus(Request $request, $id)
             $task->markFailed($errorMessage);
 
             // If task is permanently failed (exceeded max retries), mark the backlink as inactive
-            if ($task->status === AutomationTask::STATUS_FAILED && $request->has('result')) {
-                $result = $request->result;
+            if ($task->status === AutomationTask::STATUS_FAILED && array_key_exists('result', $data)) {
+                $result = $data['result'];
                 $backlinkId = $result['backlink_id'] ?? null;
                 
                 if ($backlinkId) {
@@ -157,8 +200,8 @@ public function updateTaskStatus(Request $request, $id)
             }
 
             // Log the error for debugging
-            \Log::warning("Task {$id} failed", [
-                'task_id' => $id,
+            \Log::warning("Task {$task->id} failed", [
+                'task_id' => $task->id,
                 'task_type' => $task->type,
                 'error_message' => $errorMessage,
                 'retry_count' => $task->retry_count,
@@ -166,7 +209,7 @@ public function updateTaskStatus(Request $request, $id)
                 'status' => $task->status,
             ]);
 
-            return response()->json([
+            return [
                 'message' => 'Task marked as failed',
                 'task' => [
                     'id' => $task->id,
@@ -174,11 +217,11 @@ public function updateTaskStatus(Request $request, $id)
                     'retry_count' => $task->retry_count,
                     'will_retry' => $task->status === AutomationTask::STATUS_PENDING,
                 ]
-            ]);
+            ];
         }
 
         // Handle success status
-        if ($request->status === 'success') {
+        if ($data['status'] === 'success') {
             $updateData = [
                 'status' => AutomationTask::STATUS_SUCCESS,
                 'completed_at' => now(),
@@ -186,8 +229,8 @@ public function updateTaskStatus(Request $request, $id)
                 'locked_by' => null,
             ];
 
-            if ($request->has('result')) {
-                $updateData['result'] = $request->result;
+            if (array_key_exists('result', $data)) {
+                $updateData['result'] = $data['result'];
             }
 
             // Clear error message on success
@@ -195,26 +238,26 @@ public function updateTaskStatus(Request $request, $id)
 
             $task->update($updateData);
 
-            \Log::info("Task {$id} completed successfully", [
-                'task_id' => $id,
+            \Log::info("Task {$task->id} completed successfully", [
+                'task_id' => $task->id,
                 'task_type' => $task->type,
             ]);
 
-            return response()->json(['message' => 'Task completed successfully']);
+            return ['message' => 'Task completed successfully'];
         }
 
         // Handle running status
-        if ($request->status === 'running') {
+        if ($data['status'] === 'running') {
             $updateData = [
                 'status' => AutomationTask::STATUS_RUNNING,
             ];
 
             $task->update($updateData);
-            return response()->json(['message' => 'Task status updated']);
+            return ['message' => 'Task status updated'];
         }
 
         // Handle pending status
-        if ($request->status === 'pending') {
+        if ($data['status'] === 'pending') {
             $updateData = [
                 'status' => AutomationTask::STATUS_PENDING,
                 'locked_at' => null,
@@ -222,15 +265,15 @@ public function updateTaskStatus(Request $request, $id)
             ];
 
             // Clear error message when resetting to pending
-            if ($request->has('error_message') && empty($request->error_message)) {
+            if (array_key_exists('error_message', $data) && empty($data['error_message'])) {
                 $updateData['error_message'] = null;
             }
 
             $task->update($updateData);
-            return response()->json(['message' => 'Task reset to pending']);
+            return ['message' => 'Task reset to pending'];
         }
 
-        return response()->json(['message' => 'Task updated successfully']);
+        return ['message' => 'Task updated successfully'];
     }
 
     /**
@@ -273,5 +316,320 @@ public function unlockTask(Request $request, $id)
 
         return response()->json(['message' => 'Task unlocked successfully']);
     }
-}
 
+    /**
+     * Claim tasks: fetch and lock up to `limit` pending tasks in one call
+     *
+     * Tasks whose type appears in `type_priority` are claimed first (in that
+     * order), then the oldest pending tasks of any type. Claimed tasks are
+     * returned already locked and running.
+     *
+     * With `type_weights` (type => weight) the batch is instead split between
+     * the types that have pending tasks in proportion to their weights, and
+     * each type's share is spread round-robin across campaigns, so one large
+     * backlog can't starve the other types.
+     *
+     * With `wait` > 0 the request is held (long-poll) until a task is pending
+     * or `wait` seconds pass (capped by services.task_delivery.max_claim_wait),
+     * so idle workers don't need to poll on a fixed interval. The hold keeps a
+     * PHP worker busy, so the checks back off from 250ms to 2s.
+     *
+     * Token and rate limit checks are the same as for getPendingTasks.
+     */
+    public function claimTasks(Request $request)
+    {
+        $rateLimitKey = $request->header('X-Worker-ID', (string) $request->input('worker_id', 'unknown'));
+        if ($error = $this->rejectWorkerRequest($request, $rateLimitKey)) {
+            return $error;
+        }
+
+        $validator = Validator::make($request->all(), [
+            'worker_id' => 'required|string|max:255',
+            'limit' => 'nullable|integer|min:1|max:100',
+            'type_priority' => 'nullable|array',
+            'type_priority.*' => 'string',
+            'type_weights' => 'nullable|array',
+            'type_weights.*' => 'numeric|min:0',
+            'wait' => 'nullable|integer|min:0',
+        ]);
+
+        if ($validator->fails()) {
+            return response()->json(['errors' => $validator->errors()], 422);
+        }
+
+        $workerId = $request->input('worker_id');
+        $limit = (int) $request->input('limit', 10);
+        $typePriority = array_values($request->input('type_priority', []));
+        $typeWeights = array_map('floatval', $request->input('type_weights', []));
+        $wait = min((int) $request->input('wait', 0), (int) config('services.task_delivery.max_claim_wait', 10));
+        $deadline = microtime(true) + $wait;
+
+        $tasks = $this->claimPending($workerId, $limit, $typePriority, $typeWeights);
+
+        // Long-poll: a cheap existence check, backing off, until a task shows up or the wait is over
+        $interval = self::CLAIM_WAIT_CHECK_INTERVAL_MS;
+        while ($tasks->isEmpty() && ($remaining = $deadline - microtime(true)) > 0) {
+            usleep((int) min($interval * 1000, $remaining * 1000000));
+            $interval = min($interval * 2, self::CLAIM_WAIT_MAX_CHECK_INTERVAL_MS);
+            if (AutomationTask::pending()->exists()) {
+                $tasks = $this->claimPending($workerId, $limit, $typePriority, $typeWeights);
+            }
+        }
+
+        return response()->json([
+            'tasks' => $tasks->map(function ($task) {
+                return [
+                    'id' => $task->id,
+                    'type' => $task->type,
+                    'campaign_id' => $task->campaign_id,
+                    'payload' => $task->payload,
+                    'retry_count' => $task->retry_count,
+                    'created_at' => $task->created_at->toISOString(),
+                ];
+            }),
+        ]);
+    }
+
+    /**
+     * Lock and mark running up to $limit pending tasks (weighted shares, or preferred types first)
+     */
+    private function claimPending(string $workerId, int $limit, array $typePriority, array $typeWeights = [])
+    {
+        return DB::transaction(function () use ($workerId, $limit, $typePriority, $typeWeights) {
+            if ($typeWeights) {
+                $tasks = $this->selectWeighted($limit, $typeWeights);
+            } else {
+                $query = AutomationTask::pending()->lockForUpdate();
+
+                if ($typePriority) {
+                    // CASE type WHEN 'comment' THEN 0 ... ELSE n END
+                    $cases = collect($typePriority)->map(fn ($type, $index) => "WHEN ? THEN {$index}")->implode(' ');
+                    $query->orderByRaw("CASE type {$cases} ELSE " . count($typePriority) . ' END', $typePriority);
+                }
+
+                $tasks = $query->orderBy('created_at', 'asc')->limit($limit)->get();
+            }
+
+            foreach ($tasks as $task) {
+                $task->update([
+                    'status' => AutomationTask::STATUS_RUNNING,
+                    'locked_at' => now(),
+                    'locked_by' => $workerId,
+                    'started_at' => now(),
+                ]);
+            }
+
+            return $tasks;
+        });
+    }
+
+    /**
+     * Pick (and lock) up to $limit pending tasks split between types by weight,
+     * round-robin across campaigns within each type (oldest first per campaign)
+     */
+    private function selectWeighted(int $limit, array $typeWeights)
+    {
+        $pendingCounts = AutomationTask::pending()
+            ->whereIn('type', array_keys($typeWeights))
+            ->selectRaw('type, count(*) as pending')
+            ->groupBy('type')
+            ->pluck('pending', 'type')
+            ->map(fn ($count) => (int) $count)
+            ->all();
+
+        $tasks = collect();
+        foreach ($this->allocateByWeight($typeWeights, $pendingCounts, $limit) as $type => $quota) {
+            $byCampaign = AutomationTask::pending()
+                ->where('type', $type)
+                ->orderBy('created_at', 'asc')
+                ->limit($quota * self::CLAIM_CAMPAIGN_CANDIDATES)
+                ->lockForUpdate()
+                ->get()
+                ->groupBy('campaign_id')
+                ->map(fn ($campaignTasks) => $campaignTasks->values());
+
+            $picked = collect();
+            for ($round = 0; $picked->count() < $quota; $round++) {
+                $next = $byCampaign->map(fn ($campaignTasks) => $campaignTasks->get($round))->filter();
+                if ($next->isEmpty()) {
+                    break;
+                }
+                $picked = $picked->concat($next->values()->take($quota - $picked->count()));
+            }
+
+            $tasks = $tasks->concat($picked);
+        }
+
+        return $tasks;
+    }
+
+    /**
+     * Split $limit slots between types in proportion to their weights, never
+     * giving a type more than it has pending
+     *
+     * Each claim credits every type with its share of the batch on top of the
+     * fraction it was owed from earlier claims, then hands out slots one by
+     * one to the type with the most credit (largest remainder). Small batches
+     * therefore still give every type its share over consecutive claims: with
+     * weights 0.8/0.1/0.1 and limit 1, one claim in ten goes to each minor
+     * type. The worker's weights already include its min_share floor.
+     *
+     * @return array<string, int> type => number of tasks to claim
+     */
+    private function allocateByWeight(array $typeWeights, array $pendingCounts, int $limit): array
+    {
+        $weights = array_filter(
+            $typeWeights,
+            fn ($weight, $type) => $weight > 0 && ($pendingCounts[$type] ?? 0) > 0,
+            ARRAY_FILTER_USE_BOTH
+        );
+        if (!$weights) {
+            return [];
+        }
+
+        // Types with nothing pending don't bank credit
+        $owed = array_intersect_key(Cache::get(self::CLAIM_TYPE_CREDIT_CACHE_KEY, []), $weights);
+        $total = array_sum($weights);
+        $credit = [];
+        foreach ($weights as $type => $weight) {
+            $credit[$type] = ($owed[$type] ?? 0.0) + $limit * $weight / $total;
+        }
+
+        $quotas = array_fill_keys(array_keys($weights), 0);
+        for ($slot = 0; $slot < $limit; $slot++) {
+            $best = null;
+            foreach ($weights as $type => $weight) {
+                if ($quotas[$type] >= $pendingCounts[$type]) {
+                    continue;
+                }
+                if ($best === null || $credit[$type] > $credit[$best]
+                    || ($credit[$type] == $credit[$best] && $weight > $weights[$best])) {
+                    $best = $type;
+                }
+            }
+            if ($best === null) {
+                break;
+            }
+            $quotas[$best]++;
+            $credit[$best] -= 1;
+        }
+
+        // Keep at most one slot owed either way, so a type capped by its backlog can't hoard credit
+        Cache::put(
+            self::CLAIM_TYPE_CREDIT_CACHE_KEY,
+            array_map(fn ($value) => round(max(-1.0, min(1.0, $value)), 6), $credit),
+            now()->addDay()
+        );
+
+        return array_filter($quotas);
+    }
+
+    /**
+     * Report results: apply final statuses (and create backlink opportunities)
+     * for many tasks in one call
+     *
+     * Each item is handled independently; the response lists one outcome per item.
+     *
+     * Reporting is idempotent: a final status for a task that is no longer
+     * running (or, when the item has a `worker_id`, no longer locked by that worker)
+     * is not applied again, so a resent batch can't create a second backlink
+     * or count a failure twice.
+     */
+    public function reportResults(Request $request)
+    {
+        // Validate API token
+        $apiToken = $request->header('X-API-Token');
+        if ($apiToken !== config('app.api_token')) {
+            return response()->json(['error' => 'Unauthorized'], 401);
+        }
+
+        $validator = Validator::make($request->all(), [
+            'results' => 'required|array|min:1|max:100',
+            'results.*.task_id' => 'required|integer',
+            'results.*.status' => 'required|in:pending,running,success,failed',
+            'results.*.result' => 'nullable|array',
+            'results.*.error_message' => 'nullable|string',
+            'results.*.backlink' => 'nullable|array',
+            'results.*.worker_id' => 'nullable|string',
+        ]);
+
+        if ($validator->fails()) {
+            return response()->json(['errors' => $validator->errors()], 422);
+        }
+
+        $outcomes = [];
+        foreach ($request->input('results') as $item) {
+            $outcomes[] = $this->reportResult($item);
+        }
+
+        return response()->json(['results' => $outcomes]);
+    }
+
+    /**
+     * Apply one reported result (see reportResults)
+     */
+    private function reportResult(array $item): array
+    {
+        $task = AutomationTask::find($item['task_id']);
+        if (!$task) {
+            return ['task_id' => $item['task_id'], 'ok' => false, 'error' => 'Task not found'];
+        }
+
+        $workerId = $item['worker_id'] ?? null;
+        if (in_array($item['status'], ['success', 'failed'], true)) {
+            if ($workerId !== null && $task->locked_by !== null && $task->locked_by !== $workerId) {
+                return [
+                    'task_id' => $task->id,
+                    'ok' => false,
+                    'status' => $task->status,
+                    'error' => 'Task is locked by another worker',
+                ];
+            }
+
+            $stillOwned = $workerId !== null
+                ? $task->locked_by === $workerId
+                : $task->status === AutomationTask::STATUS_RUNNING;
+            if (!$stillOwned) {
+                // Already finalized (e.g. a resent batch whose first response was lost)
+                return [
+                    'task_id' => $task->id,
+                    'ok' => true,
+                    'duplicate' => true,
+                    'status' => $task->status,
+                    'message' => 'Result already reported',
+                ];
+            }
+        }
+
+        $outcome = ['task_id' => $task->id, 'ok' => true];
+
+        // A successful task's backlink is created first; if that fails the task fails instead
+        if ($item['status'] === 'success' && !empty($item['backlink'])) {
+            $created = BacklinkController::createOpportunity($item['backlink']);
+
+            if (isset($created['opportunity'])) {
+                $outcome['opportunity_id'] = $created['opportunity']->id;
+                $item['result'] = array_merge($item['result'] ?? [], [
+                    'opportunity_id' => $created['opportunity']->id,
+                ]);
+            } else {
+                $error = $created['error'] ?? ('Invalid backlink: ' . json_encode($created['errors']));
+                $outcome['backlink_error'] = $error;
+                $item = [
+                    'status' => 'failed',
+                    'error_message' => "Failed to create backlink: {$error}",
+                    'result' => ['backlink_id' => $item['backlink']['backlink_id'] ?? null],
+                ];
+            }
+        }
+
+        $applied = $this->applyStatus($task, $item);
+        $outcome['status'] = $task->status;
+        $outcome['message'] = $applied['message'];
+        if (isset($applied['task'])) {
+            $outcome['will_retry'] = $applied['task']['will_retry'];
+        }
+
+        return $outcome;
+    }
+}
@@ -2,8 +2,10 @@
 
 namespace App\Models;
 
+use App\Services\Automation\TaskReadyNotifier;
 use Illuminate\Database\Eloquent\Model;
 use Illuminate\Database\Eloquent\Relations\BelongsTo;
+use Illuminate\Support\Facades\DB;
 
 class AutomationTask extends Model
 {
@@ -50,6 +52,19 @@ class AutomationTask extends Model
     const STATUS_FAILED = 'failed';
     const STATUS_CANCELLED = 'cancelled';
 
+    /**
+     * Notify waiting workers whenever a task becomes pending (created, retried or released)
+     */
+    protected static function booted(): void
+    {
+        static::saved(function (AutomationTask $task) {
+            if ($task->status === self::STATUS_PENDING && ($task->wasRecentlyCreated || $task->wasChanged('status'))) {
+                // After commit, so the woken worker can already see the task
+                DB::afterCommit(fn () => TaskReadyNotifier::notify($task->id));
+            }
+        });
+    }
+
     /**
      * Get the campaign this task belongs to
      */
@@ -0,0 +1,43 @@
+<?php
+
+namespace App\Services\Automation;
+
+use Illuminate\Support\Facades\Log;
+use Illuminate\Support\Facades\Redis;
+
+class TaskReadyNotifier
+{
+    /**
+     * Newest notifications kept when no worker is consuming the list
+     */
+    const MAX_QUEUED_NOTIFICATIONS = 1000;
+
+    /**
+     * Wake an idle Python worker (TASK_DELIVERY_MODE=redis) for a task that became pending
+     *
+     * Pushes the task ID onto a Redis list the workers BLPOP on, through a
+     * connection without the Redis key prefix so the key doesn't depend on
+     * APP_NAME. The worker
+     * then claims through /api/tasks/claim, so a lost or stale notification
+     * only costs one empty claim. Redis errors are logged, never thrown.
+     */
+    public static function notify(int $taskId): void
+    {
+        if (!config('services.task_delivery.redis_notify')) {
+            return;
+        }
+
+        $key = config('services.task_delivery.redis_key');
+
+        try {
+            $redis = Redis::connection(config('services.task_delivery.redis_connection'));
+            $redis->rpush($key, $taskId);
+            $redis->ltrim($key, -self::MAX_QUEUED_NOTIFICATIONS, -1);
+        } catch (\Throwable $e) {
+            Log::warning('Failed to publish task ready notification', [
+                'task_id' => $taskId,
+                'error' => $e->getMessage(),
+            ]);
+        }
+    }
+}
@@ -169,6 +169,19 @@
             'database' => env('REDIS_CACHE_DB', '1'),
         ],
 
+        // Unprefixed, so the Python workers find the task-ready list whatever APP_NAME is
+        'task_notifications' => [
+            'url' => env('REDIS_URL'),
+            'host' => env('REDIS_HOST', '127.0.0.1'),
+            'username' => env('REDIS_USERNAME'),
+            'password' => env('REDIS_PASSWORD'),
+            'port' => env('REDIS_PORT', '6379'),
+            'database' => env('REDIS_DB', '0'),
+            'options' => [
+                'prefix' => '',
+            ],
+        ],
+
     ],
 
 ];
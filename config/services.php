@@ -127,6 +127,16 @@
         ],
     ],
 
+    'task_delivery' => [
+        // Push pending task IDs to a Redis list so idle Python workers wake instantly
+        // (the connection has no key prefix, so the workers use the key as is)
+        'redis_notify' => env('TASK_REDIS_NOTIFY', false),
+        'redis_connection' => env('TASK_READY_REDIS_CONNECTION', 'task_notifications'),
+        'redis_key' => env('TASK_READY_REDIS_KEY', 'automation:tasks:ready'),
+        // Longest /api/tasks/claim may hold a request (and a PHP worker) open waiting for tasks (seconds)
+        'max_claim_wait' => env('TASK_CLAIM_MAX_WAIT', 10),
+    ],
+
 ];
 
 
@@ -1,38 +1,170 @@
 """
 API Client for communicating with Laravel backend
 """
+import os
+import time
 import requests
 import logging
 from typing import Optional, Dict, List, Any
 from urllib.parse import urljoin
 
+from core.api_cache import APICacheConfig, APIResponseCache
+from core.api_write_queue import KIND_SITE_ACCOUNT, KIND_TASK_REPORT, APIWriteQueue
+from core.rate_limiter import (
+    PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_POLL,
+    TokenBucketRateLimiter, get_rate_limiter, route_group,
+)
+
 logger = logging.getLogger(__name__)
 
+# Client-side token bucket that keeps requests inside the server's hourly budget
+API_RATE_LIMIT_ENABLED = os.getenv('API_RATE_LIMIT_ENABLED', 'true').lower() in ('true', '1', 'yes')
+# TTL cache for campaign and proxy lookups (repeated several times per task)
+API_CACHE_ENABLED = os.getenv('API_CACHE_ENABLED', 'true').lower() in ('true', '1', 'yes')
+# Extra seconds a long-polling claim waits for the response beyond the server hold time
+CLAIM_WAIT_TIMEOUT_MARGIN = 15
+
 
 class LaravelAPIClient:
     """Client for Laravel API communication"""
 
-    def __init__(self, base_url: str, api_token: str):
+    def __init__(self, base_url: str, api_token: str,
+                 rate_limiter: Optional[TokenBucketRateLimiter] = None,
+                 cache_config: Optional[APICacheConfig] = None,
+                 worker_id: Optional[str] = None):
         self.base_url = base_url.rstrip('/')
         self.api_token = api_token
+        # Sent with final task reports so the server only applies results from the worker holding the lock
+        self.worker_id = worker_id
         self.session = requests.Session()
         self.session.headers.update({
             'X-API-Token': api_token,
             'Content-Type': 'application/json',
             'Accept': 'application/json',
         })
+        # Shared per token, so every client in the process draws on one budget
+        if rate_limiter is None and API_RATE_LIMIT_ENABLED:
+            rate_limiter = get_rate_limiter(api_token or 'default')
+        self.rate_limiter = rate_limiter
+
+        # None until the first claim/report call shows whether the server has the batch endpoints
+        self._batch_endpoints: Optional[bool] = None
+
+        self.cache_config = cache_config or APICacheConfig.from_env()
+        self.cache = APIResponseCache(self.cache_config.max_entries) if API_CACHE_ENABLED else None
+
+        # Fire-and-forget writes go through this once start_write_queue() is called
+        self.write_queue: Optional[APIWriteQueue] = None
+
+    def start_write_queue(self, path: Optional[str] = None, flush_interval: float = 1.0) -> APIWriteQueue:
+        """
+        Send queue_* writes from a background dispatcher instead of inline
+
+        Args:
+            path: JSON file the queue is persisted to, so unsent writes survive a crash
+            flush_interval: Seconds between background sends
+        """
+        if self.write_queue is None:
+            self.write_queue = APIWriteQueue(self, path=path, flush_interval=flush_interval)
+        return self.write_queue
+
+    def queue_task_status(self, task_id: int, status: str, result: Optional[Dict] = None,
+                          error_message: Optional[str] = None,
+                          backlink: Optional[Dict] = None, wait: bool = False) -> Optional[Dict]:
+        """
+        Report a task status without waiting for the API (when the write queue is running)
+
+        Queued statuses for the same task coalesce (running -> success is one
+        write) and are sent in batches via report_results(). Arguments are as
+        for a report_results() item; with wait=True the report is sent now even
+        if the write queue is running, for callers that need the outcome.
+
+        Returns:
+            The report outcome if sent inline, None if queued
+        """
+        report = {'status': status}
+        if result:
+            report['result'] = result
+        if error_message:
+            report['error_message'] = error_message
+        if backlink:
+            report['backlink'] = backlink
+        if self.worker_id and status in ('success', 'failed'):
+            # Stored with the queued write, so a report replayed after a restart keeps its owner
+            report['worker_id'] = self.worker_id
+
+        if self.write_queue is not None:
+            if wait:
+                return self.write_queue.send_now(task_id, report)
+            self.write_queue.enqueue(KIND_TASK_REPORT, task_id, report)
+            return None
+
+        if status == 'running' and not backlink:
+            return self.update_task_status(task_id, status, result=result, error_message=error_message)
+        outcomes = self.report_results([{'task_id': task_id, **report}])
+        return outcomes[0] if outcomes else {}
+
+    def queue_site_account_update(self, site_account_id: int, data: Dict) -> Optional[Dict]:
+        """
+        Update a site account without waiting for the API (when the write queue is running)
+
+        Returns:
+            The API response if sent inline (no write queue), None if queued
+        """
+        if self.write_queue is not None:
+            self.write_queue.enqueue(KIND_SITE_ACCOUNT, site_account_id, data)
+            return None
+        return self.update_site_account(site_account_id, data)
+
+    def get_write_queue_stats(self) -> Dict:
+        """Write queue depth and send counters ({} if the queue isn't running)"""
+        return self.write_queue.get_stats() if self.write_queue else {}
 
-    def _request(self, method: str, endpoint: str, retry_on_rate_limit: bool = False, **kwargs) -> Optional[Dict]:
+    def close(self, timeout: float = 30.0):
+        """Flush queued writes (bounded by timeout) and stop the write queue"""
+        if self.write_queue is not None:
+            self.write_queue.close(timeout)
+
+    def get_rate_limit_stats(self) -> Dict:
+        """Remaining request budget and limiter counters ({} if rate limiting is disabled)"""
+        return self.rate_limiter.get_stats() if self.rate_limiter else {}
+
+    def _cached(self, endpoint: str, key, ttl: float, loader):
+        """Serve a lookup from the response cache (or call loader directly if caching is off)"""
+        if self.cache is None:
+            return loader()
+        return self.cache.get_or_load(endpoint, key, ttl, loader)
+
+    def invalidate_campaign(self, campaign_id: Optional[int] = None) -> int:
+        """Drop cached campaign details (one campaign, or all if campaign_id is None)"""
+        return self.cache.invalidate('campaign', campaign_id) if self.cache else 0
+
+    def invalidate_proxies(self) -> int:
+        """Drop cached proxy lists (e.g. after a proxy stops working)"""
+        return self.cache.invalidate('proxies') if self.cache else 0
+
+    def get_cache_stats(self) -> Dict:
+        """Response cache hit/miss counters ({} if caching is disabled)"""
+        return self.cache.get_stats() if self.cache else {}
+
+    def _request(self, method: str, endpoint: str, retry_on_rate_limit: bool = False,
+                 priority: Optional[int] = PRIORITY_NORMAL, **kwargs) -> Optional[Dict]:
         """Make HTTP request to API with rate limit handling
 
         Note: retry_on_rate_limit defaults to False to avoid making more requests
         when rate limited. The caller should handle rate limits by waiting.
+
+        Each attempt takes a token from the rate limiter at the given priority,
+        waiting if the budget is exhausted (priority=None: the caller already took one).
         """
         url = urljoin(self.base_url, endpoint)
+        route = route_group(endpoint)
         max_retries = 3
-        retry_delay = 5  # Start with 5 seconds
 
         for attempt in range(max_retries):
+            if self.rate_limiter and priority is not None and not self.rate_limiter.acquire(priority, route=route):
+                logger.warning(f"Rate limiter wait timed out for {method} {endpoint}, sending anyway")
+
             try:
                 response = self.session.request(method, url, **kwargs)
 
@@ -41,18 +173,23 @@ class LaravelAPIClient:
                     # Parse retry_after from response
                     retry_after = 60  # Default
                     error_msg = 'Rate limit exceeded'
+                    retry_after_header = response.headers.get('Retry-After')
+                    if retry_after_header:
+                        try:
+                            retry_after = int(retry_after_header)
+                        except ValueError:
+                            pass
                     try:
                         error_data = response.json()
                         retry_after = error_data.get('retry_after', retry_after)
                         error_msg = error_data.get('message', error_msg)
-                    except:
-                        # Try to get from Retry-After header
-                        retry_after_header = response.headers.get('Retry-After')
-                        if retry_after_header:
-                            try:
-                                retry_after = int(retry_after_header)
-                            except:
-                                pass
+                    except ValueError:
+                        pass
+
+                    if self.rate_limiter:
+                        # Pause callers of this route group until the server window resets
+                        self.rate_limiter.observe_response(429, response.headers, retry_after=retry_after,
+                                                           route=route)
 
                     # Only retry if explicitly enabled AND it's not the last attempt
                     if retry_on_rate_limit and attempt < max_retries - 1:
@@ -61,9 +198,9 @@ class LaravelAPIClient:
                             f"Rate limit exceeded for {method} {endpoint}. "
                             f"Waiting {retry_after} seconds before retry {attempt + 1}/{max_retries}"
                         )
-                        import time
-                        time.sleep(retry_after)
-                        continue  # Retry the request
+                        if not self.rate_limiter:
+                            time.sleep(retry_after)
+                        continue  # Retry the request (the limiter waits out the pause)
                     else:
                         # Don't retry - let the caller handle it
                         raise requests.exceptions.HTTPError(
@@ -72,13 +209,16 @@ class LaravelAPIClient:
                             response=response
                         )
 
+                if self.rate_limiter:
+                    self.rate_limiter.observe_response(response.status_code, response.headers, route=route)
+
                 # For other errors, raise immediately
                 response.raise_for_status()
                 return response.json() if response.content else None
 
             except requests.exceptions.HTTPError as e:
                 # Re-raise HTTP errors (including 429 if retries exhausted)
-                if e.response and e.response.status_code == 429:
+                if e.response is not None and e.response.status_code == 429:
                     raise
                 logger.error(f"API request failed: {method} {endpoint} - {e}")
                 raise
@@ -90,15 +230,192 @@ class LaravelAPIClient:
         raise requests.exceptions.RequestException(f"Failed to complete request after {max_retries} attempts")
 
     def get_pending_tasks(self, limit: int = 10, task_type: Optional[str] = None) -> List[Dict]:
-        """Get pending tasks from Laravel"""
+        """Get pending tasks from Laravel (returns [] without a request if the poll budget is spent)"""
         params = {'limit': limit}
         if task_type:
             params['type'] = task_type
 
+        # Polls only use budget above the reserve kept for task calls
+        if self.rate_limiter and not self.rate_limiter.try_acquire(PRIORITY_POLL, route='tasks'):
+            logger.debug("Skipping poll: request budget reserved for task calls")
+            return []
+
         # Don't retry on rate limit - let the worker handle it by waiting
-        response = self._request('GET', '/api/tasks/pending', params=params, retry_on_rate_limit=False)
+        # (the token was taken above, so the request itself doesn't wait again)
+        response = self._request('GET', '/api/tasks/pending', params=params, retry_on_rate_limit=False,
+                                 priority=None)
         return response.get('tasks', []) if response else []
     
+    def _batch_endpoint_missing(self, error: requests.exceptions.HTTPError) -> bool:
+        """
+        True (and remembered) if a batch endpoint isn't deployed on the server
+
+        Only Laravel's own "no such route" answers count: a 404 whose message
+        says the route could not be found, or a 405 whose Allow header leaves
+        out POST. Any other 404/405 is an ordinary error.
+        """
+        response = error.response
+        if response is None or response.status_code not in (404, 405):
+            return False
+        if response.status_code == 405:
+            allowed = response.headers.get('Allow')
+            missing = allowed is not None and 'POST' not in allowed.upper()
+        else:
+            try:
+                message = str((response.json() or {}).get('message', ''))
+            except (ValueError, AttributeError):
+                message = ''
+            missing = message.startswith('The route') and 'could not be found' in message
+        if missing:
+            logger.warning("Batch task endpoints not available, falling back to per-task calls")
+            self._batch_endpoints = False
+        return missing
+
+    def claim_tasks(self, worker_id: str, limit: int = 10,
+                    type_priority: Optional[List[str]] = None, wait: int = 0,
+                    type_weights: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """
+        Fetch and lock up to `limit` pending tasks in one call
+
+        Tasks come back already locked by worker_id and marked running
+        (each has 'claimed': True). Types listed in type_priority are claimed
+        first, in that order. Returns [] without a request if the poll budget
+        is spent.
+
+        Args:
+            worker_id: Worker that will own the locks
+            limit: Max tasks to claim
+            type_priority: Task types to prefer (e.g. ['comment'])
+            wait: Seconds the server may hold the request until a task is
+                  pending (long-poll; ignored by the per-task fallback)
+            type_weights: Split the batch between types by these weights
+                          instead (the per-task fallback uses them as a priority order)
+        """
+        type_priority = list(type_priority or [])
+
+        if self._batch_endpoints is not False:
+            if self.rate_limiter and not self.rate_limiter.try_acquire(PRIORITY_POLL, route='tasks'):
+                logger.debug("Skipping claim: request budget reserved for task calls")
+                return []
+            try:
+                payload = {
+                    'worker_id': worker_id,
+                    'limit': limit,
+                    'type_priority': type_priority,
+                }
+                kwargs = {}
+                if type_weights:
+                    payload['type_weights'] = type_weights
+                if wait > 0:
+                    payload['wait'] = wait
+                    # Don't give up on the request while the server is still holding it
+                    kwargs['timeout'] = wait + CLAIM_WAIT_TIMEOUT_MARGIN
+                response = self._request('POST', '/api/tasks/claim', priority=None, json=payload, **kwargs)
+                self._batch_endpoints = True
+                tasks = response.get('tasks', []) if response else []
+                for task in tasks:
+                    task['claimed'] = True
+                return tasks
+            except requests.exceptions.HTTPError as e:
+                if not self._batch_endpoint_missing(e):
+                    raise
+
+        if type_weights:
+            type_priority = sorted(type_weights, key=type_weights.get, reverse=True)
+        return self._claim_tasks_legacy(worker_id, limit, type_priority)
+
+    def _claim_tasks_legacy(self, worker_id: str, limit: int, type_priority: List[str]) -> List[Dict]:
+        """claim_tasks via get_pending_tasks + lock_task (servers without /api/tasks/claim)"""
+        tasks = []
+        for task_type in type_priority:
+            tasks = self.get_pending_tasks(limit=limit, task_type=task_type)
+            if tasks:
+                break
+        if not tasks:
+            tasks = self.get_pending_tasks(limit=limit)
+
+        claimed = []
+        for task in tasks:
+            lock_result = self.lock_task(task['id'], worker_id)
+            if 'error' in lock_result:
+                logger.debug(f"Task {task['id']} was claimed by another worker")
+                continue
+            self.queue_task_status(task['id'], 'running')
+            task['claimed'] = True
+            claimed.append(task)
+        return claimed
+
+    def report_results(self, results: List[Dict]) -> List[Dict]:
+        """
+        Apply final statuses (and create backlinks) for many tasks in one call
+
+        Each result is a dict with task_id, status ('success'/'failed'/...), and
+        optionally result, error_message and backlink (create_backlink fields:
+        campaign_id, backlink_id, url, type, status, site_account_id, ...) and
+        worker_id. A success whose backlink can't be created is marked failed
+        by the server; a final status for a task that is no longer running (or
+        no longer locked by worker_id) comes back as a duplicate, not applied.
+
+        Returns:
+            One outcome per result: task_id, ok, status, and opportunity_id /
+            backlink_error / will_retry / duplicate where relevant
+        """
+        if not results:
+            return []
+
+        if self._batch_endpoints is not False:
+            try:
+                response = self._request('POST', '/api/tasks/report', json={'results': results},
+                                         priority=PRIORITY_CRITICAL)
+                self._batch_endpoints = True
+                return response.get('results', []) if response else []
+            except requests.exceptions.HTTPError as e:
+                if not self._batch_endpoint_missing(e):
+                    raise
+
+        return [self._report_result_legacy(item) for item in results]
+
+    def _report_result_legacy(self, item: Dict) -> Dict:
+        """report_results for one item via create_backlink + update_task_status"""
+        task_id = item['task_id']
+        outcome = {'task_id': task_id, 'ok': True}
+        status = item['status']
+        result = item.get('result')
+        error_message = item.get('error_message')
+
+        try:
+            backlink = item.get('backlink')
+            if status == 'success' and backlink:
+                try:
+                    opportunity = self.create_backlink(
+                        campaign_id=backlink['campaign_id'],
+                        url=backlink.get('url'),
+                        task_type=backlink['type'],
+                        keyword=backlink.get('keyword'),
+                        anchor_text=backlink.get('anchor_text'),
+                        status=backlink.get('status', 'submitted'),
+                        site_account_id=backlink.get('site_account_id'),
+                        backlink_id=backlink.get('backlink_id'),
+                        error_message=backlink.get('error_message'),
+                    )
+                    created = opportunity.get('opportunity')
+                    opportunity_id = created.get('id') if isinstance(created, dict) else opportunity.get('id')
+                    outcome['opportunity_id'] = opportunity_id
+                    result = {**(result or {}), 'opportunity_id': opportunity_id}
+                except (requests.exceptions.HTTPError, ValueError) as e:
+                    outcome['backlink_error'] = str(e)
+                    status = 'failed'
+                    error_message = f"Failed to create backlink: {e}"
+                    result = {'backlink_id': backlink.get('backlink_id')}
+
+            response = self.update_task_status(task_id, status, result=result, error_message=error_message)
+            outcome['status'] = (response.get('task') or {}).get('status', status)
+            if 'task' in response:
+                outcome['will_retry'] = response['task'].get('will_retry')
+        except requests.exceptions.RequestException as e:
+            outcome.update({'ok': False, 'error': str(e)})
+        return outcome
+
     def get_task(self, task_id: int) -> Optional[Dict]:
         """Get a specific task by ID from Laravel"""
         try:
@@ -112,7 +429,8 @@ class LaravelAPIClient:
     def lock_task(self, task_id: int, worker_id: str) -> Dict:
         """Lock a task for processing"""
         try:
-            response = self._request('POST', f'/api/tasks/{task_id}/lock', json={'worker_id': worker_id})
+            response = self._request('POST', f'/api/tasks/{task_id}/lock', json={'worker_id': worker_id},
+                                     priority=PRIORITY_CRITICAL)
             return response or {}
         except requests.exceptions.HTTPError as e:
             # A 409 means another worker locked the task first; treat as a soft failure
@@ -132,7 +450,7 @@ class LaravelAPIClient:
 
     def unlock_task(self, task_id: int) -> Dict:
         """Unlock a task"""
-        response = self._request('POST', f'/api/tasks/{task_id}/unlock')
+        response = self._request('POST', f'/api/tasks/{task_id}/unlock', priority=PRIORITY_CRITICAL)
         return response or {}
 
     def update_task_status(self, task_id: int, status: str, result: Optional[Dict] = None,
@@ -144,7 +462,7 @@ class LaravelAPIClient:
         if error_message:
             data['error_message'] = error_message
 
-        response = self._request('PUT', f'/api/tasks/{task_id}/status', json=data)
+        response = self._request('PUT', f'/api/tasks/{task_id}/status', json=data, priority=PRIORITY_CRITICAL)
         return response or {}
 
     def get_opportunities_for_campaign(self, campaign_id: int, count: int = 1,
@@ -200,7 +518,7 @@ class LaravelAPIClient:
         if error_message:
             data['error_message'] = error_message
 
-        response = self._request('POST', '/api/backlinks', json=data)
+        response = self._request('POST', '/api/backlinks', json=data, priority=PRIORITY_CRITICAL)
         return response or {}
 
     def update_backlink(self, opportunity_id: int, status: Optional[str] = None,
@@ -219,12 +537,15 @@ class LaravelAPIClient:
         if error_message:
             data['error_message'] = error_message
 
-        response = self._request('PUT', f'/api/backlinks/{opportunity_id}', json=data)
+        response = self._request('PUT', f'/api/backlinks/{opportunity_id}', json=data, priority=PRIORITY_CRITICAL)
         return response or {}
 
     def get_campaign(self, campaign_id: int) -> Dict:
-        """Get campaign details"""
-        response = self._request('GET', f'/api/campaigns/{campaign_id}')
+        """Get campaign details (cached for API_CACHE_CAMPAIGN_TTL seconds)"""
+        response = self._cached(
+            'campaign', campaign_id, self.cache_config.campaign_ttl,
+            lambda: self._request('GET', f'/api/campaigns/{campaign_id}')
+        )
         return response or {}
 
     def create_site_account(self, campaign_id: int, site_domain: str, login_email: str,
@@ -259,13 +580,21 @@ class LaravelAPIClient:
         return response or {}
 
     def get_proxies(self, country: Optional[str] = None, prefer_country: bool = True) -> List[Dict]:
-        """Get proxy list with smart selection"""
+        """Get proxy list with smart selection (cached for API_CACHE_PROXIES_TTL seconds)"""
         params = {}
         if country:
             params['country'] = country
         if prefer_country:
             params['prefer_country'] = '1'
 
+        proxies = self._cached(
+            'proxies', (country, prefer_country), self.cache_config.proxies_ttl,
+            lambda: self._fetch_proxies(params)
+        )
+        return proxies or []
+
+    def _fetch_proxies(self, params: Dict) -> List[Dict]:
+        """Request the proxy list"""
         response = self._request('GET', '/api/proxies', params=params)
         return response.get('proxies', []) if response else []
 
@@ -319,7 +648,7 @@ class LaravelAPIClient:
             params['min_date'] = min_date
         
         try:
-            response = self._request('GET', '/api/ml/historical-data', params=params)
+            response = self._request('GET', '/api/ml/historical-data', params=params, priority=PRIORITY_POLL)
             if response and response.get('success'):
                 return response.get('data', [])
             return []
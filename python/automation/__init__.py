@@ -6,6 +6,13 @@ from .comment import CommentAutomation
 from .profile import ProfileAutomation
 from .forum import ForumAutomation
 from .guest import GuestPostAutomation
+from .async_base import AsyncBaseAutomation
+from .async_comment import AsyncCommentAutomation
+from .async_profile import AsyncProfileAutomation
+from .async_forum import AsyncForumAutomation
+from .async_guest import AsyncGuestPostAutomation
 
-__all__ = ['BaseAutomation', 'CommentAutomation', 'ProfileAutomation', 'ForumAutomation', 'GuestPostAutomation']
+__all__ = ['BaseAutomation', 'CommentAutomation', 'ProfileAutomation', 'ForumAutomation', 'GuestPostAutomation',
+           'AsyncBaseAutomation', 'AsyncCommentAutomation', 'AsyncProfileAutomation', 'AsyncForumAutomation',
+           'AsyncGuestPostAutomation']
 
@@ -0,0 +1,273 @@
+"""
+Async base automation class for all backlink types
+
+asyncio-native counterpart of BaseAutomation built on playwright.async_api.
+Many pages can share one event loop: while one task waits on navigation,
+LLM content generation or captcha solving, the others keep running.
+"""
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+from playwright.async_api import Page, BrowserContext, Browser
+import asyncio
+import logging
+import random
+
+from automation.base import BaseAutomation
+
+logger = logging.getLogger(__name__)
+
+# Import captcha solver
+try:
+    from automation.captcha_solver import AsyncCaptchaSolver
+except ImportError:
+    AsyncCaptchaSolver = None
+
+# Import opportunity selector
+try:
+    from opportunity_selector import OpportunitySelector
+except ImportError:
+    OpportunitySelector = None
+
+
+class AsyncBaseAutomation(ABC):
+    """
+    Base class for async automation tasks.
+
+    The browser is owned by the caller (see automation.async_engine); each task
+    only opens and closes its own isolated context and page. Blocking calls
+    (Laravel API, opportunity selection) run in worker threads via
+    asyncio.to_thread so they never stall the event loop.
+    """
+
+    # Launch options and user agents are shared with the sync automation classes
+    _build_launch_options = BaseAutomation._build_launch_options
+    _get_random_user_agent = BaseAutomation._get_random_user_agent
+
+    def __init__(self, api_client, browser: Browser, proxy: Optional[Dict] = None, headless: bool = True):
+        self.api_client = api_client
+        self.browser = browser
+        self.proxy = proxy
+        self.headless = headless
+        self.context: Optional[BrowserContext] = None
+        self.page: Optional[Page] = None
+        self.captcha_solver = AsyncCaptchaSolver(api_client) if AsyncCaptchaSolver else None
+        self.opportunity_selector = OpportunitySelector(api_client) if OpportunitySelector else None
+        self.task_lookups = None  # core.task_prefetch.TaskLookups, set by the worker
+
+    async def setup_browser(self):
+        """Create a fresh, isolated browser context and page for this task"""
+        try:
+            self.context = await self.browser.new_context(
+                viewport={'width': 1920, 'height': 1080},
+                user_agent=self._get_random_user_agent(),
+                locale='en-US',
+                timezone_id='America/New_York',
+            )
+        except Exception as e:
+            raise RuntimeError(
+                f"Failed to create browser context: {str(e)}. "
+                "The browser may have closed unexpectedly."
+            ) from e
+
+        # Add stealth scripts
+        try:
+            await self.context.add_init_script("""
+                Object.defineProperty(navigator, 'webdriver', {
+                    get: () => undefined
+                });
+
+                window.chrome = {
+                    runtime: {}
+                };
+
+                Object.defineProperty(navigator, 'plugins', {
+                    get: () => [1, 2, 3, 4, 5]
+                });
+            """)
+        except Exception as e:
+            logger.warning(f"Failed to add stealth scripts: {e}")
+
+        try:
+            self.page = await self.context.new_page()
+            self.page.set_default_timeout(30000)  # 30 second timeout
+            self.page.set_default_navigation_timeout(30000)
+        except Exception as e:
+            raise RuntimeError(
+                f"Failed to create browser page: {str(e)}. "
+                "The browser context may have closed unexpectedly."
+            ) from e
+
+    async def call_api(self, func: Callable, *args, **kwargs):
+        """Run a blocking API client call without blocking the event loop"""
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def select_opportunity(self, campaign_id: Optional[int], task_type: str) -> Optional[Dict]:
+        """
+        Select an opportunity for the task (same fallback rules as the sync classes):
+        the prefetched selection if the worker started one
+        """
+        future = self.task_lookups.take_opportunity(task_type) if self.task_lookups is not None else None
+        if future is None and (not self.opportunity_selector or not campaign_id):
+            return None
+
+        try:
+            if future is not None:
+                opportunity = await asyncio.wrap_future(future)
+            else:
+                opportunity = await asyncio.to_thread(
+                    self.opportunity_selector.select_opportunity,
+                    campaign_id=campaign_id,
+                    task_type=task_type
+                )
+            if opportunity:
+                logger.info(f"Selected opportunity {opportunity.get('id')} with PA:{opportunity.get('pa')} DA:{opportunity.get('da')}")
+                # Store opportunity for shadow mode logging
+                self.last_opportunity = opportunity
+            return opportunity
+        except Exception as e:
+            logger.warning(f"Failed to get opportunity: {e}, falling back to payload URLs")
+            return None
+
+    async def random_delay(self, min_seconds: float = 1.0, max_seconds: float = 3.0):
+        """Random delay to mimic human behavior (yields to other tasks)"""
+        await asyncio.sleep(random.uniform(min_seconds, max_seconds))
+
+    async def human_type(self, page_or_frame, selector_or_element, text: str):
+        """Type text with human-like delays
+        Args:
+            page_or_frame: Can be a Page or Frame object
+            selector_or_element: Can be a selector string or a Locator element
+            text: Text to type
+        """
+        if isinstance(selector_or_element, str):
+            element = page_or_frame.locator(selector_or_element)
+        else:
+            element = selector_or_element
+
+        await element.click()
+        await self.random_delay(0.5, 1.0)
+
+        for char in text:
+            await element.type(char, delay=random.uniform(50, 150))
+            await asyncio.sleep(random.uniform(0.05, 0.15))
+
+    async def take_screenshot(self, filename: str):
+        """Take screenshot for debugging"""
+        if self.page:
+            try:
+                await self.page.screenshot(path=f"screenshots/{filename}")
+            except Exception as e:
+                logger.warning(f"Failed to take screenshot: {e}")
+
+    async def solve_captcha_if_present(self) -> bool:
+        """Detect and solve captcha if present on page"""
+        if not self.captcha_solver or not self.page:
+            return False
+
+        try:
+            solution = await self.captcha_solver.detect_and_solve(self.page)
+            return solution is not None
+        except Exception as e:
+            logger.warning(f"Captcha solving failed: {e}")
+            return False
+
+    async def first_visible(self, scope, selectors, timeout: int = 2000):
+        """Return the first visible match for a list of selectors, or None"""
+        for selector in selectors:
+            try:
+                element = scope.locator(selector).first
+                if await element.count() > 0 and await element.is_visible(timeout=timeout):
+                    return element
+            except Exception:
+                continue
+        return None
+
+    def _is_browser_valid(self) -> bool:
+        """Check if browser, context, and page are still valid"""
+        try:
+            if not self.browser or not self.browser.is_connected():
+                return False
+            if not self.context or not self.page:
+                return False
+            return not self.page.is_closed()
+        except Exception as e:
+            logger.warning(f"Error checking browser validity: {e}")
+            return False
+
+    async def _safe_navigate(self, url: str, wait_until: str = 'domcontentloaded', timeout: int = 30000, retries: int = 2) -> bool:
+        """
+        Safely navigate to URL, recreating the context if the page crashed
+
+        Returns:
+            True if navigation succeeded, False if the browser crashed
+        """
+        for attempt in range(retries + 1):
+            try:
+                if not self._is_browser_valid():
+                    if attempt >= retries or not self.browser or not self.browser.is_connected():
+                        logger.error("Browser invalid and cannot be recovered")
+                        return False
+                    logger.warning(f"Page invalid before navigation attempt {attempt + 1}, recreating context...")
+                    await self.cleanup()
+                    await self.setup_browser()
+
+                await self.page.goto(url, wait_until=wait_until, timeout=timeout)
+                return True
+
+            except Exception as nav_error:
+                error_lower = str(nav_error).lower()
+                if not any(phrase in error_lower for phrase in ['target closed', 'browser has been closed', 'context has been closed', 'target page']):
+                    raise
+
+                logger.error(f"Page crashed during navigation (attempt {attempt + 1}/{retries + 1}): {nav_error}")
+                if attempt >= retries:
+                    return False
+                try:
+                    await self.cleanup()
+                    await self.setup_browser()
+                except Exception as recreate_error:
+                    logger.error(f"Failed to recreate context: {recreate_error}")
+                    return False
+
+        return False
+
+    async def cleanup(self):
+        """Close the task's page and context (the browser belongs to the engine)"""
+        if self.page:
+            try:
+                if not self.page.is_closed():
+                    await self.page.close()
+            except Exception as e:
+                logger.debug(f"Error closing page: {e}")
+            finally:
+                self.page = None
+
+        if self.context:
+            try:
+                await self.context.close()
+            except Exception as e:
+                logger.debug(f"Error closing context: {e}")
+            finally:
+                self.context = None
+
+    @abstractmethod
+    async def execute(self, task: Dict) -> Dict:
+        """Execute the automation task"""
+        pass
+
+    async def __aenter__(self):
+        """Async context manager entry - open context and page"""
+        try:
+            await self.setup_browser()
+            return self
+        except Exception:
+            await self.cleanup()
+            raise
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit - always close context and page"""
+        try:
+            await self.cleanup()
+        except Exception as cleanup_error:
+            logger.warning(f"Error during cleanup in __aexit__: {cleanup_error}")
+        return False
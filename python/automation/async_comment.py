@@ -0,0 +1,427 @@
+"""
+Async comment backlink automation
+"""
+from typing import Dict
+import logging
+import random
+from .async_base import AsyncBaseAutomation
+from .comment import CommentAutomation
+
+logger = logging.getLogger(__name__)
+
+# Submit buttons tried around a bare comment textarea (parent form, container, page)
+FORM_SUBMIT_SELECTORS = [
+    'button[type="submit"]',
+    'input[type="submit"]',
+    'button:has-text("Post")',
+    'button:has-text("Submit")',
+    'button:has-text("Comment")',
+    'button:has-text("Reply")',
+    'button:has-text("Send")',
+    'button[class*="submit" i]',
+    'button[class*="post" i]',
+    'button',
+]
+CONTAINER_SUBMIT_SELECTORS = [
+    'button[type="submit"]',
+    'input[type="submit"]',
+    'button:has-text("Post")',
+    'button:has-text("Submit")',
+    'button:has-text("Comment")',
+    'button',
+]
+PAGE_SUBMIT_SELECTORS = [
+    'button[type="submit"]',
+    'input[type="submit"]',
+    'button:has-text("Post")',
+    'button:has-text("Submit")',
+]
+
+
+class AsyncCommentAutomation(AsyncBaseAutomation):
+    """Async automation for comment backlinks (mirrors CommentAutomation)"""
+
+    _generate_fallback_comment = CommentAutomation._generate_fallback_comment
+
+    async def execute(self, task: Dict) -> Dict:
+        """Execute comment backlink task"""
+        payload = task.get('payload', {})
+        keywords = payload.get('keywords', [])
+        anchor_text_strategy = payload.get('anchor_text_strategy', 'variation')
+
+        opportunity = await self.select_opportunity(task.get('campaign_id'), 'comment')
+        target_url = opportunity.get('url') if opportunity else None
+        backlink_id = opportunity.get('id') if opportunity else None
+
+        # Fallback to payload target_urls if no opportunity found
+        if not target_url:
+            target_urls = payload.get('target_urls', [])
+            if not target_urls:
+                return {
+                    'success': False,
+                    'error': 'No target URLs provided and no opportunities available',
+                    'backlink_id': backlink_id,
+                }
+            target_url = random.choice(target_urls)
+
+        try:
+            logger.info(f"Processing comment backlink for {target_url}")
+
+            if not await self._safe_navigate(target_url, wait_until='domcontentloaded', timeout=30000):
+                logger.error(f"Failed to navigate to {target_url} after retries")
+                return {
+                    'success': False,
+                    'error': 'Browser crashed during navigation',
+                    'backlink_id': backlink_id,
+                }
+            await self.random_delay(2, 4)
+
+            comment_form = await self._find_comment_form()
+            if not comment_form:
+                return {
+                    'success': False,
+                    'error': 'Comment form not found',
+                    'backlink_id': backlink_id,
+                    'failure_reason': 'comment_form_not_found',
+                }
+
+            comment_text = await self._generate_comment(keywords, anchor_text_strategy, task)
+
+            # Check for captcha before filling form
+            captcha_type = None
+            if self.captcha_solver and self.page:
+                try:
+                    page_html = (await self.page.content()).lower()
+                    if 'recaptcha' in page_html or 'hcaptcha' in page_html or 'captcha' in page_html:
+                        if not await self.solve_captcha_if_present():
+                            if 'recaptcha' in page_html:
+                                captcha_type = 'recaptcha_v2' if 'v3' not in page_html else 'recaptcha_v3'
+                            elif 'hcaptcha' in page_html:
+                                captcha_type = 'hcaptcha'
+                            else:
+                                captcha_type = 'image_captcha'
+                except Exception as e:
+                    logger.debug(f"Error checking for captcha: {e}")
+
+            await self._fill_comment_form(comment_form, comment_text, task)
+
+            try:
+                if not await self._submit_comment_form(comment_form):
+                    return {
+                        'success': False,
+                        'error': 'Submit button not found for textarea',
+                        'backlink_id': backlink_id,
+                    }
+            except Exception as e:
+                logger.error(f"Error submitting form: {e}")
+                return {
+                    'success': False,
+                    'error': f'Could not submit form: {e}',
+                    'backlink_id': backlink_id,
+                }
+
+            await self.random_delay(2, 4)
+
+            if await self._verify_comment_posted(comment_text):
+                result = {
+                    'success': True,
+                    'url': self.page.url,
+                    'type': 'comment',
+                }
+                if opportunity:
+                    result['backlink_id'] = backlink_id
+                return result
+
+            return {
+                'success': False,
+                'error': 'Comment verification failed',
+                'backlink_id': backlink_id,
+                'captcha_type': captcha_type,
+            }
+
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"Comment automation failed: {error_msg}", exc_info=True)
+
+            captcha_type = None
+            if 'captcha' in error_msg.lower():
+                if 'recaptcha' in error_msg.lower():
+                    captcha_type = 'recaptcha_v2' if 'v3' not in error_msg.lower() else 'recaptcha_v3'
+                elif 'hcaptcha' in error_msg.lower():
+                    captcha_type = 'hcaptcha'
+                else:
+                    captcha_type = 'image_captcha'
+
+            return {
+                'success': False,
+                'error': error_msg,
+                'backlink_id': backlink_id,
+                'captcha_type': captcha_type,
+            }
+
+    async def _find_comment_form(self):
+        """Find comment form on page (same strategies as CommentAutomation, main frame only)"""
+        await self.random_delay(3, 5)
+
+        try:
+            await self.page.wait_for_selector('textarea, form, [class*="comment" i], [id*="comment" i]', timeout=5000, state='attached')
+        except Exception:
+            pass
+
+        # Additional wait for dynamic content (Disqus, etc.)
+        await self.random_delay(2, 3)
+
+        logger.info("Searching for comment form...")
+
+        # Strategy 1: textareas (most reliable indicator)
+        try:
+            textareas = self.page.locator('textarea')
+            textarea_count = await textareas.count()
+            logger.info(f"Found {textarea_count} textarea(s) on page")
+
+            if textarea_count == 1:
+                textarea = textareas.first
+                try:
+                    await textarea.scroll_into_view_if_needed()
+                    await self.random_delay(1, 2)
+                except Exception:
+                    pass
+                logger.info("Using the only textarea on page")
+                return textarea
+
+            for i in range(min(textarea_count, 5)):
+                textarea = textareas.nth(i)
+                try:
+                    if not await textarea.is_visible(timeout=2000):
+                        continue
+
+                    attrs = ' '.join([
+                        await textarea.get_attribute('name') or '',
+                        await textarea.get_attribute('id') or '',
+                        await textarea.get_attribute('placeholder') or '',
+                        await textarea.get_attribute('class') or '',
+                    ]).lower()
+
+                    parent_form = textarea.locator('xpath=ancestor::form[1]')
+                    if await parent_form.count() > 0 and await parent_form.is_visible(timeout=1000):
+                        logger.info(f"Found comment form via textarea #{i+1} (parent form)")
+                        return parent_form
+
+                    if any(keyword in attrs for keyword in ['comment', 'reply', 'message', 'content', 'post', 'response']):
+                        logger.info(f"Found comment textarea #{i+1} with comment keywords")
+                        return textarea
+
+                    bounding_box = await textarea.bounding_box()
+                    if bounding_box and (
+                        (bounding_box['height'] > 50 and bounding_box['width'] > 200) or bounding_box['height'] > 80
+                    ):
+                        logger.info(f"Found large textarea #{i+1} (likely comment field)")
+                        return textarea
+                except Exception as e:
+                    logger.debug(f"Error checking textarea #{i+1}: {e}")
+        except Exception as e:
+            logger.debug(f"Error searching for textareas: {e}")
+
+        # Strategy 2: forms with comment-related classes/IDs
+        form_selectors = [
+            'form[class*="comment" i]',
+            'form[id*="comment" i]',
+            'form[class*="reply" i]',
+            'form[id*="reply" i]',
+            'form#commentform',
+            'form.comment-form',
+            'form.commentform',
+            'form[data-form-id]',  # Disqus
+            'form[data-disqus-form]',  # Disqus
+        ]
+        for selector in form_selectors:
+            try:
+                forms = self.page.locator(selector)
+                for i in range(min(await forms.count(), 3)):
+                    form = forms.nth(i)
+                    if await form.is_visible(timeout=2000) and await form.locator('textarea').count() > 0:
+                        logger.info(f"Found comment form with selector: {selector} (match #{i+1})")
+                        return form
+            except Exception as e:
+                logger.debug(f"Selector '{selector}' failed: {e}")
+
+        # Strategy 3: comment form containers
+        container_selectors = [
+            'div[class*="comment-form" i] form',
+            'div[id*="comment-form" i] form',
+            'div[class*="reply-form" i] form',
+            'section[class*="comment" i] form',
+            'article form:has(textarea)',
+        ]
+        for selector in container_selectors:
+            try:
+                forms = self.page.locator(selector)
+                for i in range(min(await forms.count(), 2)):
+                    form = forms.nth(i)
+                    if await form.is_visible(timeout=2000):
+                        logger.info(f"Found comment form in container: {selector} (match #{i+1})")
+                        return form
+            except Exception:
+                continue
+
+        # Strategy 4: generic form with textarea (last resort)
+        try:
+            forms_with_textarea = self.page.locator('form:has(textarea)')
+            for i in range(min(await forms_with_textarea.count(), 5)):
+                form = forms_with_textarea.nth(i)
+                try:
+                    if not await form.is_visible(timeout=2000):
+                        continue
+                    form_attrs = ' '.join([
+                        await form.get_attribute('id') or '',
+                        await form.get_attribute('class') or '',
+                        await form.get_attribute('action') or '',
+                    ]).lower()
+                    if any(skip in form_attrs for skip in ['search', 'login', 'signin', 'register', 'subscribe']):
+                        continue
+                    logger.info(f"Found generic form with textarea (match #{i+1})")
+                    return form
+                except Exception:
+                    continue
+        except Exception as e:
+            logger.debug(f"Error with generic form search: {e}")
+
+        # Strategy 5: Commento (Disqus needs its own frame handling and is sync-only for now)
+        try:
+            if await self.page.locator('[id*="commento" i], [class*="commento" i], iframe[src*="commento"]').count() > 0:
+                commento_textarea = self.page.locator('textarea[placeholder*="comment" i], textarea#commento-textarea-root')
+                if await commento_textarea.count() > 0:
+                    logger.info("Found Commento textarea")
+                    return commento_textarea.first
+        except Exception:
+            pass
+
+        await self.take_screenshot('comment_form_not_found.png')
+        logger.warning("No comment form found with any detection strategy")
+        return None
+
+    async def _is_textarea(self, element) -> bool:
+        """Check if a located element is a bare textarea rather than a form"""
+        try:
+            tag = await element.evaluate('el => el.tagName ? el.tagName.toLowerCase() : null')
+            return tag == 'textarea'
+        except Exception as e:
+            logger.debug(f"Could not check if element is textarea: {e}")
+            return False
+
+    async def _fill_comment_form(self, form, comment_text: str, task: Dict):
+        """Fill comment form fields"""
+        logger.info("Filling comment form...")
+
+        if await self._is_textarea(form):
+            logger.info("Form is actually a textarea, filling directly")
+            await form.click()
+            await self.random_delay(0.5, 1)
+            await form.fill('')
+            await self.human_type(self.page, form, comment_text)
+            await self.random_delay(1, 2)
+            return
+
+        textarea = form.locator('textarea, input[type="text"]').first
+        if await textarea.is_visible():
+            await self.human_type(self.page, textarea, comment_text)
+
+        name_field = form.locator('input[name*="name"], input[id*="name"]').first
+        if await name_field.is_visible():
+            await self.human_type(self.page, name_field, "John Doe")
+
+        email_field = form.locator('input[type="email"], input[name*="email"]').first
+        if await email_field.is_visible():
+            await self.human_type(self.page, email_field, "user@example.com")
+
+        website_field = form.locator('input[name*="url"], input[name*="website"]').first
+        if await website_field.is_visible():
+            campaign = await self.call_api(self.api_client.get_campaign, task['campaign_id'])
+            website_url = campaign.get('web_url', '')
+            if website_url:
+                await self.human_type(self.page, website_field, website_url)
+
+        await self.random_delay(1, 2)
+
+    async def _submit_comment_form(self, comment_form) -> bool:
+        """Submit the form (or find a submit button for a bare textarea)"""
+        if not await self._is_textarea(comment_form):
+            submit_button = comment_form.locator('button[type="submit"], input[type="submit"], button:has-text("Post"), button:has-text("Submit")').first
+            await submit_button.click()
+            return True
+
+        logger.info("Looking for submit button for textarea...")
+        scopes = [
+            (comment_form.locator('xpath=ancestor::form[1]'), FORM_SUBMIT_SELECTORS, 'parent form'),
+            (comment_form.locator('xpath=ancestor::div[1]'), CONTAINER_SUBMIT_SELECTORS, 'container'),
+            (self.page, PAGE_SUBMIT_SELECTORS, 'page'),
+        ]
+        for scope, selectors, label in scopes:
+            try:
+                if scope is not self.page and await scope.count() == 0:
+                    continue
+                submit_button = await self.first_visible(scope, selectors)
+                if submit_button:
+                    logger.info(f"Found submit button in {label}")
+                    await submit_button.click()
+                    return True
+            except Exception as e:
+                logger.debug(f"Could not search {label} for submit button: {e}")
+
+        logger.warning("Could not find submit button, trying Enter key on textarea")
+        try:
+            await comment_form.press('Enter')
+            await self.random_delay(1, 2)
+            await comment_form.press('Control+Enter')
+            return True
+        except Exception:
+            logger.error("Could not submit comment - no submit button found")
+            return False
+
+    async def _generate_comment(self, keywords: list, strategy: str, task: Dict) -> str:
+        """Generate comment using LLM with fallback"""
+        article_title = ""
+        article_excerpt = ""
+        try:
+            article_title = await self.page.title() if self.page else ""
+            try:
+                meta_desc = await self.page.locator('meta[name="description"]').get_attribute('content')
+                if meta_desc:
+                    article_excerpt = meta_desc[:200]
+                else:
+                    first_p = self.page.locator('article p, .post p, .content p').first
+                    if await first_p.is_visible():
+                        article_excerpt = (await first_p.text_content() or '')[:200]
+            except Exception:
+                pass
+
+            target_url = task.get('payload', {}).get('target_url', '') or (self.page.url if self.page else "")
+            tone = task.get('payload', {}).get('content_tone', 'professional')
+
+            # The LLM call is the slowest step - other pages keep running meanwhile
+            comment_text = await self.call_api(
+                self.api_client.generate_content,
+                'comment',
+                {
+                    'article_title': article_title,
+                    'article_excerpt': article_excerpt,
+                    'target_url': target_url,
+                },
+                tone
+            )
+
+            if comment_text:
+                logger.info("Comment generated successfully using LLM")
+                return comment_text.strip()
+        except Exception as e:
+            logger.warning(f"LLM comment generation failed: {e}, using fallback")
+
+        return self._generate_fallback_comment(keywords, article_title, article_excerpt, strategy)
+
+    async def _verify_comment_posted(self, comment_text: str) -> bool:
+        """Verify comment was posted"""
+        try:
+            await self.page.wait_for_timeout(3000)
+            return await self.page.locator(f'text={comment_text[:50]}').is_visible(timeout=5000)
+        except Exception:
+            return False
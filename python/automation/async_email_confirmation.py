@@ -0,0 +1,103 @@
+"""
+Async Email Confirmation Click Automation
+Automatically clicks verification links from emails
+"""
+
+from typing import Dict
+from automation.async_base import AsyncBaseAutomation
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUCCESS_INDICATORS = [
+    'verified',
+    'confirmed',
+    'activated',
+    'success',
+    'thank you',
+    'email confirmed',
+]
+SUCCESS_SELECTORS = [
+    '.success',
+    '.alert-success',
+    '[class*="success"]',
+    '[id*="success"]',
+    'h1:has-text("verified")',
+    'h1:has-text("confirmed")',
+    'h1:has-text("activated")',
+]
+
+
+class AsyncEmailConfirmationAutomation(AsyncBaseAutomation):
+    """Async automation for clicking email verification links"""
+
+    async def execute(self, task: Dict) -> Dict:
+        """
+        Click verification link from email
+
+        Expected task payload:
+        {
+            'verification_link': 'https://example.com/verify?token=...',
+            'site_account_id': 123,
+        }
+        """
+        payload = task.get('payload', {})
+        site_account_id = payload.get('site_account_id')
+
+        try:
+            verification_link = payload.get('verification_link')
+            if not verification_link:
+                return {
+                    'success': False,
+                    'error': 'No verification link provided in task payload',
+                }
+
+            logger.info(f"Clicking verification link for site_account_id: {site_account_id}")
+
+            if not await self._safe_navigate(verification_link, wait_until='networkidle', timeout=30000):
+                return {
+                    'success': False,
+                    'error': 'Failed to navigate to verification link',
+                    'site_account_id': site_account_id,
+                }
+            await self.random_delay(2, 4)
+            await self.take_screenshot(f'email_confirmation_{site_account_id}.png')
+
+            page_text = (await self.page.content()).lower()
+            page_title = (await self.page.title()).lower()
+            is_success = any(indicator in page_text or indicator in page_title
+                             for indicator in SUCCESS_INDICATORS)
+
+            if not is_success:
+                is_success = await self.first_visible(self.page, SUCCESS_SELECTORS) is not None
+
+            await self.random_delay(2, 3)
+
+            if is_success:
+                try:
+                    await self.call_api(
+                        self.api_client.queue_site_account_update,
+                        site_account_id,
+                        {
+                            'status': 'verified',
+                            'email_verification_status': 'clicked',
+                        }
+                    )
+                    logger.info(f"Successfully clicked verification link for site_account_id: {site_account_id}")
+                except Exception as e:
+                    logger.warning(f"Failed to update site account status: {e}")
+
+            return {
+                'success': is_success,
+                'url': self.page.url,
+                'site_account_id': site_account_id,
+                'message': 'Verification link clicked successfully' if is_success else 'Verification link clicked but success not confirmed',
+            }
+
+        except Exception as e:
+            logger.error(f"Error clicking verification link: {e}", exc_info=True)
+            return {
+                'success': False,
+                'error': str(e),
+                'site_account_id': site_account_id,
+            }
@@ -0,0 +1,251 @@
+"""
+Async Automation Engine
+
+Runs async automation tasks on a single asyncio event loop (in a background
+thread) with a shared async Playwright driver. Up to max_concurrent_tasks pages
+run at once; browsers are shared between tasks with the same launch options and
+every task gets its own context.
+
+Exposes the same submit/drain/get_stats interface as core.task_slots.TaskSlotPool
+so the worker poll loop can drive either one.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional, Set
+from playwright.async_api import Browser, Playwright, async_playwright
+
+from automation.base import BaseAutomation
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAutomationEngine:
+    """Drives many concurrent pages from one event loop"""
+
+    def __init__(self, max_concurrent_tasks: int,
+                 handler: Callable[[Dict, 'AsyncAutomationEngine'], Awaitable[None]],
+                 max_browsers: int = 2):
+        """
+        Initialize and start the engine
+
+        Args:
+            max_concurrent_tasks: Number of tasks (pages) that may run at once
+            handler: Coroutine function called as handler(task, engine) on the engine loop
+            max_browsers: Browsers kept alive (one per distinct proxy/launch options)
+        """
+        if max_concurrent_tasks < 1:
+            raise ValueError("max_concurrent_tasks must be >= 1")
+
+        self.max_concurrent_tasks = max_concurrent_tasks
+        self.handler = handler
+        self.max_browsers = max_browsers
+
+        self._free = threading.Semaphore(max_concurrent_tasks)
+        self._accepting = True
+        self._futures: Set[Future] = set()
+        self._futures_lock = threading.Lock()
+
+        self._playwright: Optional[Playwright] = None
+        self._browsers: Dict[str, Browser] = {}
+        self._browser_lock: Optional[asyncio.Lock] = None
+
+        self._started_at = time.time()
+        self._active = 0
+        self._peak_active = 0
+        self._busy_seconds = 0.0
+        self._active_since: Dict[int, float] = {}
+        self._counters = {
+            'tasks_processed': 0,
+            'tasks_failed': 0,
+            'browsers_launched': 0,
+        }
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="async-automation-engine", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+        logger.info(f"Async automation engine started (max {max_concurrent_tasks} concurrent tasks)")
+
+    def _run_loop(self):
+        """Event loop thread"""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _start(self):
+        """Prepare the environment and start the async Playwright driver"""
+        self._browser_lock = asyncio.Lock()
+        await asyncio.to_thread(BaseAutomation._prepare_environment)
+        self._playwright = await async_playwright().start()
+
+    async def get_browser(self, launch_options: Dict) -> Browser:
+        """
+        Get a connected browser for the launch options (launching one if needed)
+
+        Args:
+            launch_options: Chromium launch options (see BaseAutomation._build_launch_options)
+        """
+        from core.browser_pool import BrowserPool
+        key = BrowserPool.make_key(launch_options)
+
+        async with self._browser_lock:
+            browser = self._browsers.get(key)
+            if browser is not None and browser.is_connected():
+                return browser
+            self._browsers.pop(key, None)
+
+            # Drop a browser nobody is using to stay within max_browsers
+            if len(self._browsers) >= self.max_browsers:
+                for idle_key, idle_browser in list(self._browsers.items()):
+                    if not idle_browser.contexts:
+                        self._browsers.pop(idle_key)
+                        await self._close_browser(idle_browser)
+                        break
+
+            launch_start = time.time()
+            try:
+                browser = await self._playwright.chromium.launch(**launch_options)
+            except Exception as e:
+                raise RuntimeError(
+                    f"Browser launch failed: {str(e)}. "
+                    "Check that Chromium is installed and all system dependencies are available."
+                ) from e
+
+            self._browsers[key] = browser
+            self._counters['browsers_launched'] += 1
+            logger.info(f"Async engine launched browser in {time.time() - launch_start:.2f}s "
+                        f"({len(self._browsers)} running)")
+            return browser
+
+    def submit(self, task: Dict, timeout: Optional[float] = None) -> bool:
+        """
+        Schedule a task on the engine loop (blocks while all task slots are busy)
+
+        Returns:
+            True if the task was accepted, False if draining or timed out
+        """
+        if not self._accepting:
+            return False
+        if not self._free.acquire(timeout=timeout):
+            return False
+
+        future = asyncio.run_coroutine_threadsafe(self._run_task(task), self._loop)
+        with self._futures_lock:
+            self._futures.add(future)
+        future.add_done_callback(self._task_done)
+        return True
+
+    def _task_done(self, future: Future):
+        """Release the slot once a task finishes"""
+        with self._futures_lock:
+            self._futures.discard(future)
+        self._free.release()
+
+    async def _run_task(self, task: Dict):
+        """Run one task through the handler and record utilisation"""
+        token = id(task)
+        self._active += 1
+        self._peak_active = max(self._peak_active, self._active)
+        self._active_since[token] = time.time()
+
+        try:
+            await self.handler(task, self)
+        except Exception as e:
+            self._counters['tasks_failed'] += 1
+            logger.error(f"Async task {task.get('id')} raised: {e}", exc_info=True)
+        finally:
+            self._busy_seconds += time.time() - self._active_since.pop(token)
+            self._active -= 1
+            self._counters['tasks_processed'] += 1
+
+    def wait_for_free_slot(self, timeout: Optional[float] = None) -> bool:
+        """Block until at least one task slot is free (without reserving it)"""
+        if not self._free.acquire(timeout=timeout):
+            return False
+        self._free.release()
+        return True
+
+    def free_slots(self) -> int:
+        """Number of task slots not in use"""
+        with self._futures_lock:
+            return max(self.max_concurrent_tasks - len(self._futures), 0)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stop accepting tasks, wait for running ones, then shut down browsers and the loop
+
+        Returns:
+            True if every task finished within the timeout
+        """
+        self._accepting = False
+
+        deadline = None if timeout is None else time.time() + timeout
+        with self._futures_lock:
+            pending = list(self._futures)
+        for future in pending:
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
+            try:
+                future.result(remaining)
+            except Exception:
+                pass
+
+        with self._futures_lock:
+            drained = not self._futures
+        if not drained:
+            logger.warning("Async engine did not drain before timeout, cancelling remaining tasks")
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(30)
+        except Exception as e:
+            logger.warning(f"Error shutting down async engine: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+        return drained
+
+    async def _shutdown(self):
+        """Cancel leftover tasks and close browsers and the driver"""
+        current = asyncio.current_task()
+        for task in asyncio.all_tasks():
+            if task is not current:
+                task.cancel()
+
+        for browser in list(self._browsers.values()):
+            await self._close_browser(browser)
+        self._browsers.clear()
+
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception as e:
+                logger.warning(f"Error stopping async Playwright: {e}")
+            self._playwright = None
+
+    async def _close_browser(self, browser: Browser):
+        """Close a browser, ignoring already-closed errors"""
+        try:
+            await browser.close()
+        except Exception as e:
+            logger.debug(f"Error closing browser: {e}")
+
+    def get_stats(self) -> Dict:
+        """Get concurrency and utilisation metrics"""
+        now = time.time()
+        uptime = max(now - self._started_at, 1e-9)
+        busy = self._busy_seconds + sum(now - since for since in list(self._active_since.values()))
+
+        stats = dict(self._counters)
+        stats.update({
+            'engine': 'async',
+            'concurrency': self.max_concurrent_tasks,
+            'uptime_seconds': round(uptime, 1),
+            'busy_slots': self._active,
+            'peak_active': self._peak_active,
+            'running_browsers': len(self._browsers),
+            'utilisation': round(busy / (uptime * self.max_concurrent_tasks), 3),
+            'slots': [],
+        })
+        return stats
@@ -0,0 +1,198 @@
+"""
+Async forum backlink automation
+"""
+from typing import Dict, Optional
+import logging
+from .async_base import AsyncBaseAutomation
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncForumAutomation(AsyncBaseAutomation):
+    """Async automation for forum backlinks (mirrors ForumAutomation)"""
+
+    async def execute(self, task: Dict) -> Dict:
+        """Execute forum backlink task"""
+        payload = task.get('payload', {})
+        keywords = payload.get('keywords', [])
+
+        opportunity = await self.select_opportunity(task.get('campaign_id'), 'forum')
+        target_url = opportunity.get('url') if opportunity else None
+
+        if not target_url:
+            target_urls = payload.get('target_urls', [])
+            if not target_urls:
+                return {
+                    'success': False,
+                    'error': 'No target URLs provided and no opportunities available',
+                }
+            target_url = target_urls[0]
+
+        try:
+            logger.info(f"Processing forum backlink for {target_url}")
+
+            site_account = self._get_site_account(target_url)
+            if not site_account:
+                return {
+                    'success': False,
+                    'error': 'Site account not found. Create profile first.',
+                }
+
+            if not await self._is_logged_in():
+                await self._login(site_account)
+
+            thread_url = await self._find_or_create_thread(keywords)
+            if not thread_url:
+                return {
+                    'success': False,
+                    'error': 'Failed to find or create thread',
+                }
+
+            post_text = await self._generate_post(keywords, task)
+            post_url = await self._post_reply(thread_url, post_text)
+
+            if post_url:
+                result = {
+                    'success': True,
+                    'url': post_url,
+                    'type': 'forum',
+                }
+                if opportunity:
+                    result['backlink_id'] = opportunity.get('id')
+                return result
+
+            return {
+                'success': False,
+                'error': 'Failed to post reply',
+            }
+
+        except Exception as e:
+            logger.error(f"Forum automation failed: {e}", exc_info=True)
+            return {
+                'success': False,
+                'error': str(e),
+            }
+
+    def _get_site_account(self, domain: str):
+        """Get site account for domain"""
+        # Site account lookup is not exposed by the API yet (same as ForumAutomation)
+        return None
+
+    async def _is_logged_in(self) -> bool:
+        """Check if user is logged in"""
+        try:
+            logout_link = self.page.locator('a[href*="logout"], a[href*="signout"]').first
+            return await logout_link.is_visible(timeout=3000)
+        except Exception:
+            return False
+
+    async def _login(self, site_account: Dict):
+        """Login to forum"""
+        login_form = self.page.locator('form[class*="login"], form[id*="login"]').first
+        if not await login_form.is_visible():
+            return
+
+        username_field = login_form.locator('input[name*="user"], input[type="text"]').first
+        password_field = login_form.locator('input[type="password"]').first
+
+        if await username_field.is_visible() and await password_field.is_visible():
+            await self.human_type(self.page, username_field, site_account.get('username', ''))
+            await self.human_type(self.page, password_field, site_account.get('password', ''))
+            await self._solve_captcha_quietly()
+
+            await login_form.locator('button[type="submit"], input[type="submit"]').first.click()
+            await self.random_delay(2, 4)
+
+    async def _find_or_create_thread(self, keywords: list) -> Optional[str]:
+        """Find or create thread"""
+        search_url = f"{self.page.url}/search"
+        if not await self._safe_navigate(search_url, wait_until='networkidle'):
+            return None
+
+        keyword = keywords[0] if keywords else "discussion"
+        search_field = self.page.locator('input[name*="search"], input[type="search"]').first
+
+        if await search_field.is_visible():
+            await self.human_type(self.page, search_field, keyword)
+            await self.page.locator('button:has-text("Search"), button[type="submit"]').first.click()
+            await self.random_delay(2, 4)
+
+            thread_link = self.page.locator('a[href*="thread"], a[href*="topic"]').first
+            if await thread_link.is_visible():
+                return await thread_link.get_attribute('href')
+
+        return await self._create_thread(keywords)
+
+    async def _create_thread(self, keywords: list) -> Optional[str]:
+        """Create new thread"""
+        new_thread_button = self.page.locator('a:has-text("New Thread"), a:has-text("Create Thread"), a[href*="new"]').first
+        if not await new_thread_button.is_visible():
+            return None
+
+        await new_thread_button.click()
+        await self.random_delay(2, 4)
+
+        title_field = self.page.locator('input[name*="title"], input[name*="subject"]').first
+        content_field = self.page.locator('textarea, div[contenteditable="true"]').first
+
+        if await title_field.is_visible() and await content_field.is_visible():
+            keyword = keywords[0] if keywords else "Discussion"
+            await self.human_type(self.page, title_field, f"Discussion about {keyword}")
+            await self.human_type(self.page, content_field, f"I'd like to discuss {keyword}...")
+            await self._solve_captcha_quietly()
+
+            await self.page.locator('button[type="submit"], button:has-text("Post")').first.click()
+            await self.random_delay(2, 4)
+
+            return self.page.url
+
+        return None
+
+    async def _post_reply(self, thread_url: str, post_text: str) -> Optional[str]:
+        """Post reply to thread"""
+        if not await self._safe_navigate(thread_url, wait_until='networkidle'):
+            return None
+        await self.random_delay(1, 2)
+
+        reply_form = self.page.locator('form[class*="reply"], textarea[name*="reply"]').first
+        if not await reply_form.is_visible():
+            return None
+
+        textarea = reply_form.locator('textarea, div[contenteditable="true"]').first
+        if not await textarea.is_visible():
+            return None
+
+        await self.human_type(self.page, textarea, post_text)
+        await self._solve_captcha_quietly()
+
+        await reply_form.locator('button[type="submit"], button:has-text("Post")').first.click()
+        await self.random_delay(2, 4)
+
+        return self.page.url
+
+    async def _solve_captcha_quietly(self):
+        """Attempt captcha solving before a submit; failures are not fatal"""
+        try:
+            await self.solve_captcha_if_present()
+        except Exception as e:
+            logger.debug(f"Captcha solve attempt failed: {e}")
+
+    async def _generate_post(self, keywords: list, task: Dict) -> str:
+        """Generate forum post using LLM"""
+        try:
+            post = await self.call_api(
+                self.api_client.generate_content,
+                'forum_post',
+                {
+                    'topic': keywords[0] if keywords else "topic",
+                    'target_url': task.get('payload', {}).get('target_url', ''),
+                },
+                task.get('payload', {}).get('content_tone', 'professional')
+            )
+            if post:
+                return post.strip()
+        except Exception as e:
+            logger.warning(f"LLM forum post generation failed: {e}")
+
+        keyword = keywords[0] if keywords else "topic"
+        return f"This is a great discussion about {keyword}. I found this very informative!"
@@ -0,0 +1,185 @@
+"""
+Async guest post submission automation
+"""
+from typing import Dict
+import logging
+from .async_base import AsyncBaseAutomation
+
+logger = logging.getLogger(__name__)
+
+FIELD_PATTERNS = {
+    'name': ['input[name*="name"]', 'input[id*="name"]'],
+    'email': ['input[type="email"]', 'input[name*="email"]'],
+    'subject': ['input[name*="subject"]', 'input[name*="title"]'],
+    'message': ['textarea', 'textarea[name*="message"]', 'textarea[name*="content"]'],
+    'website': ['input[name*="url"]', 'input[name*="website"]', 'input[name*="site"]'],
+}
+
+
+class AsyncGuestPostAutomation(AsyncBaseAutomation):
+    """Async automation for guest post submissions (mirrors GuestPostAutomation)"""
+
+    async def execute(self, task: Dict) -> Dict:
+        """Execute guest post submission task"""
+        payload = task.get('payload', {})
+        keywords = payload.get('keywords', [])
+
+        opportunity = await self.select_opportunity(task.get('campaign_id'), 'guest')
+        target_url = opportunity.get('url') if opportunity else None
+
+        if not target_url:
+            target_urls = payload.get('target_urls', [])
+            if not target_urls:
+                return {
+                    'success': False,
+                    'error': 'No target URLs provided and no opportunities available',
+                }
+            target_url = target_urls[0]
+
+        try:
+            logger.info(f"Processing guest post submission for {target_url}")
+
+            submission_url = await self._find_submission_url(target_url)
+            if not await self._safe_navigate(submission_url, wait_until='networkidle'):
+                return {
+                    'success': False,
+                    'error': 'Browser crashed during navigation',
+                    'backlink_id': opportunity.get('id') if opportunity else None,
+                }
+            await self.random_delay(2, 4)
+
+            # One campaign lookup serves the pitch, subject and website fields
+            campaign = await self.call_api(self.api_client.get_campaign, task['campaign_id'])
+
+            pitch = await self._generate_pitch(keywords, task, campaign)
+            fields = await self._extract_form_fields()
+            await self._fill_submission_form(fields, pitch, campaign)
+
+            try:
+                await self.solve_captcha_if_present()
+            except Exception as e:
+                logger.debug(f"Captcha solve attempt failed: {e}")
+
+            await self.page.locator('button[type="submit"], button:has-text("Submit"), button:has-text("Send")').first.click()
+            await self.random_delay(3, 5)
+
+            if await self._verify_submission_success():
+                result = {
+                    'success': True,
+                    'url': self.page.url,
+                    'type': 'guestposting',
+                    'status': 'submitted',
+                }
+                if opportunity:
+                    result['backlink_id'] = opportunity.get('id')
+                return result
+
+            return {
+                'success': False,
+                'error': 'Submission verification failed',
+            }
+
+        except Exception as e:
+            logger.error(f"Guest post automation failed: {e}", exc_info=True)
+            return {
+                'success': False,
+                'error': str(e),
+            }
+
+    async def _find_submission_url(self, base_url: str) -> str:
+        """Find guest post submission URL"""
+        for path in ['/write-for-us', '/guest-post', '/submit-article', '/contribute', '/contact']:
+            try:
+                url = f"{base_url.rstrip('/')}{path}"
+                if not await self._safe_navigate(url, wait_until='networkidle', timeout=5000):
+                    logger.warning(f"Failed to navigate to {url}")
+                    continue
+                if any(keyword in self.page.url.lower() for keyword in ['write', 'guest', 'submit', 'contribute']):
+                    return self.page.url
+            except Exception:
+                continue
+
+        return base_url
+
+    async def _extract_form_fields(self) -> Dict:
+        """Extract form field selectors"""
+        fields = {}
+        for field_name, selectors in FIELD_PATTERNS.items():
+            for selector in selectors:
+                try:
+                    if await self.page.locator(selector).first.is_visible():
+                        fields[field_name] = selector
+                        break
+                except Exception:
+                    continue
+        return fields
+
+    async def _fill_submission_form(self, fields: Dict, pitch: str, campaign: Dict):
+        """Fill guest post submission form"""
+        campaign = campaign or {}
+
+        if 'name' in fields:
+            await self.human_type(self.page, fields['name'], "John Doe")
+
+        if 'email' in fields:
+            await self.human_type(self.page, fields['email'], "writer@example.com")
+
+        if 'subject' in fields:
+            subject = f"Guest Post: {campaign.get('web_name', 'Article Submission')}"
+            await self.human_type(self.page, fields['subject'], subject)
+
+        if 'message' in fields:
+            await self.human_type(self.page, fields['message'], pitch)
+
+        if 'website' in fields and campaign.get('web_url'):
+            await self.human_type(self.page, fields['website'], campaign['web_url'])
+
+        await self.random_delay(1, 2)
+
+    async def _generate_pitch(self, keywords: list, task: Dict, campaign: Dict) -> str:
+        """Generate guest post pitch using LLM"""
+        keyword = keywords[0] if keywords else "topic"
+        try:
+            blog_name = await self.page.title() if self.page else ""
+            try:
+                site_name = await self.page.locator('meta[property="og:site_name"]').get_attribute('content')
+                if site_name:
+                    blog_name = site_name
+            except Exception:
+                pass
+
+            pitch = await self.call_api(
+                self.api_client.generate_content,
+                'guest_post_pitch',
+                {
+                    'blog_name': blog_name,
+                    'target_url': task.get('payload', {}).get('target_url', ''),
+                    'proposed_topic': keyword,
+                },
+                task.get('payload', {}).get('content_tone', 'professional')
+            )
+            if pitch:
+                return pitch.strip()
+        except Exception as e:
+            logger.warning(f"LLM guest post pitch generation failed: {e}")
+
+        return f"""
+        Hi there,
+
+        I'm interested in submitting a guest post about {keyword} for your blog.
+        I have extensive experience in this area and believe my content would be valuable for your readers.
+
+        My website: {(campaign or {}).get('web_url', '')}
+
+        Please let me know if you'd be interested in reviewing my submission.
+
+        Best regards
+        """.strip()
+
+    async def _verify_submission_success(self) -> bool:
+        """Verify submission was successful"""
+        try:
+            page_text = (await self.page.content()).lower()
+            return any(indicator in page_text for indicator in ['thank you', 'submitted', 'received', 'success'])
+        except Exception:
+            return False
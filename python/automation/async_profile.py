@@ -0,0 +1,268 @@
+"""
+Async profile backlink automation
+"""
+from typing import Dict
+import logging
+from .async_base import AsyncBaseAutomation
+from .profile import ProfileAutomation
+
+logger = logging.getLogger(__name__)
+
+USERNAME_SELECTORS = [
+    'input[name*="user"]',
+    'input[id*="user"]',
+    'input[placeholder*="user" i]',
+    'input[type="text"]',
+]
+EMAIL_SELECTORS = [
+    'input[type="email"]',
+    'input[name*="email"]',
+    'input[id*="email"]',
+    'input[placeholder*="email" i]',
+]
+WEBSITE_SELECTORS = [
+    'input[name*="url"]',
+    'input[name*="website"]',
+    'input[name*="site"]',
+    'input[id*="url"]',
+    'input[id*="website"]',
+]
+SUBMIT_SELECTORS = [
+    'button[type="submit"]',
+    'input[type="submit"]',
+    'button:has-text("Register")',
+    'button:has-text("Sign Up")',
+    'button:has-text("Create Account")',
+    'button:has-text("Join")',
+    'button:has-text("Submit")',
+    'form button',
+    'button.primary',
+    'button.btn-primary',
+    'button[class*="submit"]',
+    'button[class*="register"]',
+    'button[class*="signup"]',
+]
+
+
+class AsyncProfileAutomation(AsyncBaseAutomation):
+    """Async automation for profile backlinks (mirrors ProfileAutomation)"""
+
+    _generate_form_data = ProfileAutomation._generate_form_data
+    _extract_domain = ProfileAutomation._extract_domain
+
+    async def execute(self, task: Dict) -> Dict:
+        """Execute profile backlink task"""
+        payload = task.get('payload', {})
+
+        opportunity = await self.select_opportunity(task.get('campaign_id'), 'profile')
+        target_url = opportunity.get('url') if opportunity else None
+        backlink_id = opportunity.get('id') if opportunity else None
+
+        if not target_url:
+            target_urls = payload.get('target_urls', [])
+            if not target_urls:
+                return {
+                    'success': False,
+                    'error': 'No target URLs provided and no opportunities available',
+                }
+            target_url = target_urls[0]
+
+        try:
+            logger.info(f"Processing profile backlink for {target_url}")
+
+            registration_url = await self._find_registration_url(target_url)
+            if not await self._safe_navigate(registration_url, wait_until='networkidle'):
+                return {
+                    'success': False,
+                    'error': 'Browser crashed during navigation',
+                    'backlink_id': backlink_id,
+                }
+            await self.random_delay(2, 4)
+
+            form_data = self._generate_form_data()
+            await self._fill_registration_form(form_data, task)
+
+            await self.take_screenshot(f'profile_before_submit_{task.get("id", "unknown")}.png')
+            await self.random_delay(1, 2)
+
+            try:
+                await self.solve_captcha_if_present()
+            except Exception as e:
+                logger.debug(f"Captcha solve attempt failed: {e}")
+
+            if not await self._submit_registration_form():
+                return {
+                    'success': False,
+                    'error': 'Could not find or click submit button',
+                    'backlink_id': backlink_id,
+                }
+
+            await self.random_delay(3, 5)
+
+            profile_url = await self._get_profile_url()
+            if not profile_url:
+                return {
+                    'success': False,
+                    'error': 'Profile URL not found',
+                    'backlink_id': backlink_id,
+                }
+
+            site_account = await self.call_api(
+                self.api_client.create_site_account,
+                campaign_id=task['campaign_id'],
+                site_domain=self._extract_domain(target_url),
+                login_email=form_data['email'],
+                username=form_data['username'],
+                password=form_data['password'],
+                status='created',
+            )
+
+            result = {
+                'success': True,
+                'url': profile_url,
+                'type': 'profile',
+                'site_account_id': site_account.get('id'),
+            }
+            if opportunity:
+                result['backlink_id'] = backlink_id
+            return result
+
+        except Exception as e:
+            error_msg = str(e)
+            error_lower = error_msg.lower()
+            logger.error(f"Profile automation failed: {error_msg}", exc_info=True)
+            await self.take_screenshot(f'profile_error_{task.get("id", "unknown")}.png')
+
+            failure_reason = None
+            if 'registration' in error_lower or 'signup' in error_lower:
+                failure_reason = 'registration_failed'
+            elif 'captcha' in error_lower:
+                failure_reason = 'captcha_failed'
+            elif 'timeout' in error_lower:
+                failure_reason = 'timeout'
+            elif 'blocked' in error_lower or 'banned' in error_lower:
+                failure_reason = 'blocked'
+
+            captcha_type = None
+            if 'captcha' in error_lower:
+                if 'recaptcha' in error_lower:
+                    captcha_type = 'recaptcha_v2' if 'v3' not in error_lower else 'recaptcha_v3'
+                elif 'hcaptcha' in error_lower:
+                    captcha_type = 'hcaptcha'
+                else:
+                    captcha_type = 'image_captcha'
+
+            return {
+                'success': False,
+                'error': error_msg,
+                'backlink_id': backlink_id,
+                'failure_reason': failure_reason,
+                'captcha_type': captcha_type,
+            }
+
+    async def _find_registration_url(self, base_url: str) -> str:
+        """Find registration URL"""
+        for path in ['/register', '/signup', '/sign-up', '/create-account', '/join']:
+            try:
+                url = f"{base_url.rstrip('/')}{path}"
+                if not await self._safe_navigate(url, wait_until='networkidle', timeout=5000):
+                    logger.warning(f"Failed to navigate to {url}")
+                    continue
+                if 'register' in self.page.url.lower() or 'signup' in self.page.url.lower():
+                    return self.page.url
+            except Exception:
+                continue
+
+        return base_url
+
+    async def _fill_registration_form(self, form_data: Dict, task: Dict):
+        """Fill registration form using the selector fallbacks of ProfileAutomation"""
+        logger.info("Filling registration form...")
+
+        try:
+            await self.page.wait_for_selector('form, input[type="email"], input[type="password"]', timeout=10000)
+        except Exception:
+            logger.warning("Form elements not found, continuing anyway...")
+
+        username_field = await self.first_visible(self.page, USERNAME_SELECTORS, timeout=0)
+        if username_field:
+            await self.human_type(self.page, username_field, form_data['username'])
+        else:
+            logger.warning("Could not find username field")
+
+        email_field = await self.first_visible(self.page, EMAIL_SELECTORS, timeout=0)
+        if email_field:
+            await self.human_type(self.page, email_field, form_data['email'])
+        else:
+            logger.warning("Could not find email field")
+
+        password_fields = self.page.locator('input[type="password"]')
+        password_count = await password_fields.count()
+        if password_count > 0:
+            try:
+                if await password_fields.first.is_visible():
+                    await self.human_type(self.page, password_fields.first, form_data['password'])
+                    # Fill confirm password if exists
+                    if password_count > 1 and await password_fields.nth(1).is_visible():
+                        await self.human_type(self.page, password_fields.nth(1), form_data['password'])
+            except Exception as e:
+                logger.warning(f"Error filling password: {e}")
+        else:
+            logger.warning("Could not find password field")
+
+        website_field = await self.first_visible(self.page, WEBSITE_SELECTORS, timeout=0)
+        if website_field:
+            campaign = await self.call_api(self.api_client.get_campaign, task['campaign_id'])
+            website_url = campaign.get('web_url', '')
+            if website_url:
+                await self.human_type(self.page, website_field, website_url)
+
+        await self.random_delay(1, 2)
+        logger.info("Form filling completed")
+
+    async def _submit_registration_form(self) -> bool:
+        """Submit registration form with multiple selector attempts"""
+        for selector in SUBMIT_SELECTORS:
+            try:
+                submit_button = self.page.locator(selector).first
+                if await submit_button.count() == 0:
+                    continue
+                await submit_button.wait_for(state='visible', timeout=5000)
+                if await submit_button.get_attribute('disabled'):
+                    logger.warning(f"Submit button found but is disabled: {selector}")
+                    continue
+
+                logger.info(f"Clicking submit button with selector: {selector}")
+                await submit_button.click(timeout=10000)
+                return True
+            except Exception as e:
+                logger.debug(f"Button with selector '{selector}' not ready: {e}")
+
+        # If no button found, try to submit the form directly
+        try:
+            form = self.page.locator('form').first
+            if await form.count() > 0:
+                logger.info("Trying to submit form directly")
+                await form.evaluate('form => form.submit()')
+                return True
+        except Exception as e:
+            logger.warning(f"Could not submit form directly: {e}")
+
+        logger.error("Could not find any submit button or form")
+        return False
+
+    async def _get_profile_url(self) -> str:
+        """Get profile URL after registration"""
+        try:
+            await self.page.wait_for_timeout(3000)
+
+            if '/profile' in self.page.url or '/user' in self.page.url:
+                return self.page.url
+
+            profile_link = self.page.locator('a[href*="profile"], a[href*="user"]').first
+            if await profile_link.is_visible():
+                return await profile_link.get_attribute('href')
+
+            return self.page.url
+        except Exception:
+            return self.page.url
@@ -25,6 +25,9 @@ os.environ['PLAYWRIGHT_SKIP_VALIDATE_HOST_REQUIREMENTS'] = '1'
 
 logger = logging.getLogger(__name__)
 
+# Library checks (ldconfig/find/ldd) only need to succeed once per worker process
+_environment_prepared = False
+
 # Import captcha solver
 try:
     from automation.captcha_solver import CaptchaSolver
@@ -47,10 +50,15 @@ except ImportError:
 class BaseAutomation(ABC):
     """Base class for all automation tasks"""
 
-    def __init__(self, api_client, proxy: Optional[Dict] = None, headless: bool = True):
+    def __init__(self, api_client, proxy: Optional[Dict] = None, headless: bool = True,
+                 browser_pool=None):
         self.api_client = api_client
         self.proxy = proxy
         self.headless = headless
+        # Optional core.browser_pool.BrowserPool - when set, the browser is borrowed
+        # from the pool and only the context/page are created and closed per task
+        self.browser_pool = browser_pool
+        self.browser_lease = None
         self.playwright = None
         self.browser: Optional[Browser] = None
         self.context: Optional[BrowserContext] = None
@@ -61,9 +69,68 @@ class BaseAutomation(ABC):
         shadow_mode = os.getenv('SHADOW_MODE', 'false').lower() in ('true', '1', 'yes')
         self.opportunity_selector = OpportunitySelector(api_client, shadow_mode=shadow_mode) if OpportunitySelector else None
         self.last_opportunity = None  # Store for shadow mode logging
+        # Set by the worker: lookups started before the browser (core.task_prefetch)
+        self.task_lookups = None
+        self.startup_trace = None
+
+    def prepare_browser(self):
+        """
+        Browser setup that doesn't need the proxy: library checks and, without a
+        pool, the Playwright driver. Run while the proxy lookup is in flight.
+        """
+        self._prepare_environment()
+        if self.browser_pool is None and self.playwright is None:
+            self._ensure_no_running_event_loop()
+            self.playwright = sync_playwright().start()
 
     def setup_browser(self):
         """Setup browser with proxy and stealth settings"""
+        if self.startup_trace is not None:
+            with self.startup_trace.span('browser_setup'):
+                self._setup_browser()
+        else:
+            self._setup_browser()
+
+    def _setup_browser(self):
+        self._prepare_environment()
+        launch_options = self._build_launch_options()
+
+        if self.browser_pool is not None:
+            # Borrow a warm browser from the worker's pool; only the context is per task
+            self.browser_lease = self.browser_pool.acquire(launch_options, self._launch_browser)
+            self.browser = self.browser_lease.browser
+        else:
+            if self.playwright is None:
+                self._ensure_no_running_event_loop()
+
+                # Start Playwright - it will create its own internal event loop
+                # This is expected and necessary for Playwright sync API to work
+                logger.debug("Starting Playwright (no running event loops detected, Playwright will create its own)")
+                self.playwright = sync_playwright().start()
+            self.browser = self._launch_browser(self.playwright, launch_options)
+
+        self._create_context_and_page()
+        logger.debug("Browser setup completed successfully")
+
+    def select_opportunity(self, campaign_id: int, task_type: str) -> Optional[Dict]:
+        """Opportunity for this task: the prefetched selection if the worker started one"""
+        future = self.task_lookups.take_opportunity(task_type) if self.task_lookups is not None else None
+        if future is not None:
+            return future.result()
+        return self.opportunity_selector.select_opportunity(campaign_id=campaign_id, task_type=task_type)
+
+    @staticmethod
+    def _prepare_environment():
+        """
+        Verify system libraries and LD_LIBRARY_PATH before the first browser launch.
+
+        The checks shell out to ldconfig/find/ldd, so they run once per process and
+        are skipped for every later launch.
+        """
+        global _environment_prepared
+        if _environment_prepared:
+            return
+
         # Skip Linux library checks on Windows - Playwright handles Windows dependencies differently
         is_windows = platform.system() == 'Windows' or sys.platform == 'win32'
         
@@ -267,6 +334,161 @@ class BaseAutomation(ABC):
             except Exception as e:
                 logger.warning(f"Could not set LD_LIBRARY_PATH: {e}")
 
+        # Final verification: Ensure library cache is updated and library is accessible (Linux only)
+        libglib_verified = True if is_windows else False
+        if not is_windows:
+            import subprocess
+            try:
+                # Run ldconfig one more time right before launch
+                ldconfig_result = subprocess.run(['ldconfig'], capture_output=True, timeout=10, text=True)
+                if ldconfig_result.returncode != 0:
+                    logger.warning(f"ldconfig had issues: {ldconfig_result.stderr[:200] if ldconfig_result.stderr else 'Unknown error'}")
+
+                # Verify libglib is accessible
+                verify_result = subprocess.run(
+                    ['ldconfig', '-p'],
+                    capture_output=True,
+                    text=True,
+                    timeout=5
+                )
+                if 'libglib-2.0.so.0' in verify_result.stdout:
+                    libglib_verified = True
+                    logger.info("libglib-2.0.so.0 found in library cache")
+                else:
+                    logger.warning("libglib-2.0.so.0 not in library cache, searching filesystem...")
+                    # Try to find it directly
+                    find_result = subprocess.run(
+                        ['find', '/usr/lib*', '/lib*', '-name', 'libglib-2.0.so.0', '2>/dev/null'],
+                        shell=True,
+                        capture_output=True,
+                        text=True,
+                        timeout=10
+                    )
+                    if find_result.stdout.strip():
+                        lib_file = find_result.stdout.strip().split('\n')[0]
+                        logger.info(f"Found libglib-2.0.so.0 at {lib_file}")
+                        # Try to actually load the library to verify it's accessible
+                        try:
+                            test_result = subprocess.run(
+                                ['ldd', lib_file],
+                                capture_output=True,
+                                text=True,
+                                timeout=5
+                            )
+                            if test_result.returncode == 0:
+                                libglib_verified = True
+                                logger.info(f"Library file is valid and loadable: {lib_file}")
+                            else:
+                                logger.warning(f"Library file found but may have dependency issues: {test_result.stderr}")
+                        except Exception as e:
+                            logger.debug(f"Could not test library loading: {e}")
+                    else:
+                        logger.error("libglib-2.0.so.0 not found anywhere on filesystem!")
+
+                # If still not verified, try to install it
+                if not libglib_verified:
+                    logger.warning("libglib-2.0.so.0 not verified. Attempting emergency installation...")
+                    try:
+                        install_result = subprocess.run(
+                            ['apt-get', 'update', '-qq'],
+                            capture_output=True,
+                            timeout=30
+                        )
+                        install_result = subprocess.run(
+                            ['apt-get', 'install', '-y', '--no-install-recommends', 'libglib2.0-0', 'libglib2.0-bin'],
+                            capture_output=True,
+                            text=True,
+                            timeout=120
+                        )
+                        if install_result.returncode == 0:
+                            subprocess.run(['ldconfig'], capture_output=True, timeout=10)
+                            logger.info("Emergency libglib installation completed")
+                            libglib_verified = True
+                        else:
+                            logger.error(f"Emergency installation failed: {install_result.stderr[:500]}")
+                    except Exception as e:
+                        logger.error(f"Emergency installation exception: {e}")
+
+            except Exception as e:
+                logger.warning(f"Library verification warning: {e}")
+
+            if not libglib_verified:
+                logger.error("WARNING: libglib-2.0.so.0 verification failed. Browser launch may fail.")
+
+        # Ensure LD_LIBRARY_PATH doesn't have leading/trailing colons (Linux only)
+        if not is_windows:
+            ld_path = os.environ.get('LD_LIBRARY_PATH', '')
+            if ld_path:
+                # Clean up any empty paths
+                cleaned_paths = [p for p in ld_path.split(':') if p and p.strip()]
+                cleaned_ld_path = ':'.join(cleaned_paths)
+                if cleaned_ld_path != ld_path:
+                    os.environ['LD_LIBRARY_PATH'] = cleaned_ld_path
+                    ld_path = cleaned_ld_path
+                    logger.info(f"Cleaned LD_LIBRARY_PATH to: {ld_path}")
+            else:
+                ld_path = 'not set'
+            logger.info(f"Launching browser with LD_LIBRARY_PATH={ld_path}")
+            logger.info(f"libglib verified: {libglib_verified}")
+        else:
+            logger.info("Launching browser on Windows (no LD_LIBRARY_PATH needed)")
+
+        # Test if browser executable can actually run (check dependencies) - Linux only
+        if not is_windows:
+            import subprocess
+            try:
+                import glob
+                playwright_cache = os.path.expanduser('~/.cache/ms-playwright')
+                chromium_paths = glob.glob(f"{playwright_cache}/chromium-*/chrome-linux/chrome")
+                if chromium_paths:
+                    chrome_path = chromium_paths[0]
+                    logger.info(f"Testing browser executable dependencies: {chrome_path}")
+                    # Try to check what libraries it needs
+                    ldd_result = subprocess.run(
+                        ['ldd', chrome_path],
+                        capture_output=True,
+                        text=True,
+                        timeout=10
+                    )
+                    if ldd_result.returncode == 0:
+                        # Check for missing libraries
+                        missing_libs = []
+                        for line in ldd_result.stdout.split('\n'):
+                            if 'not found' in line.lower():
+                                missing_libs.append(line.strip())
+                        if missing_libs:
+                            logger.error(f"Browser executable has MISSING dependencies:")
+                            for lib in missing_libs[:5]:  # Show first 5
+                                logger.error(f"  - {lib}")
+                            logger.error("This will cause browser launch to fail!")
+                            logger.error("Try: apt-get update && apt-get install -y <missing-package>")
+                        else:
+                            logger.info("✓ Browser executable dependencies OK (all libraries found)")
+                    else:
+                        logger.warning(f"Could not check browser dependencies: {ldd_result.stderr}")
+
+                    # Also try to run the browser with --version to see if it can start
+                    try:
+                        version_result = subprocess.run(
+                            [chrome_path, '--version'],
+                            capture_output=True,
+                            text=True,
+                            timeout=5,
+                            env=dict(os.environ, LD_LIBRARY_PATH=os.environ.get('LD_LIBRARY_PATH', ''))
+                        )
+                        if version_result.returncode == 0:
+                            logger.info(f"✓ Browser executable can run: {version_result.stdout.strip()}")
+                        else:
+                            logger.warning(f"Browser --version failed: {version_result.stderr}")
+                    except Exception as e:
+                        logger.warning(f"Could not test browser --version: {e}")
+            except Exception as e:
+                logger.warning(f"Could not test browser executable: {e}")
+
+        _environment_prepared = True
+
+    def _ensure_no_running_event_loop(self):
+        """Make sure Playwright Sync API is not started inside a running asyncio loop"""
         # Ensure we're not in an asyncio event loop when using sync_playwright
         # Playwright Sync API cannot be used inside an asyncio event loop
         # Note: asyncio is imported at module level, policy is set there to prevent auto-creation
@@ -356,11 +578,8 @@ class BaseAutomation(ABC):
         except Exception as e:
             logger.debug(f"Could not check/reset event loop policy: {e}")
 
-        # Start Playwright - it will create its own internal event loop
-        # This is expected and necessary for Playwright sync API to work
-        logger.debug("Starting Playwright (no running event loops detected, Playwright will create its own)")
-        self.playwright = sync_playwright().start()
-
+    def _build_launch_options(self) -> Dict:
+        """Build Chromium launch options (also used as the browser pool key)"""
         # Browser launch options
         launch_options = {
             'headless': self.headless,
@@ -383,186 +602,40 @@ class BaseAutomation(ABC):
                 'password': self.proxy.get('password'),
             }
 
-        # Final verification: Ensure library cache is updated and library is accessible (Linux only)
-        libglib_verified = True if is_windows else False
-        if not is_windows:
-            import subprocess
-            try:
-                # Run ldconfig one more time right before launch
-                ldconfig_result = subprocess.run(['ldconfig'], capture_output=True, timeout=10, text=True)
-                if ldconfig_result.returncode != 0:
-                    logger.warning(f"ldconfig had issues: {ldconfig_result.stderr[:200] if ldconfig_result.stderr else 'Unknown error'}")
-
-                # Verify libglib is accessible
-                verify_result = subprocess.run(
-                    ['ldconfig', '-p'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                if 'libglib-2.0.so.0' in verify_result.stdout:
-                    libglib_verified = True
-                    logger.info("libglib-2.0.so.0 found in library cache")
-                else:
-                    logger.warning("libglib-2.0.so.0 not in library cache, searching filesystem...")
-                    # Try to find it directly
-                    find_result = subprocess.run(
-                        ['find', '/usr/lib*', '/lib*', '-name', 'libglib-2.0.so.0', '2>/dev/null'],
-                        shell=True,
-                        capture_output=True,
-                        text=True,
-                        timeout=10
-                    )
-                    if find_result.stdout.strip():
-                        lib_file = find_result.stdout.strip().split('\n')[0]
-                        logger.info(f"Found libglib-2.0.so.0 at {lib_file}")
-                        # Try to actually load the library to verify it's accessible
-                        try:
-                            test_result = subprocess.run(
-                                ['ldd', lib_file],
-                                capture_output=True,
-                                text=True,
-                                timeout=5
-                            )
-                            if test_result.returncode == 0:
-                                libglib_verified = True
-                                logger.info(f"Library file is valid and loadable: {lib_file}")
-                            else:
-                                logger.warning(f"Library file found but may have dependency issues: {test_result.stderr}")
-                        except Exception as e:
-                            logger.debug(f"Could not test library loading: {e}")
-                    else:
-                        logger.error("libglib-2.0.so.0 not found anywhere on filesystem!")
-
-                # If still not verified, try to install it
-                if not libglib_verified:
-                    logger.warning("libglib-2.0.so.0 not verified. Attempting emergency installation...")
-                    try:
-                        install_result = subprocess.run(
-                            ['apt-get', 'update', '-qq'],
-                            capture_output=True,
-                            timeout=30
-                        )
-                        install_result = subprocess.run(
-                            ['apt-get', 'install', '-y', '--no-install-recommends', 'libglib2.0-0', 'libglib2.0-bin'],
-                            capture_output=True,
-                            text=True,
-                            timeout=120
-                        )
-                        if install_result.returncode == 0:
-                            subprocess.run(['ldconfig'], capture_output=True, timeout=10)
-                            logger.info("Emergency libglib installation completed")
-                            libglib_verified = True
-                        else:
-                            logger.error(f"Emergency installation failed: {install_result.stderr[:500]}")
-                    except Exception as e:
-                        logger.error(f"Emergency installation exception: {e}")
-
-            except Exception as e:
-                logger.warning(f"Library verification warning: {e}")
-
-            if not libglib_verified:
-                logger.error("WARNING: libglib-2.0.so.0 verification failed. Browser launch may fail.")
+        # Additional browser launch args for better compatibility
+        launch_options['args'].extend([
+            '--disable-extensions',
+            '--disable-background-networking',
+            '--disable-background-timer-throttling',
+            '--disable-backgrounding-occluded-windows',
+            '--disable-breakpad',
+            '--disable-component-extensions-with-background-pages',
+            '--disable-features=TranslateUI',
+            '--disable-ipc-flooding-protection',
+            '--disable-renderer-backgrounding',
+            '--disable-sync',
+            '--force-color-profile=srgb',
+            '--metrics-recording-only',
+            '--no-first-run',
+            '--enable-automation',
+            '--password-store=basic',
+            '--use-mock-keychain',
+            # Windows-specific stability: DO NOT use --single-process on Windows (causes crashes)
+            # '--single-process',  # Removed - causes crashes on Windows
+            '--disable-software-rasterizer',
+            # Additional Windows stability flags
+            '--disable-web-security',  # Helps with some site compatibility
+            '--disable-features=IsolateOrigins,site-per-process',  # Reduce process isolation issues
+        ])
+
+        return launch_options
+
+    def _launch_browser(self, playwright, launch_options: Dict) -> Browser:
+        """Launch Chromium, attempting dependency recovery on known launch errors"""
+        is_windows = platform.system() == 'Windows' or sys.platform == 'win32'
 
-        # Try to launch browser - if it fails due to dependencies, try to install them
         try:
-            # Ensure LD_LIBRARY_PATH doesn't have leading/trailing colons (Linux only)
-            if not is_windows:
-                ld_path = os.environ.get('LD_LIBRARY_PATH', '')
-                if ld_path:
-                    # Clean up any empty paths
-                    cleaned_paths = [p for p in ld_path.split(':') if p and p.strip()]
-                    cleaned_ld_path = ':'.join(cleaned_paths)
-                    if cleaned_ld_path != ld_path:
-                        os.environ['LD_LIBRARY_PATH'] = cleaned_ld_path
-                        ld_path = cleaned_ld_path
-                        logger.info(f"Cleaned LD_LIBRARY_PATH to: {ld_path}")
-                else:
-                    ld_path = 'not set'
-                logger.info(f"Launching browser with LD_LIBRARY_PATH={ld_path}")
-                logger.info(f"libglib verified: {libglib_verified}")
-            else:
-                logger.info("Launching browser on Windows (no LD_LIBRARY_PATH needed)")
-
-            # Test if browser executable can actually run (check dependencies) - Linux only
-            if not is_windows:
-                import subprocess
-                try:
-                    import glob
-                    playwright_cache = os.path.expanduser('~/.cache/ms-playwright')
-                    chromium_paths = glob.glob(f"{playwright_cache}/chromium-*/chrome-linux/chrome")
-                    if chromium_paths:
-                        chrome_path = chromium_paths[0]
-                        logger.info(f"Testing browser executable dependencies: {chrome_path}")
-                        # Try to check what libraries it needs
-                        ldd_result = subprocess.run(
-                            ['ldd', chrome_path],
-                            capture_output=True,
-                            text=True,
-                            timeout=10
-                        )
-                        if ldd_result.returncode == 0:
-                            # Check for missing libraries
-                            missing_libs = []
-                            for line in ldd_result.stdout.split('\n'):
-                                if 'not found' in line.lower():
-                                    missing_libs.append(line.strip())
-                            if missing_libs:
-                                logger.error(f"Browser executable has MISSING dependencies:")
-                                for lib in missing_libs[:5]:  # Show first 5
-                                    logger.error(f"  - {lib}")
-                                logger.error("This will cause browser launch to fail!")
-                                logger.error("Try: apt-get update && apt-get install -y <missing-package>")
-                            else:
-                                logger.info("✓ Browser executable dependencies OK (all libraries found)")
-                        else:
-                            logger.warning(f"Could not check browser dependencies: {ldd_result.stderr}")
-
-                        # Also try to run the browser with --version to see if it can start
-                        try:
-                            version_result = subprocess.run(
-                                [chrome_path, '--version'],
-                                capture_output=True,
-                                text=True,
-                                timeout=5,
-                                env=dict(os.environ, LD_LIBRARY_PATH=os.environ.get('LD_LIBRARY_PATH', ''))
-                            )
-                            if version_result.returncode == 0:
-                                logger.info(f"✓ Browser executable can run: {version_result.stdout.strip()}")
-                            else:
-                                logger.warning(f"Browser --version failed: {version_result.stderr}")
-                        except Exception as e:
-                            logger.warning(f"Could not test browser --version: {e}")
-                except Exception as e:
-                    logger.warning(f"Could not test browser executable: {e}")
-
-            # Additional browser launch args for better compatibility
-            launch_options['args'].extend([
-                '--disable-extensions',
-                '--disable-background-networking',
-                '--disable-background-timer-throttling',
-                '--disable-backgrounding-occluded-windows',
-                '--disable-breakpad',
-                '--disable-component-extensions-with-background-pages',
-                '--disable-features=TranslateUI',
-                '--disable-ipc-flooding-protection',
-                '--disable-renderer-backgrounding',
-                '--disable-sync',
-                '--force-color-profile=srgb',
-                '--metrics-recording-only',
-                '--no-first-run',
-                '--enable-automation',
-                '--password-store=basic',
-                '--use-mock-keychain',
-                # Windows-specific stability: DO NOT use --single-process on Windows (causes crashes)
-                # '--single-process',  # Removed - causes crashes on Windows
-                '--disable-software-rasterizer',
-                # Additional Windows stability flags
-                '--disable-web-security',  # Helps with some site compatibility
-                '--disable-features=IsolateOrigins,site-per-process',  # Reduce process isolation issues
-            ])
-
-            self.browser = self.playwright.chromium.launch(**launch_options)
+            return playwright.chromium.launch(**launch_options)
         except Exception as e:
             error_msg = str(e).lower()
             original_error = e
@@ -643,7 +716,7 @@ class BaseAutomation(ABC):
                     )
                     if result.returncode == 0:
                         logger.info("Dependencies installed, retrying browser launch...")
-                        self.browser = self.playwright.chromium.launch(**launch_options)
+                        return playwright.chromium.launch(**launch_options)
                     else:
                         logger.error(f"Failed to install dependencies: {result.stderr}")
                         raise RuntimeError(
@@ -660,7 +733,7 @@ class BaseAutomation(ABC):
                     # Try launching anyway - sometimes browsers work despite validation errors
                     logger.warning("Attempting browser launch despite dependency warnings...")
                     try:
-                        self.browser = self.playwright.chromium.launch(**launch_options)
+                        return playwright.chromium.launch(**launch_options)
                     except Exception as retry_error:
                         raise RuntimeError(
                             f"Browser launch failed after dependency installation attempt. "
@@ -673,6 +746,8 @@ class BaseAutomation(ABC):
                     "Check that Chromium is installed and all system dependencies are available."
                 ) from e
 
+    def _create_context_and_page(self):
+        """Create a fresh, isolated browser context and page for this task"""
         # Create context with stealth settings
         try:
             self.context = self.browser.new_context(
@@ -720,7 +795,6 @@ class BaseAutomation(ABC):
                 "The browser context may have closed unexpectedly."
             ) from e
 
-        logger.debug("Browser setup completed successfully")
 
     def _get_random_user_agent(self) -> str:
         """Get random user agent"""
@@ -912,6 +986,8 @@ class BaseAutomation(ABC):
                         return False
                 
                 # Attempt navigation
+                if self.startup_trace is not None:
+                    self.startup_trace.mark('first_navigation')
                 self.page.goto(url, wait_until=wait_until, timeout=timeout)
                 return True
                 
@@ -946,6 +1022,11 @@ class BaseAutomation(ABC):
         """Cleanup browser resources - ensures all resources are properly closed"""
         cleanup_errors = []
 
+        # A crashed page/context means the pooled browser must not be handed out again
+        lease_healthy = True
+        if self.browser_lease is not None and self.page is not None:
+            lease_healthy = self._is_browser_valid()
+
         # Close page first
         if self.page:
             try:
@@ -982,6 +1063,17 @@ class BaseAutomation(ABC):
             finally:
                 self.context = None
 
+        # Return pooled browser instead of closing it
+        if self.browser_lease is not None:
+            try:
+                self.browser_pool.release(self.browser_lease, healthy=lease_healthy)
+            except Exception as e:
+                cleanup_errors.append(f"browser_pool: {e}")
+                logger.warning(f"Error releasing pooled browser: {e}")
+            finally:
+                self.browser_lease = None
+                self.browser = None
+
         # Close browser
         if self.browser:
             try:
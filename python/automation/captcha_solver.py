@@ -4,11 +4,21 @@ Captcha solving integration for automation tasks
 
 import logging
 import time
+import re
+import asyncio
 from typing import Optional, Dict
 from playwright.sync_api import Page
 
 logger = logging.getLogger(__name__)
 
+# Iframes that carry the site key in their src
+SITE_KEY_IFRAMES = {
+    'recaptcha_v2': 'iframe[src*="recaptcha"]',
+    'recaptcha_v3': 'iframe[src*="recaptcha"]',
+    'hcaptcha': 'iframe[src*="hcaptcha"]',
+}
+CAPTCHA_IMAGE_SELECTOR = 'img[src*="captcha"], img[id*="captcha"]'
+
 
 class CaptchaSolver:
     """Helper class for solving captchas"""
@@ -83,23 +93,15 @@ class CaptchaSolver:
                 site_key = None
                 try:
                     # Try to find site key in iframe or script
-                    iframe = page.locator('iframe[src*="recaptcha"]').first
+                    iframe = page.locator(SITE_KEY_IFRAMES[captcha_type]).first
                     if iframe.is_visible():
-                        src = iframe.get_attribute('src')
-                        import re
-                        match = re.search(r'k=([^&]+)', src)
-                        if match:
-                            site_key = match.group(1)
+                        site_key = self._site_key_from_src(captcha_type, iframe.get_attribute('src'))
                 except:
                     pass
                 
                 if not site_key:
                     # Try to find in page source
-                    page_html = page.content()
-                    import re
-                    match = re.search(r'data-sitekey=["\']([^"\']+)["\']', page_html)
-                    if match:
-                        site_key = match.group(1)
+                    site_key = self._site_key_from_html(page.content())
                 
                 if not site_key:
                     return None
@@ -113,22 +115,14 @@ class CaptchaSolver:
                 # Extract hCaptcha site key
                 site_key = None
                 try:
-                    iframe = page.locator('iframe[src*="hcaptcha"]').first
+                    iframe = page.locator(SITE_KEY_IFRAMES[captcha_type]).first
                     if iframe.is_visible():
-                        src = iframe.get_attribute('src')
-                        import re
-                        match = re.search(r'sitekey=([^&]+)', src)
-                        if match:
-                            site_key = match.group(1)
+                        site_key = self._site_key_from_src(captcha_type, iframe.get_attribute('src'))
                 except:
                     pass
                 
                 if not site_key:
-                    page_html = page.content()
-                    import re
-                    match = re.search(r'data-sitekey=["\']([^"\']+)["\']', page_html)
-                    if match:
-                        site_key = match.group(1)
+                    site_key = self._site_key_from_html(page.content())
                 
                 if not site_key:
                     return None
@@ -141,25 +135,10 @@ class CaptchaSolver:
             elif captcha_type == 'image':
                 # Extract image captcha
                 try:
-                    captcha_img = page.locator('img[src*="captcha"], img[id*="captcha"]').first
+                    captcha_img = page.locator(CAPTCHA_IMAGE_SELECTOR).first
                     if captcha_img.is_visible():
-                        img_src = captcha_img.get_attribute('src')
-                        # Download image and convert to base64
-                        import base64
-                        import requests
-                        
-                        if img_src.startswith('data:'):
-                            # Already base64
-                            img_data = img_src.split(',')[1]
-                        else:
-                            # Download image
-                            if not img_src.startswith('http'):
-                                img_src = page_url.rsplit('/', 1)[0] + '/' + img_src.lstrip('/')
-                            response = requests.get(img_src)
-                            img_data = base64.b64encode(response.content).decode('utf-8')
-                        
                         return {
-                            'image': img_data,
+                            'image': self._load_image(page_url, captcha_img.get_attribute('src')),
                         }
                 except Exception as e:
                     logger.warning(f"Failed to extract image captcha: {e}")
@@ -179,55 +158,189 @@ class CaptchaSolver:
                 logger.error("No solution token provided")
                 return
             
-            if captcha_type in ['recaptcha_v2', 'recaptcha_v3']:
-                # Inject reCAPTCHA solution
-                page.evaluate(f"""
-                    (function() {{
-                        // Find textarea for g-recaptcha-response
-                        var textarea = document.querySelector('textarea[name="g-recaptcha-response"]');
-                        if (textarea) {{
-                            textarea.value = '{solution_token}';
-                            textarea.dispatchEvent(new Event('input', {{ bubbles: true }}));
-                        }}
-                        
-                        // Also set callback if exists
-                        if (window.grecaptcha && window.grecaptcha.getResponse) {{
-                            var callback = window.grecaptcha.getResponse();
-                            if (callback) {{
-                                window[callback]('{solution_token}');
-                            }}
-                        }}
-                    }})();
-                """)
+            script = self._injection_script(captcha_type, solution_token)
+            if script:
+                page.evaluate(script)
             
-            elif captcha_type == 'hcaptcha':
-                # Inject hCaptcha solution
-                page.evaluate(f"""
-                    (function() {{
-                        var textarea = document.querySelector('textarea[name="h-captcha-response"]');
-                        if (textarea) {{
-                            textarea.value = '{solution_token}';
-                            textarea.dispatchEvent(new Event('input', {{ bubbles: true }}));
-                        }}
-                    }})();
-                """)
+            # Wait a bit for injection to take effect
+            time.sleep(1)
             
-            elif captcha_type == 'image':
-                # Fill image captcha input
-                solution_text = solution_token
-                page.evaluate(f"""
-                    (function() {{
-                        var input = document.querySelector('input[name*="captcha"], input[id*="captcha"]');
-                        if (input) {{
-                            input.value = '{solution_text}';
-                            input.dispatchEvent(new Event('input', {{ bubbles: true }}));
+        except Exception as e:
+            logger.error(f"Failed to inject captcha solution: {e}")
+
+    @staticmethod
+    def _site_key_from_src(captcha_type: str, src: Optional[str]) -> Optional[str]:
+        """Extract site key from a captcha iframe src"""
+        if not src:
+            return None
+        param = 'sitekey' if captcha_type == 'hcaptcha' else 'k'
+        match = re.search(rf'{param}=([^&]+)', src)
+        return match.group(1) if match else None
+
+    @staticmethod
+    def _site_key_from_html(page_html: str) -> Optional[str]:
+        """Extract site key from a data-sitekey attribute in page HTML"""
+        match = re.search(r'data-sitekey=["\']([^"\']+)["\']', page_html)
+        return match.group(1) if match else None
+
+    @staticmethod
+    def _load_image(page_url: str, img_src: str) -> str:
+        """Get captcha image as base64 (downloads it unless it is a data: URL)"""
+        import base64
+        import requests
+        
+        if img_src.startswith('data:'):
+            # Already base64
+            return img_src.split(',')[1]
+        
+        # Download image
+        if not img_src.startswith('http'):
+            img_src = page_url.rsplit('/', 1)[0] + '/' + img_src.lstrip('/')
+        response = requests.get(img_src)
+        return base64.b64encode(response.content).decode('utf-8')
+
+    @staticmethod
+    def _injection_script(captcha_type: str, solution_token: str) -> Optional[str]:
+        """Build the script that writes a solution token into the page"""
+        if captcha_type in ['recaptcha_v2', 'recaptcha_v3']:
+            # Inject reCAPTCHA solution
+            return f"""
+                (function() {{
+                    // Find textarea for g-recaptcha-response
+                    var textarea = document.querySelector('textarea[name="g-recaptcha-response"]');
+                    if (textarea) {{
+                        textarea.value = '{solution_token}';
+                        textarea.dispatchEvent(new Event('input', {{ bubbles: true }}));
+                    }}
+                    
+                    // Also set callback if exists
+                    if (window.grecaptcha && window.grecaptcha.getResponse) {{
+                        var callback = window.grecaptcha.getResponse();
+                        if (callback) {{
+                            window[callback]('{solution_token}');
                         }}
-                    }})();
-                """)
+                    }}
+                }})();
+            """
+        
+        if captcha_type == 'hcaptcha':
+            # Inject hCaptcha solution
+            return f"""
+                (function() {{
+                    var textarea = document.querySelector('textarea[name="h-captcha-response"]');
+                    if (textarea) {{
+                        textarea.value = '{solution_token}';
+                        textarea.dispatchEvent(new Event('input', {{ bubbles: true }}));
+                    }}
+                }})();
+            """
+        
+        if captcha_type == 'image':
+            # Fill image captcha input
+            return f"""
+                (function() {{
+                    var input = document.querySelector('input[name*="captcha"], input[id*="captcha"]');
+                    if (input) {{
+                        input.value = '{solution_token}';
+                        input.dispatchEvent(new Event('input', {{ bubbles: true }}));
+                    }}
+                }})();
+            """
+        
+        return None
+
+
+class AsyncCaptchaSolver(CaptchaSolver):
+    """
+    Captcha solver for async Playwright pages.
+
+    Page calls are awaited and the blocking solve request runs in a thread, so
+    other pages keep making progress while a captcha is being solved.
+    """
+    
+    async def detect_and_solve(self, page) -> Optional[Dict]:
+        """
+        Detect captcha on page and solve it
+        Returns solution dict or None
+        """
+        try:
+            captcha_type = self._detect_captcha_type(await page.content())
+            if not captcha_type:
+                return None
+            
+            logger.info(f"Detected captcha type: {captcha_type}")
+            
+            captcha_data = await self._extract_captcha_data(page, captcha_type)
+            if not captcha_data:
+                logger.warning("Could not extract captcha data")
+                return None
+            
+            solution = await asyncio.to_thread(self.api_client.solve_captcha, captcha_type, captcha_data)
+            if not solution:
+                logger.error("Failed to solve captcha")
+                return None
+            
+            await self._inject_solution(page, captcha_type, solution)
+            
+            logger.info("Captcha solved and injected successfully")
+            return solution
+            
+        except Exception as e:
+            logger.error(f"Captcha solving failed: {e}", exc_info=True)
+            return None
+    
+    async def _extract_captcha_data(self, page, captcha_type: str) -> Optional[Dict]:
+        """Extract captcha data needed for solving"""
+        page_url = page.url
+        
+        try:
+            if captcha_type in SITE_KEY_IFRAMES:
+                site_key = None
+                try:
+                    iframe = page.locator(SITE_KEY_IFRAMES[captcha_type]).first
+                    if await iframe.is_visible():
+                        site_key = self._site_key_from_src(captcha_type, await iframe.get_attribute('src'))
+                except Exception:
+                    pass
+                
+                if not site_key:
+                    site_key = self._site_key_from_html(await page.content())
+                
+                if not site_key:
+                    return None
+                
+                return {
+                    'site_key': site_key,
+                    'page_url': page_url,
+                }
+            
+            if captcha_type == 'image':
+                captcha_img = page.locator(CAPTCHA_IMAGE_SELECTOR).first
+                if await captcha_img.is_visible():
+                    img_src = await captcha_img.get_attribute('src')
+                    return {
+                        'image': await asyncio.to_thread(self._load_image, page_url, img_src),
+                    }
+        
+        except Exception as e:
+            logger.error(f"Failed to extract captcha data: {e}")
+        
+        return None
+    
+    async def _inject_solution(self, page, captcha_type: str, solution: Dict):
+        """Inject captcha solution into page"""
+        try:
+            solution_token = solution.get('solution') or solution.get('token')
+            if not solution_token:
+                logger.error("No solution token provided")
+                return
+            
+            script = self._injection_script(captcha_type, solution_token)
+            if script:
+                await page.evaluate(script)
             
             # Wait a bit for injection to take effect
-            time.sleep(1)
+            await asyncio.sleep(1)
             
         except Exception as e:
             logger.error(f"Failed to inject captcha solution: {e}")
-
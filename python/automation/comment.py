@@ -31,10 +31,7 @@ class CommentAutomation(BaseAutomation):
         
         if self.opportunity_selector and campaign_id:
             try:
-                opportunity = self.opportunity_selector.select_opportunity(
-                    campaign_id=campaign_id,
-                    task_type='comment'
-                )
+                opportunity = self.select_opportunity(campaign_id, 'comment')
                 if opportunity:
                     target_url = opportunity.get('url')
                     logger.info(f"Selected opportunity {opportunity.get('id')} with PA:{opportunity.get('pa')} DA:{opportunity.get('da')}")
@@ -93,8 +93,8 @@ class EmailConfirmationAutomation(BaseAutomation):
             # Update site account status via API
             if is_success:
                 try:
-                    # Update site account to verified status
-                    self.api_client.update_site_account(
+                    # Update site account to verified status (queued, off the task's critical path)
+                    self.api_client.queue_site_account_update(
                         site_account_id,
                         {
                             'status': 'verified',
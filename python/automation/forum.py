@@ -24,10 +24,7 @@ class ForumAutomation(BaseAutomation):
         
         if self.opportunity_selector and campaign_id:
             try:
-                opportunity = self.opportunity_selector.select_opportunity(
-                    campaign_id=campaign_id,
-                    task_type='forum'
-                )
+                opportunity = self.select_opportunity(campaign_id, 'forum')
                 if opportunity:
                     target_url = opportunity.get('url')
                     logger.info(f"Selected opportunity {opportunity.get('id')} with PA:{opportunity.get('pa')} DA:{opportunity.get('da')}")
@@ -181,10 +178,10 @@ class ForumAutomation(BaseAutomation):
             title_field = self.page.locator('input[name*="title"], input[name*="subject"]').first
             content_field = self.page.locator('textarea, div[contenteditable="true"]').first
             
-                if title_field.is_visible() and content_field.is_visible():
-                    keyword = keywords[0] if keywords else "Discussion"
-                    self.human_type(self.page, title_field, f"Discussion about {keyword}")
-                    self.human_type(self.page, content_field, f"I'd like to discuss {keyword}...")
+            if title_field.is_visible() and content_field.is_visible():
+                keyword = keywords[0] if keywords else "Discussion"
+                self.human_type(self.page, title_field, f"Discussion about {keyword}")
+                self.human_type(self.page, content_field, f"I'd like to discuss {keyword}...")
                 
                 # Submit
                 try:
@@ -23,10 +23,7 @@ class GuestPostAutomation(BaseAutomation):
         
         if self.opportunity_selector and campaign_id:
             try:
-                opportunity = self.opportunity_selector.select_opportunity(
-                    campaign_id=campaign_id,
-                    task_type='guest'
-                )
+                opportunity = self.select_opportunity(campaign_id, 'guest')
                 if opportunity:
                     target_url = opportunity.get('url')
                     logger.info(f"Selected opportunity {opportunity.get('id')} with PA:{opportunity.get('pa')} DA:{opportunity.get('da')}")
@@ -23,10 +23,7 @@ class ProfileAutomation(BaseAutomation):
         
         if self.opportunity_selector and campaign_id:
             try:
-                opportunity = self.opportunity_selector.select_opportunity(
-                    campaign_id=campaign_id,
-                    task_type='profile'
-                )
+                opportunity = self.select_opportunity(campaign_id, 'profile')
                 if opportunity:
                     target_url = opportunity.get('url')
                     logger.info(f"Selected opportunity {opportunity.get('id')} with PA:{opportunity.get('pa')} DA:{opportunity.get('da')}")
@@ -1,8 +1,13 @@
 """
 Structured Logging Service for Automation Outcomes
 Logs automation task results in structured format (CSV or JSON)
+
+Outcomes are appended to one file. Recent entries are read backwards from the
+end of the file, and JSON logs have a sidecar index by timestamp and task_id
+(core.outcome_history.OutcomeLogIndex), so reads don't scan the whole log.
 """
 
+import io
 import json
 import csv
 import os
@@ -12,6 +17,8 @@ from typing import Dict, Optional, List
 from enum import Enum
 from urllib.parse import urlparse
 
+from core.outcome_history import OutcomeLogIndex, tail_lines
+
 logger = logging.getLogger(__name__)
 
 
@@ -52,6 +59,7 @@ class AutomationLogger:
             self._ensure_csv_header()
         else:
             self.log_file = os.path.join(output_dir, "automation_logs.jsonl")  # JSON Lines format
+        self._index: Optional[OutcomeLogIndex] = None
     
     def _ensure_csv_header(self):
         """Ensure CSV file has header row"""
@@ -203,7 +211,8 @@ class AutomationLogger:
                    retry_count: Optional[int] = None,
                    url: Optional[str] = None,
                    error_message: Optional[str] = None,
-                   result_data: Optional[Dict] = None):
+                   result_data: Optional[Dict] = None,
+                   campaign_id: Optional[int] = None):
         """
         Log automation outcome
         
@@ -219,6 +228,7 @@ class AutomationLogger:
             url: URL used (for domain extraction)
             error_message: Error message (for failure reason classification)
             result_data: Additional result data
+            campaign_id: Campaign the task belongs to
         """
         # Extract domain if not provided
         if not domain and url:
@@ -246,6 +256,8 @@ class AutomationLogger:
             'execution_time': round(execution_time, 2) if execution_time is not None else None,
             'retry_count': retry_count or 0,
         }
+        if campaign_id is not None:
+            log_entry['campaign_id'] = campaign_id
         
         # Write log entry
         if self.format == "csv":
@@ -297,21 +309,82 @@ class AutomationLogger:
         
         entries = []
         try:
+            # Only the last `limit` lines are read, from the end of the file
+            lines = tail_lines(self.log_file, limit)
             if self.format == "csv":
                 with open(self.log_file, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    entries = list(reader)
+                    header = f.readline()
+                if lines and lines[0].decode('utf-8') == header.rstrip('\r\n'):
+                    lines = lines[1:]
+                text = ''.join(line.decode('utf-8') + '\n' for line in lines)
+                entries = list(csv.DictReader(io.StringIO(header + text)))
             else:
-                with open(self.log_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if line.strip():
-                            entries.append(json.loads(line))
+                for line in lines:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
             
-            # Return most recent entries
-            return entries[-limit:]
+            return entries
         except Exception as e:
             logger.error(f"Failed to read log entries: {e}")
             return []
+    
+    def get_index(self) -> Optional[OutcomeLogIndex]:
+        """Sidecar index of the JSON log (None for CSV logs)"""
+        if self.format == "csv":
+            return None
+        if self._index is None:
+            self._index = OutcomeLogIndex(self.log_file)
+        return self._index
+    
+    def get_logs_for_task(self, task_id) -> List[Dict]:
+        """
+        Get every log entry of a task
+        
+        Args:
+            task_id: Task ID
+            
+        Returns:
+            List of log entries, oldest first
+        """
+        index = self.get_index()
+        if index is None:
+            return [entry for entry in self._read_csv() if entry.get('task_id') == str(task_id)]
+        try:
+            return index.entries_for_task(task_id)
+        except Exception as e:
+            logger.error(f"Failed to read log entries for task {task_id}: {e}")
+            return []
+    
+    def get_logs_since(self, since: datetime, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Get log entries logged at or after a time
+        
+        Args:
+            since: UTC time
+            limit: Maximum number of entries to return (oldest first)
+            
+        Returns:
+            List of log entries, oldest first
+        """
+        timestamp = since.isoformat() + 'Z'
+        index = self.get_index()
+        if index is None:
+            entries = [entry for entry in self._read_csv() if entry.get('timestamp', '') >= timestamp]
+            return entries[:limit] if limit is not None else entries
+        try:
+            return index.entries_since(timestamp, limit)
+        except Exception as e:
+            logger.error(f"Failed to read log entries since {timestamp}: {e}")
+            return []
+    
+    def _read_csv(self) -> List[Dict]:
+        """All CSV log entries (CSV logs aren't indexed)"""
+        if not os.path.exists(self.log_file):
+            return []
+        with open(self.log_file, 'r', encoding='utf-8', newline='') as f:
+            return list(csv.DictReader(f))
 
 
 # Global logger instance (can be overridden)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark FieldRoleMatcher field extraction on saved DOM snapshots
+
+Loads each snapshot (default: the DOM snapshots telemetry saved under runs/,
+plain or compressed as SNAPSHOT_DOM_COMPRESSION wrote them) into headless Chromium with all network requests blocked, then times the
+single-evaluate bulk extractor against the per-field legacy extractor and
+checks that both produce the same role mappings.
+
+Usage:
+    python benchmark_field_role_matcher.py [snapshot.html ...] [--repeat N]
+"""
+import argparse
+import gzip
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from playwright.sync_api import sync_playwright
+
+from core.field_role_matcher import FieldRoleMatcher
+from core.snapshot_writer import DOM_EXTENSIONS, ZSTD_AVAILABLE, zstandard
+
+
+def find_snapshots():
+    """Saved DOM snapshots under runs/ (.html, .html.gz or .html.zst)"""
+    runs_dir = Path(__file__).parent / 'runs'
+    return sorted(path for ext in DOM_EXTENSIONS.values() for path in runs_dir.glob(f'*/*dom*{ext}'))
+
+
+def read_snapshot(path):
+    """HTML of a snapshot, decompressed by its extension"""
+    data = path.read_bytes()
+    if path.name.endswith(DOM_EXTENSIONS['gzip']):
+        data = gzip.decompress(data)
+    elif path.name.endswith(DOM_EXTENSIONS['zstd']):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError(f"{path} needs zstandard (pip install zstandard)")
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data.decode('utf-8', errors='replace')
+
+
+def score_roles(page, candidates):
+    """Best (field index, score) per role, as match_fields would pick"""
+    roles = {}
+    for role, role_patterns in FieldRoleMatcher.ROLE_PATTERNS.items():
+        best_index, best_score = None, 0.0
+        for candidate in candidates:
+            score = FieldRoleMatcher._score_candidate(candidate, role, role_patterns, page, None)
+            if score > best_score:
+                best_index, best_score = candidate['index'], score
+        if best_index is not None and best_score >= FieldRoleMatcher.MIN_CONFIDENCE:
+            roles[role] = (best_index, round(best_score, 2))
+    return roles
+
+
+def time_extractor(page, extract, repeat):
+    """Run extraction + scoring `repeat` times; return (timings_ms, roles, field_count)"""
+    timings = []
+    roles, field_count = {}, 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        candidates = extract()
+        roles = score_roles(page, candidates)
+        timings.append((time.perf_counter() - start) * 1000)
+        field_count = len(candidates)
+    return timings, roles, field_count
+
+
+def benchmark_snapshot(browser, path, repeat):
+    """Benchmark one snapshot; returns a result row"""
+    page = browser.new_page()
+    try:
+        page.route('**/*', lambda route: route.abort())
+        page.set_content(read_snapshot(path), wait_until='domcontentloaded')
+
+        bulk_ms, bulk_roles, fields = time_extractor(
+            page, lambda: FieldRoleMatcher._extract_candidates_bulk(page, None), repeat)
+        legacy_ms, legacy_roles, _ = time_extractor(
+            page, lambda: FieldRoleMatcher._extract_candidates_legacy(page, None, None, 'benchmark'), repeat)
+
+        return {
+            'snapshot': str(path),
+            'fields': fields,
+            'bulk_ms': statistics.median(bulk_ms),
+            'legacy_ms': statistics.median(legacy_ms),
+            'same_roles': bulk_roles == legacy_roles,
+            'bulk_roles': bulk_roles,
+            'legacy_roles': legacy_roles,
+        }
+    finally:
+        page.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark FieldRoleMatcher extraction on saved DOM snapshots')
+    parser.add_argument('snapshots', nargs='*',
+                        help='Snapshot files, .html, .html.gz or .html.zst (default: runs/*/*dom*.html*)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per extractor per snapshot (median reported)')
+    args = parser.parse_args()
+
+    paths = [Path(p) for p in args.snapshots] or find_snapshots()
+    if not paths:
+        print("No DOM snapshots found (pass paths or run tasks to populate runs/)")
+        return 1
+
+    print("=" * 70)
+    print("FieldRoleMatcher extraction benchmark")
+    print("=" * 70)
+
+    mismatches = 0
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            for path in paths:
+                row = benchmark_snapshot(browser, path, args.repeat)
+                speedup = row['legacy_ms'] / row['bulk_ms'] if row['bulk_ms'] else float('inf')
+                print(f"\n{row['snapshot']}")
+                print(f"  visible fields: {row['fields']}")
+                print(f"  bulk:   {row['bulk_ms']:8.1f} ms")
+                print(f"  legacy: {row['legacy_ms']:8.1f} ms  ({speedup:.1f}x slower)")
+                if row['same_roles']:
+                    print(f"  ✓ same role mappings: {row['bulk_roles']}")
+                else:
+                    mismatches += 1
+                    print(f"  ✗ role mappings differ")
+                    print(f"    bulk:   {row['bulk_roles']}")
+                    print(f"    legacy: {row['legacy_roles']}")
+        finally:
+            browser.close()
+
+    print("\n" + "=" * 70)
+    print(f"{len(paths)} snapshot(s), {mismatches} mapping mismatch(es)")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Replay benchmark for shortest-expected-job-first task ordering
+
+Replays task outcomes from automation_logs.jsonl (or a synthetic mixed
+workload) through a simulated worker: tasks arrive in batches of --limit,
+each batch runs on --concurrency slots using the logged execution_time, and
+the next batch is claimed when the previous one is done. Each batch is run
+once in claim order (FIFO) and once ordered by DurationEstimator, which only
+learns from batches that already finished. Prints queue-wait percentiles
+(claim to start) for both.
+
+Usage:
+    python benchmark_task_ordering.py [history.jsonl] [--limit N] [--concurrency N]
+    python benchmark_task_ordering.py --synthetic 2000
+"""
+import argparse
+import heapq
+import json
+import random
+import statistics
+import sys
+from pathlib import Path
+
+from core.duration_estimator import DurationEstimator, DurationEstimatorConfig
+from core.outcome_history import default_history_path
+
+# Rough per-type duration medians (seconds) for --synthetic
+SYNTHETIC_MEDIANS = {
+    'email_confirmation_click': 8,
+    'comment': 45,
+    'forum': 90,
+    'guest': 120,
+    'profile': 240,
+}
+
+
+def load_history(path):
+    """Timed outcomes from a JSON Lines history file, in log order"""
+    tasks = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('execution_time') is None or entry.get('action_attempted') in (None, 'unknown'):
+                continue
+            tasks.append({
+                'type': entry['action_attempted'],
+                'domain': entry.get('domain'),
+                'seconds': float(entry['execution_time']),
+            })
+    return tasks
+
+
+def synthetic_history(count, seed):
+    """Mixed workload: log-normal durations per type, each domain a bit faster or slower"""
+    rng = random.Random(seed)
+    domains = [f"site{i}.example" for i in range(200)]
+    domain_speed = {domain: rng.lognormvariate(0, 0.3) for domain in domains}
+    tasks = []
+    for _ in range(count):
+        task_type = rng.choice(list(SYNTHETIC_MEDIANS))
+        domain = rng.choice(domains)
+        seconds = SYNTHETIC_MEDIANS[task_type] * domain_speed[domain] * rng.lognormvariate(0, 0.25)
+        tasks.append({'type': task_type, 'domain': domain, 'seconds': round(seconds, 2)})
+    return tasks
+
+
+def run_batch(batch, concurrency):
+    """Queue wait per task when the batch runs in this order on `concurrency` slots"""
+    slots = [0.0] * concurrency
+    waits = []
+    for task in batch:
+        start = heapq.heappop(slots)
+        waits.append((task, start))
+        heapq.heappush(slots, start + task['seconds'])
+    return waits
+
+
+def replay(tasks, limit, concurrency, use_estimator):
+    """Replay all batches; returns [(task, queue_wait_seconds)]"""
+    estimator = DurationEstimator(DurationEstimatorConfig(
+        history_path='', state_path=None, refresh_interval=float('inf')))
+    results = []
+    for i in range(0, len(tasks), limit):
+        batch = tasks[i:i + limit]
+        if use_estimator:
+            batch = sorted(batch, key=lambda task: estimator.estimate(task['type'], task['domain']))
+        results.extend(run_batch(batch, concurrency))
+        # The estimator only learns outcomes of finished batches
+        for task in batch:
+            estimator.observe(task['type'], task['domain'], task['seconds'])
+    return results
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def summarize(label, results):
+    waits = [wait for _, wait in results]
+    print(f"  {label:<6} p50 {percentile(waits, 0.5):7.1f}s   p95 {percentile(waits, 0.95):7.1f}s   "
+          f"mean {statistics.mean(waits):7.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay task outcomes to compare FIFO and SJF batch ordering')
+    parser.add_argument('history', nargs='?', help='automation_logs.jsonl (default: AUTOMATION_LOG_DIR)')
+    parser.add_argument('--limit', type=int, default=5, help='Tasks per claimed batch')
+    parser.add_argument('--concurrency', type=int, default=1, help='Task slots')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='Replay N synthetic tasks instead of history')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for --synthetic')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        tasks = synthetic_history(args.synthetic, args.seed)
+        source = f"{args.synthetic} synthetic tasks"
+    else:
+        path = Path(args.history or default_history_path())
+        if not path.exists():
+            print(f"History file not found: {path} (pass a path or use --synthetic N)")
+            return 1
+        tasks = load_history(path)
+        source = str(path)
+    if not tasks:
+        print("No timed outcomes to replay")
+        return 1
+
+    print("=" * 70)
+    print(f"Task ordering replay: {source}")
+    print(f"{len(tasks)} tasks, batches of {args.limit}, {args.concurrency} slot(s)")
+    print("=" * 70)
+
+    fifo = replay(tasks, args.limit, args.concurrency, use_estimator=False)
+    sjf = replay(tasks, args.limit, args.concurrency, use_estimator=True)
+
+    print("\nQueue wait, all tasks:")
+    summarize('FIFO', fifo)
+    summarize('SJF', sjf)
+
+    for task_type in sorted({task['type'] for task in tasks}):
+        fifo_type = [(t, w) for t, w in fifo if t['type'] == task_type]
+        sjf_type = [(t, w) for t, w in sjf if t['type'] == task_type]
+        print(f"\nQueue wait, {task_type} ({len(fifo_type)} tasks):")
+        summarize('FIFO', fifo_type)
+        summarize('SJF', sjf_type)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+API Response Cache
+
+TTL cache for API lookups that rarely change within a task (campaign details,
+proxy lists). Entries expire per endpoint, can be invalidated explicitly and
+concurrent misses for the same key share one request.
+"""
+
+import os
+import copy
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class APICacheConfig:
+    """Per-endpoint TTLs in seconds (0 disables caching for that endpoint)"""
+    campaign_ttl: float = 300.0
+    proxies_ttl: float = 120.0
+    max_entries: int = 1000
+
+    @classmethod
+    def from_env(cls) -> 'APICacheConfig':
+        """Build config from API_CACHE_* environment variables"""
+        return cls(
+            campaign_ttl=float(os.getenv('API_CACHE_CAMPAIGN_TTL', '300')),
+            proxies_ttl=float(os.getenv('API_CACHE_PROXIES_TTL', '120')),
+            max_entries=int(os.getenv('API_CACHE_MAX_ENTRIES', '1000')),
+        )
+
+
+@dataclass
+class CacheEntry:
+    """A cached response"""
+    value: Any
+    expires_at: float
+    stored_at: float = field(default_factory=time.time)
+
+    def is_expired(self, now: float) -> bool:
+        return now >= self.expires_at
+
+
+class APIResponseCache:
+    """
+    Thread-safe TTL cache keyed by (endpoint, args).
+
+    Values are deep-copied on the way out so callers can't mutate the cached
+    response. Falsy responses are never cached (they usually mean an error).
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, Hashable], CacheEntry] = {}
+        self._loading: Dict[Tuple[str, Hashable], threading.Event] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, endpoint: str, outcome: str):
+        """Bump a per-endpoint counter (lock held)"""
+        counters = self._stats.setdefault(endpoint, {'hits': 0, 'misses': 0, 'invalidations': 0})
+        counters[outcome] += 1
+
+    def get_or_load(self, endpoint: str, key: Hashable, ttl: float, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value, or call loader() and cache its result for ttl seconds
+
+        Args:
+            endpoint: Endpoint name (used for stats and invalidation)
+            key: Hashable request arguments
+            ttl: Seconds to keep the value (<= 0 bypasses the cache)
+            loader: Makes the actual request
+        """
+        if ttl <= 0:
+            return loader()
+
+        cache_key = (endpoint, key)
+        while True:
+            with self._lock:
+                entry = self._entries.get(cache_key)
+                if entry is not None and not entry.is_expired(time.time()):
+                    self._count(endpoint, 'hits')
+                    return copy.deepcopy(entry.value)
+                loading = self._loading.get(cache_key)
+                if loading is None:
+                    self._count(endpoint, 'misses')
+                    loading = self._loading[cache_key] = threading.Event()
+                    break
+            # Another thread is fetching this key; use its result
+            loading.wait()
+
+        try:
+            value = loader()
+            if value:
+                with self._lock:
+                    if len(self._entries) >= self.max_entries:
+                        self._evict(time.time())
+                    self._entries[cache_key] = CacheEntry(value=value, expires_at=time.time() + ttl)
+            return copy.deepcopy(value)
+        finally:
+            with self._lock:
+                self._loading.pop(cache_key, None)
+            loading.set()
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the oldest ones if still full (lock held)"""
+        for cache_key in [k for k, e in self._entries.items() if e.is_expired(now)]:
+            del self._entries[cache_key]
+        if len(self._entries) >= self.max_entries:
+            oldest = sorted(self._entries, key=lambda k: self._entries[k].stored_at)
+            for cache_key in oldest[:len(self._entries) - self.max_entries + 1]:
+                del self._entries[cache_key]
+
+    def invalidate(self, endpoint: Optional[str] = None, key: Optional[Hashable] = None) -> int:
+        """
+        Drop cached entries
+
+        Args:
+            endpoint: Only this endpoint (default: all)
+            key: Only this key within the endpoint (default: all keys)
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            doomed = [
+                cache_key for cache_key in self._entries
+                if (endpoint is None or cache_key[0] == endpoint) and (key is None or cache_key[1] == key)
+            ]
+            for cache_key in doomed:
+                del self._entries[cache_key]
+                self._count(cache_key[0], 'invalidations')
+            return len(doomed)
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters per endpoint"""
+        with self._lock:
+            by_endpoint = {endpoint: dict(counters) for endpoint, counters in self._stats.items()}
+            entries = len(self._entries)
+        hits = sum(c['hits'] for c in by_endpoint.values())
+        misses = sum(c['misses'] for c in by_endpoint.values())
+        return {
+            'entries': entries,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'by_endpoint': by_endpoint,
+        }
@@ -0,0 +1,341 @@
+"""
+API Write Queue
+
+Write-behind dispatcher for fire-and-forget API writes (task status reports,
+site account updates). Writes are queued and sent by a background thread, so
+their network latency stays off the task's critical path.
+
+- Writes for the same task/site account coalesce: running -> success is sent
+  as a single success report, and site account updates merge.
+- Task reports are sent in batches through LaravelAPIClient.report_results().
+- Failed sends retry with exponential backoff; writes the server rejects (4xx)
+  are dropped and logged. The server applies a task's final status once, so a
+  resent or replayed report can't be counted twice.
+- send_now() sends one report inline (replacing the task's queued write) for
+  callers that need the server's outcome before recording the result.
+- The queue is saved to a JSON file after every change and reloaded on start,
+  so a worker crash doesn't lose results.
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+KIND_TASK_REPORT = 'task_report'
+KIND_SITE_ACCOUNT = 'site_account'
+
+FINAL_TASK_STATUSES = ('success', 'failed')
+REPORT_BATCH_SIZE = 100  # Server limit for /api/tasks/report
+
+
+@dataclass
+class QueuedWrite:
+    """One pending write"""
+    kind: str
+    key: int  # task_id or site_account_id
+    payload: Dict
+    attempts: int = 0
+    next_attempt_at: float = 0.0
+    queued_at: float = field(default_factory=time.time)
+
+
+def _coalesce(old: QueuedWrite, new: QueuedWrite) -> QueuedWrite:
+    """Combine two queued writes for the same target into one"""
+    if old.kind == KIND_SITE_ACCOUNT:
+        new.payload = {**old.payload, **new.payload}
+    elif new.payload.get('status') == 'running' and old.payload.get('status') in FINAL_TASK_STATUSES:
+        # A final status is never downgraded back to running
+        return old
+    new.queued_at = old.queued_at
+    return new
+
+
+class APIWriteQueue:
+    """
+    Background dispatcher for queued API writes.
+
+    Use get_stats() for queue depth and send counters, flush() to send
+    everything now and close() to flush and stop (called at exit).
+    """
+
+    def __init__(self, api_client, path: Optional[str] = None, flush_interval: float = 1.0,
+                 max_attempts: int = 8, max_backoff: float = 300.0):
+        """
+        Initialize and start the dispatcher
+
+        Args:
+            api_client: LaravelAPIClient used to send writes
+            path: JSON file the queue is persisted to (None: memory only)
+            flush_interval: Seconds between background sends
+            max_attempts: Sends before a write is dropped
+            max_backoff: Cap on the retry delay in seconds
+        """
+        self.api_client = api_client
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+
+        self._pending: Dict[Tuple[str, int], QueuedWrite] = {}
+        self._in_flight: Dict[Tuple[str, int], QueuedWrite] = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._counters = {
+            'queued': 0,
+            'coalesced': 0,
+            'sent': 0,
+            'requests': 0,
+            'retries': 0,
+            'dropped': 0,
+        }
+
+        self._load()
+
+        self._thread = threading.Thread(target=self._run, name="api-write-queue", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, kind: str, key: int, payload: Dict):
+        """
+        Queue a write (coalescing with a pending write for the same target)
+
+        Args:
+            kind: KIND_TASK_REPORT (payload: report_results item) or
+                  KIND_SITE_ACCOUNT (payload: update_site_account data)
+            key: task_id or site_account_id
+            payload: Write payload
+        """
+        write = QueuedWrite(kind=kind, key=key, payload=dict(payload))
+        with self._lock:
+            existing = self._pending.get((kind, key))
+            if existing is not None:
+                write = _coalesce(existing, write)
+                self._counters['coalesced'] += 1
+            self._pending[(kind, key)] = write
+            self._counters['queued'] += 1
+            self._persist()
+
+        # Final task statuses are worth sending promptly
+        if kind == KIND_TASK_REPORT and payload.get('status') in FINAL_TASK_STATUSES:
+            self._wakeup.set()
+
+    def send_now(self, key: int, payload: Dict) -> Optional[Dict]:
+        """
+        Send a task report immediately and return the server's outcome
+
+        A queued write for the same task (e.g. 'running') is superseded. If the
+        send fails the report is queued for retry like any other write.
+
+        Args:
+            key: task_id
+            payload: report_results item (without task_id)
+
+        Returns:
+            The report outcome, or None if it couldn't be sent (queued instead)
+        """
+        target = (KIND_TASK_REPORT, key)
+        with self._send_lock:
+            with self._lock:
+                if self._pending.pop(target, None) is not None:
+                    self._counters['coalesced'] += 1
+                self._counters['queued'] += 1
+                self._counters['requests'] += 1
+                self._persist()
+            try:
+                outcomes = self.api_client.report_results([{'task_id': key, **payload}])
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Task {key} report failed ({e}), queued for retry")
+                self.enqueue(KIND_TASK_REPORT, key, payload)
+                return None
+            with self._lock:
+                self._counters['sent'] += 1
+        return outcomes[0] if outcomes else {}
+
+    def _run(self):
+        """Background send loop"""
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self._send_due()
+            except Exception as e:
+                logger.warning(f"API write queue send failed: {e}")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Send every queued write now, retrying until done or timed out
+
+        Returns:
+            True if the queue is empty
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            self._send_due()
+            if not self.pending_writes():
+                return True
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(min(1.0, self.flush_interval))
+
+    def close(self, timeout: float = 30.0):
+        """Flush (bounded by timeout) and stop the dispatcher; unsent writes stay on disk"""
+        if self._closed:
+            return
+        drained = self.flush(timeout)
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(5)
+        if not drained:
+            logger.warning(f"API write queue closed with {self.pending_writes()} unsent writes"
+                           f"{f' (saved to {self.path})' if self.path else ''}")
+
+    def pending_writes(self) -> int:
+        """Number of writes not yet sent"""
+        with self._lock:
+            return len(self._pending) + len(self._in_flight)
+
+    def _take_due(self) -> List[QueuedWrite]:
+        """Move writes that are due from pending to in-flight"""
+        now = time.time()
+        with self._lock:
+            due = [w for w in self._pending.values() if w.next_attempt_at <= now]
+            for write in due:
+                target = (write.kind, write.key)
+                del self._pending[target]
+                self._in_flight[target] = write
+            return due
+
+    def _send_due(self):
+        """Send all due writes (one report_results call per batch of task reports)"""
+        with self._send_lock:
+            due = self._take_due()
+            if not due:
+                return
+
+            reports = [w for w in due if w.kind == KIND_TASK_REPORT]
+            for i in range(0, len(reports), REPORT_BATCH_SIZE):
+                self._send_reports(reports[i:i + REPORT_BATCH_SIZE])
+
+            for write in due:
+                if write.kind == KIND_SITE_ACCOUNT:
+                    self._send_site_account(write)
+
+    def _send_reports(self, batch: List[QueuedWrite]):
+        """Send a batch of task reports"""
+        self._counters['requests'] += 1
+        try:
+            outcomes = self.api_client.report_results([{'task_id': w.key, **w.payload} for w in batch])
+        except requests.exceptions.RequestException as e:
+            for write in batch:
+                self._failed(write, e)
+            return
+
+        by_task = {outcome.get('task_id'): outcome for outcome in outcomes or []}
+        for write in batch:
+            outcome = by_task.get(write.key, {})
+            if not outcome.get('ok', False):
+                logger.error(f"Task {write.key} report rejected: {outcome.get('error', 'no outcome returned')}")
+                self._done(write, dropped=True)
+                continue
+            if outcome.get('backlink_error'):
+                logger.error(f"Task {write.key} backlink not created, task marked failed: "
+                             f"{outcome['backlink_error']}")
+            self._done(write)
+
+    def _send_site_account(self, write: QueuedWrite):
+        """Send one site account update"""
+        self._counters['requests'] += 1
+        try:
+            self.api_client.update_site_account(write.key, data=dict(write.payload))
+        except requests.exceptions.RequestException as e:
+            self._failed(write, e)
+            return
+        self._done(write)
+
+    def _done(self, write: QueuedWrite, dropped: bool = False):
+        """Forget a write that was sent (or rejected)"""
+        with self._lock:
+            self._in_flight.pop((write.kind, write.key), None)
+            self._counters['dropped' if dropped else 'sent'] += 1
+            self._persist()
+
+    def _failed(self, write: QueuedWrite, error: Exception):
+        """Schedule a retry with backoff, or drop the write if it can't succeed"""
+        status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+        write.attempts += 1
+        rejected = status_code is not None and 400 <= status_code < 500 and status_code != 429
+
+        if rejected or write.attempts >= self.max_attempts:
+            logger.error(f"Dropping {write.kind} write for {write.key} after {write.attempts} attempts: {error}")
+            self._done(write, dropped=True)
+            return
+
+        backoff = min(2 ** write.attempts, self.max_backoff)
+        if self.api_client.rate_limiter:
+            backoff = max(backoff, self.api_client.rate_limiter.throttled_for())
+        write.next_attempt_at = time.time() + backoff
+        logger.warning(f"{write.kind} write for {write.key} failed ({error}), retry {write.attempts} in {backoff:.0f}s")
+
+        target = (write.kind, write.key)
+        with self._lock:
+            self._in_flight.pop(target, None)
+            newer = self._pending.get(target)
+            # A write queued while this one was in flight is newer - coalesce onto it
+            self._pending[target] = _coalesce(write, newer) if newer is not None else write
+            self._counters['retries'] += 1
+            self._persist()
+
+    def _persist(self):
+        """Save pending and in-flight writes to disk (lock held)"""
+        if not self.path:
+            return
+        writes = [asdict(w) for w in list(self._in_flight.values()) + list(self._pending.values())]
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(writes, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to persist API write queue to {self.path}: {e}")
+
+    def _load(self):
+        """Reload writes left over from a previous run"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                writes = [QueuedWrite(**w) for w in json.load(f)]
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable API write queue {self.path}: {e}")
+            return
+
+        for write in writes:
+            write.next_attempt_at = 0.0
+            target = (write.kind, write.key)
+            existing = self._pending.get(target)
+            self._pending[target] = _coalesce(existing, write) if existing is not None else write
+        if writes:
+            logger.info(f"Recovered {len(self._pending)} unsent API writes from {self.path}")
+
+    def get_stats(self) -> Dict:
+        """Queue depth and send counters"""
+        with self._lock:
+            oldest = min((w.queued_at for w in self._pending.values()), default=None)
+            return {
+                **self._counters,
+                'pending': len(self._pending),
+                'in_flight': len(self._in_flight),
+                'oldest_pending_seconds': round(time.time() - oldest, 1) if oldest else 0.0,
+            }
@@ -0,0 +1,311 @@
+"""
+Browser Pool
+
+Keeps warm Chromium instances alive across tasks and hands out fresh,
+isolated BrowserContexts per task instead of launching a browser per task
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+from playwright.sync_api import Browser, Playwright, sync_playwright
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BrowserPoolConfig:
+    """Browser pool configuration"""
+    max_browsers: int = 2  # Warm browsers kept per worker thread
+    max_tasks_per_browser: int = 50  # Recycle after this many tasks
+    max_browser_age_seconds: int = 1800  # Recycle browsers older than this (30 minutes)
+
+
+@dataclass
+class PooledBrowser:
+    """A launched browser owned by the pool"""
+    key: str
+    browser: Browser
+    launch_time: float
+    launched_at: float = field(default_factory=time.time)
+    last_used_at: float = field(default_factory=time.time)
+    tasks_served: int = 0
+    in_use: bool = False
+
+    def is_healthy(self) -> bool:
+        """Check if the browser process is still connected"""
+        try:
+            return self.browser.is_connected()
+        except Exception:
+            return False
+
+    def get_age(self) -> float:
+        """Get browser age in seconds"""
+        return time.time() - self.launched_at
+
+
+@dataclass
+class BrowserLease:
+    """A browser handed out to a single task"""
+    pooled: PooledBrowser
+    acquire_time: float
+    reused: bool
+
+    @property
+    def browser(self) -> Browser:
+        return self.pooled.browser
+
+    def to_dict(self) -> Dict:
+        """Convert to dictionary (for telemetry)"""
+        return {
+            'reused': self.reused,
+            'acquire_ms': round(self.acquire_time * 1000, 1),
+            'launch_ms': round(self.pooled.launch_time * 1000, 1) if not self.reused else None,
+            'tasks_served': self.pooled.tasks_served,
+        }
+
+
+class BrowserPool:
+    """
+    Pool of warm Chromium browsers keyed by proxy and launch options.
+
+    Playwright's sync API is bound to the thread that started it, so one pool
+    (and one Playwright driver) exists per worker thread - see get_browser_pool().
+    """
+
+    # Number of latency samples kept for metrics
+    METRIC_WINDOW = 200
+
+    def __init__(self, config: Optional[BrowserPoolConfig] = None):
+        """
+        Initialize browser pool
+
+        Args:
+            config: Optional pool configuration
+        """
+        self.config = config or BrowserPoolConfig()
+        self._playwright: Optional[Playwright] = None
+        self._browsers: List[PooledBrowser] = []
+        self._lock = threading.Lock()
+        self._launch_times: Deque[float] = deque(maxlen=self.METRIC_WINDOW)
+        self._acquire_times: Deque[float] = deque(maxlen=self.METRIC_WINDOW)
+        self._counters = {
+            'acquired': 0,
+            'launched': 0,
+            'reused': 0,
+            'recycled': 0,
+            'crashed': 0,
+            'evicted': 0,
+        }
+
+    @staticmethod
+    def make_key(launch_options: Dict) -> str:
+        """Build pool key from launch options (includes proxy settings)"""
+        return json.dumps(launch_options, sort_keys=True, default=str)
+
+    def _ensure_driver(self) -> Playwright:
+        """Start the pool's Playwright driver on first use"""
+        if self._playwright is None:
+            try:
+                running_loop = asyncio.get_running_loop()
+            except RuntimeError:
+                running_loop = None
+            if running_loop is not None:
+                raise RuntimeError(
+                    "Cannot start browser pool inside a running asyncio event loop "
+                    "(Playwright Sync API)."
+                )
+            self._playwright = sync_playwright().start()
+            logger.info("Browser pool started Playwright driver")
+        return self._playwright
+
+    def owns_event_loop(self, loop: Any) -> bool:
+        """
+        Check if an event loop belongs to the pool's Playwright driver.
+
+        The sync driver leaves its loop registered as "running" between calls,
+        which is expected while the pool keeps browsers warm.
+        """
+        if self._playwright is None or loop is None:
+            return False
+        return getattr(self._playwright, '_loop', None) is loop
+
+    def acquire(self, launch_options: Dict,
+                launcher: Callable[[Playwright, Dict], Browser]) -> BrowserLease:
+        """
+        Acquire a browser for a task
+
+        Args:
+            launch_options: Chromium launch options (proxy, headless, args)
+            launcher: Function that launches a browser with (playwright, launch_options)
+
+        Returns:
+            BrowserLease - release it with release() when the task is done
+        """
+        start = time.time()
+        key = self.make_key(launch_options)
+
+        with self._lock:
+            pooled = self._find_idle(key)
+            reused = pooled is not None
+
+            if pooled is None:
+                self._make_room()
+                playwright = self._ensure_driver()
+
+                launch_start = time.time()
+                browser = launcher(playwright, launch_options)
+                launch_time = time.time() - launch_start
+
+                pooled = PooledBrowser(key=key, browser=browser, launch_time=launch_time)
+                self._browsers.append(pooled)
+                self._launch_times.append(launch_time)
+                self._counters['launched'] += 1
+                logger.info(f"Browser pool launched new browser in {launch_time:.2f}s "
+                            f"({len(self._browsers)}/{self.config.max_browsers} warm)")
+            else:
+                self._counters['reused'] += 1
+
+            pooled.in_use = True
+            pooled.tasks_served += 1
+            pooled.last_used_at = time.time()
+
+            acquire_time = time.time() - start
+            self._acquire_times.append(acquire_time)
+            self._counters['acquired'] += 1
+
+        logger.debug(f"Browser acquired in {acquire_time * 1000:.1f}ms (reused: {reused})")
+        return BrowserLease(pooled=pooled, acquire_time=acquire_time, reused=reused)
+
+    def release(self, lease: BrowserLease, healthy: bool = True):
+        """
+        Return a browser to the pool
+
+        Args:
+            lease: Lease returned by acquire()
+            healthy: False if the task saw the browser/context crash
+        """
+        pooled = lease.pooled
+        with self._lock:
+            pooled.in_use = False
+            pooled.last_used_at = time.time()
+
+            if pooled not in self._browsers:
+                return
+
+            if not healthy or not pooled.is_healthy():
+                self._retire(pooled, 'crashed')
+            elif pooled.tasks_served >= self.config.max_tasks_per_browser:
+                self._retire(pooled, 'recycled')
+            elif pooled.get_age() >= self.config.max_browser_age_seconds:
+                self._retire(pooled, 'recycled')
+
+    def _find_idle(self, key: str) -> Optional[PooledBrowser]:
+        """Find an idle, healthy browser for a key (retires dead ones on the way)"""
+        for pooled in list(self._browsers):
+            if pooled.in_use or pooled.key != key:
+                continue
+            if not pooled.is_healthy():
+                self._retire(pooled, 'crashed')
+                continue
+            if pooled.get_age() >= self.config.max_browser_age_seconds:
+                self._retire(pooled, 'recycled')
+                continue
+            return pooled
+        return None
+
+    def _make_room(self):
+        """Evict least recently used idle browsers until a new one fits"""
+        while len(self._browsers) >= self.config.max_browsers:
+            idle = [b for b in self._browsers if not b.in_use]
+            if not idle:
+                # Every browser is leased - allow a temporary overflow
+                logger.warning("Browser pool exhausted, launching beyond max_browsers")
+                return
+            oldest = min(idle, key=lambda b: b.last_used_at)
+            self._retire(oldest, 'evicted')
+
+    def _retire(self, pooled: PooledBrowser, reason: str):
+        """Close a browser and drop it from the pool"""
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
+        self._counters[reason] += 1
+
+        try:
+            pooled.browser.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled browser: {e}")
+
+        logger.info(f"Browser pool {reason} browser after {pooled.tasks_served} tasks "
+                    f"({pooled.get_age():.0f}s old)")
+
+    def close(self):
+        """Close all browsers and stop the Playwright driver"""
+        with self._lock:
+            for pooled in list(self._browsers):
+                self._retire(pooled, 'evicted')
+
+            if self._playwright is not None:
+                try:
+                    self._playwright.stop()
+                except Exception as e:
+                    logger.warning(f"Error stopping browser pool driver: {e}")
+                finally:
+                    self._playwright = None
+
+    def get_stats(self) -> Dict:
+        """Get pool metrics (counters plus launch/acquire latency)"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['warm_browsers'] = len(self._browsers)
+            stats['in_use'] = sum(1 for b in self._browsers if b.in_use)
+            stats['launch_ms'] = _latency_summary(self._launch_times)
+            stats['acquire_ms'] = _latency_summary(self._acquire_times)
+        return stats
+
+
+def _latency_summary(samples) -> Dict[str, Optional[float]]:
+    """Summarize latency samples (seconds) as avg/p50/p95 in milliseconds"""
+    if not samples:
+        return {'avg': None, 'p50': None, 'p95': None}
+
+    ordered = sorted(samples)
+    count = len(ordered)
+    return {
+        'avg': round(sum(ordered) / count * 1000, 1),
+        'p50': round(ordered[int(count * 0.50)] * 1000, 1),
+        'p95': round(ordered[min(int(count * 0.95), count - 1)] * 1000, 1),
+    }
+
+
+# Per-thread pools (Playwright sync objects cannot cross threads)
+_pool_local = threading.local()
+
+
+def get_browser_pool(config: Optional[BrowserPoolConfig] = None) -> BrowserPool:
+    """Get browser pool for the current thread"""
+    pool = getattr(_pool_local, 'pool', None)
+    if pool is None:
+        if config is None:
+            config = BrowserPoolConfig(
+                max_browsers=int(os.getenv('BROWSER_POOL_SIZE', '2')),
+                max_tasks_per_browser=int(os.getenv('BROWSER_POOL_MAX_TASKS', '50')),
+                max_browser_age_seconds=int(os.getenv('BROWSER_POOL_MAX_AGE_SECONDS', '1800')),
+            )
+        pool = BrowserPool(config)
+        _pool_local.pool = pool
+    return pool
+
+
+def close_browser_pool():
+    """Close the current thread's browser pool (if any)"""
+    pool = getattr(_pool_local, 'pool', None)
+    if pool is not None:
+        pool.close()
+        _pool_local.pool = None
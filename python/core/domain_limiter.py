@@ -0,0 +1,299 @@
+"""
+Domain Concurrency Limiter
+
+Politeness limits per target domain: at most max_concurrent tasks on a domain
+at once and at least min_gap_seconds between task starts on it. Two browsers
+hitting one site together is what gets tasks BLOCKED (and, through
+DomainMemory.record_failure, the domain flagged always_blocked).
+
+Leases live in a SQLite database, so every worker process on the host shares
+the limits. try_acquire() never waits: it returns a lease, or the seconds
+until the domain may be free so the worker can defer the task (DeferredTasks)
+instead of failing it. Leases expire after lease_ttl, so a crashed worker
+can't hold a domain forever.
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from core.domain_memory import normalize_domain
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DomainLimiterConfig:
+    """Domain limiter configuration"""
+    db_path: str = 'domain_limits.db'
+    max_concurrent: int = 1  # Tasks running on one domain at once
+    min_gap_seconds: float = 10.0  # Between task starts on one domain
+    lease_ttl: float = 600.0  # Leases of crashed workers expire after this
+    busy_retry_seconds: float = 15.0  # Recheck interval for a domain at max_concurrent
+    max_defer_seconds: float = 600.0  # Deferred longer than this: hand the task back
+    max_deferred: int = 50  # Deferred tasks held by one worker
+    max_start_wait_seconds: float = 120.0  # A started task waits this long for its opportunity's domain
+
+    @classmethod
+    def from_env(cls) -> 'DomainLimiterConfig':
+        """Build config from DOMAIN_LIMIT_* environment variables"""
+        max_runtime = float(os.getenv('MAX_TASK_RUNTIME_SECONDS', '300'))
+        return cls(
+            db_path=os.getenv('DOMAIN_LIMIT_DB_PATH', 'domain_limits.db'),
+            max_concurrent=int(os.getenv('DOMAIN_LIMIT_MAX_CONCURRENT', '1')),
+            min_gap_seconds=float(os.getenv('DOMAIN_LIMIT_MIN_GAP', '10')),
+            lease_ttl=float(os.getenv('DOMAIN_LIMIT_LEASE_TTL', str(max_runtime + 300))),
+            max_defer_seconds=float(os.getenv('DOMAIN_LIMIT_MAX_DEFER', '600')),
+            max_deferred=int(os.getenv('DOMAIN_LIMIT_MAX_DEFERRED', '50')),
+            max_start_wait_seconds=float(os.getenv('DOMAIN_LIMIT_MAX_START_WAIT', '120')),
+        )
+
+
+@dataclass
+class DomainLease:
+    """A running task's hold on a domain (lease_id None: not tracked)"""
+    lease_id: Optional[str]
+    domain: str
+    acquired_at: float
+
+
+class DomainLimiter:
+    """
+    Cross-process per-domain concurrency cap and minimum start gap.
+
+    try_acquire() before a task starts a browser, release() when it is done.
+    """
+
+    def __init__(self, config: Optional[DomainLimiterConfig] = None):
+        self.config = config or DomainLimiterConfig.from_env()
+        self.db_path = self.config.db_path
+
+        # One connection per thread (sqlite3 connections are thread-bound)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._counters_lock = threading.Lock()
+        self._counters = {
+            'granted': 0,
+            'deferred_busy': 0,
+            'deferred_gap': 0,
+            'released': 0,
+            'expired': 0,
+            'errors': 0,
+        }
+
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection (WAL mode, autocommit; transactions are explicit)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _init_database(self):
+        """Initialize database schema"""
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS domain_leases (
+                lease_id TEXT PRIMARY KEY,
+                domain TEXT NOT NULL,
+                holder TEXT,
+                acquired_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_domain_leases_domain ON domain_leases(domain)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS domain_starts (
+                domain TEXT PRIMARY KEY,
+                last_started_at REAL NOT NULL
+            )
+        """)
+
+    def _count(self, key: str, amount: int = 1):
+        with self._counters_lock:
+            self._counters[key] += amount
+
+    def try_acquire(self, domain: str, holder: Optional[str] = None) -> Tuple[Optional[DomainLease], float]:
+        """
+        Take a lease on a domain if its limits allow a task to start now
+
+        Args:
+            domain: Target domain of the task
+            holder: Worker ID recorded with the lease (for debugging)
+
+        Returns:
+            (lease, 0) if the task may start, or (None, seconds until it may be
+            worth trying again). Database errors fail open with an untracked lease.
+        """
+        key = normalize_domain(domain)
+        now = time.time()
+        conn = self._connect()
+        try:
+            # IMMEDIATE takes the write lock up front, so check-and-insert is atomic across processes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = conn.execute("DELETE FROM domain_leases WHERE expires_at <= ?", (now,)).rowcount
+                active = conn.execute(
+                    "SELECT COUNT(*) FROM domain_leases WHERE domain = ?", (key,)
+                ).fetchone()[0]
+                row = conn.execute(
+                    "SELECT last_started_at FROM domain_starts WHERE domain = ?", (key,)
+                ).fetchone()
+
+                retry_after = 0.0
+                if active >= self.config.max_concurrent:
+                    retry_after = self.config.busy_retry_seconds
+                    counter = 'deferred_busy'
+                elif row and now - row[0] < self.config.min_gap_seconds:
+                    retry_after = self.config.min_gap_seconds - (now - row[0])
+                    counter = 'deferred_gap'
+
+                lease = None
+                if retry_after <= 0:
+                    lease = DomainLease(lease_id=uuid.uuid4().hex, domain=key, acquired_at=now)
+                    conn.execute(
+                        "INSERT INTO domain_leases (lease_id, domain, holder, acquired_at, expires_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (lease.lease_id, key, holder, now, now + self.config.lease_ttl)
+                    )
+                    conn.execute(
+                        "INSERT INTO domain_starts (domain, last_started_at) VALUES (?, ?) "
+                        "ON CONFLICT(domain) DO UPDATE SET last_started_at = excluded.last_started_at",
+                        (key, now)
+                    )
+                    counter = 'granted'
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._count('errors')
+            logger.warning(f"Domain limiter unavailable for {key}, not limiting: {e}")
+            return DomainLease(lease_id=None, domain=key, acquired_at=now), 0.0
+
+        if expired:
+            self._count('expired', expired)
+        self._count(counter)
+        return lease, retry_after
+
+    def release(self, lease: Optional[DomainLease]):
+        """Free a lease once its task finished (None/untracked leases are ignored)"""
+        if lease is None or lease.lease_id is None:
+            return
+        try:
+            self._connect().execute("DELETE FROM domain_leases WHERE lease_id = ?", (lease.lease_id,))
+            self._count('released')
+        except sqlite3.Error as e:
+            # The lease expires after lease_ttl anyway
+            self._count('errors')
+            logger.warning(f"Failed to release domain lease for {lease.domain}: {e}")
+
+    def get_stats(self) -> Dict:
+        """Grant/defer counters and leases currently held on this host"""
+        try:
+            active = self._connect().execute(
+                "SELECT COUNT(*) FROM domain_leases WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            active = None
+        with self._counters_lock:
+            return {**self._counters, 'active_leases': active}
+
+    def close(self):
+        """Close every thread's connection"""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class DeferredTasks:
+    """
+    Claimed tasks waiting for their domain, in deferral order.
+
+    Used by the dispatching thread only. Tasks that waited longer than
+    max_defer_seconds, or beyond max_tasks, are handed back by pop_expired().
+    """
+
+    def __init__(self, max_defer_seconds: float = 600.0, max_tasks: int = 50):
+        self.max_defer_seconds = max_defer_seconds
+        self.max_tasks = max_tasks
+        # task id -> (task, first deferred at, ready at), monotonic times
+        self._tasks: Dict[object, Tuple[Dict, float, float]] = {}
+        self._stats = {'deferred': 0, 'resumed': 0, 'handed_back': 0}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def add(self, task: Dict, retry_after: float):
+        """Hold a task until retry_after seconds from now"""
+        now = time.monotonic()
+        previous = self._tasks.pop(task.get('id'), None)
+        if previous is None:
+            self._stats['deferred'] += 1
+        deferred_at = previous[1] if previous else now
+        self._tasks[task.get('id')] = (task, deferred_at, now + retry_after)
+
+    def pop_ready(self) -> List[Dict]:
+        """Tasks whose domain may be free again (oldest deferral first)"""
+        now = time.monotonic()
+        ready = [task_id for task_id, (_, _, ready_at) in self._tasks.items() if ready_at <= now]
+        ready.sort(key=lambda task_id: self._tasks[task_id][1])
+        self._stats['resumed'] += len(ready)
+        return [self._tasks.pop(task_id)[0] for task_id in ready]
+
+    def pop_expired(self) -> List[Dict]:
+        """Tasks deferred too long, and the oldest ones beyond max_tasks"""
+        now = time.monotonic()
+        by_age = sorted(self._tasks, key=lambda task_id: self._tasks[task_id][1])
+        overflow = max(len(by_age) - self.max_tasks, 0)
+        expired = [
+            task_id for index, task_id in enumerate(by_age)
+            if index < overflow or now - self._tasks[task_id][1] > self.max_defer_seconds
+        ]
+        self._stats['handed_back'] += len(expired)
+        return [self._tasks.pop(task_id)[0] for task_id in expired]
+
+    def pop_all(self) -> List[Dict]:
+        """Every deferred task (when the worker stops)"""
+        tasks = [task for task, _, _ in self._tasks.values()]
+        self._tasks.clear()
+        return tasks
+
+    def next_ready_in(self) -> Optional[float]:
+        """Seconds until the next deferred task is ready (None if there are none)"""
+        if not self._tasks:
+            return None
+        return max(min(ready_at for _, _, ready_at in self._tasks.values()) - time.monotonic(), 0.0)
+
+    def get_stats(self) -> Dict:
+        """Deferral counters and tasks currently held"""
+        return {'held': len(self._tasks), **self._stats}
+
+
+# Global instance
+_domain_limiter = None
+
+
+def get_domain_limiter(config: Optional[DomainLimiterConfig] = None) -> DomainLimiter:
+    """Get global domain limiter instance"""
+    global _domain_limiter
+    if _domain_limiter is None:
+        _domain_limiter = DomainLimiter(config)
+    return _domain_limiter
@@ -4,40 +4,182 @@ Domain Memory
 Stores per-domain learning and patterns for faster, more reliable automation
 """
 
+import os
+import time
+import atexit
 import sqlite3
 import json
 import logging
 import threading
-from typing import Dict, Optional, Any
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# Columns stored as JSON text
+JSON_COLUMNS = ('recurring_popup_selectors', 'best_locator_strategy')
+# Columns stored as 0/1
+BOOL_COLUMNS = ('iframe_required', 'always_blocked', 'sso_only')
+# Columns update() may write (domain/created_at/last_updated are managed here)
+PATCH_COLUMNS = (
+    'iframe_required', 'recurring_popup_selectors', 'best_locator_strategy',
+    'login_flow_type', 'always_blocked', 'sso_only',
+)
+# Stat kept equal to the sum of all failures_* stats (maintained on increment)
+TOTAL_FAILURES_KEY = 'total_failures'
+# SQLite host parameter limit is 999 on older builds
+QUERY_CHUNK_SIZE = 500
+
+
+def domain_from_url(url: Optional[str]) -> Optional[str]:
+    """Domain (netloc) of a URL; accepts bare 'example.com/path' too"""
+    if not url:
+        return None
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None
+    domain = parsed.netloc or parsed.path.split('/')[0]
+    return domain.lower() or None
+
+
+def normalize_domain(domain: Optional[str]) -> Optional[str]:
+    """
+    Lowercase domain without port or www. (None for missing/'unknown'), so
+    www.example.com and example.com count as one site
+    """
+    if not domain or domain == 'unknown':
+        return None
+    domain = domain.lower().split(':')[0]
+    return domain[4:] if domain.startswith('www.') else domain
+
+
+def task_target_url(task: Dict) -> Optional[str]:
+    """
+    URL a claimed task will open, as far as its payload says: opportunity_url,
+    else the first of target_urls, else verification_link (email confirmations)
+    """
+    payload = task.get('payload') or {}
+    target_urls = payload.get('target_urls') or []
+    if isinstance(target_urls, str):
+        target_urls = [target_urls]
+    return (payload.get('opportunity_url') or task.get('opportunity_url')
+            or (target_urls[0] if target_urls else None)
+            or payload.get('verification_link'))
+
+
+def _skip_reason(always_blocked: Any, sso_only: Any) -> Optional[str]:
+    """Skip reason for a domain's flags (same precedence as should_skip)"""
+    if always_blocked:
+        return 'always_blocked'
+    if sso_only:
+        return 'sso_only'
+    return None
+
 
 class DomainMemory:
     """Stores and retrieves per-domain learning"""
     
-    def __init__(self, db_path: str = "domain_memory.db", enable_cache: bool = True):
+    # Rows written this long before the last invalidation check are re-checked,
+    # covering writers whose transaction committed after its last_updated stamp
+    INVALIDATION_SLACK_SECONDS = 5
+    
+    def __init__(self, db_path: str = "domain_memory.db", enable_cache: bool = True,
+                 write_behind: bool = True, flush_interval: float = 1.0, max_pending: int = 500,
+                 cache_size: int = 10000, cache_ttl: float = 300.0, invalidation_interval: float = 2.0):
         """
         Initialize domain memory
         
         Args:
             db_path: Path to SQLite database
             enable_cache: Enable in-memory cache for speed
+            write_behind: Queue writes and flush them in batched transactions
+            flush_interval: Seconds between write-behind flushes
+            max_pending: Pending writes that trigger an early flush
+            cache_size: Max domains kept in the LRU cache
+            cache_ttl: Seconds a cached domain is served before reloading
+            invalidation_interval: Min seconds between checks for rows changed by other writers
         """
         self.db_path = Path(db_path)
         self.enable_cache = enable_cache
-        self._cache: Dict[str, Dict] = {}
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.invalidation_interval = invalidation_interval
+        
+        # LRU cache: domain -> (data snapshot, cached_at). Snapshots are never
+        # mutated in place; writers replace them (copy-on-write).
+        self._cache: 'OrderedDict[str, Tuple[Dict, float]]' = OrderedDict()
         self._cache_lock = threading.Lock()
+        self._invalidation_lock = threading.Lock()
+        self._last_invalidation_check = time.time()
+        self._invalidation_watermark = datetime.utcnow()
+        self._cache_counters = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+        }
+        
+        # Domains flagged always_blocked/sso_only (domain -> reason), for
+        # O(1) pre-screening without touching the database
+        self._skip_domains: Dict[str, str] = {}
+        self._skip_lock = threading.Lock()
+        self._prescreen_started = time.time()
+        self._prescreen_counters: Dict[str, Dict[str, int]] = {}
+        
+        # One connection per thread (sqlite3 connections are thread-bound)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        
+        # Write-behind queue: coalesced column patches and stat deltas per domain
+        self._pending_patches: Dict[str, Dict[str, Any]] = {}
+        self._pending_stats: Dict[str, Dict[str, int]] = {}
+        self._pending_count = 0
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_wakeup = threading.Event()
+        self._closed = False
+        self._flusher: Optional[threading.Thread] = None
+        self._counters = {
+            'flushes': 0,
+            'flushed_writes': 0,
+            'flush_errors': 0,
+        }
+        
         self._init_database()
+        
+        if self.write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name="domain-memory-flusher", daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection (WAL mode, autocommit; transactions are explicit)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
     
     def _init_database(self):
         """Initialize database schema"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = self._connect()
         
-        cursor.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS domain_memory (
                 domain TEXT PRIMARY KEY,
                 iframe_required INTEGER DEFAULT 0,
@@ -52,20 +194,85 @@ class DomainMemory:
             )
         """)
         
-        conn.commit()
-        conn.close()
+        # Stats live here, one row per counter, so increments are atomic
+        # (the stats column above is only read to migrate old databases)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS domain_stats (
+                domain TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (domain, key)
+            ) WITHOUT ROWID
+        """)
+        
+        # last_updated doubles as the row version for cache invalidation
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_domain_memory_last_updated ON domain_memory (last_updated)")
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_domain_memory_skip ON domain_memory (domain)
+            WHERE always_blocked = 1 OR sso_only = 1
+        """)
+        
+        self._migrate_stats_blobs(conn)
+        self._load_skip_domains(conn)
+        
         logger.debug(f"Domain memory database initialized at {self.db_path}")
     
+    def _load_skip_domains(self, conn: sqlite3.Connection):
+        """Load every always_blocked/sso_only domain into the in-memory skip set"""
+        rows = conn.execute(
+            "SELECT domain, always_blocked, sso_only FROM domain_memory WHERE always_blocked = 1 OR sso_only = 1"
+        ).fetchall()
+        with self._skip_lock:
+            self._skip_domains = {
+                row['domain']: _skip_reason(row['always_blocked'], row['sso_only']) for row in rows
+            }
+        if rows:
+            logger.info(f"Domain memory: {len(rows)} domains flagged for skipping")
+    
+    def _note_skip_flags(self, domain: str, always_blocked: Any, sso_only: Any):
+        """Keep the skip set in line with a domain's current flags"""
+        reason = _skip_reason(always_blocked, sso_only)
+        with self._skip_lock:
+            if reason:
+                self._skip_domains[domain] = reason
+            else:
+                self._skip_domains.pop(domain, None)
+    
+    def _migrate_stats_blobs(self, conn: sqlite3.Connection):
+        """Move JSON stats blobs from domain_memory into domain_stats (once)"""
+        if conn.execute("SELECT 1 FROM domain_memory WHERE stats IS NOT NULL LIMIT 1").fetchone() is None:
+            return
+        
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("SELECT domain, stats FROM domain_memory WHERE stats IS NOT NULL").fetchall()
+            for row in rows:
+                try:
+                    stats = json.loads(row['stats']) if row['stats'] else {}
+                except:
+                    stats = {}
+                self._add_stat_deltas(conn, row['domain'], self._with_failure_total(stats))
+            conn.execute("UPDATE domain_memory SET stats = NULL WHERE stats IS NOT NULL")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Migrated stats for {len(rows)} domains to domain_stats")
+    
+    @staticmethod
+    def _with_failure_total(deltas: Dict[str, int]) -> Dict[str, int]:
+        """Add the TOTAL_FAILURES_KEY delta implied by failures_* deltas"""
+        failures = sum(v for k, v in deltas.items() if k.startswith('failures_'))
+        if not failures:
+            return deltas
+        deltas = dict(deltas)
+        deltas[TOTAL_FAILURES_KEY] = deltas.get(TOTAL_FAILURES_KEY, 0) + failures
+        return deltas
+    
     def _get_from_db(self, domain: str) -> Optional[Dict]:
         """Get domain data from database"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM domain_memory WHERE domain = ?", (domain,))
-        row = cursor.fetchone()
-        
-        conn.close()
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM domain_memory WHERE domain = ?", (domain,)).fetchone()
         
         if not row:
             return None
@@ -89,13 +296,11 @@ class DomainMemory:
         else:
             data['best_locator_strategy'] = {}
         
-        if data.get('stats'):
-            try:
-                data['stats'] = json.loads(data['stats'])
-            except:
-                data['stats'] = {}
-        else:
-            data['stats'] = {}
+        data['stats'] = {
+            stat['key']: stat['value'] for stat in conn.execute(
+                "SELECT key, value FROM domain_stats WHERE domain = ?", (domain,)
+            )
+        }
         
         # Convert boolean fields
         data['iframe_required'] = bool(data.get('iframe_required', 0))
@@ -104,74 +309,210 @@ class DomainMemory:
         
         return data
     
-    def _save_to_db(self, domain: str, data: Dict):
-        """Save domain data to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+    @staticmethod
+    def _encode(column: str, value: Any) -> Any:
+        """Convert a Python value to its column representation"""
+        if column in JSON_COLUMNS:
+            return json.dumps(value if value is not None else ({} if column != 'recurring_popup_selectors' else []))
+        if column in BOOL_COLUMNS:
+            return int(bool(value))
+        return value
+    
+    def _upsert(self, conn: sqlite3.Connection, domain: str, patch: Dict, now: str):
+        """Insert the domain or update only the patched columns (single statement)"""
+        columns = [c for c in PATCH_COLUMNS if c in patch]
+        values = [self._encode(c, patch[c]) for c in columns]
+        
+        assignments = ''.join(f"{c} = excluded.{c}, " for c in columns)
+        conn.execute(f"""
+            INSERT INTO domain_memory (domain, {''.join(c + ', ' for c in columns)}last_updated, created_at)
+            VALUES (?, {'?, ' * len(columns)}?, ?)
+            ON CONFLICT(domain) DO UPDATE SET {assignments}last_updated = excluded.last_updated
+        """, (domain, *values, now, now))
+    
+    @staticmethod
+    def _add_stat_deltas(conn: sqlite3.Connection, domain: str, deltas: Dict[str, int]):
+        """Atomically add deltas to domain_stats counters"""
+        conn.executemany("""
+            INSERT INTO domain_stats (domain, key, value) VALUES (?, ?, ?)
+            ON CONFLICT(domain, key) DO UPDATE SET value = value + excluded.value
+        """, [(domain, key, amount) for key, amount in deltas.items()])
+    
+    def _replace_stats(self, conn: sqlite3.Connection, domain: str, stats: Dict[str, int]):
+        """Replace all counters of a domain (update() with a 'stats' patch)"""
+        conn.execute("DELETE FROM domain_stats WHERE domain = ?", (domain,))
+        stats = {k: v for k, v in (stats or {}).items() if k != TOTAL_FAILURES_KEY}
+        self._add_stat_deltas(conn, domain, self._with_failure_total(stats))
+    
+    def _save_to_db(self, domain: str, patch: Dict = None, stat_deltas: Dict[str, int] = None):
+        """Write a patch and/or stat deltas for one domain in a single transaction"""
+        self._write_batch({domain: patch or {}}, {domain: stat_deltas} if stat_deltas else {})
+    
+    def _write_batch(self, patches: Dict[str, Dict], stat_deltas: Dict[str, Dict[str, int]]):
+        """Write patches and stat deltas for many domains in one transaction"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        # Stamped after taking the write lock so it is close to the commit time
         now = datetime.utcnow().isoformat()
+        try:
+            for domain, patch in patches.items():
+                self._upsert(conn, domain, patch, now)
+                if 'stats' in patch:
+                    self._replace_stats(conn, domain, patch['stats'])
+            for domain, deltas in stat_deltas.items():
+                if domain not in patches:
+                    self._upsert(conn, domain, {}, now)
+                self._add_stat_deltas(conn, domain, deltas)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def _queue_write(self, domain: str, patch: Optional[Dict] = None, stat_deltas: Optional[Dict[str, int]] = None):
+        """Persist a write now, or queue it for the next batched flush"""
+        if not self.write_behind or self._closed:
+            self._save_to_db(domain, patch, stat_deltas)
+            return
+        
+        with self._pending_lock:
+            if patch:
+                self._pending_patches.setdefault(domain, {}).update(patch)
+                self._pending_count += 1
+            if stat_deltas:
+                pending = self._pending_stats.setdefault(domain, {})
+                for key, amount in stat_deltas.items():
+                    pending[key] = pending.get(key, 0) + amount
+                self._pending_count += 1
+            should_wake = self._pending_count >= self.max_pending
+        
+        if should_wake:
+            self._flush_wakeup.set()
+    
+    def _apply_pending(self, domain: str, data: Dict) -> Dict:
+        """Overlay queued (not yet flushed) writes on data read from the database"""
+        with self._pending_lock:
+            patch = dict(self._pending_patches.get(domain, {}))
+            deltas = dict(self._pending_stats.get(domain, {}))
+        if patch:
+            data.update(patch)
+        if deltas:
+            stats = dict(data.get('stats') or {})
+            for key, amount in deltas.items():
+                stats[key] = stats.get(key, 0) + amount
+            data['stats'] = stats
+        return data
+    
+    def _flush_loop(self):
+        """Background flusher for the write-behind queue"""
+        while not self._closed:
+            self._flush_wakeup.wait(self.flush_interval)
+            self._flush_wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Domain memory flush failed: {e}")
+    
+    def flush(self) -> int:
+        """
+        Write all queued patches and stat increments in one transaction
         
-        # Check if domain exists
-        cursor.execute("SELECT domain FROM domain_memory WHERE domain = ?", (domain,))
-        exists = cursor.fetchone() is not None
-        
-        # Prepare data
-        recurring_popup_selectors = json.dumps(data.get('recurring_popup_selectors', []))
-        best_locator_strategy = json.dumps(data.get('best_locator_strategy', {}))
-        stats = json.dumps(data.get('stats', {}))
-        
-        if exists:
-            # Update
-            cursor.execute("""
-                UPDATE domain_memory SET
-                    iframe_required = ?,
-                    recurring_popup_selectors = ?,
-                    best_locator_strategy = ?,
-                    login_flow_type = ?,
-                    always_blocked = ?,
-                    sso_only = ?,
-                    stats = ?,
-                    last_updated = ?
-                WHERE domain = ?
-            """, (
-                int(data.get('iframe_required', 0)),
-                recurring_popup_selectors,
-                best_locator_strategy,
-                data.get('login_flow_type'),
-                int(data.get('always_blocked', 0)),
-                int(data.get('sso_only', 0)),
-                stats,
-                now,
-                domain
-            ))
-        else:
-            # Insert
-            cursor.execute("""
-                INSERT INTO domain_memory (
-                    domain, iframe_required, recurring_popup_selectors,
-                    best_locator_strategy, login_flow_type, always_blocked,
-                    sso_only, stats, last_updated, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                domain,
-                int(data.get('iframe_required', 0)),
-                recurring_popup_selectors,
-                best_locator_strategy,
-                data.get('login_flow_type'),
-                int(data.get('always_blocked', 0)),
-                int(data.get('sso_only', 0)),
-                stats,
-                now,
-                now
-            ))
-        
-        conn.commit()
-        conn.close()
+        Returns:
+            Number of queued writes flushed
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                patches, self._pending_patches = self._pending_patches, {}
+                stat_deltas, self._pending_stats = self._pending_stats, {}
+                count, self._pending_count = self._pending_count, 0
+            
+            if not patches and not stat_deltas:
+                return 0
+            
+            start = time.time()
+            try:
+                self._write_batch(patches, stat_deltas)
+            except Exception:
+                self._counters['flush_errors'] += 1
+                self._requeue(patches, stat_deltas, count)
+                raise
+            
+            self._counters['flushes'] += 1
+            self._counters['flushed_writes'] += count
+            logger.debug(f"Domain memory flushed {count} writes for "
+                         f"{len(set(patches) | set(stat_deltas))} domains in {(time.time() - start) * 1000:.1f}ms")
+            return count
+    
+    def _requeue(self, patches: Dict[str, Dict], stat_deltas: Dict[str, Dict[str, int]], count: int):
+        """Put back writes from a failed flush (newer queued patches win)"""
+        with self._pending_lock:
+            for domain, patch in patches.items():
+                merged = dict(patch)
+                merged.update(self._pending_patches.get(domain, {}))
+                self._pending_patches[domain] = merged
+            for domain, deltas in stat_deltas.items():
+                pending = self._pending_stats.setdefault(domain, {})
+                for key, amount in deltas.items():
+                    pending[key] = pending.get(key, 0) + amount
+            self._pending_count += count
+    
+    def pending_writes(self) -> int:
+        """Number of queued writes not yet flushed"""
+        with self._pending_lock:
+            return self._pending_count
+    
+    def get_stats(self) -> Dict:
+        """Get write-behind and cache counters"""
+        stats = dict(self._counters)
+        stats['pending_writes'] = self.pending_writes()
+        stats['write_behind'] = self.write_behind
+        stats['cache'] = self.get_cache_stats() if self.enable_cache else None
+        return stats
+    
+    def close(self):
+        """Flush queued writes, stop the flusher and close connections"""
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_wakeup.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(5)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"Domain memory final flush failed: {e}")
+        
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+    
+    @staticmethod
+    def _defaults(domain: str) -> Dict:
+        """Domain data for a domain with no stored memory"""
+        return {
+            'domain': domain,
+            'iframe_required': False,
+            'recurring_popup_selectors': [],
+            'best_locator_strategy': {},
+            'login_flow_type': None,
+            'always_blocked': False,
+            'sso_only': False,
+            'stats': {},
+            'last_updated': None,
+            'created_at': None
+        }
     
     def get(self, domain: str) -> Dict:
         """
         Get domain memory data
         
+        With the cache enabled the returned dict is a shared snapshot: treat
+        it (and nested lists/dicts) as read-only and write through update().
+        
         Args:
             domain: Domain name
         
@@ -180,32 +521,20 @@ class DomainMemory:
         """
         # Check cache first
         if self.enable_cache:
-            with self._cache_lock:
-                if domain in self._cache:
-                    return self._cache[domain].copy()
-        
-        # Get from database
-        data = self._get_from_db(domain)
-        
-        if not data:
-            # Return defaults
-            data = {
-                'domain': domain,
-                'iframe_required': False,
-                'recurring_popup_selectors': [],
-                'best_locator_strategy': {},
-                'login_flow_type': None,
-                'always_blocked': False,
-                'sso_only': False,
-                'stats': {},
-                'last_updated': None,
-                'created_at': None
-            }
+            self._check_invalidation()
+            cached = self._cache_get(domain)
+            if cached is not None:
+                return cached
+        
+        # Get from database (not mid-flush, so queued writes are counted exactly once)
+        with self._flush_lock:
+            data = self._get_from_db(domain) or self._defaults(domain)
+            # Writes still in the write-behind queue are newer than the database
+            data = self._apply_pending(domain, data)
         
         # Update cache
         if self.enable_cache:
-            with self._cache_lock:
-                self._cache[domain] = data.copy()
+            self._cache_put(domain, data)
         
         return data
     
@@ -213,23 +542,28 @@ class DomainMemory:
         """
         Update domain memory with patch
         
+        Only the patched columns are written (one UPSERT, batched with other
+        writes when write-behind is enabled).
+        
         Args:
             domain: Domain name
             patch: Dict with fields to update
         """
-        # Get current data
-        current = self.get(domain)
+        # Get current data (copy: cached snapshots are never mutated)
+        current = dict(self.get(domain))
         
         # Apply patch
         current.update(patch)
         
         # Save to database
-        self._save_to_db(domain, current)
+        self._queue_write(domain, patch={k: v for k, v in patch.items() if k in PATCH_COLUMNS or k == 'stats'})
+        
+        if 'always_blocked' in patch or 'sso_only' in patch:
+            self._note_skip_flags(domain, current.get('always_blocked'), current.get('sso_only'))
         
         # Update cache
         if self.enable_cache:
-            with self._cache_lock:
-                self._cache[domain] = current.copy()
+            self._cache_put(domain, current)
         
         logger.debug(f"Domain memory updated for {domain}: {patch}")
     
@@ -237,20 +571,27 @@ class DomainMemory:
         """
         Increment a statistic for a domain
         
+        Stored as value = value + amount in domain_stats, so concurrent
+        writers (threads or processes) never lose increments. failures_*
+        increments also bump TOTAL_FAILURES_KEY.
+        
         Args:
             domain: Domain name
             key: Stat key
             amount: Amount to increment (default: 1)
         """
-        data = self.get(domain)
-        stats = data.get('stats', {})
+        deltas = self._with_failure_total({key: amount})
         
-        if key not in stats:
-            stats[key] = 0
+        data = dict(self.get(domain))
+        stats = dict(data.get('stats', {}))
+        for stat_key, stat_amount in deltas.items():
+            stats[stat_key] = stats.get(stat_key, 0) + stat_amount
         
-        stats[key] += amount
+        self._queue_write(domain, stat_deltas=deltas)
         
-        self.update(domain, {'stats': stats})
+        if self.enable_cache:
+            data['stats'] = stats
+            self._cache_put(domain, data)
     
     def record_iframe_used(self, domain: str, success: bool):
         """Record iframe usage"""
@@ -264,7 +605,7 @@ class DomainMemory:
         """Record popup clear attempt"""
         if success:
             data = self.get(domain)
-            popup_selectors = data.get('recurring_popup_selectors', [])
+            popup_selectors = list(data.get('recurring_popup_selectors', []))
             
             # Add selector if not already present
             if selector not in popup_selectors:
@@ -279,7 +620,7 @@ class DomainMemory:
         """Record locator strategy usage"""
         if success:
             data = self.get(domain)
-            strategies = data.get('best_locator_strategy', {})
+            strategies = dict(data.get('best_locator_strategy', {}))
             
             # Update best strategy for role
             if role not in strategies:
@@ -290,7 +631,7 @@ class DomainMemory:
                 if isinstance(current, dict):
                     # Already tracking stats
                     if current.get('strategy') == strategy:
-                        current['success_count'] = current.get('success_count', 0) + 1
+                        strategies[role] = dict(current, success_count=current.get('success_count', 0) + 1)
                     else:
                         # New strategy is better, replace
                         strategies[role] = strategy
@@ -318,24 +659,40 @@ class DomainMemory:
         """Record failure and potentially set skip flags"""
         self.increment_stat(domain, f'failures_{failure_type}', 1)
         
-        # Check if we should set skip flags
+        # Check if we should set skip flags (counts include other workers' writes)
+        counts = self._read_stats(domain, [TOTAL_FAILURES_KEY, 'failures_blocked', 'failures_sso_required'])
+        total_attempts = counts[TOTAL_FAILURES_KEY]
+        if total_attempts < 5:
+            return
+        
         data = self.get(domain)
-        stats = data.get('stats', {})
         
         # If consistently blocked, set always_blocked flag
-        blocked_count = stats.get('failures_blocked', 0)
-        total_attempts = sum(v for k, v in stats.items() if k.startswith('failures_'))
-        
-        if total_attempts >= 5 and blocked_count >= total_attempts * 0.8:
+        if not data.get('always_blocked') and counts['failures_blocked'] >= total_attempts * 0.8:
             self.update(domain, {'always_blocked': True})
             logger.warning(f"Domain {domain} marked as always_blocked due to consistent failures")
         
         # If consistently requires SSO, set sso_only flag
-        sso_count = stats.get('failures_sso_required', 0)
-        if total_attempts >= 5 and sso_count >= total_attempts * 0.8:
+        if not data.get('sso_only') and counts['failures_sso_required'] >= total_attempts * 0.8:
             self.update(domain, {'sso_only': True})
             logger.warning(f"Domain {domain} marked as sso_only due to consistent SSO requirements")
     
+    def _read_stats(self, domain: str, keys: List[str]) -> Dict[str, int]:
+        """Current values of a few stats (database plus queued increments, one indexed query)"""
+        with self._flush_lock:
+            values = dict.fromkeys(keys, 0)
+            rows = self._connect().execute(
+                f"SELECT key, value FROM domain_stats WHERE domain = ? AND key IN ({', '.join('?' * len(keys))})",
+                (domain, *keys)
+            )
+            for row in rows:
+                values[row['key']] = row['value']
+            with self._pending_lock:
+                pending = self._pending_stats.get(domain, {})
+                for key in keys:
+                    values[key] += pending.get(key, 0)
+        return values
+    
     def should_skip(self, domain: str):
         """
         Check if domain should be skipped
@@ -353,6 +710,154 @@ class DomainMemory:
         
         return False, None
     
+    def bulk_should_skip(self, domains: List[str], source: str = 'tasks') -> Dict[str, Tuple[bool, Optional[str]]]:
+        """
+        Check many domains at once (one primary-key query per 500 domains)
+        
+        Also refreshes the in-memory skip set and counts skipped domains
+        per source for get_prescreen_stats().
+        
+        Args:
+            domains: Domain names (duplicates and empty values are ignored)
+            source: Label for the pre-screen counters (e.g. 'tasks', 'opportunities')
+        
+        Returns:
+            Dict mapping domain -> (should_skip, reason)
+        """
+        unique = list(dict.fromkeys(d for d in domains if d))
+        flags = {domain: {'always_blocked': False, 'sso_only': False} for domain in unique}
+        
+        conn = self._connect()
+        for i in range(0, len(unique), QUERY_CHUNK_SIZE):
+            chunk = unique[i:i + QUERY_CHUNK_SIZE]
+            rows = conn.execute(
+                f"SELECT domain, always_blocked, sso_only FROM domain_memory "
+                f"WHERE domain IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            for row in rows:
+                flags[row['domain']] = {'always_blocked': row['always_blocked'], 'sso_only': row['sso_only']}
+        
+        # Flags still in the write-behind queue are newer than the database
+        with self._pending_lock:
+            for domain in unique:
+                patch = self._pending_patches.get(domain, {})
+                for flag in ('always_blocked', 'sso_only'):
+                    if flag in patch:
+                        flags[domain][flag] = patch[flag]
+        
+        results = {}
+        for domain, domain_flags in flags.items():
+            self._note_skip_flags(domain, domain_flags['always_blocked'], domain_flags['sso_only'])
+            reason = _skip_reason(domain_flags['always_blocked'], domain_flags['sso_only'])
+            results[domain] = (reason is not None, reason)
+        skipped = sum(1 for flagged, _ in results.values() if flagged)
+        
+        with self._skip_lock:
+            counters = self._prescreen_counters.setdefault(source, {'checked': 0, 'skipped': 0})
+            counters['checked'] += len(unique)
+            counters['skipped'] += skipped
+        
+        return results
+    
+    def is_skipped_domain(self, domain: str) -> Optional[str]:
+        """Skip reason from the in-memory skip set (no database access), or None"""
+        with self._skip_lock:
+            return self._skip_domains.get(domain)
+    
+    def get_prescreen_stats(self) -> Dict:
+        """
+        Pre-screen counters per source
+        
+        Every skipped task or opportunity is a browser session that was not
+        started, so skipped_per_hour estimates browser launches saved per hour.
+        """
+        # At least five minutes, so the first batch is not extrapolated to an hour
+        hours = max(time.time() - self._prescreen_started, 300.0) / 3600
+        with self._skip_lock:
+            by_source = {source: dict(c) for source, c in self._prescreen_counters.items()}
+            flagged_domains = len(self._skip_domains)
+        skipped = sum(c['skipped'] for c in by_source.values())
+        return {
+            'flagged_domains': flagged_domains,
+            'checked': sum(c['checked'] for c in by_source.values()),
+            'skipped': skipped,
+            'skipped_per_hour': round(skipped / hours, 1),
+            'by_source': by_source,
+        }
+    
+    def _cache_get(self, domain: str) -> Optional[Dict]:
+        """Cached snapshot for a domain (None on miss or expiry)"""
+        with self._cache_lock:
+            entry = self._cache.get(domain)
+            if entry is not None:
+                data, cached_at = entry
+                if time.time() - cached_at <= self.cache_ttl:
+                    self._cache.move_to_end(domain)
+                    self._cache_counters['hits'] += 1
+                    return data
+                del self._cache[domain]
+                self._cache_counters['expirations'] += 1
+            self._cache_counters['misses'] += 1
+        return None
+    
+    def _cache_put(self, domain: str, data: Dict):
+        """Store a snapshot, evicting least recently used domains over cache_size"""
+        with self._cache_lock:
+            self._cache[domain] = (data, time.time())
+            self._cache.move_to_end(domain)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self._cache_counters['evictions'] += 1
+    
+    def _check_invalidation(self):
+        """
+        Drop cached domains whose row changed since the last check
+        
+        One indexed range query on last_updated, at most every
+        invalidation_interval seconds; picks up flags such as always_blocked
+        written by other workers.
+        """
+        now = time.time()
+        if now - self._last_invalidation_check < self.invalidation_interval:
+            return
+        if not self._invalidation_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_invalidation_check = now
+            check_started = datetime.utcnow()
+            since = self._invalidation_watermark - timedelta(seconds=self.INVALIDATION_SLACK_SECONDS)
+            rows = self._connect().execute(
+                "SELECT domain, last_updated, always_blocked, sso_only FROM domain_memory WHERE last_updated > ?",
+                (since.isoformat(),)
+            ).fetchall()
+            self._invalidation_watermark = check_started
+            
+            for row in rows:
+                self._note_skip_flags(row['domain'], row['always_blocked'], row['sso_only'])
+            
+            with self._cache_lock:
+                for row in rows:
+                    entry = self._cache.get(row['domain'])
+                    if entry is not None and entry[0].get('last_updated') != row['last_updated']:
+                        del self._cache[row['domain']]
+                        self._cache_counters['invalidations'] += 1
+        except Exception as e:
+            logger.debug(f"Domain memory invalidation check failed: {e}")
+        finally:
+            self._invalidation_lock.release()
+    
+    def get_cache_stats(self) -> Dict:
+        """Get cache hit/miss/eviction counters"""
+        with self._cache_lock:
+            stats = dict(self._cache_counters)
+            stats['size'] = len(self._cache)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['max_size'] = self.cache_size
+        stats['ttl_seconds'] = self.cache_ttl
+        return stats
+    
     def clear_cache(self):
         """Clear in-memory cache"""
         with self._cache_lock:
@@ -368,6 +873,13 @@ def get_domain_memory(db_path: str = "domain_memory.db", enable_cache: bool = Tr
     """Get global domain memory instance"""
     global _domain_memory
     if _domain_memory is None:
-        _domain_memory = DomainMemory(db_path=db_path, enable_cache=enable_cache)
+        _domain_memory = DomainMemory(
+            db_path=db_path,
+            enable_cache=enable_cache,
+            write_behind=os.getenv('DOMAIN_MEMORY_WRITE_BEHIND', 'true').lower() == 'true',
+            flush_interval=float(os.getenv('DOMAIN_MEMORY_FLUSH_INTERVAL', '1.0')),
+            cache_size=int(os.getenv('DOMAIN_MEMORY_CACHE_SIZE', '10000')),
+            cache_ttl=float(os.getenv('DOMAIN_MEMORY_CACHE_TTL', '300')),
+            invalidation_interval=float(os.getenv('DOMAIN_MEMORY_INVALIDATION_INTERVAL', '2.0')),
+        )
     return _domain_memory
-
@@ -0,0 +1,211 @@
+"""
+Task Duration Estimator
+
+Expected execution time per (task type, domain) as an exponentially weighted
+moving average of the execution_time values AutomationLogger records. Used to
+run short tasks first (email confirmation clicks before multi-minute profile
+registrations), either as the cost in the fair scheduler or as plain
+shortest-expected-job-first ordering.
+
+Estimates fall back from (type, domain) to the task type to a global default;
+a domain with few samples is blended with its type's estimate. State and the
+history file offset are saved to JSON, so a restart resumes where it stopped.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from core.domain_memory import domain_from_url, normalize_domain, task_target_url
+from core.outcome_history import OutcomeHistoryTail, default_history_path
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DurationEstimatorConfig:
+    """Duration estimator configuration"""
+    history_path: str = 'logs/automation_logs.jsonl'
+    state_path: Optional[str] = 'logs/duration_estimates.json'
+    alpha: float = 0.3  # Weight of the newest sample
+    default_seconds: float = 120.0  # Estimate for a task type with no history
+    domain_min_samples: int = 3  # Samples before a domain's own EWMA outweighs its type's
+    max_domains: int = 20000  # Least recently updated domains are dropped beyond this
+    refresh_interval: float = 60.0  # Seconds between history re-reads
+
+    @classmethod
+    def from_env(cls) -> 'DurationEstimatorConfig':
+        """Build config from DURATION_ESTIMATOR_* environment variables"""
+        history_path = os.getenv('DURATION_ESTIMATOR_HISTORY_PATH') or default_history_path()
+        return cls(
+            history_path=history_path,
+            state_path=os.getenv('DURATION_ESTIMATOR_STATE_PATH') or os.path.join(
+                os.path.dirname(history_path), 'duration_estimates.json'),
+            alpha=float(os.getenv('DURATION_ESTIMATOR_ALPHA', '0.3')),
+            default_seconds=float(os.getenv('DURATION_ESTIMATOR_DEFAULT_SECONDS', '120')),
+            refresh_interval=float(os.getenv('DURATION_ESTIMATOR_REFRESH_INTERVAL', '60')),
+        )
+
+
+@dataclass
+class EWMA:
+    """Exponentially weighted moving average of task durations"""
+    value: float = 0.0
+    samples: int = 0
+    updated_at: float = field(default_factory=time.time)
+
+    def update(self, seconds: float, alpha: float):
+        self.value = seconds if self.samples == 0 else alpha * seconds + (1 - alpha) * self.value
+        self.samples += 1
+        self.updated_at = time.time()
+
+
+def task_domain(task: Dict) -> Optional[str]:
+    """Domain of the page a claimed task will open (see task_target_url)"""
+    return normalize_domain(domain_from_url(task_target_url(task)))
+
+
+class DurationEstimator:
+    """
+    EWMA duration estimates per task type and per (task type, domain).
+
+    Call observe() for each finished task (refresh() does it for new
+    automation_logs.jsonl entries), estimate() / order() to use them.
+    """
+
+    def __init__(self, config: Optional[DurationEstimatorConfig] = None):
+        self.config = config or DurationEstimatorConfig.from_env()
+        self._lock = threading.Lock()
+        self._by_type: Dict[str, EWMA] = {}
+        self._by_domain: Dict[Tuple[str, str], EWMA] = {}
+        self._observed = 0
+        self._last_refresh = float('-inf')
+
+        offset = self._load()
+        self._history = OutcomeHistoryTail(self.config.history_path, offset=offset)
+
+    def observe(self, task_type: str, domain: Optional[str], seconds: Optional[float]):
+        """Fold one execution time into the estimates"""
+        if not task_type or seconds is None or seconds < 0:
+            return
+        with self._lock:
+            self._observe(task_type, normalize_domain(domain), float(seconds))
+
+    def _observe(self, task_type: str, domain: Optional[str], seconds: float):
+        """observe() with the lock held"""
+        self._by_type.setdefault(task_type, EWMA()).update(seconds, self.config.alpha)
+        if domain:
+            self._by_domain.setdefault((task_type, domain), EWMA()).update(seconds, self.config.alpha)
+        self._observed += 1
+
+    def refresh(self, force: bool = False):
+        """Observe outcomes appended to the history file, then save the state"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.config.refresh_interval:
+                return
+            self._last_refresh = now
+
+            entries, _ = self._history.read_new()
+            for entry in entries:
+                task_type = entry.get('action_attempted')
+                seconds = entry.get('execution_time')
+                if task_type and task_type != 'unknown' and seconds is not None:
+                    self._observe(task_type, normalize_domain(entry.get('domain')), float(seconds))
+            if entries:
+                self._trim()
+                self._save()
+
+    def estimate(self, task_type: str, domain: Optional[str] = None) -> float:
+        """Expected seconds for a task of this type on this domain"""
+        with self._lock:
+            return self._estimate(task_type, normalize_domain(domain))
+
+    def _estimate(self, task_type: str, domain: Optional[str]) -> float:
+        """estimate() with the lock held"""
+        type_ewma = self._by_type.get(task_type)
+        type_estimate = type_ewma.value if type_ewma else self.config.default_seconds
+        domain_ewma = self._by_domain.get((task_type, domain)) if domain else None
+        if domain_ewma is None:
+            return type_estimate
+        # Few samples: lean on the type's estimate
+        weight = domain_ewma.samples / (domain_ewma.samples + self.config.domain_min_samples)
+        return weight * domain_ewma.value + (1 - weight) * type_estimate
+
+    def task_estimate(self, task: Dict) -> float:
+        """Expected seconds for a claimed task"""
+        return self.estimate(task.get('type'), task_domain(task))
+
+    def order(self, tasks: List[Dict]) -> List[Dict]:
+        """Shortest expected job first (ties keep claim order)"""
+        self.refresh()
+        estimates = [self.task_estimate(task) for task in tasks]
+        ranked = sorted(range(len(tasks)), key=lambda i: (estimates[i], i))
+        return [tasks[i] for i in ranked]
+
+    def _trim(self):
+        """Drop the least recently updated domains beyond max_domains (lock held)"""
+        excess = len(self._by_domain) - self.config.max_domains
+        if excess > 0:
+            oldest = sorted(self._by_domain, key=lambda key: self._by_domain[key].updated_at)[:excess]
+            for key in oldest:
+                del self._by_domain[key]
+
+    def _save(self):
+        """Write estimates and the history offset to state_path (lock held)"""
+        if not self.config.state_path:
+            return
+        state = {
+            'history_offset': self._history.offset,
+            'by_type': {task_type: asdict(ewma) for task_type, ewma in self._by_type.items()},
+            'by_domain': [
+                {'type': task_type, 'domain': domain, **asdict(ewma)}
+                for (task_type, domain), ewma in self._by_domain.items()
+            ],
+        }
+        tmp_path = f"{self.config.state_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.config.state_path) or '.', exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.config.state_path)
+        except OSError as e:
+            logger.warning(f"Failed to save duration estimates to {self.config.state_path}: {e}")
+
+    def _load(self) -> Optional[int]:
+        """Load saved estimates; returns the saved history offset (None: start fresh)"""
+        path = self.config.state_path
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            by_type = {task_type: EWMA(**ewma) for task_type, ewma in state.get('by_type', {}).items()}
+            by_domain = {}
+            for item in state.get('by_domain', []):
+                item = dict(item)
+                key = (item.pop('type'), item.pop('domain'))
+                by_domain[key] = EWMA(**item)
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable duration estimates {path}: {e}")
+            return None
+
+        self._by_type, self._by_domain = by_type, by_domain
+        logger.info(f"Loaded duration estimates for {len(by_type)} task types, {len(by_domain)} domains")
+        return state.get('history_offset')
+
+    def get_stats(self) -> Dict:
+        """Per-type estimates and sample counts"""
+        with self._lock:
+            return {
+                'observed': self._observed,
+                'domains': len(self._by_domain),
+                'by_type': {
+                    task_type: {'expected_seconds': round(ewma.value, 1), 'samples': ewma.samples}
+                    for task_type, ewma in self._by_type.items()
+                },
+            }
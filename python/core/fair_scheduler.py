@@ -0,0 +1,260 @@
+"""
+Weighted Fair Task Scheduler
+
+Keeps a large backlog of one task type (usually comments) from starving the
+others, while favouring the work that yields the most backlinks:
+
+- type_weights() tells /api/tasks/claim how to split each batch between task
+  types. A type's weight is its expected successful backlinks per
+  browser-minute (success rate / expected duration); every type keeps at
+  least min_share of the batch.
+- order() sorts a claimed batch with weighted fair queuing over flows
+  (task type, campaign), so no type or campaign monopolises the slots.
+
+Success rates and durations come from automation_logs.jsonl (the
+AutomationLogger history), re-read incrementally every refresh_interval, so
+outcomes of this worker's own tasks feed back in. Types and campaigns with
+little history are shrunk towards the overall averages.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from core.outcome_history import OutcomeHistoryTail, default_history_path
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FairSchedulerConfig:
+    """Fair scheduler configuration"""
+    history_path: str = 'logs/automation_logs.jsonl'
+    history_window: int = 5000  # Most recent outcomes used for the estimates
+    refresh_interval: float = 60.0  # Seconds between history re-reads
+    min_share: float = 0.1  # Smallest batch share of any task type
+    prior_weight: float = 10.0  # Pseudo-outcomes pulling sparse types/campaigns to the average
+    default_duration: float = 120.0  # Expected seconds per task with no history at all
+    default_success_rate: float = 0.3
+
+    @classmethod
+    def from_env(cls) -> 'FairSchedulerConfig':
+        """Build config from FAIR_SCHEDULER_* environment variables"""
+        return cls(
+            history_path=os.getenv('FAIR_SCHEDULER_HISTORY_PATH') or default_history_path(),
+            history_window=int(os.getenv('FAIR_SCHEDULER_WINDOW', '5000')),
+            refresh_interval=float(os.getenv('FAIR_SCHEDULER_REFRESH_INTERVAL', '60')),
+            min_share=float(os.getenv('FAIR_SCHEDULER_MIN_SHARE', '0.1')),
+        )
+
+
+@dataclass
+class FlowStats:
+    """Outcome tallies for a task type or (type, campaign)"""
+    attempts: int = 0
+    successes: int = 0
+    timed: int = 0  # Attempts with an execution time
+    seconds: float = 0.0
+
+    def add(self, success: bool, seconds: Optional[float], sign: int = 1):
+        self.attempts += sign
+        self.successes += sign if success else 0
+        if seconds is not None:
+            self.timed += sign
+            self.seconds += sign * seconds
+
+    def success_rate(self, prior_rate: float, prior_weight: float) -> float:
+        return (self.successes + prior_weight * prior_rate) / (self.attempts + prior_weight)
+
+    def expected_seconds(self, prior_seconds: float, prior_weight: float) -> float:
+        return (self.seconds + prior_weight * prior_seconds) / (self.timed + prior_weight)
+
+
+class WeightedFairScheduler:
+    """
+    Batch split and ordering of tasks across task types and campaigns.
+
+    Use type_weights() for the claim request, order() on the claimed batch
+    and get_stats() for the per-type estimates and overall throughput.
+    """
+
+    def __init__(self, task_types: List[str], config: Optional[FairSchedulerConfig] = None,
+                 duration_estimator=None):
+        """
+        Args:
+            task_types: Task types this worker can run
+            config: Scheduler config (default: from environment)
+            duration_estimator: DurationEstimator for per-domain task costs in order()
+                                (default: the flow's mean duration)
+        """
+        self.task_types = list(task_types)
+        self.config = config or FairSchedulerConfig.from_env()
+        self.duration_estimator = duration_estimator
+
+        self._lock = threading.Lock()
+        self._window: Deque[Tuple[str, Optional[int], bool, Optional[float]]] = deque()
+        self._by_type: Dict[str, FlowStats] = {}
+        self._by_flow: Dict[Tuple[str, Optional[int]], FlowStats] = {}
+        self._total = FlowStats()
+        self._history = OutcomeHistoryTail(self.config.history_path)
+        self._last_refresh = float('-inf')
+
+        # WFQ state: virtual clock and the last finish tag per flow
+        self._virtual_time = 0.0
+        self._last_finish: Dict[Tuple[str, Optional[int]], float] = {}
+
+    def _refresh(self):
+        """Add outcomes appended to the history file since the last refresh (lock held)"""
+        now = time.monotonic()
+        if now - self._last_refresh < self.config.refresh_interval:
+            return
+        self._last_refresh = now
+
+        entries, restarted = self._history.read_new()
+        if restarted:
+            self._reset_history()
+        for entry in entries:
+            task_type = entry.get('action_attempted')
+            if not task_type or task_type == 'unknown':
+                continue
+            self._add_outcome(task_type, entry.get('campaign_id'), entry.get('result') == 'success',
+                              entry.get('execution_time'))
+
+    def _reset_history(self):
+        self._window.clear()
+        self._by_type.clear()
+        self._by_flow.clear()
+        self._total = FlowStats()
+
+    def _add_outcome(self, task_type: str, campaign_id: Optional[int], success: bool,
+                     seconds: Optional[float]):
+        """Add an outcome to the sliding window (lock held)"""
+        if len(self._window) >= self.config.history_window:
+            self._tally(*self._window.popleft(), sign=-1)
+        outcome = (task_type, campaign_id, success, seconds)
+        self._window.append(outcome)
+        self._tally(*outcome, sign=1)
+
+    def _tally(self, task_type, campaign_id, success, seconds, sign):
+        self._by_type.setdefault(task_type, FlowStats()).add(success, seconds, sign)
+        self._by_flow.setdefault((task_type, campaign_id), FlowStats()).add(success, seconds, sign)
+        self._total.add(success, seconds, sign)
+
+    def _overall(self) -> Tuple[float, float]:
+        """Overall (success rate, expected seconds), falling back to the defaults"""
+        rate = self._total.success_rate(self.config.default_success_rate, self.config.prior_weight)
+        seconds = self._total.expected_seconds(self.config.default_duration, self.config.prior_weight)
+        return rate, seconds
+
+    def _type_estimate(self, task_type: str) -> Tuple[float, float]:
+        """(success rate, expected seconds) for a task type (lock held)"""
+        rate, seconds = self._overall()
+        stats = self._by_type.get(task_type)
+        if stats is None:
+            return rate, seconds
+        return (stats.success_rate(rate, self.config.prior_weight),
+                stats.expected_seconds(seconds, self.config.prior_weight))
+
+    def _flow_estimate(self, flow: Tuple[str, Optional[int]]) -> Tuple[float, float]:
+        """(success rate, expected seconds) for a (type, campaign) flow (lock held)"""
+        rate, seconds = self._type_estimate(flow[0])
+        stats = self._by_flow.get(flow)
+        if stats is None:
+            return rate, seconds
+        return (stats.success_rate(rate, self.config.prior_weight),
+                stats.expected_seconds(seconds, self.config.prior_weight))
+
+    def _weights(self) -> Dict[str, float]:
+        """Normalised type weights with the min_share floor (lock held)"""
+        values = {}
+        for task_type in self.task_types:
+            rate, seconds = self._type_estimate(task_type)
+            values[task_type] = rate / max(seconds / 60.0, 1e-3)
+        min_share = min(self.config.min_share, 1.0 / max(len(values), 1))
+        floored = set()
+        while True:
+            # Types below the floor get exactly min_share; the rest split what's left
+            free = 1.0 - min_share * len(floored)
+            rest = sum(v for t, v in values.items() if t not in floored) or 1.0
+            shares = {t: min_share if t in floored else free * v / rest for t, v in values.items()}
+            below = {t for t, share in shares.items() if share < min_share} - floored
+            if not below:
+                return shares
+            floored |= below
+
+    def type_weights(self) -> Dict[str, float]:
+        """Batch share per task type for the claim request"""
+        with self._lock:
+            self._refresh()
+            return {t: round(w, 4) for t, w in self._weights().items()}
+
+    def order(self, tasks: List[Dict]) -> List[Dict]:
+        """
+        Order a claimed batch by weighted fair queuing
+
+        Each task gets a finish tag: start (the later of the virtual clock and
+        its flow's previous finish) plus expected duration / flow weight, so
+        short tasks run first unless their flow already had its share.
+        Tasks run in finish-tag order; flow state carries over between batches.
+        """
+        if len(tasks) < 2:
+            return list(tasks)
+
+        costs = None
+        if self.duration_estimator is not None:
+            self.duration_estimator.refresh()
+            costs = [self.duration_estimator.task_estimate(task) for task in tasks]
+
+        with self._lock:
+            self._refresh()
+            weights = self._weights()
+            tagged = []
+            for index, task in enumerate(tasks):
+                flow = (task.get('type'), task.get('campaign_id'))
+                rate, seconds = self._flow_estimate(flow)
+                type_rate, type_seconds = self._type_estimate(flow[0])
+                # Campaigns doing better than their type get a larger share, within 4x either way
+                campaign_factor = (rate / seconds) / max(type_rate / type_seconds, 1e-9)
+                weight = weights.get(flow[0], self.config.min_share) * min(max(campaign_factor, 0.25), 4.0)
+
+                cost = costs[index] if costs else seconds
+                start = max(self._virtual_time, self._last_finish.get(flow, 0.0))
+                finish = start + cost / weight
+                self._last_finish[flow] = finish
+                tagged.append((finish, index, start, task))
+
+            tagged.sort(key=lambda item: (item[0], item[1]))
+            self._virtual_time = max(self._virtual_time, tagged[-1][2])
+            # Flows that finished before the clock behave like new flows anyway
+            self._last_finish = {f: t for f, t in self._last_finish.items() if t > self._virtual_time}
+            return [task for _, _, _, task in tagged]
+
+    def get_stats(self) -> Dict:
+        """Per-type estimates, weights and successful backlinks per browser-minute"""
+        with self._lock:
+            self._refresh()
+            weights = self._weights()
+            by_type = {}
+            for task_type in self.task_types:
+                rate, seconds = self._type_estimate(task_type)
+                stats = self._by_type.get(task_type, FlowStats())
+                by_type[task_type] = {
+                    'outcomes': stats.attempts,
+                    'success_rate': round(rate, 3),
+                    'expected_seconds': round(seconds, 1),
+                    'successes_per_browser_minute': round(rate / max(seconds / 60.0, 1e-3), 3),
+                    'weight': round(weights[task_type], 3),
+                }
+            total = self._total
+            browser_minutes = total.seconds / 60.0
+            return {
+                'outcomes': total.attempts,
+                'successes_per_browser_minute': (
+                    round(total.successes / browser_minutes, 3) if browser_minutes > 0 else None
+                ),
+                'by_type': by_type,
+            }
@@ -5,6 +5,7 @@ Maps varied form fields to standard roles using heuristics
 """
 
 import re
+import time
 import logging
 from typing import Dict, List, Optional, Tuple
 from playwright.sync_api import Page, Locator, Frame
@@ -87,6 +88,56 @@ class FieldRoleMatcher:
     # Minimum confidence threshold
     MIN_CONFIDENCE = 0.60
     
+    # Collects everything _score_candidate needs for every field in one
+    # evaluate_all call. Label and nearby-text lookups mirror _find_label_text
+    # and _find_nearby_text; visibility follows Playwright's definition.
+    FIELD_SCAN_SCRIPT = """
+    (fields) => {
+        const started = performance.now();
+        const textOf = (el) => (el && el.innerText) || '';
+        const xpathFirst = (expr, el) => document.evaluate(
+            expr, el, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        const labelText = (el) => {
+            if (el.id) {
+                const label = Array.from(document.querySelectorAll('label')).find(
+                    (l) => l.getAttribute('for') === el.id);
+                if (label) return textOf(label);
+            }
+            const parent = xpathFirst('ancestor::label[1]', el);
+            if (parent) return textOf(parent);
+            const preceding = xpathFirst('preceding::label[1]', el);
+            if (preceding) return textOf(preceding);
+            return null;
+        };
+        const nearbyText = (el) => {
+            const parentText = textOf(el.parentElement);
+            if (parentText) return parentText.slice(0, 100);
+            const siblingText = textOf(el.previousElementSibling);
+            if (siblingText) return siblingText.slice(0, 100);
+            return null;
+        };
+        const isVisible = (el) => {
+            const rect = el.getBoundingClientRect();
+            if (rect.width <= 0 || rect.height <= 0) return false;
+            return window.getComputedStyle(el).visibility !== 'hidden';
+        };
+
+        const result = fields.map((el, index) => ({
+            index,
+            visible: isVisible(el),
+            type: el.getAttribute('type') || '',
+            tag_name: el.tagName.toLowerCase(),
+            name: el.getAttribute('name') || '',
+            id: el.getAttribute('id') || '',
+            placeholder: el.getAttribute('placeholder') || '',
+            autocomplete: el.getAttribute('autocomplete') || '',
+            label_text: labelText(el),
+            nearby_text: nearbyText(el),
+        }));
+        return { fields: result, scan_ms: performance.now() - started };
+    }
+    """
+    
     @classmethod
     def match_fields(
         cls,
@@ -123,7 +174,9 @@ class FieldRoleMatcher:
         
         if task_id:
             log_step(task_id, f'{log_prefix}_candidates_extracted', {
-                'count': len(candidates)
+                'count': len(candidates),
+                'method': candidates[0].get('extraction', 'legacy'),
+                'extraction_ms': candidates[0].get('extraction_ms')
             })
         
         # Score each candidate for each role
@@ -174,7 +227,56 @@ class FieldRoleMatcher:
         task_id: Optional[int],
         log_prefix: str
     ) -> List[Dict]:
-        """Extract candidate form fields"""
+        """
+        Extract candidate form fields
+        
+        Reads every field's attributes, label text, nearby text and visibility
+        in one evaluate_all round-trip; falls back to per-field calls if the
+        bulk scan cannot run.
+        """
+        try:
+            return cls._extract_candidates_bulk(page, form_locator)
+        except Exception as e:
+            logger.debug(f"Bulk field extraction failed, using per-field calls: {e}")
+            return cls._extract_candidates_legacy(page, form_locator, task_id, log_prefix)
+    
+    @classmethod
+    def _extract_candidates_bulk(
+        cls,
+        page: Page,
+        form_locator: Optional[Locator]
+    ) -> List[Dict]:
+        """Extract visible candidate fields with a single FIELD_SCAN_SCRIPT call"""
+        start = time.time()
+        search_context = form_locator if form_locator else page
+        inputs = search_context.locator('input, textarea, select')
+        
+        scan = inputs.evaluate_all(cls.FIELD_SCAN_SCRIPT)
+        extraction_ms = round((time.time() - start) * 1000, 1)
+        
+        candidates = []
+        for field in scan['fields']:
+            if not field.pop('visible'):
+                continue
+            field['locator'] = inputs.nth(field['index'])
+            field['extraction'] = 'bulk'
+            field['extraction_ms'] = extraction_ms
+            candidates.append(field)
+        
+        logger.debug(f"Bulk field scan: {len(scan['fields'])} fields, {len(candidates)} visible "
+                     f"in {extraction_ms}ms (in-page {scan.get('scan_ms', 0):.1f}ms)")
+        return candidates
+    
+    @classmethod
+    def _extract_candidates_legacy(
+        cls,
+        page: Page,
+        form_locator: Optional[Locator],
+        task_id: Optional[int],
+        log_prefix: str
+    ) -> List[Dict]:
+        """Extract candidate form fields with per-field Playwright calls (slow)"""
+        start = time.time()
         candidates = []
         
         try:
@@ -221,6 +323,11 @@ class FieldRoleMatcher:
         except Exception as e:
             logger.error(f"Error extracting candidates: {e}")
         
+        extraction_ms = round((time.time() - start) * 1000, 1)
+        for candidate in candidates:
+            candidate['extraction'] = 'legacy'
+            candidate['extraction_ms'] = extraction_ms
+        
         return candidates
     
     @classmethod
@@ -292,7 +399,9 @@ class FieldRoleMatcher:
         
         # Heuristic 7: Label/placeholder tokens (try to find label)
         try:
-            label_text = cls._find_label_text(candidate['locator'], page, form_locator)
+            if 'label_text' not in candidate:
+                candidate['label_text'] = cls._find_label_text(candidate['locator'], page, form_locator)
+            label_text = candidate['label_text']
             if label_text:
                 label_lower = label_text.lower()
                 for token in role_patterns.get('label_tokens', []):
@@ -305,7 +414,9 @@ class FieldRoleMatcher:
         
         # Heuristic 8: Nearby text
         try:
-            nearby_text = cls._find_nearby_text(candidate['locator'], page, form_locator)
+            if 'nearby_text' not in candidate:
+                candidate['nearby_text'] = cls._find_nearby_text(candidate['locator'], page, form_locator)
+            nearby_text = candidate['nearby_text']
             if nearby_text:
                 nearby_lower = nearby_text.lower()
                 for token in role_patterns.get('nearby_text', []):
@@ -7,6 +7,7 @@ Falls back through multiple strategies before failing
 
 import logging
 import re
+import time
 from typing import Dict, List, Optional, Tuple, Any, Callable
 from playwright.sync_api import Page, Locator, FrameLocator
 from core.iframe_router import IframeRouter
@@ -19,23 +20,36 @@ logger = logging.getLogger(__name__)
 class LocatorCandidate:
     """Represents a locator candidate with metadata"""
     
-    def __init__(self, locator: Locator, confidence: float, strategy: str, 
-                 why: str, frame_context: Optional[Any] = None):
+    def __init__(self, locator: Optional[Locator], confidence: float, strategy: str, 
+                 why: str, frame_context: Optional[Any] = None,
+                 locator_factory: Optional[Callable[[], Locator]] = None,
+                 enabled: bool = True):
         """
         Initialize locator candidate
         
         Args:
-            locator: Playwright Locator
+            locator: Playwright Locator (None if built lazily by locator_factory)
             confidence: Confidence score (0.0-1.0)
             strategy: Strategy name
             why: Explanation of why this candidate was chosen
             frame_context: Frame context if found in iframe
+            locator_factory: Builds the Locator on first access (batched resolution)
+            enabled: Whether the matched element is enabled
         """
-        self.locator = locator
+        self._locator = locator
+        self._locator_factory = locator_factory
         self.confidence = confidence
         self.strategy = strategy
         self.why = why
         self.frame_context = frame_context
+        self.enabled = enabled
+    
+    @property
+    def locator(self) -> Optional[Locator]:
+        """Playwright Locator for this candidate (built on first access)"""
+        if self._locator is None and self._locator_factory is not None:
+            self._locator = self._locator_factory()
+        return self._locator
     
     def to_dict(self) -> Dict:
         """Convert to dictionary"""
@@ -44,6 +58,7 @@ class LocatorCandidate:
             'confidence': self.confidence,
             'why': self.why,
             'frame_context': self.frame_context is not None,
+            'enabled': self.enabled,
         }
 
 
@@ -67,6 +82,149 @@ class LocatorEngine:
         'radio': 'radio',
     }
     
+    # Confidence per strategy (highest first = strategy order)
+    STRATEGY_CONFIDENCE = {
+        'get_by_role': 0.95,
+        'label_placeholder': 0.85,
+        'visible_text': 0.75,
+        'stable_attrs': 0.70,
+        'css_xpath': 0.60,
+    }
+    XPATH_FALLBACK_CONFIDENCE = 0.55
+    
+    # Resolves every candidate probe in one in-page pass. Each probe is the
+    # in-page equivalent of a Playwright selector (see _candidate_specs); the
+    # result reports match count plus visibility/enabled state of the first
+    # match, mirroring locator.first.is_visible() / is_enabled().
+    PROBE_SCRIPT = """
+    (probes) => {
+        const started = performance.now();
+        const norm = (s) => (s || '').replace(/\\s+/g, ' ').trim();
+        const textCache = new Map();
+        const textOf = (el) => {
+            if (!textCache.has(el)) textCache.set(el, norm(el.textContent));
+            return textCache.get(el);
+        };
+        const matcher = (probe) => {
+            if (probe.pattern !== undefined && probe.pattern !== null) {
+                let re = null;
+                try { re = new RegExp(probe.pattern, 'i'); } catch (e) { return () => false; }
+                return (s) => re.test(s);
+            }
+            const needle = norm(probe.text).toLowerCase();
+            return (s) => s.toLowerCase().includes(needle);
+        };
+        const inDocumentOrder = (elements) => Array.from(new Set(elements)).sort(
+            (a, b) => (a.compareDocumentPosition(b) & Node.DOCUMENT_POSITION_FOLLOWING) ? -1 : 1);
+
+        const IMPLICIT_ROLES = {
+            button: 'button, input[type="button" i], input[type="submit" i], input[type="reset" i], input[type="image" i]',
+            link: 'a[href], area[href]',
+            textbox: 'textarea, input:not([type]), input[type="text" i], input[type="email" i], input[type="tel" i], input[type="url" i]',
+            searchbox: 'input[type="search" i]',
+            checkbox: 'input[type="checkbox" i]',
+            radio: 'input[type="radio" i]',
+            form: 'form',
+        };
+        const roleOf = (el, role) => {
+            const explicit = (el.getAttribute('role') || '').trim().split(/\\s+/)[0];
+            return explicit ? explicit === role : true;
+        };
+        const nameOf = (el) => {
+            const labelledBy = el.getAttribute('aria-labelledby');
+            if (labelledBy) {
+                const text = norm(labelledBy.split(/\\s+/)
+                    .map((id) => document.getElementById(id))
+                    .filter(Boolean).map((n) => n.textContent).join(' '));
+                if (text) return text;
+            }
+            const ariaLabel = norm(el.getAttribute('aria-label'));
+            if (ariaLabel) return ariaLabel;
+            const tag = el.tagName;
+            if (tag === 'INPUT' || tag === 'TEXTAREA' || tag === 'SELECT') {
+                const type = (el.getAttribute('type') || '').toLowerCase();
+                if (type === 'submit' || type === 'reset' || type === 'button') {
+                    return norm(el.value) || (type === 'submit' ? 'Submit' : type === 'reset' ? 'Reset' : '');
+                }
+                if (type === 'image') return norm(el.getAttribute('alt')) || 'Submit';
+                const labels = el.labels ? norm(Array.from(el.labels).map((l) => l.textContent).join(' ')) : '';
+                return labels || norm(el.getAttribute('title')) || norm(el.getAttribute('placeholder'));
+            }
+            if (tag === 'FORM') return norm(el.getAttribute('title'));
+            return textOf(el) || norm(el.getAttribute('title'));
+        };
+
+        const query = (selector, root) => Array.from((root || document).querySelectorAll(selector));
+        const resolve = (probe) => {
+            switch (probe.kind) {
+                case 'css':
+                    return query(probe.css);
+                case 'has_text': {
+                    const match = matcher(probe);
+                    return query(probe.css).filter((el) => match(textOf(el)));
+                }
+                case 'label_sibling': {
+                    const match = matcher(probe);
+                    const found = [];
+                    for (const label of query('label').filter((el) => match(textOf(el)))) {
+                        for (let n = label.nextElementSibling; n; n = n.nextElementSibling) {
+                            if (n.matches(probe.css)) found.push(n);
+                        }
+                    }
+                    return inDocumentOrder(found);
+                }
+                case 'text': {
+                    // Smallest elements containing the text (Playwright text= engine)
+                    const match = matcher(probe);
+                    const hits = new Set(query('body, body *')
+                        .filter((el) => !['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE'].includes(el.tagName))
+                        .filter((el) => match(textOf(el))));
+                    return Array.from(hits).filter(
+                        (el) => !Array.from(el.children).some((child) => hits.has(child)));
+                }
+                case 'role': {
+                    const pattern = new RegExp(probe.pattern, 'i');
+                    const implicit = IMPLICIT_ROLES[probe.role];
+                    const selector = implicit ? `${implicit}, [role~="${probe.role}"]` : `[role~="${probe.role}"]`;
+                    return query(selector).filter((el) => roleOf(el, probe.role) && pattern.test(nameOf(el)));
+                }
+                case 'xpath': {
+                    const snapshot = document.evaluate(
+                        probe.xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+                    const found = [];
+                    for (let i = 0; i < snapshot.snapshotLength; i++) {
+                        const node = snapshot.snapshotItem(i);
+                        if (node.nodeType === Node.ELEMENT_NODE) found.push(node);
+                    }
+                    return found;
+                }
+                default:
+                    throw new Error(`unknown probe kind ${probe.kind}`);
+            }
+        };
+        const isVisible = (el) => {
+            const rect = el.getBoundingClientRect();
+            if (rect.width <= 0 || rect.height <= 0) return false;
+            return window.getComputedStyle(el).visibility !== 'hidden';
+        };
+        const isEnabled = (el) => {
+            if (el.getAttribute('aria-disabled') === 'true') return false;
+            try { return !el.matches(':disabled'); } catch (e) { return true; }
+        };
+
+        const results = probes.map((probe) => {
+            try {
+                const found = resolve(probe);
+                if (!found.length) return { count: 0, visible: false, enabled: false };
+                return { count: found.length, visible: isVisible(found[0]), enabled: isEnabled(found[0]) };
+            } catch (e) {
+                return { count: 0, visible: false, enabled: false, error: String(e) };
+            }
+        });
+        return { results, scan_ms: performance.now() - started };
+    }
+    """
+    
     @classmethod
     def find(
         cls,
@@ -80,6 +238,10 @@ class LocatorEngine:
         """
         Find element using ranked strategies
         
+        Candidates from every strategy are resolved in one in-page pass per
+        frame (see PROBE_SCRIPT); if that cannot run, each candidate is probed
+        with Playwright calls instead.
+        
         Args:
             page: Playwright Page object
             target_role: Target role (button, input, form, textarea, etc.)
@@ -104,11 +266,17 @@ class LocatorEngine:
             })
         
         # Generate candidates
-        candidates = cls._generate_candidates(page, target_role, keywords, context, task_id, log_prefix)
+        resolution = 'batched'
+        try:
+            candidates = cls._generate_candidates_batched(page, target_role, keywords, task_id, log_prefix)
+        except Exception as e:
+            logger.debug(f"Batched locator resolution failed, probing candidates one by one: {e}")
+            resolution = 'legacy'
+            candidates = cls._generate_candidates(page, target_role, keywords, context, task_id, log_prefix)
         
         if not candidates:
             if task_id:
-                log_step(task_id, f'{log_prefix}_no_candidates')
+                log_step(task_id, f'{log_prefix}_no_candidates', {'resolution': resolution})
             return None, None, []
         
         # Sort by confidence (highest first)
@@ -117,7 +285,8 @@ class LocatorEngine:
         if task_id:
             log_step(task_id, f'{log_prefix}_candidates_generated', {
                 'count': len(candidates),
-                'top_confidence': candidates[0].confidence if candidates else 0.0
+                'top_confidence': candidates[0].confidence if candidates else 0.0,
+                'resolution': resolution
             })
         
         # Try top-K candidates
@@ -143,6 +312,28 @@ class LocatorEngine:
                             top_candidates.insert(0, top_candidates.pop(i))
                             break
         
+        def accept(candidate: LocatorCandidate, idx: int):
+            if task_id:
+                log_step(task_id, f'{log_prefix}_found', {
+                    'strategy': candidate.strategy,
+                    'confidence': candidate.confidence,
+                    'why': candidate.why,
+                    'attempt': idx + 1,
+                    'resolution': resolution
+                })
+            
+            # Record successful strategy in domain memory
+            if domain:
+                domain_memory.record_locator_strategy(
+                    domain,
+                    target_role,
+                    candidate.strategy,
+                    True
+                )
+            
+            return candidate.locator, candidate, candidates
+        
+        disabled_fallback = None
         for idx, candidate in enumerate(top_candidates):
             try:
                 # Check budget
@@ -161,29 +352,26 @@ class LocatorEngine:
                         'why': candidate.why
                     })
                 
+                if resolution == 'batched':
+                    # Presence/visibility already known from the in-page pass;
+                    # prefer an enabled element but keep the best disabled one
+                    if candidate.enabled:
+                        return accept(candidate, idx)
+                    if task_id:
+                        log_step(task_id, f'{log_prefix}_candidate_disabled', {
+                            'index': idx,
+                            'strategy': candidate.strategy
+                        })
+                    if disabled_fallback is None:
+                        disabled_fallback = (candidate, idx)
+                    continue
+                
                 # Check if locator exists and is visible
                 if candidate.locator.count() > 0:
                     try:
                         first = candidate.locator.first
                         if first.is_visible(timeout=2000):
-                            if task_id:
-                                log_step(task_id, f'{log_prefix}_found', {
-                                    'strategy': candidate.strategy,
-                                    'confidence': candidate.confidence,
-                                    'why': candidate.why,
-                                    'attempt': idx + 1
-                                })
-                            
-                            # Record successful strategy in domain memory
-                            if domain:
-                                domain_memory.record_locator_strategy(
-                                        domain,
-                                        target_role,
-                                        candidate.strategy,
-                                        True
-                                    )
-                                
-                                return candidate.locator, candidate, candidates
+                            return accept(candidate, idx)
                     except:
                         # Element exists but not visible, try next
                         if task_id:
@@ -208,6 +396,10 @@ class LocatorEngine:
                 logger.debug(f"Candidate {idx} failed: {e}")
                 continue
         
+        if disabled_fallback:
+            # Visible but disabled (e.g. submit enabled once the form is filled)
+            return accept(*disabled_fallback)
+        
         # None of the candidates worked
         if task_id:
             log_step(task_id, f'{log_prefix}_failed', {
@@ -218,412 +410,312 @@ class LocatorEngine:
         return None, None, candidates
     
     @classmethod
-    def _generate_candidates(
+    def _generate_candidates_batched(
         cls,
         page: Page,
         target_role: str,
         keywords: List[str],
-        context: Optional[Dict],
         task_id: Optional[int],
         log_prefix: str
     ) -> List[LocatorCandidate]:
-        """Generate ranked locator candidates"""
-        candidates = []
-        
-        # Normalize target role
-        normalized_role = cls._normalize_role(target_role)
+        """
+        Generate ranked locator candidates with one PROBE_SCRIPT evaluate per frame
         
-        # Strategy 1: getByRole + name matching (highest confidence)
-        candidates.extend(cls._strategy_get_by_role(page, normalized_role, keywords, context, task_id, log_prefix))
+        Same selection rules as _generate_candidates: per strategy and keyword
+        the first selector that is visible (main page before iframes) becomes a
+        candidate. Only the winner's Locator is ever built.
         
-        # Strategy 2: label/placeholder matching
-        candidates.extend(cls._strategy_label_placeholder(page, normalized_role, keywords, context, task_id, log_prefix))
+        Raises:
+            Exception if the main page cannot be evaluated (caller falls back)
+        """
+        from core.telemetry import log_step
         
-        # Strategy 3: visible text matching
-        candidates.extend(cls._strategy_visible_text(page, normalized_role, keywords, context, task_id, log_prefix))
+        role = cls._normalize_role(target_role)
+        specs = cls._candidate_specs(role, keywords)
+        if not specs:
+            return []
+        
+        start = time.time()
+        main_result = page.evaluate(cls.PROBE_SCRIPT, [spec['probe'] for spec in specs])
+        main_hits = [r['visible'] for r in main_result['results']]
+        
+        # A spec needs the iframe pass only if no earlier-or-equal selector of
+        # its group is visible on the main page
+        main_hit_at = {}
+        for idx, spec in enumerate(specs):
+            if main_hits[idx] and spec['group'] not in main_hit_at:
+                main_hit_at[spec['group']] = idx
+        pending = [idx for idx, spec in enumerate(specs)
+                   if idx < main_hit_at.get(spec['group'], len(specs))]
+        
+        frame_hits: Dict[int, Tuple[Any, str, Dict]] = {}
+        frames_scanned = 0
+        if pending:
+            for frame_idx, frame in enumerate(page.frames[1:]):
+                remaining = [idx for idx in pending if idx not in frame_hits]
+                if not remaining:
+                    break
+                try:
+                    frame_result = frame.evaluate(cls.PROBE_SCRIPT, [specs[idx]['probe'] for idx in remaining])
+                except Exception as e:
+                    logger.debug(f"Probe evaluate failed in iframe {frame_idx}: {e}")
+                    continue
+                frames_scanned += 1
+                for idx, result in zip(remaining, frame_result['results']):
+                    if result['visible']:
+                        frame_hits[idx] = (frame, f"iframe_{frame_idx}", result)
         
-        # Strategy 4: stable attributes (aria/name/autocomplete/data-testid)
-        candidates.extend(cls._strategy_stable_attrs(page, normalized_role, keywords, context, task_id, log_prefix))
+        candidates = []
+        resolved_groups = set()
+        for idx, spec in enumerate(specs):
+            group = spec['group']
+            if group in resolved_groups:
+                continue
+            # XPath fallback only applies while the CSS/XPath strategy has nothing
+            if spec['fallback'] and any(c.strategy == spec['strategy'] for c in candidates):
+                continue
+            
+            if main_hits[idx]:
+                ctx, frame, source, result = page, None, 'main', main_result['results'][idx]
+            elif idx in frame_hits:
+                frame, source, result = frame_hits[idx]
+                ctx = frame
+            else:
+                continue
+            
+            resolved_groups.add(group)
+            candidates.append(LocatorCandidate(
+                locator=None,
+                locator_factory=lambda ctx=ctx, spec=spec: cls._build_locator(ctx, spec, role),
+                confidence=spec['confidence'],
+                strategy=spec['strategy'],
+                why=spec['why'].format(source=source),
+                frame_context=frame,
+                enabled=result['enabled']
+            ))
         
-        # Strategy 5: CSS/XPath fallback
-        candidates.extend(cls._strategy_css_xpath(page, normalized_role, keywords, context, task_id, log_prefix))
+        if task_id:
+            log_step(task_id, f'{log_prefix}_batched_probe', {
+                'probes': len(specs),
+                'frames_scanned': frames_scanned,
+                'candidates': len(candidates),
+                'scan_ms': round(main_result.get('scan_ms', 0), 1),
+                'total_ms': round((time.time() - start) * 1000, 1)
+            })
         
         return candidates
     
     @classmethod
-    def _normalize_role(cls, role: str) -> str:
-        """Normalize role to Playwright role"""
-        role_lower = role.lower()
-        return cls.ROLE_MAPPINGS.get(role_lower, role_lower)
-    
-    @classmethod
-    def _strategy_get_by_role(
+    def _generate_candidates(
         cls,
         page: Page,
-        role: str,
+        target_role: str,
         keywords: List[str],
         context: Optional[Dict],
         task_id: Optional[int],
         log_prefix: str
     ) -> List[LocatorCandidate]:
-        """Strategy 1: getByRole + name matching"""
+        """Generate ranked locator candidates by probing each selector (main page, then iframes)"""
         candidates = []
         
-        try:
-            # Try each keyword as name
-            for keyword in keywords:
-                if not keyword:
-                    continue
-                
-                try:
-                    # Use iframe router
-                    def locator_builder(ctx):
-                        if isinstance(ctx, Page):
-                            return ctx.get_by_role(role, name=re.compile(keyword, re.IGNORECASE))
-                        else:  # FrameLocator
-                            return ctx.get_by_role(role, name=re.compile(keyword, re.IGNORECASE))
-                    
-                    locator, frame, source = IframeRouter.find_in_main_or_frames(
-                        page,
-                        locator_builder,
-                        task_id=task_id,
-                        description=f'{log_prefix}_get_by_role'
-                    )
-                    
-                    if locator:
-                        candidates.append(LocatorCandidate(
-                            locator=locator,
-                            confidence=0.95,
-                            strategy='get_by_role',
-                            why=f"getByRole('{role}', name=~'{keyword}') in {source}",
-                            frame_context=frame
-                        ))
-                except Exception as e:
-                    logger.debug(f"getByRole strategy failed for '{keyword}': {e}")
+        # Normalize target role
+        normalized_role = cls._normalize_role(target_role)
         
-        except Exception as e:
-            logger.debug(f"Error in getByRole strategy: {e}")
+        resolved_groups = set()
+        for spec in cls._candidate_specs(normalized_role, keywords):
+            group = spec['group']
+            if group in resolved_groups:
+                continue
+            if spec['fallback'] and any(c.strategy == spec['strategy'] for c in candidates):
+                continue
+            
+            try:
+                locator, frame, source = IframeRouter.find_in_main_or_frames(
+                    page,
+                    lambda ctx, spec=spec: cls._build_locator(ctx, spec, normalized_role),
+                    task_id=task_id,
+                    description=f"{log_prefix}_{spec['strategy']}"
+                )
+            except Exception as e:
+                logger.debug(f"{spec['strategy']} strategy failed for '{spec['keyword']}': {e}")
+                continue
+            
+            if locator:
+                resolved_groups.add(group)
+                candidates.append(LocatorCandidate(
+                    locator=locator,
+                    confidence=spec['confidence'],
+                    strategy=spec['strategy'],
+                    why=spec['why'].format(source=source),
+                    frame_context=frame
+                ))
         
         return candidates
     
     @classmethod
-    def _strategy_label_placeholder(
-        cls,
-        page: Page,
-        role: str,
-        keywords: List[str],
-        context: Optional[Dict],
-        task_id: Optional[int],
-        log_prefix: str
-    ) -> List[LocatorCandidate]:
-        """Strategy 2: label/placeholder matching"""
-        candidates = []
-        
-        try:
-            # Build selectors for label/placeholder
-            for keyword in keywords:
-                if not keyword:
-                    continue
-                
-                # Label-based selectors
-                label_selectors = [
-                    f'input[type="{role}"][placeholder*="{keyword}" i]',
-                    f'textarea[placeholder*="{keyword}" i]',
-                    f'input[name*="{keyword}" i]',
-                    f'textarea[name*="{keyword}" i]',
-                    f'label:has-text("{keyword}") ~ input',
-                    f'label:has-text("{keyword}") ~ textarea',
-                ]
-                
-                # Add role-specific selectors
-                if role in ['textbox', 'input']:
-                    label_selectors.extend([
-                        f'input[placeholder*="{keyword}" i]',
-                        f'input[name*="{keyword}" i]',
-                    ])
-                elif role == 'button':
-                    label_selectors.extend([
-                        f'button:has-text("{keyword}")',
-                        f'input[type="submit"][value*="{keyword}" i]',
-                    ])
-                
-                for selector in label_selectors:
-                    try:
-                        def locator_builder(ctx):
-                            if isinstance(ctx, Page):
-                                return ctx.locator(selector)
-                            else:  # FrameLocator
-                                return ctx.locator(selector)
-                        
-                        locator, frame, source = IframeRouter.find_in_main_or_frames(
-                            page,
-                            locator_builder,
-                            task_id=task_id,
-                            description=f'{log_prefix}_label_placeholder'
-                        )
-                        
-                        if locator:
-                            candidates.append(LocatorCandidate(
-                                locator=locator,
-                                confidence=0.85,
-                                strategy='label_placeholder',
-                                why=f"Label/placeholder matching '{keyword}' via {selector} in {source}",
-                                frame_context=frame
-                            ))
-                            break  # Found one, move to next keyword
-                    except:
-                        continue
-        except Exception as e:
-            logger.debug(f"Error in label/placeholder strategy: {e}")
-        
-        return candidates
+    def _normalize_role(cls, role: str) -> str:
+        """Normalize role to Playwright role"""
+        role_lower = role.lower()
+        return cls.ROLE_MAPPINGS.get(role_lower, role_lower)
+    
+    @staticmethod
+    def _build_locator(ctx: Any, spec: Dict, role: str) -> Locator:
+        """Build the Playwright Locator for a candidate spec in a Page, Frame or FrameLocator"""
+        if spec['probe']['kind'] == 'role':
+            return ctx.get_by_role(role, name=re.compile(spec['keyword'], re.IGNORECASE))
+        return ctx.locator(spec['selector'])
     
     @classmethod
-    def _strategy_visible_text(
-        cls,
-        page: Page,
-        role: str,
-        keywords: List[str],
-        context: Optional[Dict],
-        task_id: Optional[int],
-        log_prefix: str
-    ) -> List[LocatorCandidate]:
-        """Strategy 3: visible text matching"""
-        candidates = []
+    def _candidate_specs(cls, role: str, keywords: List[str]) -> List[Dict]:
+        """
+        Build candidate specs for all strategies, in strategy order
         
-        try:
-            for keyword in keywords:
-                if not keyword:
-                    continue
-                
-                # Text-based selectors
-                text_selectors = [
-                    f'text={keyword}',
-                    f'text=/{keyword}/i',
-                ]
-                
-                # Role-specific text matching
-                if role == 'button':
-                    text_selectors.extend([
-                        f'button:has-text("{keyword}")',
-                        f'button:has-text(/{keyword}/i)',
-                    ])
-                elif role == 'link':
-                    text_selectors.extend([
-                        f'a:has-text("{keyword}")',
-                        f'a:has-text(/{keyword}/i)',
-                    ])
-                
-                for selector in text_selectors:
-                    try:
-                        def locator_builder(ctx):
-                            if isinstance(ctx, Page):
-                                if selector.startswith('text='):
-                                    return ctx.locator(selector)
-                                else:
-                                    return ctx.locator(selector)
-                            else:  # FrameLocator
-                                return ctx.locator(selector)
-                        
-                        locator, frame, source = IframeRouter.find_in_main_or_frames(
-                            page,
-                            locator_builder,
-                            task_id=task_id,
-                            description=f'{log_prefix}_visible_text'
-                        )
-                        
-                        if locator:
-                            candidates.append(LocatorCandidate(
-                                locator=locator,
-                                confidence=0.75,
-                                strategy='visible_text',
-                                why=f"Visible text matching '{keyword}' via {selector} in {source}",
-                                frame_context=frame
-                            ))
-                            break
-                    except:
-                        continue
-        except Exception as e:
-            logger.debug(f"Error in visible text strategy: {e}")
+        Each spec pairs a Playwright selector with its in-page probe. Specs that
+        share a group (strategy + keyword) are alternatives: the first visible
+        one wins.
         
-        return candidates
-    
-    @classmethod
-    def _strategy_stable_attrs(
-        cls,
-        page: Page,
-        role: str,
-        keywords: List[str],
-        context: Optional[Dict],
-        task_id: Optional[int],
-        log_prefix: str
-    ) -> List[LocatorCandidate]:
-        """Strategy 4: stable attributes (aria/name/autocomplete/data-testid)"""
-        candidates = []
+        Args:
+            role: Normalized role
+            keywords: Keywords to match
         
-        try:
-            for keyword in keywords:
-                if not keyword:
-                    continue
-                
-                # Stable attribute selectors
-                attr_selectors = [
-                    f'[aria-label*="{keyword}" i]',
-                    f'[name*="{keyword}" i]',
-                    f'[autocomplete*="{keyword}" i]',
-                    f'[data-testid*="{keyword}" i]',
-                    f'[id*="{keyword}" i]',
-                ]
-                
-                # Role-specific attribute selectors
-                if role in ['textbox', 'input']:
-                    attr_selectors.extend([
-                        f'input[aria-label*="{keyword}" i]',
-                        f'input[name*="{keyword}" i]',
-                        f'textarea[aria-label*="{keyword}" i]',
-                        f'textarea[name*="{keyword}" i]',
-                    ])
-                elif role == 'button':
-                    attr_selectors.extend([
-                        f'button[aria-label*="{keyword}" i]',
-                        f'button[name*="{keyword}" i]',
-                    ])
-                
-                for selector in attr_selectors:
-                    try:
-                        def locator_builder(ctx):
-                            if isinstance(ctx, Page):
-                                return ctx.locator(selector)
-                            else:  # FrameLocator
-                                return ctx.locator(selector)
-                        
-                        locator, frame, source = IframeRouter.find_in_main_or_frames(
-                            page,
-                            locator_builder,
-                            task_id=task_id,
-                            description=f'{log_prefix}_stable_attrs'
-                        )
-                        
-                        if locator:
-                            candidates.append(LocatorCandidate(
-                                locator=locator,
-                                confidence=0.70,
-                                strategy='stable_attrs',
-                                why=f"Stable attribute matching '{keyword}' via {selector} in {source}",
-                                frame_context=frame
-                            ))
-                            break
-                    except:
-                        continue
-        except Exception as e:
-            logger.debug(f"Error in stable attrs strategy: {e}")
+        Returns:
+            List of spec dicts (strategy, confidence, keyword, selector, probe, why, group, fallback)
+        """
+        specs = []
+        
+        def add(strategy, kw_idx, keyword, selector, probe, why, confidence=None, fallback=False):
+            specs.append({
+                'strategy': strategy,
+                'confidence': confidence if confidence is not None else cls.STRATEGY_CONFIDENCE[strategy],
+                'keyword': keyword,
+                'selector': selector,
+                'probe': probe,
+                'why': why,
+                'group': f"{strategy}{'_xpath' if fallback else ''}:{kw_idx}",
+                'fallback': fallback,
+            })
         
-        return candidates
-    
-    @classmethod
-    def _strategy_css_xpath(
-        cls,
-        page: Page,
-        role: str,
-        keywords: List[str],
-        context: Optional[Dict],
-        task_id: Optional[int],
-        log_prefix: str
-    ) -> List[LocatorCandidate]:
-        """Strategy 5: CSS/XPath fallback"""
-        candidates = []
+        def css(selector):
+            return {'kind': 'css', 'css': selector}
         
-        try:
-            for keyword in keywords:
-                if not keyword:
-                    continue
-                
-                # CSS fallback selectors
-                css_selectors = []
-                
-                if role in ['textbox', 'input']:
-                    css_selectors = [
-                        f'input[type="text"][class*="{keyword}" i]',
-                        f'textarea[class*="{keyword}" i]',
-                        f'input[class*="{keyword}" i]',
-                        f'textarea[class*="{keyword}" i]',
-                    ]
-                elif role == 'button':
-                    css_selectors = [
-                        f'button[class*="{keyword}" i]',
-                        f'input[type="submit"][class*="{keyword}" i]',
-                    ]
-                elif role == 'form':
-                    css_selectors = [
-                        f'form[class*="{keyword}" i]',
-                        f'form[id*="{keyword}" i]',
-                        f'form[action*="{keyword}" i]',
-                    ]
-                
-                for selector in css_selectors:
-                    try:
-                        def locator_builder(ctx):
-                            if isinstance(ctx, Page):
-                                return ctx.locator(selector)
-                            else:  # FrameLocator
-                                return ctx.locator(selector)
-                        
-                        locator, frame, source = IframeRouter.find_in_main_or_frames(
-                            page,
-                            locator_builder,
-                            task_id=task_id,
-                            description=f'{log_prefix}_css_xpath'
-                        )
-                        
-                        if locator:
-                            candidates.append(LocatorCandidate(
-                                locator=locator,
-                                confidence=0.60,
-                                strategy='css_xpath',
-                                why=f"CSS fallback matching '{keyword}' via {selector} in {source}",
-                                frame_context=frame
-                            ))
-                            break
-                    except:
-                        continue
-                
-                # XPath fallback (if CSS didn't work)
-                if not candidates:
-                    xpath_patterns = [
-                        f'//input[contains(translate(@name, "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz"), "{keyword.lower()}")]',
-                        f'//textarea[contains(translate(@name, "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz"), "{keyword.lower()}")]',
-                    ]
-                    
-                    for xpath in xpath_patterns:
-                        try:
-                            def locator_builder(ctx):
-                                if isinstance(ctx, Page):
-                                    return ctx.locator(f'xpath={xpath}')
-                                else:  # FrameLocator
-                                    return ctx.locator(f'xpath={xpath}')
-                            
-                            locator, frame, source = IframeRouter.find_in_main_or_frames(
-                                page,
-                                locator_builder,
-                                task_id=task_id,
-                                description=f'{log_prefix}_css_xpath'
-                            )
-                            
-                            if locator:
-                                candidates.append(LocatorCandidate(
-                                    locator=locator,
-                                    confidence=0.55,
-                                    strategy='css_xpath',
-                                    why=f"XPath fallback matching '{keyword}' in {source}",
-                                    frame_context=frame
-                                ))
-                                break
-                        except:
-                            continue
-        except Exception as e:
-            logger.debug(f"Error in CSS/XPath strategy: {e}")
+        def has_text(base, keyword, regex=False):
+            probe = {'kind': 'has_text', 'css': base}
+            probe['pattern' if regex else 'text'] = keyword
+            return probe
         
-        return candidates
+        keywords = [(idx, kw) for idx, kw in enumerate(keywords) if kw]
+        
+        # Strategy 1: getByRole + name matching (highest confidence)
+        for idx, keyword in keywords:
+            add('get_by_role', idx, keyword, None,
+                {'kind': 'role', 'role': role, 'pattern': keyword},
+                f"getByRole('{role}', name=~'{keyword}') in {{source}}")
+        
+        # Strategy 2: label/placeholder matching
+        for idx, keyword in keywords:
+            selectors = [
+                (f'input[type="{role}"][placeholder*="{keyword}" i]', None),
+                (f'textarea[placeholder*="{keyword}" i]', None),
+                (f'input[name*="{keyword}" i]', None),
+                (f'textarea[name*="{keyword}" i]', None),
+                (f'label:has-text("{keyword}") ~ input', {'kind': 'label_sibling', 'css': 'input', 'text': keyword}),
+                (f'label:has-text("{keyword}") ~ textarea', {'kind': 'label_sibling', 'css': 'textarea', 'text': keyword}),
+            ]
+            if role in ['textbox', 'input']:
+                selectors.extend([
+                    (f'input[placeholder*="{keyword}" i]', None),
+                    (f'input[name*="{keyword}" i]', None),
+                ])
+            elif role == 'button':
+                selectors.extend([
+                    (f'button:has-text("{keyword}")', has_text('button', keyword)),
+                    (f'input[type="submit"][value*="{keyword}" i]', None),
+                ])
+            for selector, probe in selectors:
+                add('label_placeholder', idx, keyword, selector, probe or css(selector),
+                    f"Label/placeholder matching '{keyword}' via {selector} in {{source}}")
+        
+        # Strategy 3: visible text matching
+        for idx, keyword in keywords:
+            selectors = [
+                (f'text={keyword}', {'kind': 'text', 'text': keyword}),
+                (f'text=/{keyword}/i', {'kind': 'text', 'pattern': keyword}),
+            ]
+            if role == 'button':
+                selectors.extend([
+                    (f'button:has-text("{keyword}")', has_text('button', keyword)),
+                    (f'button:has-text(/{keyword}/i)', has_text('button', keyword, regex=True)),
+                ])
+            elif role == 'link':
+                selectors.extend([
+                    (f'a:has-text("{keyword}")', has_text('a', keyword)),
+                    (f'a:has-text(/{keyword}/i)', has_text('a', keyword, regex=True)),
+                ])
+            for selector, probe in selectors:
+                add('visible_text', idx, keyword, selector, probe,
+                    f"Visible text matching '{keyword}' via {selector} in {{source}}")
+        
+        # Strategy 4: stable attributes (aria/name/autocomplete/data-testid)
+        for idx, keyword in keywords:
+            selectors = [
+                f'[aria-label*="{keyword}" i]',
+                f'[name*="{keyword}" i]',
+                f'[autocomplete*="{keyword}" i]',
+                f'[data-testid*="{keyword}" i]',
+                f'[id*="{keyword}" i]',
+            ]
+            if role in ['textbox', 'input']:
+                selectors.extend([
+                    f'input[aria-label*="{keyword}" i]',
+                    f'input[name*="{keyword}" i]',
+                    f'textarea[aria-label*="{keyword}" i]',
+                    f'textarea[name*="{keyword}" i]',
+                ])
+            elif role == 'button':
+                selectors.extend([
+                    f'button[aria-label*="{keyword}" i]',
+                    f'button[name*="{keyword}" i]',
+                ])
+            for selector in selectors:
+                add('stable_attrs', idx, keyword, selector, css(selector),
+                    f"Stable attribute matching '{keyword}' via {selector} in {{source}}")
+        
+        # Strategy 5: CSS/XPath fallback
+        for idx, keyword in keywords:
+            selectors = []
+            if role in ['textbox', 'input']:
+                selectors = [
+                    f'input[type="text"][class*="{keyword}" i]',
+                    f'textarea[class*="{keyword}" i]',
+                    f'input[class*="{keyword}" i]',
+                    f'textarea[class*="{keyword}" i]',
+                ]
+            elif role == 'button':
+                selectors = [
+                    f'button[class*="{keyword}" i]',
+                    f'input[type="submit"][class*="{keyword}" i]',
+                ]
+            elif role == 'form':
+                selectors = [
+                    f'form[class*="{keyword}" i]',
+                    f'form[id*="{keyword}" i]',
+                    f'form[action*="{keyword}" i]',
+                ]
+            for selector in selectors:
+                add('css_xpath', idx, keyword, selector, css(selector),
+                    f"CSS fallback matching '{keyword}' via {selector} in {{source}}")
+            
+            # XPath fallback (only while the CSS fallback found nothing)
+            lowered = keyword.lower()
+            for xpath in [
+                f'//input[contains(translate(@name, "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz"), "{lowered}")]',
+                f'//textarea[contains(translate(@name, "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz"), "{lowered}")]',
+            ]:
+                add('css_xpath', idx, keyword, f'xpath={xpath}', {'kind': 'xpath', 'xpath': xpath},
+                    f"XPath fallback matching '{keyword}' in {{source}}",
+                    confidence=cls.XPATH_FALLBACK_CONFIDENCE, fallback=True)
+        
+        return specs
     
     @classmethod
     def find_form(
@@ -0,0 +1,302 @@
+"""
+Outcome History
+
+Readers for automation_logs.jsonl (written by AutomationLogger) that don't
+re-read the whole file:
+- OutcomeHistoryTail: each read_new() returns only the entries appended since
+  the previous call, so schedulers can learn from task outcomes incrementally.
+- tail_lines(): the last N lines, read backwards from the end of the file.
+- OutcomeLogIndex: sidecar SQLite index of line offsets by timestamp and
+  task_id. It is brought up to date incrementally by readers (writers only
+  append), so lookups cost the same whatever the size of the log.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the end of an existing history file on first load
+INITIAL_HISTORY_BYTES = 4 * 1024 * 1024
+# Block size for reading a file backwards
+TAIL_BLOCK_SIZE = 64 * 1024
+# Log bytes indexed per transaction
+INDEX_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def default_history_path() -> str:
+    """automation_logs.jsonl in AUTOMATION_LOG_DIR (as used by get_logger())"""
+    return os.path.join(os.getenv('AUTOMATION_LOG_DIR', 'logs'), 'automation_logs.jsonl')
+
+
+class OutcomeHistoryTail:
+    """
+    Tails a JSON Lines outcome log.
+
+    Pass a saved offset to resume where a previous process stopped; without
+    one, the first read starts INITIAL_HISTORY_BYTES from the end.
+    """
+
+    def __init__(self, path: str, offset: Optional[int] = None,
+                 initial_bytes: int = INITIAL_HISTORY_BYTES):
+        self.path = path
+        self.offset = offset
+        self.initial_bytes = initial_bytes
+
+    def read_new(self) -> Tuple[List[Dict], bool]:
+        """
+        Read entries appended since the last call
+
+        Returns:
+            (entries, restarted): restarted is True on the first read and
+            after the file was truncated or rotated
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return [], False
+
+        restarted = False
+        skip_first = False
+        if self.offset is None or size < self.offset:
+            restarted = True
+            if self.offset is None:
+                self.offset = max(size - self.initial_bytes, 0)
+                skip_first = self.offset > 0  # Starts mid-line
+            else:
+                self.offset = 0
+
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+        except OSError as e:
+            logger.debug(f"Failed to read outcome history {self.path}: {e}")
+            return [], restarted
+
+        # Only complete lines; a partial last line is read next time
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        lines = data[:end].splitlines()
+        if skip_first:
+            lines = lines[1:]
+
+        entries = []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict):
+                entries.append(entry)
+        return entries, restarted
+
+
+def tail_lines(path: str, count: int, block_size: int = TAIL_BLOCK_SIZE) -> List[bytes]:
+    """
+    Last complete lines of a file, oldest first
+
+    Reads blocks backwards from the end until it has count lines, so the cost
+    depends on count, not on the size of the file.
+
+    Args:
+        path: File to read
+        count: Max lines
+        block_size: Bytes read per step
+
+    Returns:
+        Up to count non-empty lines without line endings
+    """
+    if count <= 0:
+        return []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # One extra newline: the first line of the data may be partial
+        while position > 0 and data.count(b'\n') <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+
+    lines = data.split(b'\n')
+    if position > 0:
+        lines = lines[1:]
+    lines = [line.rstrip(b'\r') for line in lines if line.strip()]
+    return lines[-count:]
+
+
+def _read_line(f, offset: int, length: int) -> Optional[Dict]:
+    f.seek(offset)
+    try:
+        entry = json.loads(f.read(length))
+    except ValueError:
+        return None
+    return entry if isinstance(entry, dict) else None
+
+
+class OutcomeLogIndex:
+    """
+    Sidecar index of a JSON Lines outcome log by timestamp and task_id.
+
+    sync() indexes the lines appended since the last sync (the whole file
+    once, the first time); the query methods sync first. Several processes
+    may share one index. If the log was truncated or replaced, it is
+    reindexed from the start.
+    """
+
+    def __init__(self, log_path: str, index_path: Optional[str] = None):
+        """
+        Args:
+            log_path: JSON Lines log (automation_logs.jsonl)
+            index_path: Index database (default: <log_path>.index.db)
+        """
+        self.log_path = log_path
+        self.index_path = index_path or f"{log_path}.index.db"
+        self._local = threading.local()
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection (WAL mode, autocommit; transactions are explicit)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _init_database(self):
+        """Initialize index schema"""
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                offset INTEGER PRIMARY KEY,
+                length INTEGER NOT NULL,
+                timestamp TEXT,
+                task_id TEXT
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries(timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_task_id ON entries(task_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def sync(self) -> int:
+        """
+        Index lines appended to the log since the last sync
+
+        Returns:
+            Number of lines indexed
+        """
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            return 0
+
+        conn = self._connect()
+        indexed = 0
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'indexed_to'").fetchone()
+                indexed_to = row[0] if row else 0
+                if size < indexed_to:
+                    logger.info(f"{self.log_path} was truncated or replaced, reindexing")
+                    conn.execute("DELETE FROM entries")
+                    indexed_to = 0
+                if indexed_to >= size:
+                    conn.execute("COMMIT")
+                    return indexed
+
+                with open(self.log_path, 'rb') as f:
+                    f.seek(indexed_to)
+                    data = f.read(min(INDEX_CHUNK_BYTES, size - indexed_to))
+                end = data.rfind(b'\n') + 1
+                if end == 0:
+                    if len(data) < INDEX_CHUNK_BYTES:
+                        # Only a partial last line so far
+                        conn.execute("COMMIT")
+                        return indexed
+                    end = len(data)  # A line longer than a chunk: skip it
+
+                rows = []
+                position = indexed_to
+                for line in data[:end].split(b'\n'):
+                    length = len(line) + 1
+                    if line.strip():
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            entry = None
+                        if isinstance(entry, dict):
+                            task_id = entry.get('task_id')
+                            rows.append((position, len(line), entry.get('timestamp'),
+                                         None if task_id is None else str(task_id)))
+                    position += length
+                conn.executemany(
+                    "INSERT OR REPLACE INTO entries (offset, length, timestamp, task_id) VALUES (?, ?, ?, ?)", rows
+                )
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('indexed_to', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (indexed_to + end,)
+                )
+                conn.execute("COMMIT")
+                indexed += len(rows)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def offset_at(self, timestamp: str) -> int:
+        """Byte offset of the first line logged at or after timestamp (end of the indexed log if none)"""
+        self.sync()
+        conn = self._connect()
+        row = conn.execute("SELECT MIN(offset) FROM entries WHERE timestamp >= ?", (timestamp,)).fetchone()
+        if row[0] is not None:
+            return row[0]
+        row = conn.execute("SELECT value FROM meta WHERE key = 'indexed_to'").fetchone()
+        return row[0] if row else 0
+
+    def entries_for_task(self, task_id) -> List[Dict]:
+        """Every entry logged for a task, in log order"""
+        self.sync()
+        rows = self._connect().execute(
+            "SELECT offset, length FROM entries WHERE task_id = ? ORDER BY offset", (str(task_id),)
+        ).fetchall()
+        return self._read(rows)
+
+    def entries_since(self, timestamp: str, limit: Optional[int] = None) -> List[Dict]:
+        """Entries logged at or after timestamp (ISO 8601, as logged), in log order"""
+        self.sync()
+        query = "SELECT offset, length FROM entries WHERE timestamp >= ? ORDER BY offset"
+        params: Tuple = (timestamp,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (timestamp, limit)
+        return self._read(self._connect().execute(query, params).fetchall())
+
+    def _read(self, rows: List[Tuple[int, int]]) -> List[Dict]:
+        if not rows:
+            return []
+        entries = []
+        try:
+            with open(self.log_path, 'rb') as f:
+                for offset, length in rows:
+                    entry = _read_line(f, offset, length)
+                    if entry is not None:
+                        entries.append(entry)
+        except OSError as e:
+            logger.warning(f"Failed to read {self.log_path}: {e}")
+        return entries
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,331 @@
+"""
+API Rate Limiter
+
+Client-side token bucket that keeps the worker inside the Laravel API's
+hourly request budget. Calls are prioritised: task status updates, locks and
+unlocks may spend the whole bucket, other task calls leave a reserve for them,
+and polls for pending tasks only run while a larger reserve is left.
+
+The server's own limits are per minute and per route group (throttle:1000,1
+on /api/tasks, throttle:60,1 on campaigns, proxies, backlinks, ...), so its
+X-RateLimit-Limit/X-RateLimit-Remaining headers and 429 Retry-After feed a
+separate one-minute window per route prefix instead of the hourly bucket.
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Priorities (lower value = more important)
+PRIORITY_CRITICAL = 0  # Status updates, locks/unlocks, result reporting
+PRIORITY_NORMAL = 1  # Campaign, proxies, content, captcha lookups
+PRIORITY_POLL = 2  # Polling for pending tasks, background fetches
+
+PRIORITY_NAMES = {
+    PRIORITY_CRITICAL: 'critical',
+    PRIORITY_NORMAL: 'normal',
+    PRIORITY_POLL: 'poll',
+}
+
+# Laravel's throttle:N,1 middleware counts requests per one-minute window
+ROUTE_WINDOW_SECONDS = 60.0
+
+
+def route_group(endpoint: str) -> str:
+    """Route prefix an endpoint is throttled under ('/api/tasks/5/lock' -> 'tasks')"""
+    parts = [part for part in endpoint.split('?', 1)[0].split('/') if part]
+    if parts and parts[0] == 'api':
+        parts = parts[1:]
+    return parts[0] if parts else 'default'
+
+
+@dataclass
+class _RouteWindow:
+    """Server-side per-minute budget of one route group, as last reported"""
+    limit: Optional[int] = None
+    remaining: Optional[int] = None
+    resets_at: float = 0.0  # monotonic time
+    paused_until: float = 0.0  # monotonic time (429 Retry-After)
+
+
+@dataclass
+class RateLimiterConfig:
+    """Rate limiter configuration"""
+    requests_per_hour: int = 300  # Server budget per API token
+    capacity: Optional[int] = None  # Bucket size (default: requests_per_hour)
+    normal_reserve: float = 0.1  # Fraction of the bucket normal calls leave for critical ones
+    poll_reserve: float = 0.3  # Fraction of the bucket polls leave for task calls
+    max_wait_seconds: float = 300.0  # Longest a blocking call waits for a token
+
+    @classmethod
+    def from_env(cls) -> 'RateLimiterConfig':
+        """Build config from API_RATE_LIMIT_* environment variables"""
+        return cls(
+            requests_per_hour=int(os.getenv('API_RATE_LIMIT_PER_HOUR', '300')),
+            normal_reserve=float(os.getenv('API_RATE_LIMIT_NORMAL_RESERVE', '0.1')),
+            poll_reserve=float(os.getenv('API_RATE_LIMIT_POLL_RESERVE', '0.3')),
+            max_wait_seconds=float(os.getenv('API_RATE_LIMIT_MAX_WAIT', '300')),
+        )
+
+
+class TokenBucketRateLimiter:
+    """
+    Thread-safe token bucket with priority reserves.
+
+    A call of a given priority is allowed while taking a token still leaves
+    the reserve for more important calls. Blocking callers also yield to any
+    waiting caller of higher priority.
+    """
+
+    def __init__(self, config: Optional[RateLimiterConfig] = None):
+        self.config = config or RateLimiterConfig()
+        self.capacity = float(self.config.capacity or self.config.requests_per_hour)
+        self.refill_per_second = self.config.requests_per_hour / 3600.0
+
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._throttled_until = 0.0  # monotonic time
+        self._cond = threading.Condition()
+        self._waiting = {priority: 0 for priority in PRIORITY_NAMES}
+
+        self._granted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self._denied = {name: 0 for name in PRIORITY_NAMES.values()}
+        self._wait_seconds = 0.0
+        self._rate_limited = 0
+        self._routes: Dict[str, _RouteWindow] = {}
+
+    def _refill(self, now: float):
+        """Add tokens for the time elapsed since the last refill (lock held)"""
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+            self._last_refill = now
+
+    def _reserve(self, priority: int) -> float:
+        """Tokens a call of this priority must leave in the bucket"""
+        if priority <= PRIORITY_CRITICAL:
+            return 0.0
+        reserve = self.config.normal_reserve if priority == PRIORITY_NORMAL else self.config.poll_reserve
+        # A full bucket must always admit a call, however small the bucket
+        return min(self.capacity * reserve, self.capacity - 1)
+
+    def _route_window(self, route: Optional[str], now: float) -> Optional[_RouteWindow]:
+        """The route group's window, with counts forgotten once its minute is over (lock held)"""
+        window = self._routes.get(route) if route else None
+        if window is not None and window.remaining is not None and now >= window.resets_at:
+            window.remaining = None
+        return window
+
+    def _wait_time(self, priority: int, now: float, route: Optional[str] = None) -> float:
+        """Seconds until a call of this priority could be granted (lock held)"""
+        wait = max(self._throttled_until - now, 0.0)
+        missing = self._reserve(priority) + 1 - self._tokens
+        if missing > 0:
+            wait = max(wait, missing / self.refill_per_second)
+
+        window = self._route_window(route, now)
+        if window is not None:
+            wait = max(wait, window.paused_until - now)
+            if window.remaining is not None and window.limit:
+                # Same reserves as the hourly bucket, applied to the route's minute
+                reserve = 0.0 if priority <= PRIORITY_CRITICAL else min(
+                    window.limit * (self.config.normal_reserve if priority == PRIORITY_NORMAL
+                                    else self.config.poll_reserve), window.limit - 1)
+                if window.remaining < reserve + 1:
+                    wait = max(wait, window.resets_at - now)
+        return wait
+
+    def _take(self, priority: int, now: float, route: Optional[str]):
+        """Spend a token, and one of the route's per-minute requests (lock held)"""
+        self._tokens -= 1
+        self._granted[PRIORITY_NAMES[priority]] += 1
+        window = self._route_window(route, now)
+        if window is not None and window.remaining is not None:
+            window.remaining -= 1
+
+    def _outranked(self, priority: int) -> bool:
+        """True if a caller of higher priority is waiting (lock held)"""
+        return any(count for p, count in self._waiting.items() if p < priority)
+
+    def try_acquire(self, priority: int = PRIORITY_NORMAL, route: Optional[str] = None) -> bool:
+        """
+        Take a token without waiting
+
+        Args:
+            priority: PRIORITY_CRITICAL, PRIORITY_NORMAL or PRIORITY_POLL
+            route: Route group of the call (see route_group())
+
+        Returns:
+            True if the call may go ahead now
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if self._wait_time(priority, now, route) > 0 or self._outranked(priority):
+                self._denied[PRIORITY_NAMES[priority]] += 1
+                return False
+            self._take(priority, now, route)
+            return True
+
+    def acquire(self, priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None,
+                route: Optional[str] = None) -> bool:
+        """
+        Take a token, waiting until the budget allows a call of this priority
+
+        Args:
+            priority: PRIORITY_CRITICAL, PRIORITY_NORMAL or PRIORITY_POLL
+            timeout: Max seconds to wait (default: config.max_wait_seconds)
+            route: Route group of the call (see route_group())
+
+        Returns:
+            True if a token was taken, False if the wait timed out
+        """
+        if timeout is None:
+            timeout = self.config.max_wait_seconds
+        start = time.monotonic()
+        deadline = start + timeout
+
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._wait_time(priority, now, route)
+                    if wait <= 0 and not self._outranked(priority):
+                        self._take(priority, now, route)
+                        self._wait_seconds += now - start
+                        return True
+                    if now >= deadline:
+                        self._denied[PRIORITY_NAMES[priority]] += 1
+                        self._wait_seconds += now - start
+                        return False
+                    # Outranked callers are woken by notify_all when the waiter ahead leaves
+                    self._cond.wait(min(wait or 1.0, deadline - now))
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def observe_response(self, status_code: int, headers: Dict, retry_after: Optional[float] = None,
+                         route: Optional[str] = None):
+        """
+        Sync the route group's per-minute window with the server's counters
+
+        The headers describe the server's per-minute limit for this route
+        group, not the hourly budget, so they never resize the hourly bucket.
+
+        Args:
+            status_code: HTTP status of the response
+            headers: Response headers (X-RateLimit-Limit / X-RateLimit-Remaining)
+            retry_after: Seconds to pause the route group for (from a 429)
+            route: Route group of the request (None: a 429 pauses every caller)
+        """
+        limit = _int_header(headers, 'X-RateLimit-Limit')
+        remaining = _int_header(headers, 'X-RateLimit-Remaining')
+
+        with self._cond:
+            now = time.monotonic()
+            window = None
+            if route:
+                window = self._route_window(route, now)
+                if window is None:
+                    window = self._routes[route] = _RouteWindow()
+                if remaining is not None:
+                    if window.remaining is None:
+                        # First count seen in this minute; the server's window ends within a minute
+                        window.resets_at = now + ROUTE_WINDOW_SECONDS
+                        window.remaining = remaining
+                    else:
+                        # Other processes sharing the token spend the same budget
+                        window.remaining = min(window.remaining, remaining)
+                if limit:
+                    window.limit = limit
+
+            if status_code == 429:
+                self._rate_limited += 1
+                try:
+                    retry_after = float(retry_after or 0)
+                except (TypeError, ValueError):
+                    retry_after = 0.0
+                if retry_after > 0:
+                    if window is not None:
+                        window.paused_until = max(window.paused_until, now + retry_after)
+                        window.remaining = 0
+                        window.resets_at = max(window.resets_at, now + retry_after)
+                    else:
+                        self._throttled_until = max(self._throttled_until, now + retry_after)
+                    logger.warning(f"API rate limited ({route or 'all routes'}), "
+                                   f"pausing requests for {retry_after:.0f}s")
+
+            self._cond.notify_all()
+
+    def time_until_available(self, priority: int = PRIORITY_NORMAL, route: Optional[str] = None) -> float:
+        """Seconds until a call of this priority (to this route group) could be granted (0: now)"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return self._wait_time(priority, now, route)
+
+    def throttled_for(self, route: Optional[str] = None) -> float:
+        """Seconds left on a server-imposed pause (0 if not paused)"""
+        with self._cond:
+            now = time.monotonic()
+            until = self._throttled_until
+            window = self._routes.get(route) if route else None
+            if window is not None:
+                until = max(until, window.paused_until)
+            return max(until - now, 0.0)
+
+    def get_stats(self) -> Dict:
+        """Get remaining budget and usage counters"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'requests_per_hour': round(self.refill_per_second * 3600),
+                'capacity': int(self.capacity),
+                'tokens_available': int(self._tokens),
+                'poll_allowed': self._wait_time(PRIORITY_POLL, now) <= 0,
+                'throttled_for_seconds': round(max(self._throttled_until - now, 0.0), 1),
+                'routes': {
+                    name: {
+                        'limit_per_minute': window.limit,
+                        'remaining': window.remaining if now < window.resets_at else None,
+                        'paused_for_seconds': round(max(window.paused_until - now, 0.0), 1),
+                    }
+                    for name, window in self._routes.items()
+                },
+                'granted': dict(self._granted),
+                'denied': dict(self._denied),
+                'rate_limited_responses': self._rate_limited,
+                'total_wait_seconds': round(self._wait_seconds, 1),
+            }
+
+
+def _int_header(headers: Dict, name: str) -> Optional[int]:
+    """Integer header value, or None if missing/invalid"""
+    value = headers.get(name) if headers else None
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# One limiter per API token, shared by every client in the process
+_rate_limiters: Dict[str, TokenBucketRateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(key: str = 'default', config: Optional[RateLimiterConfig] = None) -> TokenBucketRateLimiter:
+    """Get the shared rate limiter for an API token"""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            limiter = TokenBucketRateLimiter(config or RateLimiterConfig.from_env())
+            _rate_limiters[key] = limiter
+        return limiter
@@ -0,0 +1,533 @@
+"""
+Run Archive
+
+Retention for the run directories core.telemetry writes under runs/. Once a
+run has finished (final_result.json is older than archive_after_seconds and
+newer than init.json, or the run was abandoned without one), its files are packed into a SQLite blob
+store for the day it finished (runs_archive/runs-YYYY-MM-DD.db) and the
+directory is removed, so runs/ only holds recent runs instead of one
+directory per task forever.
+
+index.db maps task_id to its day archive with the outcome and failure reason,
+so get_run()/get_file() find a run with two primary key lookups, live or
+archived. Whole day files are deleted once older than max_age_days, or
+oldest first while the archive is larger than max_bytes.
+"""
+
+import os
+import json
+import time
+import zlib
+import shutil
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Stored as they are (compressing them again gains nothing)
+COMPRESSED_EXTENSIONS = ('.gz', '.zst', '.jpg', '.jpeg', '.png', '.webp')
+DAY_FILE_PREFIX = 'runs-'
+
+
+@dataclass
+class RunArchiveConfig:
+    """Run archive configuration"""
+    runs_dir: str = 'runs'
+    archive_dir: str = 'runs_archive'
+    archive_after_seconds: float = 3600.0  # Finished runs stay plain directories this long
+    abandoned_after_seconds: float = 86400.0  # Runs without final_result.json are archived after this
+    max_age_days: int = 30  # Day archives older than this are deleted
+    max_bytes: int = 5 * 1024 ** 3  # Oldest day archives are deleted while the archive is larger
+    interval: float = 600.0  # Seconds between archive passes
+    batch_size: int = 500  # Runs packed per transaction
+
+    @classmethod
+    def from_env(cls) -> 'RunArchiveConfig':
+        """Build config from RUN_ARCHIVE_* environment variables"""
+        return cls(
+            runs_dir=os.getenv('TELEMETRY_RUNS_DIR', 'runs'),
+            archive_dir=os.getenv('RUN_ARCHIVE_DIR', 'runs_archive'),
+            archive_after_seconds=float(os.getenv('RUN_ARCHIVE_AFTER_SECONDS', '3600')),
+            abandoned_after_seconds=float(os.getenv('RUN_ARCHIVE_ABANDONED_AFTER_SECONDS', '86400')),
+            max_age_days=int(os.getenv('RUN_ARCHIVE_MAX_AGE_DAYS', '30')),
+            max_bytes=int(float(os.getenv('RUN_ARCHIVE_MAX_GB', '5')) * 1024 ** 3),
+            interval=float(os.getenv('RUN_ARCHIVE_INTERVAL', '600')),
+        )
+
+
+class RunArchive:
+    """
+    Packs finished run directories into day archives and looks runs up.
+
+    archive_runs() and enforce_retention() do one pass each; start() runs
+    both every config.interval seconds in a background thread.
+    """
+
+    def __init__(self, config: Optional[RunArchiveConfig] = None):
+        self.config = config or RunArchiveConfig.from_env()
+        self.runs_dir = Path(self.config.runs_dir)
+        self.archive_dir = Path(self.config.archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.archive_dir / 'index.db'
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._active_task_ids: Optional[Callable[[], Iterable]] = None
+        self._stats = {
+            'runs_archived': 0,
+            'files_archived': 0,
+            'bytes_read': 0,
+            'bytes_stored': 0,
+            'days_evicted': 0,
+            'runs_evicted': 0,
+            'errors': 0,
+        }
+
+        self._init_database()
+
+    def _connect(self, path: Path) -> sqlite3.Connection:
+        """Open a connection (WAL mode, autocommit; transactions are explicit)"""
+        conn = sqlite3.connect(str(path), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_database(self):
+        """Initialize index schema"""
+        with closing(self._connect(self.index_path)) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    task_id TEXT PRIMARY KEY,
+                    day TEXT NOT NULL,
+                    success INTEGER,
+                    failure_reason TEXT,
+                    completed_at TEXT,
+                    execution_time REAL,
+                    files INTEGER NOT NULL,
+                    stored_bytes INTEGER NOT NULL,
+                    archived_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_day ON runs(day)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_failure_reason ON runs(failure_reason)")
+
+    def _day_path(self, day: str) -> Path:
+        return self.archive_dir / f"{DAY_FILE_PREFIX}{day}.db"
+
+    def _open_day(self, day: str) -> sqlite3.Connection:
+        conn = self._connect(self._day_path(day))
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                task_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                encoding TEXT NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (task_id, name)
+            )
+        """)
+        return conn
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    # ------------------------------------------------------------------
+    # Archiving
+    # ------------------------------------------------------------------
+
+    def _finished_runs(self, now: float) -> List[Dict]:
+        """Run directories ready to archive, with their day and outcome"""
+        runs = []
+        try:
+            entries = list(os.scandir(self.runs_dir))
+        except FileNotFoundError:
+            return runs
+        # A retried task reuses its run directory while the last attempt's final_result.json is still there
+        active = {str(task_id) for task_id in self._active_task_ids()} if self._active_task_ids else set()
+        for entry in entries:
+            if not entry.is_dir() or entry.name in active:
+                continue
+            run_dir = Path(entry.path)
+            final_file = run_dir / 'final_result.json'
+            init_file = run_dir / 'init.json'
+            try:
+                started_at = init_file.stat().st_mtime if init_file.exists() else 0.0
+                final_at = final_file.stat().st_mtime if final_file.exists() else None
+                if final_at is not None and final_at >= started_at:
+                    finished_at = final_at
+                    if now - finished_at < self.config.archive_after_seconds:
+                        continue
+                    final_result = json.loads(final_file.read_text(encoding='utf-8'))
+                else:
+                    # No result for the latest attempt: archived once abandoned
+                    finished_at = max(entry.stat().st_mtime, started_at)
+                    if now - finished_at < self.config.abandoned_after_seconds:
+                        continue
+                    final_result = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable run {run_dir}: {e}")
+                self._count('errors')
+                continue
+
+            result = final_result.get('result') or {}
+            success = result.get('success')
+            runs.append({
+                'task_id': entry.name,
+                'run_dir': run_dir,
+                'day': datetime.utcfromtimestamp(finished_at).strftime('%Y-%m-%d'),
+                'success': None if success is None else int(bool(success)),
+                'failure_reason': result.get('failure_reason'),
+                'completed_at': final_result.get('completed_at'),
+                'execution_time': final_result.get('execution_time'),
+            })
+        return runs
+
+    def _pack(self, conn: sqlite3.Connection, run: Dict) -> Dict:
+        """Insert a run's files into a day archive (transaction held by the caller)"""
+        files = stored = read = 0
+        seen: Dict[tuple, str] = {}
+        for path in sorted(run['run_dir'].rglob('*')):
+            name = path.relative_to(run['run_dir']).as_posix()
+            if path.is_symlink():
+                # Snapshot "latest" names point at a timestamped file stored anyway
+                encoding, data = 'link', os.readlink(path).encode('utf-8')
+            elif not path.is_file():
+                continue
+            else:
+                stat = path.stat()
+                inode = (stat.st_dev, stat.st_ino)
+                if stat.st_nlink > 1 and inode in seen:
+                    encoding, data = 'link', seen[inode].encode('utf-8')
+                else:
+                    seen[inode] = name
+                    data = path.read_bytes()
+                    read += len(data)
+                    if path.name.lower().endswith(COMPRESSED_EXTENSIONS):
+                        encoding = 'raw'
+                    else:
+                        encoding, data = 'zlib', zlib.compress(data, 6)
+            conn.execute(
+                "INSERT OR REPLACE INTO files (task_id, name, encoding, data) VALUES (?, ?, ?, ?)",
+                (run['task_id'], name, encoding, data)
+            )
+            files += 1
+            stored += len(data)
+        return {'files': files, 'stored_bytes': stored, 'bytes_read': read}
+
+    def archive_runs(self, now: Optional[float] = None) -> int:
+        """
+        Pack finished runs into their day archives and remove their directories
+
+        Args:
+            now: Current time (epoch seconds; for tests)
+
+        Returns:
+            Number of runs archived
+        """
+        now = now or time.time()
+        runs = self._finished_runs(now)
+        by_day: Dict[str, List[Dict]] = {}
+        for run in runs:
+            by_day.setdefault(run['day'], []).append(run)
+
+        archived = 0
+        for day, day_runs in sorted(by_day.items()):
+            for start in range(0, len(day_runs), self.config.batch_size):
+                archived += self._archive_batch(day, day_runs[start:start + self.config.batch_size], now)
+        if archived:
+            logger.info(f"Archived {archived} runs from {self.runs_dir} into {self.archive_dir}")
+        return archived
+
+    def _archive_batch(self, day: str, runs: List[Dict], now: float) -> int:
+        packed = []
+        try:
+            with closing(self._open_day(day)) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for run in runs:
+                        try:
+                            packed.append((run, self._pack(conn, run)))
+                        except OSError as e:
+                            # Left in runs/ for the next pass
+                            logger.warning(f"Failed to read run {run['run_dir']}: {e}")
+                            self._count('errors')
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+
+            # Index only after the files are committed, so an indexed run is always readable
+            with closing(self._connect(self.index_path)) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO runs (task_id, day, success, failure_reason, completed_at, "
+                    "execution_time, files, stored_bytes, archived_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(run['task_id'], day, run['success'], run['failure_reason'], run['completed_at'],
+                      run['execution_time'], sizes['files'], sizes['stored_bytes'], now)
+                     for run, sizes in packed]
+                )
+                conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.error(f"Failed to archive {len(runs)} runs into {self._day_path(day)}: {e}")
+            self._count('errors')
+            return 0
+
+        for run, sizes in packed:
+            shutil.rmtree(run['run_dir'], ignore_errors=True)
+            with self._lock:
+                self._stats['runs_archived'] += 1
+                self._stats['files_archived'] += sizes['files']
+                self._stats['bytes_read'] += sizes['bytes_read']
+                self._stats['bytes_stored'] += sizes['stored_bytes']
+        return len(packed)
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+
+    def _day_files(self) -> List[Path]:
+        """Day archives, oldest first"""
+        return sorted(self.archive_dir.glob(f"{DAY_FILE_PREFIX}*.db"))
+
+    def _day_size(self, path: Path) -> int:
+        """Bytes of a day archive including its WAL"""
+        total = 0
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                total += os.path.getsize(f"{path}{suffix}")
+            except OSError:
+                pass
+        return total
+
+    def enforce_retention(self, now: Optional[float] = None) -> int:
+        """
+        Delete day archives past max_age_days, then the oldest while over max_bytes
+
+        Returns:
+            Number of day archives deleted
+        """
+        now = now or time.time()
+        cutoff = (datetime.utcfromtimestamp(now) - timedelta(days=self.config.max_age_days)).strftime('%Y-%m-%d')
+        today = datetime.utcfromtimestamp(now).strftime('%Y-%m-%d')
+
+        days = [(path, path.stem[len(DAY_FILE_PREFIX):]) for path in self._day_files()]
+        sizes = {path: self._day_size(path) for path, _ in days}
+        total = sum(sizes.values())
+
+        evicted = 0
+        for path, day in days:
+            if day >= cutoff and (total <= self.config.max_bytes or day == today):
+                continue
+            if self._evict_day(path, day):
+                total -= sizes[path]
+                evicted += 1
+        if total > self.config.max_bytes:
+            logger.warning(f"Run archive is {total} bytes, over its {self.config.max_bytes} byte cap with today's runs alone")
+        return evicted
+
+    def _evict_day(self, path: Path, day: str) -> bool:
+        try:
+            with closing(self._connect(self.index_path)) as conn:
+                removed = conn.execute("DELETE FROM runs WHERE day = ?", (day,)).rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Failed to drop index entries for {day}: {e}")
+            self._count('errors')
+            return False
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(f"{path}{suffix}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to delete {path}{suffix}: {e}")
+        logger.info(f"Evicted run archive {path.name} ({removed} runs)")
+        with self._lock:
+            self._stats['days_evicted'] += 1
+            self._stats['runs_evicted'] += removed
+        return True
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def get_entry(self, task_id) -> Optional[Dict]:
+        """Index entry of an archived run (None if it isn't archived)"""
+        with closing(self._connect(self.index_path)) as conn:
+            row = conn.execute("SELECT * FROM runs WHERE task_id = ?", (str(task_id),)).fetchone()
+        return dict(row) if row else None
+
+    def find_runs(self, success: Optional[bool] = None, failure_reason: Optional[str] = None,
+                  day: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """
+        Archived runs matching the filters, newest first
+
+        Args:
+            success: Only successful (True) or failed (False) runs
+            failure_reason: FailureReason value
+            day: YYYY-MM-DD the run finished
+            limit: Max entries
+
+        Returns:
+            Index entries
+        """
+        clauses, params = [], []
+        if success is not None:
+            clauses.append("success = ?")
+            params.append(int(success))
+        if failure_reason:
+            clauses.append("failure_reason = ?")
+            params.append(failure_reason)
+        if day:
+            clauses.append("day = ?")
+            params.append(day)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self._connect(self.index_path)) as conn:
+            rows = conn.execute(
+                f"SELECT * FROM runs {where} ORDER BY archived_at DESC, task_id LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_run(self, task_id, names: Optional[List[str]] = None) -> Optional[Dict[str, bytes]]:
+        """
+        Files of a run, from runs/ if it's still there, else from the archive
+
+        Args:
+            task_id: Task ID
+            names: Only these files (e.g. ['final_result.json'])
+
+        Returns:
+            {file name: contents} (None if the run is unknown)
+        """
+        run_dir = self.runs_dir / str(task_id)
+        if run_dir.is_dir():
+            return {
+                path.relative_to(run_dir).as_posix(): path.read_bytes()
+                for path in sorted(run_dir.rglob('*'))
+                if path.is_file() and (names is None or path.relative_to(run_dir).as_posix() in names)
+            }
+
+        entry = self.get_entry(task_id)
+        if entry is None or not self._day_path(entry['day']).exists():
+            return None
+        query = "SELECT name, encoding, data FROM files WHERE task_id = ?"
+        params = [str(task_id)]
+        if names is not None:
+            query += f" AND name IN ({','.join('?' * len(names))})"
+            params.extend(names)
+        with closing(self._connect(self._day_path(entry['day']))) as conn:
+            rows = {row['name']: row for row in conn.execute(query, params).fetchall()}
+            links = {name: bytes(row['data']).decode('utf-8') for name, row in rows.items() if row['encoding'] == 'link'}
+            missing = sorted(set(links.values()) - set(rows))
+            if missing:
+                rows.update({row['name']: row for row in conn.execute(
+                    f"SELECT name, encoding, data FROM files WHERE task_id = ? AND name IN "
+                    f"({','.join('?' * len(missing))})", (str(task_id), *missing)
+                ).fetchall()})
+
+        def decode(row) -> bytes:
+            if row['encoding'] == 'zlib':
+                return zlib.decompress(row['data'])
+            return bytes(row['data'])
+
+        files = {}
+        for name, row in rows.items():
+            if names is not None and name not in names:
+                continue
+            if name in links:
+                target = rows.get(links[name])
+                if target is not None and target['encoding'] != 'link':
+                    files[name] = decode(target)
+            else:
+                files[name] = decode(row)
+        return files
+
+    def get_file(self, task_id, name: str) -> Optional[bytes]:
+        """One file of a run (None if the run or file is unknown)"""
+        files = self.get_run(task_id, names=[name])
+        return files.get(name) if files else None
+
+    def extract_run(self, task_id, dest_dir: str) -> Optional[Path]:
+        """Write a run's files to dest_dir/<task_id> for tools that expect a run directory"""
+        files = self.get_run(task_id)
+        if files is None:
+            return None
+        target = Path(dest_dir) / str(task_id)
+        for name, data in files.items():
+            path = target / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        return target
+
+    # ------------------------------------------------------------------
+    # Background maintenance
+    # ------------------------------------------------------------------
+
+    def run_once(self) -> Dict:
+        """One archive + retention pass"""
+        return {'archived': self.archive_runs(), 'days_evicted': self.enforce_retention()}
+
+    def start(self, active_task_ids: Optional[Callable[[], Iterable]] = None):
+        """
+        Run archive/retention passes every config.interval seconds in a background thread
+
+        Args:
+            active_task_ids: Returns the task IDs of runs in progress in this
+                process; their directories are never archived
+        """
+        self._active_task_ids = active_task_ids
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="run-archive", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Run archive pass failed: {e}", exc_info=True)
+                self._count('errors')
+            self._stop.wait(self.config.interval)
+
+    def stop(self, timeout: float = 30.0):
+        """Stop the background thread (an ongoing pass finishes first)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def get_stats(self) -> Dict:
+        """Archive counters, archived runs and archive size"""
+        day_files = self._day_files()
+        try:
+            with closing(self._connect(self.index_path)) as conn:
+                indexed = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        except sqlite3.Error:
+            indexed = None
+        with self._lock:
+            stats = dict(self._stats)
+        stats['runs_indexed'] = indexed
+        stats['days'] = len(day_files)
+        stats['archive_bytes'] = sum(self._day_size(path) for path in day_files)
+        return stats
+
+
+# Global instance
+_run_archive = None
+
+
+def get_run_archive(config: Optional[RunArchiveConfig] = None) -> RunArchive:
+    """Get global run archive instance"""
+    global _run_archive
+    if _run_archive is None:
+        _run_archive = RunArchive(config)
+    return _run_archive
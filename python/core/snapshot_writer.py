@@ -0,0 +1,288 @@
+"""
+Telemetry Snapshot Writer
+
+DOM/screenshot snapshots for Telemetry.save_snapshot(). The task thread only
+captures the page once (page.content() and one screenshot, which the browser
+encodes); DOM compression, image re-encoding and disk writes run on a
+background thread.
+
+- The timestamped files are written once; the "latest" names
+  (dom_snapshot.html.gz, screenshot.jpg, ...) are hard links to them, or a
+  symlink/copy where links aren't supported.
+- DOM: gzip, zstd (needs zstandard) or none. Screenshot: jpeg, png or webp
+  (re-encoded from png with Pillow), full page or viewport only.
+- Policy: 'always', 'failures' or 'off'. With 'failures', snapshots of runs
+  whose outcome isn't known yet are held in memory until finalize_run() and
+  only written if the run failed.
+"""
+
+import os
+import io
+import gzip
+import time
+import shutil
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_POLICIES = ('always', 'failures', 'off')
+DOM_EXTENSIONS = {'gzip': '.html.gz', 'zstd': '.html.zst', 'none': '.html'}
+IMAGE_EXTENSIONS = {'jpeg': '.jpg', 'png': '.png', 'webp': '.webp'}
+
+
+@dataclass
+class SnapshotConfig:
+    """Snapshot configuration"""
+    policy: str = 'always'  # One of SNAPSHOT_POLICIES
+    dom_compression: str = 'gzip'  # gzip, zstd or none
+    image_format: str = 'jpeg'  # jpeg, png or webp
+    image_quality: int = 70  # jpeg/webp quality
+    full_page: bool = True  # False: viewport only
+
+    @classmethod
+    def from_env(cls) -> 'SnapshotConfig':
+        """Build config from SNAPSHOT_* environment variables"""
+        return cls(
+            policy=os.getenv('SNAPSHOT_POLICY', 'always').lower(),
+            dom_compression=os.getenv('SNAPSHOT_DOM_COMPRESSION', 'gzip').lower(),
+            image_format=os.getenv('SNAPSHOT_IMAGE_FORMAT', 'jpeg').lower(),
+            image_quality=int(os.getenv('SNAPSHOT_IMAGE_QUALITY', '70')),
+            full_page=os.getenv('SNAPSHOT_FULL_PAGE', 'true').lower() in ('true', '1', 'yes'),
+        )
+
+
+@dataclass
+class _Capture:
+    """Raw page state, encoded and written later"""
+    run_dir: Path
+    name_prefix: str
+    timestamp: str
+    dom: Optional[str]
+    screenshot: Optional[bytes]
+
+
+class SnapshotWriter:
+    """
+    Captures snapshots on the caller's thread and writes them in the background.
+
+    capture() for each snapshot, finish_run() from finalize_run() to write or
+    drop held snapshots and wait for the run's pending writes.
+    """
+
+    def __init__(self, config: Optional[SnapshotConfig] = None):
+        self.config = config or SnapshotConfig.from_env()
+        if self.config.policy not in SNAPSHOT_POLICIES:
+            logger.warning(f"Unknown SNAPSHOT_POLICY '{self.config.policy}', using 'always'")
+            self.config.policy = 'always'
+        if self.config.dom_compression not in DOM_EXTENSIONS or (
+                self.config.dom_compression == 'zstd' and not ZSTD_AVAILABLE):
+            logger.warning(f"DOM compression '{self.config.dom_compression}' not available, using gzip")
+            self.config.dom_compression = 'gzip'
+        if self.config.image_format not in IMAGE_EXTENSIONS or (
+                self.config.image_format == 'webp' and not PIL_AVAILABLE):
+            logger.warning(f"Screenshot format '{self.config.image_format}' not available, using jpeg")
+            self.config.image_format = 'jpeg'
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshot-writer')
+        self._lock = threading.Lock()
+        self._pending: Dict[Path, List[Future]] = {}
+        self._held: Dict[Path, List[_Capture]] = {}
+        self._stats = {
+            'captured': 0,
+            'skipped': 0,
+            'held': 0,
+            'discarded': 0,
+            'written': 0,
+            'write_errors': 0,
+            'bytes_written': 0,
+        }
+        self._capture_seconds = 0.0
+        self._write_seconds = 0.0
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _paths(self, capture: _Capture) -> Dict[str, Path]:
+        dom_ext = DOM_EXTENSIONS[self.config.dom_compression]
+        image_ext = IMAGE_EXTENSIONS[self.config.image_format]
+        prefix = f"{capture.name_prefix}_%s_{capture.timestamp}"
+        return {
+            'dom_snapshot': capture.run_dir / (prefix % 'dom' + dom_ext),
+            'dom_latest': capture.run_dir / ('dom_snapshot' + dom_ext),
+            'screenshot': capture.run_dir / (prefix % 'screenshot' + image_ext),
+            'screenshot_latest': capture.run_dir / ('screenshot' + image_ext),
+        }
+
+    def capture(self, page, run_dir: Path, name_prefix: str = "snapshot",
+                success: Optional[bool] = None) -> Dict[str, Optional[str]]:
+        """
+        Capture the page's DOM and a screenshot
+
+        Args:
+            page: Playwright Page object
+            run_dir: Run directory the files go to
+            name_prefix: Prefix for snapshot files
+            success: Run outcome if already known (None: decided by finish_run)
+
+        Returns:
+            Dict with the paths the files are written to (None if not captured
+            or skipped). Files are written in the background and, under the
+            'failures' policy, only if the run fails.
+        """
+        result = {'dom_snapshot': None, 'screenshot': None}
+        policy = self.config.policy
+        if policy == 'off' or (policy == 'failures' and success):
+            self._count('skipped')
+            return result
+
+        start = time.perf_counter()
+        capture = _Capture(
+            run_dir=run_dir,
+            name_prefix=name_prefix,
+            timestamp=datetime.utcnow().strftime('%Y%m%d_%H%M%S'),
+            dom=None,
+            screenshot=None,
+        )
+        try:
+            capture.dom = page.content()
+        except Exception as e:
+            logger.warning(f"Failed to capture DOM snapshot in {run_dir}: {e}")
+        try:
+            if self.config.image_format == 'jpeg':
+                capture.screenshot = page.screenshot(
+                    type='jpeg', quality=self.config.image_quality, full_page=self.config.full_page)
+            else:
+                capture.screenshot = page.screenshot(type='png', full_page=self.config.full_page)
+        except Exception as e:
+            logger.warning(f"Failed to capture screenshot in {run_dir}: {e}")
+
+        with self._lock:
+            self._stats['captured'] += 1
+            self._capture_seconds += time.perf_counter() - start
+            if policy == 'failures' and success is None:
+                self._held.setdefault(run_dir, []).append(capture)
+                self._stats['held'] += 1
+            else:
+                self._pending.setdefault(run_dir, []).append(self._executor.submit(self._write, capture))
+
+        paths = self._paths(capture)
+        if capture.dom is not None:
+            result['dom_snapshot'] = str(paths['dom_snapshot'])
+        if capture.screenshot is not None:
+            result['screenshot'] = str(paths['screenshot'])
+        return result
+
+    def finish_run(self, run_dir: Path, success: bool, timeout: float = 10.0) -> bool:
+        """
+        Write (failed run) or drop (successful run) held snapshots, then wait
+        for the run's snapshot writes
+
+        Returns:
+            True if every write finished within the timeout
+        """
+        with self._lock:
+            held = self._held.pop(run_dir, [])
+            if success:
+                self._stats['discarded'] += len(held)
+                held = []
+            futures = self._pending.pop(run_dir, [])
+            futures.extend(self._executor.submit(self._write, capture) for capture in held)
+        if not futures:
+            return True
+        _, not_done = wait(futures, timeout=timeout)
+        return not not_done
+
+    def write_held(self):
+        """Write every held snapshot on this thread (at exit, for runs that never finished)"""
+        with self._lock:
+            held = [capture for captures in self._held.values() for capture in captures]
+            self._held.clear()
+        for capture in held:
+            self._write(capture)
+
+    def _write(self, capture: _Capture):
+        """Encode and write one snapshot, then point the "latest" names at it"""
+        start = time.perf_counter()
+        paths = self._paths(capture)
+        written = 0
+        if capture.dom is not None:
+            written += self._write_file(paths['dom_snapshot'], paths['dom_latest'], self._encode_dom(capture.dom))
+        if capture.screenshot is not None:
+            try:
+                image = self._encode_image(capture.screenshot)
+            except Exception as e:
+                logger.warning(f"Failed to encode screenshot {paths['screenshot']}: {e}")
+                self._count('write_errors')
+            else:
+                written += self._write_file(paths['screenshot'], paths['screenshot_latest'], image)
+        with self._lock:
+            self._stats['written'] += 1
+            self._stats['bytes_written'] += written
+            self._write_seconds += time.perf_counter() - start
+
+    def _encode_dom(self, dom: str) -> bytes:
+        data = dom.encode('utf-8')
+        if self.config.dom_compression == 'gzip':
+            return gzip.compress(data, compresslevel=6)
+        if self.config.dom_compression == 'zstd':
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return data
+
+    def _encode_image(self, screenshot: bytes) -> bytes:
+        if self.config.image_format != 'webp':
+            return screenshot
+        output = io.BytesIO()
+        Image.open(io.BytesIO(screenshot)).save(output, 'WEBP', quality=self.config.image_quality)
+        return output.getvalue()
+
+    def _write_file(self, path: Path, latest: Path, data: bytes) -> int:
+        """Write data to path and link latest to it; returns bytes written"""
+        try:
+            with open(path, 'wb') as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning(f"Failed to write snapshot {path}: {e}")
+            self._count('write_errors')
+            return 0
+        try:
+            latest.unlink(missing_ok=True)
+            try:
+                os.link(path, latest)
+            except OSError:
+                try:
+                    latest.symlink_to(path.name)
+                except OSError:
+                    shutil.copyfile(path, latest)
+        except OSError as e:
+            logger.warning(f"Failed to update {latest}: {e}")
+        return len(data)
+
+    def get_stats(self) -> Dict:
+        """Snapshot counters and cost per snapshot (milliseconds) on the task thread and in the writer"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['held_now'] = sum(len(captures) for captures in self._held.values())
+            stats['capture_ms'] = round(self._capture_seconds / max(stats['captured'], 1) * 1e3, 1)
+            stats['write_ms'] = round(self._write_seconds / max(stats['written'], 1) * 1e3, 1)
+        return stats
@@ -5,6 +5,7 @@ Detects page state: overlays, modals, login requirements, registration hints, et
 """
 
 import re
+import time
 import logging
 from typing import Dict, Optional, List
 from playwright.sync_api import Page
@@ -38,6 +39,10 @@ class PageState:
         
         # Intent guess
         self.intent_guess = "unknown"  # login, comment, profile, forum, guest, unknown
+        
+        # Analysis cost
+        self.analysis_ms: Optional[float] = None
+        self.analysis_method = "dom_scan"  # dom_scan (single evaluate) or legacy (per-selector calls)
     
     def to_dict(self) -> Dict:
         """Convert to dictionary"""
@@ -55,6 +60,8 @@ class PageState:
             'blocked_hints': self.blocked_hints,
             'bot_check_hints': self.bot_check_hints,
             'intent_guess': self.intent_guess,
+            'analysis_ms': self.analysis_ms,
+            'analysis_method': self.analysis_method,
         }
 
 
@@ -194,18 +201,202 @@ class StateDetector:
         'form[action*="submit" i]',
     ]
     
+    OVERLAY_SELECTORS = [
+        '[class*="overlay"]',
+        '[id*="overlay"]',
+        '[class*="backdrop"]',
+        '[id*="backdrop"]',
+        '[class*="mask"]',
+        '[id*="mask"]',
+    ]
+    
+    # Text keywords (matched against lowercased page HTML or element text)
+    COOKIE_TEXT_KEYWORDS = ['cookie', 'consent', 'privacy', 'gdpr']
+    NEWSLETTER_KEYWORDS = ['newsletter', 'subscribe', 'email updates', 'sign up']
+    AUTH_WALL_KEYWORDS = [
+        'please log in',
+        'login required',
+        'sign in to continue',
+        'you must be logged in',
+        'authentication required',
+    ]
+    REGISTRATION_KEYWORDS = ['register', 'sign up', 'create account', 'join us']
+    EMAIL_VERIFICATION_KEYWORDS = [
+        'verify your email',
+        'confirm your email',
+        'check your inbox',
+        'email verification',
+    ]
+    
+    # Single in-page pass computing every PageState flag. Visibility follows
+    # Playwright's definition (non-empty box, not visibility:hidden).
+    DOM_SCAN_SCRIPT = """
+    (cfg) => {
+        const started = performance.now();
+        const html = document.documentElement ? document.documentElement.outerHTML.toLowerCase() : '';
+        const query = (selector) => {
+            try { return Array.from(document.querySelectorAll(selector)); } catch (e) { return []; }
+        };
+        const queryAll = (selectors) => {
+            const seen = new Set();
+            for (const selector of selectors) {
+                for (const el of query(selector)) seen.add(el);
+            }
+            return Array.from(seen);
+        };
+        const anyMatch = (selectors) => selectors.some((selector) => {
+            try { return document.querySelector(selector) !== null; } catch (e) { return false; }
+        });
+        const isVisible = (el) => {
+            const rect = el.getBoundingClientRect();
+            if (rect.width <= 0 || rect.height <= 0) return false;
+            return window.getComputedStyle(el).visibility !== 'hidden';
+        };
+        const textOf = (el) => (el.innerText || '').toLowerCase();
+        const hasKeyword = (text, keywords) => keywords.some((k) => text.includes(k));
+        const matchesPattern = (patterns) => patterns.some((p) => {
+            try { return new RegExp(p, 'i').test(html); } catch (e) { return false; }
+        });
+
+        // Same check as _detect_email_verification: one combined selector, whose text= entries
+        // make it invalid, so it throws before the keyword check (RuntimeAgent fails profile
+        // tasks on this flag; a working check would hit every confirm_password field)
+        const emailVerificationHints = () => {
+            try {
+                return document.querySelectorAll(cfg.emailVerification).length > 0
+                    || hasKeyword(html, cfg.emailVerificationKeywords);
+            } catch (e) { return false; }
+        };
+
+        const visibleModals = queryAll(cfg.modal).filter(isVisible);
+
+        const loginRequired = anyMatch(cfg.login) || hasKeyword(html, cfg.authWallKeywords);
+
+        let intent = 'unknown';
+        if (anyMatch(cfg.comment)) intent = 'comment';
+        else if (anyMatch(cfg.profile)) intent = 'profile';
+        else if (anyMatch(cfg.forum)) intent = 'forum';
+        else if (anyMatch(cfg.guest)) intent = 'guest';
+        else if (loginRequired) intent = 'login';
+
+        return {
+            overlay_present: queryAll(cfg.overlay).some(isVisible),
+            modal_present: visibleModals.length > 0,
+            cookie_banner_present: queryAll(cfg.cookie).some(
+                (el) => isVisible(el) && hasKeyword(textOf(el), cfg.cookieKeywords)),
+            newsletter_modal_present: hasKeyword(html, cfg.newsletterKeywords) && visibleModals.some(
+                (el) => hasKeyword(textOf(el), cfg.newsletterKeywords)),
+            login_modal_present: visibleModals.some(
+                (el) => el.querySelector('input[type="email"], input[type="password"]') !== null),
+            login_required: loginRequired,
+            registration_hints: anyMatch(cfg.registration) || hasKeyword(html, cfg.registrationKeywords),
+            email_verification_hints: emailVerificationHints(),
+            iframe_count: document.querySelectorAll('iframe').length,
+            captcha_present: anyMatch(cfg.captcha) || html.includes('recaptcha') || html.includes('hcaptcha'),
+            blocked_hints: matchesPattern(cfg.blockedPatterns) || anyMatch(cfg.blocked),
+            bot_check_hints: matchesPattern(cfg.botCheckPatterns) || anyMatch(cfg.botCheck),
+            intent_guess: intent,
+            scan_ms: performance.now() - started,
+        };
+    }
+    """
+    
+    SCAN_FLAGS = [
+        'overlay_present', 'modal_present', 'cookie_banner_present', 'newsletter_modal_present',
+        'login_modal_present', 'login_required', 'registration_hints', 'email_verification_hints',
+        'iframe_count', 'captcha_present', 'blocked_hints', 'bot_check_hints', 'intent_guess',
+    ]
+    
+    _scan_config: Optional[Dict] = None
+    
     @classmethod
     def analyze(cls, page: Page) -> PageState:
         """
         Analyze page state
         
+        Runs one in-page DOM scan (single evaluate round-trip); falls back to
+        per-selector queries if the scan cannot run.
+        
         Args:
             page: Playwright Page object
         
         Returns:
-            PageState object
+            PageState object (analysis_ms holds the wall-clock cost)
         """
+        start = time.time()
+        
+        try:
+            state = cls._analyze_dom_scan(page)
+        except Exception as e:
+            logger.debug(f"DOM scan failed, using per-selector analysis: {e}")
+            state = cls._analyze_legacy(page)
+        
+        state.analysis_ms = round((time.time() - start) * 1000, 1)
+        logger.debug(f"Page state analyzed in {state.analysis_ms}ms ({state.analysis_method})")
+        return state
+    
+    @classmethod
+    def _get_scan_config(cls) -> Dict:
+        """Selector/keyword lists passed to DOM_SCAN_SCRIPT (built once)"""
+        if cls._scan_config is None:
+            def split(indicators):
+                selectors = [i for i in indicators if not i.startswith('text=')]
+                patterns = [cls._text_pattern(i) for i in indicators if i.startswith('text=')]
+                return selectors, patterns
+            
+            blocked_selectors, blocked_patterns = split(cls.BLOCKED_INDICATORS)
+            bot_check_selectors, bot_check_patterns = split(cls.BOT_CHECK_INDICATORS)
+            
+            cls._scan_config = {
+                'overlay': cls.OVERLAY_SELECTORS,
+                'modal': cls.MODAL_SELECTORS,
+                'cookie': cls.COOKIE_BANNER_SELECTORS,
+                'login': cls.LOGIN_SELECTORS,
+                'registration': cls.REGISTRATION_SELECTORS,
+                'emailVerification': ', '.join(cls.EMAIL_VERIFICATION_SELECTORS),
+                'captcha': cls.CAPTCHA_SELECTORS,
+                'blocked': blocked_selectors,
+                'blockedPatterns': blocked_patterns,
+                'botCheck': bot_check_selectors,
+                'botCheckPatterns': bot_check_patterns,
+                'comment': cls.COMMENT_INDICATORS,
+                'profile': cls.PROFILE_INDICATORS,
+                'forum': cls.FORUM_INDICATORS,
+                'guest': cls.GUEST_POST_INDICATORS,
+                'cookieKeywords': cls.COOKIE_TEXT_KEYWORDS,
+                'newsletterKeywords': cls.NEWSLETTER_KEYWORDS,
+                'authWallKeywords': cls.AUTH_WALL_KEYWORDS,
+                'registrationKeywords': cls.REGISTRATION_KEYWORDS,
+                'emailVerificationKeywords': cls.EMAIL_VERIFICATION_KEYWORDS,
+            }
+        return cls._scan_config
+    
+    @staticmethod
+    def _text_pattern(indicator: str) -> str:
+        """Extract the regex from a 'text=/pattern/flags' indicator"""
+        pattern = indicator[5:]
+        if pattern.startswith('/') and '/' in pattern[1:]:
+            pattern = pattern[1:pattern.rindex('/')]
+        return pattern
+    
+    @classmethod
+    def _analyze_dom_scan(cls, page: Page) -> PageState:
+        """Compute every PageState flag in a single page.evaluate call"""
+        result = page.evaluate(cls.DOM_SCAN_SCRIPT, cls._get_scan_config())
+        logger.debug(f"In-page DOM scan took {result.get('scan_ms', 0):.1f}ms")
+        
         state = PageState()
+        for flag in cls.SCAN_FLAGS:
+            setattr(state, flag, result[flag])
+        state.iframe_count = int(state.iframe_count)
+        state.analysis_method = "dom_scan"
+        return state
+    
+    @classmethod
+    def _analyze_legacy(cls, page: Page) -> PageState:
+        """Analyze page state with one query per selector (slow, many round-trips)"""
+        state = PageState()
+        state.analysis_method = "legacy"
         
         try:
             # Get page content
@@ -245,16 +436,7 @@ class StateDetector:
         """Detect if overlay is present"""
         try:
             # Check for common overlay patterns
-            overlay_selectors = [
-                '[class*="overlay"]',
-                '[id*="overlay"]',
-                '[class*="backdrop"]',
-                '[id*="backdrop"]',
-                '[class*="mask"]',
-                '[id*="mask"]',
-            ]
-            
-            for selector in overlay_selectors:
+            for selector in cls.OVERLAY_SELECTORS:
                 try:
                     elements = page.query_selector_all(selector)
                     for element in elements:
@@ -293,7 +475,7 @@ class StateDetector:
                     if element.is_visible():
                         # Check if it contains cookie-related text
                         text = element.inner_text().lower()
-                        if any(word in text for word in ['cookie', 'consent', 'privacy', 'gdpr']):
+                        if any(word in text for word in cls.COOKIE_TEXT_KEYWORDS):
                             return True
         except:
             pass
@@ -304,7 +486,7 @@ class StateDetector:
         """Detect newsletter modal"""
         try:
             # Check for newsletter-related text
-            newsletter_keywords = ['newsletter', 'subscribe', 'email updates', 'sign up']
+            newsletter_keywords = cls.NEWSLETTER_KEYWORDS
             if any(keyword in content_lower for keyword in newsletter_keywords):
                 # Check if modal is visible
                 for selector in cls.MODAL_SELECTORS:
@@ -345,14 +527,7 @@ class StateDetector:
                 return True
             
             # Check for auth wall text
-            auth_wall_keywords = [
-                'please log in',
-                'login required',
-                'sign in to continue',
-                'you must be logged in',
-                'authentication required',
-            ]
-            if any(keyword in content_lower for keyword in auth_wall_keywords):
+            if any(keyword in content_lower for keyword in cls.AUTH_WALL_KEYWORDS):
                 return True
         except:
             pass
@@ -368,8 +543,7 @@ class StateDetector:
                 return True
             
             # Check for registration text
-            reg_keywords = ['register', 'sign up', 'create account', 'join us']
-            if any(keyword in content_lower for keyword in reg_keywords):
+            if any(keyword in content_lower for keyword in cls.REGISTRATION_KEYWORDS):
                 return True
         except:
             pass
@@ -385,13 +559,7 @@ class StateDetector:
                 return True
             
             # Check for verification text
-            verif_keywords = [
-                'verify your email',
-                'confirm your email',
-                'check your inbox',
-                'email verification',
-            ]
-            if any(keyword in content_lower for keyword in verif_keywords):
+            if any(keyword in content_lower for keyword in cls.EMAIL_VERIFICATION_KEYWORDS):
                 return True
         except:
             pass
@@ -422,7 +590,7 @@ class StateDetector:
                 try:
                     if indicator.startswith('text='):
                         # Text pattern
-                        pattern = indicator[5:].strip('/')
+                        pattern = cls._text_pattern(indicator)
                         if re.search(pattern, content_lower, re.IGNORECASE):
                             return True
                     else:
@@ -445,7 +613,7 @@ class StateDetector:
                 try:
                     if indicator.startswith('text='):
                         # Text pattern
-                        pattern = indicator[5:].strip('/')
+                        pattern = cls._text_pattern(indicator)
                         if re.search(pattern, content_lower, re.IGNORECASE):
                             return True
                     else:
@@ -0,0 +1,417 @@
+"""
+Task Delivery
+
+How the worker's poll loop learns about new tasks:
+
+- poll: claim, then sleep poll_interval (the original behaviour)
+- long_poll: the server holds each claim until a task is pending (up to
+  long_poll_wait seconds), so a new task starts as soon as it is created and
+  an idle worker makes one request per hold period
+- redis: idle workers block on the Redis list Laravel pushes pending task IDs
+  to and only claim when woken, plus a safety claim every idle_claim_interval
+
+Waits between claims come from AdaptivePollScheduler: none after a full
+batch (more tasks are probably waiting), poll_interval after a partial one,
+and exponential backoff with jitter while claims come back empty. No claim is
+made during a 429 Retry-After pause or while the request budget is reserved
+for task calls.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from core.rate_limiter import PRIORITY_POLL
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MODE_POLL = 'poll'
+MODE_LONG_POLL = 'long_poll'
+MODE_REDIS = 'redis'
+DELIVERY_MODES = (MODE_POLL, MODE_LONG_POLL, MODE_REDIS)
+
+# Longest single block on the notifier, so a stop request is noticed quickly
+NOTIFY_WAIT_CHUNK_SECONDS = 2.0
+
+
+@dataclass
+class TaskDeliveryConfig:
+    """Task delivery configuration"""
+    mode: str = MODE_LONG_POLL
+    long_poll_wait: int = 10  # Seconds the server may hold a claim
+    idle_claim_interval: float = 300.0  # redis: claim anyway after this long without a notification
+    redis_url: Optional[str] = None
+    redis_key: str = 'automation:tasks:ready'  # Unprefixed (Laravel's task_notifications connection)
+    poll_max_interval: float = 120.0  # Longest wait between empty claims
+    poll_backoff_factor: float = 2.0  # Wait multiplier per consecutive empty claim
+    poll_jitter: float = 0.2  # +/- fraction of random spread on backoff waits
+
+    @classmethod
+    def from_env(cls) -> 'TaskDeliveryConfig':
+        """Build config from TASK_DELIVERY_* / REDIS_* environment variables"""
+        redis_url = os.getenv('REDIS_URL')
+        if not redis_url and os.getenv('REDIS_HOST'):
+            password = os.getenv('REDIS_PASSWORD')
+            auth = f":{password}@" if password and password.lower() != 'null' else ''
+            redis_url = (f"redis://{auth}{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT', '6379')}"
+                         f"/{os.getenv('REDIS_DB', '0')}")
+        return cls(
+            mode=os.getenv('TASK_DELIVERY_MODE', MODE_LONG_POLL).lower(),
+            long_poll_wait=int(os.getenv('TASK_LONG_POLL_WAIT', '10')),
+            idle_claim_interval=float(os.getenv('TASK_DELIVERY_IDLE_CLAIM_INTERVAL', '300')),
+            redis_url=redis_url,
+            redis_key=os.getenv('TASK_READY_REDIS_KEY', 'automation:tasks:ready'),
+            poll_max_interval=float(os.getenv('TASK_POLL_MAX_INTERVAL', '120')),
+            poll_backoff_factor=float(os.getenv('TASK_POLL_BACKOFF_FACTOR', '2.0')),
+            poll_jitter=float(os.getenv('TASK_POLL_JITTER', '0.2')),
+        )
+
+
+def _parse_timestamp(value) -> Optional[float]:
+    """Unix time of an ISO 8601 timestamp from the API, or None"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class AdaptivePollScheduler:
+    """
+    Decides how long to wait before the next claim.
+
+    Tracks consecutive empty claims for the backoff, the 429 pause and the
+    client-side poll budget, plus metrics for the latency/budget trade-off:
+    how long claimed tasks had been queued and how many claims found nothing.
+    """
+
+    def __init__(self, max_interval: float = 120.0, backoff_factor: float = 2.0,
+                 jitter: float = 0.2, rate_limiter=None, window: int = 500):
+        """
+        Args:
+            max_interval: Cap on the backoff wait in seconds
+            backoff_factor: Wait multiplier per consecutive empty claim
+            jitter: +/- fraction of random spread on backoff waits
+            rate_limiter: TokenBucketRateLimiter whose poll budget to respect
+            window: Recent queue waits kept for percentiles
+        """
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.rate_limiter = rate_limiter
+
+        self._lock = threading.Lock()
+        self._empty_streak = 0
+        self._paused_until = 0.0  # monotonic time
+        self._queue_waits = deque(maxlen=window)
+        self._started = time.monotonic()
+        self._counters = {
+            'claims': 0,
+            'idle_claims': 0,
+            'full_claims': 0,
+            'tasks': 0,
+            'skipped_for_budget': 0,
+            'slept_seconds': 0.0,
+        }
+
+    def record_claim(self, tasks: List[Dict], limit: int):
+        """Update backoff state and metrics after a claim request"""
+        now = time.time()
+        with self._lock:
+            self._counters['claims'] += 1
+            self._counters['tasks'] += len(tasks)
+            if not tasks:
+                self._counters['idle_claims'] += 1
+                self._empty_streak += 1
+                return
+            self._empty_streak = 0
+            if len(tasks) >= limit:
+                self._counters['full_claims'] += 1
+            for task in tasks:
+                # Retried tasks keep their original created_at, which isn't queue wait
+                created_at = _parse_timestamp(task.get('created_at'))
+                if created_at is not None and not task.get('retry_count'):
+                    self._queue_waits.append(max(now - created_at, 0.0))
+
+    def record_budget_skip(self):
+        """Count a claim skipped because the request budget didn't allow it"""
+        with self._lock:
+            self._counters['skipped_for_budget'] += 1
+
+    def record_sleep(self, seconds: float):
+        with self._lock:
+            self._counters['slept_seconds'] += seconds
+
+    def on_rate_limited(self, retry_after: float):
+        """Hold claims until a 429's Retry-After has passed"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + max(float(retry_after), 0.0))
+
+    def required_delay(self) -> float:
+        """Seconds before any claim is allowed (429 pause, poll budget)"""
+        with self._lock:
+            delay = max(self._paused_until - time.monotonic(), 0.0)
+        if self.rate_limiter:
+            delay = max(delay, self.rate_limiter.time_until_available(PRIORITY_POLL, route='tasks'))
+        return delay
+
+    def next_delay(self, base_interval: float) -> float:
+        """
+        Wait before the next claim after a partial or empty batch
+
+        Args:
+            base_interval: Wait after a partial batch / the first empty claim
+        """
+        with self._lock:
+            streak = self._empty_streak
+        delay = base_interval
+        if streak > 1:
+            # Jitter keeps workers that went idle together from polling in lockstep
+            delay = base_interval * self.backoff_factor ** (streak - 1)
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+            delay = min(delay, max(self.max_interval, base_interval))
+        return max(delay, self.required_delay())
+
+    def get_stats(self) -> Dict:
+        """Claim counters, backoff state and queue wait percentiles"""
+        with self._lock:
+            waits = sorted(self._queue_waits)
+            counters = dict(self._counters)
+            streak = self._empty_streak
+        hours = max(time.monotonic() - self._started, 1.0) / 3600
+
+        def percentile(fraction):
+            return round(waits[min(int(len(waits) * fraction), len(waits) - 1)], 1) if waits else None
+
+        return {
+            **counters,
+            'slept_seconds': round(counters['slept_seconds'], 1),
+            'empty_streak': streak,
+            'idle_claims_per_hour': round(counters['idle_claims'] / hours, 1),
+            'queue_wait_seconds': {
+                'samples': len(waits),
+                'avg': round(sum(waits) / len(waits), 1) if waits else None,
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(waits[-1], 1) if waits else None,
+            },
+        }
+
+
+class RedisTaskNotifier:
+    """Blocks on the Redis list Laravel's TaskReadyNotifier pushes task IDs to"""
+
+    def __init__(self, url: str, key: str):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package not installed (pip install redis)")
+        self.key = key
+        self.client = redis.Redis.from_url(url, socket_timeout=NOTIFY_WAIT_CHUNK_SECONDS + 5,
+                                           socket_connect_timeout=5)
+        self.client.ping()
+
+    def notify(self, task_id: Optional[int] = None):
+        self.client.rpush(self.key, task_id or 0)
+
+    def wait(self, timeout: float) -> bool:
+        """Block until notified (True) or timeout (False)"""
+        return self.client.blpop([self.key], timeout=max(timeout, 0.1)) is not None
+
+    def discard(self, task_ids: Iterable[int]):
+        """Drop notifications for tasks that were already claimed"""
+        pipe = self.client.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.lrem(self.key, 0, task_id)
+        pipe.execute()
+
+
+class TaskDelivery:
+    """
+    Claims tasks and waits for more according to the delivery mode.
+
+    The poll loop calls claim(), dispatches the tasks, then wait_for_tasks().
+    """
+
+    def __init__(self, api_client, worker_id: str, type_priority: Optional[List[str]] = None,
+                 config: Optional[TaskDeliveryConfig] = None, notifier=None, fair_scheduler=None,
+                 duration_estimator=None):
+        """
+        Args:
+            api_client: LaravelAPIClient used to claim tasks
+            worker_id: Worker that will own the claimed tasks
+            type_priority: Task types to claim first (ignored with a fair_scheduler)
+            config: Delivery config (default: from environment)
+            notifier: Notifier for redis mode (default: RedisTaskNotifier from config)
+            fair_scheduler: WeightedFairScheduler that splits and orders each batch
+            duration_estimator: DurationEstimator for shortest-expected-job-first
+                                ordering when there is no fair_scheduler
+        """
+        self.api_client = api_client
+        self.worker_id = worker_id
+        self.type_priority = list(type_priority or [])
+        self.fair_scheduler = fair_scheduler
+        self.duration_estimator = duration_estimator
+        self.config = config or TaskDeliveryConfig.from_env()
+        self.mode = self.config.mode
+
+        if self.mode not in DELIVERY_MODES:
+            logger.warning(f"Unknown task delivery mode '{self.mode}', using {MODE_POLL}")
+            self.mode = MODE_POLL
+
+        self.notifier = notifier
+        if self.mode == MODE_REDIS and self.notifier is None:
+            self.notifier = self._connect_redis()
+            if self.notifier is None:
+                self.mode = MODE_LONG_POLL
+
+        self.scheduler = AdaptivePollScheduler(
+            max_interval=self.config.poll_max_interval,
+            backoff_factor=self.config.poll_backoff_factor,
+            jitter=self.config.poll_jitter,
+            rate_limiter=getattr(api_client, 'rate_limiter', None),
+        )
+
+        self._last_full = False
+        self._last_held = False
+        self._stats = {
+            'notifications': 0,
+            'safety_claims': 0,
+            'notifier_errors': 0,
+        }
+
+    def _connect_redis(self):
+        """Connect the Redis notifier, or None (with a warning) if it isn't usable"""
+        if not self.config.redis_url:
+            logger.warning("Redis task delivery needs REDIS_URL or REDIS_HOST, falling back to long-poll")
+            return None
+        try:
+            notifier = RedisTaskNotifier(self.config.redis_url, self.config.redis_key)
+            logger.info(f"Waiting for task notifications on Redis list {self.config.redis_key}")
+            return notifier
+        except Exception as e:
+            logger.warning(f"Redis task delivery unavailable ({e}), falling back to long-poll")
+            return None
+
+    def claim(self, limit: int, max_wait: Optional[float] = None) -> List[Dict]:
+        """
+        Claim up to `limit` tasks (held by the server in long_poll mode)
+
+        Returns [] without a request while a 429 pause or the poll budget
+        doesn't allow a claim.
+
+        Args:
+            limit: Max tasks to claim
+            max_wait: Cap on how long the server may hold the claim (seconds)
+        """
+        self._last_full = False
+        self._last_held = False
+        if self.scheduler.required_delay() > 0:
+            self.scheduler.record_budget_skip()
+            return []
+
+        wait = self.config.long_poll_wait if self.mode == MODE_LONG_POLL else 0
+        if max_wait is not None:
+            wait = max(min(wait, int(max_wait)), 0)
+        start = time.monotonic()
+        type_weights = self.fair_scheduler.type_weights() if self.fair_scheduler else None
+        tasks = self.api_client.claim_tasks(self.worker_id, limit=limit, type_priority=self.type_priority,
+                                            wait=wait, type_weights=type_weights)
+
+        self._last_full = len(tasks) >= limit
+        # An instant empty answer means the server doesn't hold claims - back off like poll mode
+        self._last_held = bool(tasks) or (wait > 0 and time.monotonic() - start >= wait / 2)
+        self.scheduler.record_claim(tasks, limit)
+
+        if tasks and self.notifier is not None:
+            self._discard_notifications(task['id'] for task in tasks)
+        if self.fair_scheduler:
+            tasks = self.fair_scheduler.order(tasks)
+        elif self.duration_estimator and len(tasks) > 1:
+            tasks = self.duration_estimator.order(tasks)
+        return tasks
+
+    def on_rate_limited(self, retry_after: float):
+        """Pause claims after a 429 (the rate limiter pauses too when enabled)"""
+        self.scheduler.on_rate_limited(retry_after)
+
+    def _discard_notifications(self, task_ids: Iterable[int]):
+        """Stop notifications for tasks this worker claimed from waking anyone"""
+        try:
+            self.notifier.discard(list(task_ids))
+        except Exception as e:
+            self._stats['notifier_errors'] += 1
+            logger.debug(f"Failed to discard task notifications: {e}")
+
+    def wait_for_tasks(self, stop_event: threading.Event, poll_interval: float,
+                       max_wait: Optional[float] = None):
+        """
+        Wait until the next claim is worthwhile (returns early if stop_event is set)
+
+        Args:
+            stop_event: Set when the worker is stopping
+            poll_interval: Wait after a partial batch, and the backoff base for empty ones
+            max_wait: Return after at most this many seconds (e.g. when deferred
+                      tasks become runnable); budget and 429 pauses still apply to claim()
+        """
+        if self._last_full or (self.mode == MODE_LONG_POLL and self._last_held):
+            # More tasks are probably pending, or the server already did the waiting
+            self._sleep(stop_event, self.scheduler.required_delay(), max_wait)
+            return
+        if self.mode == MODE_REDIS:
+            self._sleep(stop_event, self.scheduler.required_delay(), max_wait)
+            self._wait_for_notification(stop_event, poll_interval, max_wait)
+            return
+        self._sleep(stop_event, self.scheduler.next_delay(poll_interval), max_wait)
+
+    def _sleep(self, stop_event: threading.Event, seconds: float, max_wait: Optional[float] = None):
+        """Wait (interrupted by stop_event) and count the time slept"""
+        if max_wait is not None:
+            seconds = min(seconds, max_wait)
+        if seconds > 0:
+            start = time.monotonic()
+            stop_event.wait(seconds)
+            self.scheduler.record_sleep(time.monotonic() - start)
+
+    def _wait_for_notification(self, stop_event: threading.Event, poll_interval: float,
+                               max_wait: Optional[float] = None):
+        """Block on the notifier until woken, stopped, max_wait or idle_claim_interval passes"""
+        timeout = self.config.idle_claim_interval
+        capped = max_wait is not None and max_wait < timeout
+        deadline = time.monotonic() + (max_wait if capped else timeout)
+        while not stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if not capped:
+                    self._stats['safety_claims'] += 1
+                return
+            try:
+                if self.notifier.wait(min(NOTIFY_WAIT_CHUNK_SECONDS, remaining)):
+                    self._stats['notifications'] += 1
+                    return
+            except Exception as e:
+                # Redis down: poll with backoff until it's back
+                self._stats['notifier_errors'] += 1
+                delay = self.scheduler.next_delay(poll_interval)
+                logger.warning(f"Task notification wait failed ({e}), claiming again in {delay:.0f}s")
+                self._sleep(stop_event, delay, max_wait)
+                return
+
+    def get_stats(self) -> Dict:
+        """Delivery mode, claim counters and queue wait metrics"""
+        return {'mode': self.mode, **self._stats, **self.scheduler.get_stats()}
@@ -0,0 +1,206 @@
+"""
+Task Start Prefetch
+
+Runs the lookups a task needs before its first navigation side by side
+instead of one after another: the campaign -> proxy chain and opportunity
+selection go to a small shared thread pool while the slot thread prepares
+the browser (the proxy is a Chromium launch option, so only the launch
+itself waits for it).
+
+StartupTrace records when each startup step ran and on which thread, and
+reports the critical path to the first navigation.
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Startup steps and the steps each one waits for
+STEP_DEPENDENCIES = {
+    'campaign': (),
+    'proxies': ('campaign',),
+    'opportunity': (),
+    'browser_prepare': (),
+    'browser_setup': ('browser_prepare', 'proxies'),
+    'first_navigation': ('browser_setup', 'opportunity'),
+}
+
+
+class StartupTrace:
+    """
+    Timeline of one task's startup steps.
+
+    span() times a step, mark() records an instant (first_navigation). Only
+    the first occurrence of each step is kept, so retries don't hide the
+    startup timings.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._spans: Dict[str, Dict] = {}
+
+    def _record(self, name: str, start: float, end: float):
+        with self._lock:
+            if name not in self._spans:
+                self._spans[name] = {
+                    'start': start - self.started_at,
+                    'end': end - self.started_at,
+                    'thread': threading.current_thread().name,
+                }
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a startup step"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.monotonic())
+
+    def mark(self, name: str):
+        """Record an instant (zero-length step)"""
+        now = time.monotonic()
+        self._record(name, now, now)
+
+    def critical_path(self) -> List[str]:
+        """
+        Steps that determined when the last step finished
+
+        Walks back from first_navigation (or the last step to finish),
+        following the dependency that finished latest.
+        """
+        with self._lock:
+            spans = dict(self._spans)
+        if not spans:
+            return []
+        step = 'first_navigation' if 'first_navigation' in spans else max(spans, key=lambda s: spans[s]['end'])
+        path = [step]
+        while True:
+            dependencies = [d for d in STEP_DEPENDENCIES.get(step, ()) if d in spans]
+            if not dependencies:
+                break
+            step = max(dependencies, key=lambda d: spans[d]['end'])
+            path.append(step)
+        return list(reversed(path))
+
+    def to_dict(self) -> Dict:
+        """Spans (seconds since task start), critical path and time to first navigation"""
+        with self._lock:
+            spans = {
+                name: {
+                    'start': round(span['start'], 3),
+                    'seconds': round(span['end'] - span['start'], 3),
+                    'thread': span['thread'],
+                }
+                for name, span in sorted(self._spans.items(), key=lambda item: item[1]['start'])
+            }
+            navigation = self._spans.get('first_navigation')
+        return {
+            'time_to_first_navigation': round(navigation['end'], 3) if navigation else None,
+            # What the same steps cost run one after another
+            'serial_seconds': round(sum(span['seconds'] for span in spans.values()), 3),
+            'critical_path': self.critical_path(),
+            'spans': spans,
+        }
+
+
+class TaskLookups:
+    """
+    Campaign/proxy and opportunity lookups for one task, started on creation.
+
+    proxy() and the future from take_opportunity() re-raise lookup errors,
+    so callers keep their existing error handling.
+    """
+
+    def __init__(self, api_client, task: Dict, opportunity_selector=None,
+                 opportunity_type: Optional[str] = None, trace: Optional[StartupTrace] = None,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        """
+        Args:
+            api_client: LaravelAPIClient
+            task: Claimed task
+            opportunity_selector: OpportunitySelector to prefetch the opportunity with
+            opportunity_type: Task type to select the opportunity for (None: don't prefetch)
+            trace: StartupTrace the lookups are recorded in
+            executor: Thread pool (default: the shared prefetch pool)
+        """
+        self.api_client = api_client
+        self.task = task
+        self.opportunity_type = opportunity_type
+        self.trace = trace or StartupTrace()
+        executor = executor or get_prefetch_executor()
+
+        self._proxy_future: Future = executor.submit(self._lookup_proxy)
+        self._opportunity_future: Optional[Future] = None
+        if opportunity_selector is not None and opportunity_type and task.get('campaign_id'):
+            self._opportunity_future = executor.submit(
+                self._select_opportunity, opportunity_selector, task['campaign_id'], opportunity_type
+            )
+
+    def _lookup_proxy(self) -> Optional[Dict]:
+        """Campaign, then a proxy preferring the campaign's country"""
+        with self.trace.span('campaign'):
+            campaign = self.api_client.get_campaign(self.task['campaign_id'])
+        if not campaign:
+            raise ValueError(f"Campaign {self.task['campaign_id']} not found")
+
+        campaign_country = campaign.get('company_country') or campaign.get('country_name')
+        with self.trace.span('proxies'):
+            proxies = self.api_client.get_proxies(country=campaign_country, prefer_country=True)
+        return proxies[0] if proxies else None
+
+    def _select_opportunity(self, selector, campaign_id: int, task_type: str) -> Optional[Dict]:
+        with self.trace.span('opportunity'):
+            return selector.select_opportunity(campaign_id=campaign_id, task_type=task_type)
+
+    def proxy(self) -> Optional[Dict]:
+        """Proxy for the task (waits for the campaign/proxy lookups)"""
+        return self._proxy_future.result()
+
+    def opportunity_url(self) -> Optional[str]:
+        """
+        URL of the prefetched opportunity, waiting for the selection (None if
+        none was prefetched, the lookup failed or it was already taken)
+        """
+        future = self._opportunity_future
+        if future is None:
+            return None
+        try:
+            opportunity = future.result()
+        except Exception:
+            # take_opportunity() hands the same error to the automation
+            return None
+        return opportunity.get('url') if opportunity else None
+
+    def take_opportunity(self, task_type: str) -> Optional[Future]:
+        """
+        The prefetched opportunity selection, once (None if it wasn't prefetched
+        for this task type or was already taken)
+        """
+        if task_type != self.opportunity_type:
+            return None
+        future, self._opportunity_future = self._opportunity_future, None
+        return future
+
+
+_prefetch_executor: Optional[ThreadPoolExecutor] = None
+_prefetch_executor_lock = threading.Lock()
+
+
+def get_prefetch_executor() -> ThreadPoolExecutor:
+    """Shared thread pool for task start lookups (TASK_PREFETCH_WORKERS threads)"""
+    global _prefetch_executor
+    with _prefetch_executor_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv('TASK_PREFETCH_WORKERS', '8')),
+                thread_name_prefix='task-prefetch',
+            )
+        return _prefetch_executor
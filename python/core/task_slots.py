@@ -0,0 +1,213 @@
+"""
+Task Slots
+
+Runs several process_task calls at once on a bounded set of worker threads.
+Each slot owns its own Playwright driver/browser pool (sync Playwright objects
+are bound to the thread that created them).
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from core.browser_pool import get_browser_pool, close_browser_pool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SlotStats:
+    """Utilisation counters for one slot"""
+    slot_id: int
+    started_at: float
+    tasks_processed: int = 0
+    tasks_failed: int = 0
+    busy_seconds: float = 0.0
+    current_task_id: Optional[int] = None
+    current_task_started_at: Optional[float] = None
+
+    def get_busy_seconds(self, now: float) -> float:
+        """Busy time including the task currently running"""
+        busy = self.busy_seconds
+        if self.current_task_started_at is not None:
+            busy += now - self.current_task_started_at
+        return busy
+
+    def to_dict(self, now: float) -> Dict:
+        """Convert to dictionary (for logging)"""
+        uptime = max(now - self.started_at, 1e-9)
+        busy = self.get_busy_seconds(now)
+        return {
+            'slot_id': self.slot_id,
+            'tasks_processed': self.tasks_processed,
+            'tasks_failed': self.tasks_failed,
+            'busy_seconds': round(busy, 1),
+            'utilisation': round(busy / uptime, 3),
+            'current_task_id': self.current_task_id,
+        }
+
+
+class TaskSlotPool:
+    """
+    Bounded pool of task slots.
+
+    submit() blocks until a slot is free, so the worker never pulls more work
+    than it can start. drain() stops accepting tasks and waits for in-flight
+    tasks to finish (used for graceful SIGTERM shutdown).
+    """
+
+    def __init__(self, concurrency: int,
+                 handler: Callable[[Dict, Optional[object]], None],
+                 use_browser_pool: bool = True):
+        """
+        Initialize task slots
+
+        Args:
+            concurrency: Number of tasks that may run at once
+            handler: Function called as handler(task, browser_pool) in a slot thread
+            use_browser_pool: Give every slot its own warm browser pool
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+
+        self.concurrency = concurrency
+        self.handler = handler
+        self.use_browser_pool = use_browser_pool
+
+        self._free = threading.Semaphore(concurrency)
+        self._cond = threading.Condition()
+        self._pending: List[Dict] = []
+        self._accepting = True
+        self._started_at = time.time()
+        self._slots: List[SlotStats] = []
+        self._threads: List[threading.Thread] = []
+        self._browser_stats: Dict[int, Dict] = {}
+
+        for slot_id in range(concurrency):
+            stats = SlotStats(slot_id=slot_id, started_at=self._started_at)
+            self._slots.append(stats)
+            thread = threading.Thread(
+                target=self._slot_loop,
+                args=(stats,),
+                name=f"task-slot-{slot_id}",
+                daemon=True,
+            )
+            self._threads.append(thread)
+            thread.start()
+
+        logger.info(f"Started {concurrency} task slots")
+
+    def submit(self, task: Dict, timeout: Optional[float] = None) -> bool:
+        """
+        Hand a task to the next free slot
+
+        Args:
+            task: Task dict from the API
+            timeout: Max seconds to wait for a free slot (None waits forever)
+
+        Returns:
+            True if the task was accepted, False if draining or timed out
+        """
+        if not self._accepting:
+            return False
+        if not self._free.acquire(timeout=timeout):
+            return False
+
+        with self._cond:
+            if not self._accepting:
+                self._free.release()
+                return False
+            self._pending.append(task)
+            self._cond.notify()
+        return True
+
+    def wait_for_free_slot(self, timeout: Optional[float] = None) -> bool:
+        """Block until at least one slot is free (without reserving it)"""
+        if not self._free.acquire(timeout=timeout):
+            return False
+        self._free.release()
+        return True
+
+    def free_slots(self) -> int:
+        """Number of slots not running or about to run a task"""
+        with self._cond:
+            busy = sum(1 for s in self._slots if s.current_task_id is not None)
+            return max(self.concurrency - busy - len(self._pending), 0)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stop accepting tasks and wait for in-flight tasks to finish
+
+        Args:
+            timeout: Max seconds to wait (None waits forever)
+
+        Returns:
+            True if every slot finished within the timeout
+        """
+        with self._cond:
+            self._accepting = False
+            self._cond.notify_all()
+
+        deadline = None if timeout is None else time.time() + timeout
+        for thread in self._threads:
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
+            thread.join(remaining)
+
+        drained = not any(t.is_alive() for t in self._threads)
+        if not drained:
+            logger.warning("Task slots did not drain before timeout")
+        return drained
+
+    def _slot_loop(self, stats: SlotStats):
+        """Run tasks for one slot until the pool is drained"""
+        browser_pool = get_browser_pool() if self.use_browser_pool else None
+
+        try:
+            while True:
+                with self._cond:
+                    while not self._pending and self._accepting:
+                        self._cond.wait()
+                    if not self._pending:
+                        break
+                    task = self._pending.pop(0)
+                    stats.current_task_id = task.get('id')
+                    stats.current_task_started_at = time.time()
+
+                try:
+                    self.handler(task, browser_pool)
+                except Exception as e:
+                    stats.tasks_failed += 1
+                    logger.error(f"Slot {stats.slot_id} task {task.get('id')} raised: {e}", exc_info=True)
+                finally:
+                    with self._cond:
+                        stats.busy_seconds += time.time() - stats.current_task_started_at
+                        stats.tasks_processed += 1
+                        stats.current_task_id = None
+                        stats.current_task_started_at = None
+                    self._free.release()
+        finally:
+            if browser_pool is not None:
+                self._browser_stats[stats.slot_id] = browser_pool.get_stats()
+                close_browser_pool()
+
+    def get_stats(self) -> Dict:
+        """Get per-slot and overall utilisation"""
+        now = time.time()
+        with self._cond:
+            slots = [s.to_dict(now) for s in self._slots]
+            pending = len(self._pending)
+
+        uptime = max(now - self._started_at, 1e-9)
+        total_busy = sum(s['busy_seconds'] for s in slots)
+        return {
+            'concurrency': self.concurrency,
+            'uptime_seconds': round(uptime, 1),
+            'pending': pending,
+            'busy_slots': sum(1 for s in slots if s['current_task_id'] is not None),
+            'tasks_processed': sum(s['tasks_processed'] for s in slots),
+            'utilisation': round(total_busy / (uptime * self.concurrency), 3),
+            'slots': slots,
+            'browser_pools': dict(self._browser_stats),
+        }
@@ -1,33 +1,130 @@
 """
 Enterprise-Grade Telemetry System
 
-Generates run artifacts for every task execution, even on failure
+Generates run artifacts for every task execution, even on failure.
+
+Step traces (steps.jsonl) are kept according to TELEMETRY_LEVEL:
+- full: every run, steps written as they are logged
+- failures (default): failed runs plus a head-sampled share of all runs
+  (TELEMETRY_TRACE_SAMPLE_RATE). Other runs hold their steps in memory
+  unserialized until finalize_run() decides, and successful ones only get
+  step counts in final_result.json.
+- aggregate: no steps.jsonl; step counts only
 """
 
 import json
 import os
+import time
+import atexit
+import random
 import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional, Any
+from typing import Dict, Iterable, Optional, Any, Tuple
 from playwright.sync_api import Page
 
+from core.telemetry_writer import BufferedStepWriter, StepWriterConfig
+from core.snapshot_writer import SnapshotConfig, SnapshotWriter
+
 logger = logging.getLogger(__name__)
 
+# Steps whose name contains one of these are never sampled out under backpressure
+ESSENTIAL_STEP_MARKERS = ('error', 'fail', 'exception', 'exceeded', 'task_started', 'result_')
+
+
+def _is_essential(step_name: str, meta: Optional[Dict]) -> bool:
+    """Errors and outcome steps must reach steps.jsonl even when the writer is behind"""
+    name = step_name.lower()
+    return any(marker in name for marker in ESSENTIAL_STEP_MARKERS) or bool(meta and meta.get('error'))
+
+
+TRACE_LEVELS = ('full', 'failures', 'aggregate')
+
+
+@dataclass
+class TraceConfig:
+    """Which runs keep their step trace"""
+    level: str = 'failures'  # One of TRACE_LEVELS
+    sample_rate: float = 0.05  # Share of runs traced in full whatever their outcome ('failures' level)
+    max_held_steps: int = 5000  # Most recent steps held per run until finalize_run
+
+    @classmethod
+    def from_env(cls) -> 'TraceConfig':
+        """Build config from TELEMETRY_LEVEL and TELEMETRY_TRACE_* environment variables"""
+        level = os.getenv('TELEMETRY_LEVEL', 'failures').lower()
+        if level not in TRACE_LEVELS:
+            logger.warning(f"Unknown TELEMETRY_LEVEL '{level}', using 'failures'")
+            level = 'failures'
+        return cls(
+            level=level,
+            sample_rate=float(os.getenv('TELEMETRY_TRACE_SAMPLE_RATE', '0.05')),
+            max_held_steps=int(os.getenv('TELEMETRY_MAX_HELD_STEPS', '5000')),
+        )
+
+
+def _serialize_step(timestamp: datetime, step_name: str, meta: Optional[Dict]) -> str:
+    """One steps.jsonl line"""
+    step_event = {
+        'timestamp': timestamp.isoformat() + 'Z',
+        'step': step_name,
+        'meta': meta or {},
+    }
+    return json.dumps(step_event, ensure_ascii=False) + '\n'
+
 
 class Telemetry:
     """Telemetry system for task run observability"""
     
-    def __init__(self, runs_dir: str = "runs"):
+    def __init__(self, runs_dir: str = "runs", buffered: bool = True,
+                 writer_config: Optional[StepWriterConfig] = None,
+                 trace_config: Optional[TraceConfig] = None,
+                 snapshot_config: Optional[SnapshotConfig] = None):
         """
         Initialize telemetry
         
         Args:
             runs_dir: Directory for run artifacts
+            buffered: Write steps from a background thread (False: one append per step)
+            writer_config: Buffered writer config (default: from environment)
+            trace_config: Which runs keep their step trace (default: from environment)
+            snapshot_config: Snapshot format and policy (default: from environment)
         """
         self.runs_dir = Path(runs_dir)
         self.runs_dir.mkdir(parents=True, exist_ok=True)
         self.active_runs: Dict[int, Dict] = {}
+        self.writer = BufferedStepWriter(writer_config) if buffered else None
+        self.trace_config = trace_config or TraceConfig.from_env()
+        self.snapshots = SnapshotWriter(snapshot_config)
+        self._step_lock = threading.Lock()
+        self._steps_logged = 0
+        self._step_seconds = 0.0
+        self._trace_stats = {
+            'runs_traced': 0,
+            'runs_summarized': 0,
+            'steps_discarded': 0,
+        }
+        # Registered after the writer's close(), so it runs first at exit
+        atexit.register(self._write_unfinished_traces)
+
+    def _trace_mode(self) -> Tuple[str, Optional[str]]:
+        """
+        Head decision for a new run
+
+        Returns:
+            (mode, trace label): 'stream' writes steps as they come, 'hold'
+            keeps them until finalize_run, 'none' only counts them
+        """
+        level = self.trace_config.level
+        if level == 'full':
+            return 'stream', 'full'
+        if level == 'aggregate':
+            return 'none', None
+        if random.random() < self.trace_config.sample_rate:
+            return 'stream', 'sampled'
+        return 'hold', None
     
     def init_run(self, task_id: int, meta: Optional[Dict] = None) -> Path:
         """
@@ -49,10 +146,16 @@ class Telemetry:
             'meta': meta or {},
         }
         
+        trace_mode, trace_label = self._trace_mode()
         self.active_runs[task_id] = {
             'run_dir': run_dir,
             'started_at': datetime.utcnow(),
             'meta': run_meta,
+            'trace_mode': trace_mode,
+            'trace': trace_label,
+            'held': deque(maxlen=self.trace_config.max_held_steps) if trace_mode == 'hold' else None,
+            'steps': 0,
+            'step_counts': {},
         }
         
         # Write initial metadata
@@ -76,92 +179,67 @@ class Telemetry:
         Returns:
             True if logged successfully
         """
+        start = time.perf_counter()
         if task_id not in self.active_runs:
             logger.warning(f"Run not initialized for task {task_id}, initializing now")
             self.init_run(task_id)
         
-        run_dir = self.active_runs[task_id]['run_dir']
-        steps_file = run_dir / 'steps.jsonl'
-        
-        step_event = {
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
-            'step': step_name,
-            'meta': meta or {},
-        }
-        
-        try:
-            with open(steps_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(step_event, ensure_ascii=False) + '\n')
-            
-            logger.debug(f"Logged step '{step_name}' for task {task_id}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to log step for task {task_id}: {e}")
-            return False
+        run = self.active_runs[task_id]
+        run['steps'] += 1
+        counts = run['step_counts']
+        counts[step_name] = counts.get(step_name, 0) + 1
+
+        logged = True
+        if run['trace_mode'] == 'hold':
+            # Serialized only if finalize_run keeps the trace
+            run['held'].append((datetime.utcnow(), step_name, dict(meta) if meta else None))
+        elif run['trace_mode'] == 'stream':
+            steps_file = run['run_dir'] / 'steps.jsonl'
+            try:
+                line = _serialize_step(datetime.utcnow(), step_name, meta)
+                if self.writer is not None:
+                    logged = self.writer.write(steps_file, line, essential=_is_essential(step_name, meta))
+                else:
+                    with open(steps_file, 'a', encoding='utf-8') as f:
+                        f.write(line)
+            except Exception as e:
+                logger.error(f"Failed to log step for task {task_id}: {e}")
+                return False
+
+        with self._step_lock:
+            self._steps_logged += 1
+            self._step_seconds += time.perf_counter() - start
+        return logged
     
-    def save_snapshot(self, task_id: int, page: Page, name_prefix: str = "snapshot") -> Dict[str, Optional[str]]:
+    def save_snapshot(self, task_id: int, page: Page, name_prefix: str = "snapshot",
+                      success: Optional[bool] = None) -> Dict[str, Optional[str]]:
         """
         Save DOM snapshot and screenshot
         
+        Captures the page on this thread; compression and disk writes happen
+        in the background (see core.snapshot_writer).
+        
         Args:
             task_id: Task ID
             page: Playwright Page object
             name_prefix: Prefix for snapshot files
+            success: Run outcome if known (SNAPSHOT_POLICY=failures skips successful runs)
         
         Returns:
-            Dict with paths to saved files (or None if failed)
+            Dict with paths to saved files (or None if failed or skipped)
         """
         if task_id not in self.active_runs:
             logger.warning(f"Run not initialized for task {task_id}, initializing now")
             self.init_run(task_id)
         
         run_dir = self.active_runs[task_id]['run_dir']
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        
-        result = {
-            'dom_snapshot': None,
-            'screenshot': None,
-        }
-        
         try:
-            # Save DOM snapshot (timestamped and default)
-            try:
-                dom_content = page.content()
-                
-                # Save timestamped version
-                dom_file_timestamped = run_dir / f'{name_prefix}_dom_{timestamp}.html'
-                with open(dom_file_timestamped, 'w', encoding='utf-8') as f:
-                    f.write(dom_content)
-                result['dom_snapshot'] = str(dom_file_timestamped)
-                
-                # Save default dom_snapshot.html (latest)
-                dom_file_default = run_dir / 'dom_snapshot.html'
-                with open(dom_file_default, 'w', encoding='utf-8') as f:
-                    f.write(dom_content)
-                
-                logger.debug(f"Saved DOM snapshot for task {task_id}: {dom_file_default}")
-            except Exception as e:
-                logger.warning(f"Failed to save DOM snapshot for task {task_id}: {e}")
-            
-            # Save screenshot (timestamped and default)
-            try:
-                # Save timestamped version
-                screenshot_file_timestamped = run_dir / f'{name_prefix}_screenshot_{timestamp}.png'
-                page.screenshot(path=str(screenshot_file_timestamped), full_page=True)
-                result['screenshot'] = str(screenshot_file_timestamped)
-                
-                # Save default screenshot.png (latest)
-                screenshot_file_default = run_dir / 'screenshot.png'
-                page.screenshot(path=str(screenshot_file_default), full_page=True)
-                
-                logger.debug(f"Saved screenshot for task {task_id}: {screenshot_file_default}")
-            except Exception as e:
-                logger.warning(f"Failed to save screenshot for task {task_id}: {e}")
-        
+            result = self.snapshots.capture(page, run_dir, name_prefix, success=success)
+            logger.debug(f"Captured {name_prefix} snapshot for task {task_id}: {result}")
+            return result
         except Exception as e:
             logger.error(f"Error saving snapshot for task {task_id}: {e}")
-        
-        return result
+            return {'dom_snapshot': None, 'screenshot': None}
     
     def finalize_run(self, task_id: int, result_meta: Dict) -> Path:
         """
@@ -195,6 +273,24 @@ class Telemetry:
             'execution_time': result_meta.get('execution_time'),
             'result': result_meta,
         }
+
+        # Tail decision: held traces are kept for failed runs only
+        steps_file = run_dir / 'steps.jsonl'
+        held = run_info['held']
+        if run_info['trace_mode'] == 'hold' and not result_meta.get('success'):
+            self._write_trace(steps_file, held)
+            run_info['trace'] = 'failure'
+        final_result['step_summary'] = self._step_summary(run_info)
+
+        if self.writer is not None and run_info['trace']:
+            # steps.jsonl is complete once final_result.json exists
+            final_result['telemetry_steps'] = self.writer.pop_run_counts(steps_file)
+            if not self.writer.flush():
+                logger.warning(f"Timed out flushing telemetry steps for task {task_id}")
+        run_info['held'] = None
+
+        if not self.snapshots.finish_run(run_dir, bool(result_meta.get('success'))):
+            logger.warning(f"Timed out writing snapshots for task {task_id}")
         
         # Save final result
         result_file = run_dir / 'final_result.json'
@@ -213,6 +309,60 @@ class Telemetry:
             logger.error(f"Failed to finalize run for task {task_id}: {e}")
             return result_file
     
+    def _step_summary(self, run_info: Dict) -> Dict:
+        """Aggregates recorded for every run, and the trace decision"""
+        held = run_info['held']
+        summary = {
+            'trace': run_info['trace'],
+            'steps': run_info['steps'],
+            'step_counts': run_info['step_counts'],
+        }
+        with self._step_lock:
+            if run_info['trace']:
+                self._trace_stats['runs_traced'] += 1
+            else:
+                self._trace_stats['runs_summarized'] += 1
+                self._trace_stats['steps_discarded'] += len(held) if held is not None else run_info['steps']
+        if run_info['trace'] and held is not None and run_info['steps'] > len(held):
+            # Only the last max_held_steps were kept
+            summary['steps_truncated'] = run_info['steps'] - len(held)
+        return summary
+
+    def _write_trace(self, steps_file: Path, held: Iterable[Tuple[datetime, str, Optional[Dict]]]):
+        """Serialize and write a held trace"""
+        try:
+            lines = [_serialize_step(*step) for step in held]
+            if self.writer is not None:
+                self.writer.write_lines(steps_file, lines)
+            elif lines:
+                with open(steps_file, 'a', encoding='utf-8') as f:
+                    f.write(''.join(lines))
+        except Exception as e:
+            logger.error(f"Failed to write step trace {steps_file}: {e}")
+
+    def _write_unfinished_traces(self):
+        """At exit, keep the held traces and snapshots of runs that never reached finalize_run"""
+        for run_info in list(self.active_runs.values()):
+            held = run_info.get('held')
+            if held:
+                self._write_trace(run_info['run_dir'] / 'steps.jsonl', held)
+                run_info['held'] = None
+        self.snapshots.write_held()
+
+    def get_stats(self) -> Dict:
+        """Steps logged, time log_step() costs the caller, trace decisions, writer and snapshot stats"""
+        with self._step_lock:
+            stats = {
+                'steps_logged': self._steps_logged,
+                'log_step_us_per_step': round(self._step_seconds / max(self._steps_logged, 1) * 1e6, 1),
+                'trace_level': self.trace_config.level,
+                **self._trace_stats,
+            }
+        if self.writer is not None:
+            stats['writer'] = self.writer.get_stats()
+        stats['snapshots'] = self.snapshots.get_stats()
+        return stats
+
     def get_run_dir(self, task_id: int) -> Optional[Path]:
         """Get run directory for a task"""
         if task_id in self.active_runs:
@@ -235,7 +385,8 @@ def get_telemetry() -> Telemetry:
     global _telemetry_instance
     if _telemetry_instance is None:
         runs_dir = os.getenv('TELEMETRY_RUNS_DIR', 'runs')
-        _telemetry_instance = Telemetry(runs_dir=runs_dir)
+        buffered = os.getenv('TELEMETRY_BUFFERED', 'true').lower() in ('true', '1', 'yes')
+        _telemetry_instance = Telemetry(runs_dir=runs_dir, buffered=buffered)
     return _telemetry_instance
 
 
@@ -250,9 +401,10 @@ def log_step(task_id: int, step_name: str, meta: Optional[Dict] = None) -> bool:
     return get_telemetry().log_step(task_id, step_name, meta)
 
 
-def save_snapshot(task_id: int, page: Page, name_prefix: str = "snapshot") -> Dict[str, Optional[str]]:
+def save_snapshot(task_id: int, page: Page, name_prefix: str = "snapshot",
+                  success: Optional[bool] = None) -> Dict[str, Optional[str]]:
     """Save DOM snapshot and screenshot"""
-    return get_telemetry().save_snapshot(task_id, page, name_prefix)
+    return get_telemetry().save_snapshot(task_id, page, name_prefix, success=success)
 
 
 def finalize_run(task_id: int, result_meta: Dict) -> Path:
@@ -0,0 +1,259 @@
+"""
+Telemetry Step Writer
+
+Buffered, non-blocking writer for runs/<task>/steps.jsonl. log_step() adds
+each serialized step to a bounded in-memory queue; a background thread
+appends them per run file in chunks (one open/write/close per file and flush
+instead of per step).
+
+- Queued steps are written once they add up to flush_bytes, every
+  flush_interval, and on flush() (finalize_run flushes its run).
+- Under backpressure (queue above sample_threshold) only one in sample_rate
+  routine steps is kept, and a full queue drops them. Essential steps (errors,
+  failures) wait up to essential_timeout for room instead.
+- get_stats() reports queue depth, drops, and the cost per step on the
+  caller's side and in the writer thread.
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Pending items other than (path, line)
+_FLUSH = object()
+_STOP = object()
+
+
+@dataclass
+class StepWriterConfig:
+    """Step writer configuration"""
+    queue_size: int = 10000  # Steps waiting for the writer thread
+    flush_bytes: int = 64 * 1024  # Buffered bytes per run before a write
+    flush_interval: float = 1.0  # Max seconds a step waits in the buffer
+    sample_threshold: float = 0.8  # Queue fill above which routine steps are sampled
+    sample_rate: int = 10  # Keep one in this many routine steps while sampling
+    essential_timeout: float = 1.0  # Seconds an essential step waits for queue room
+
+    @classmethod
+    def from_env(cls) -> 'StepWriterConfig':
+        """Build config from TELEMETRY_* environment variables"""
+        return cls(
+            queue_size=int(os.getenv('TELEMETRY_QUEUE_SIZE', '10000')),
+            flush_bytes=int(os.getenv('TELEMETRY_FLUSH_BYTES', str(64 * 1024))),
+            flush_interval=float(os.getenv('TELEMETRY_FLUSH_INTERVAL', '1.0')),
+            sample_threshold=float(os.getenv('TELEMETRY_SAMPLE_THRESHOLD', '0.8')),
+            sample_rate=int(os.getenv('TELEMETRY_SAMPLE_RATE', '10')),
+        )
+
+
+class BufferedStepWriter:
+    """
+    Background appender for JSON Lines step files.
+
+    write() queues a line, flush() waits until queued lines are on disk and
+    close() flushes and stops the thread (called at exit).
+    """
+
+    def __init__(self, config: Optional[StepWriterConfig] = None):
+        self.config = config or StepWriterConfig.from_env()
+        self._sample_threshold = int(self.config.queue_size * self.config.sample_threshold)
+        self._sample_counter = 0
+
+        # Lines (and flush/stop markers) in arrival order; the writer thread swaps the list out
+        self._cond = threading.Condition(threading.Lock())
+        self._pending: List[Tuple[object, object]] = []
+        self._pending_lines = 0
+        self._pending_bytes = 0
+        self._wakeup = threading.Event()
+
+        self._run_counts: Dict[Path, Dict[str, int]] = {}
+        self._stats = {
+            'queued': 0,
+            'written': 0,
+            'sampled_out': 0,
+            'dropped': 0,
+            'write_errors': 0,
+            'flushes': 0,
+            'queue_high_water': 0,
+        }
+        self._enqueue_seconds = 0.0
+        self._write_seconds = 0.0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _count(self, path: Path, key: str, amount: int = 1):
+        """Bump a global and per-run counter (lock held)"""
+        self._stats[key] += amount
+        counts = self._run_counts.get(path)
+        if counts is None:
+            counts = self._run_counts[path] = {'queued': 0, 'sampled_out': 0, 'dropped': 0}
+        counts[key] += amount
+
+    def write(self, path: Path, line: str, essential: bool = False) -> bool:
+        """
+        Queue one line for appending to path
+
+        Args:
+            path: steps.jsonl of the run
+            line: Serialized step, ending in a newline
+            essential: Never sampled out, and waits briefly for room when the queue is full
+
+        Returns:
+            True if queued, False if sampled out or dropped
+        """
+        start = time.perf_counter()
+        if self._closed:
+            self._append(path, [line])
+            return True
+
+        with self._cond:
+            depth = self._pending_lines
+            if not essential and depth >= self._sample_threshold:
+                self._sample_counter += 1
+                if self._sample_counter % max(self.config.sample_rate, 1):
+                    self._count(path, 'sampled_out')
+                    return False
+
+            if depth >= self.config.queue_size:
+                self._wakeup.set()
+                if not essential or not self._cond.wait_for(
+                        lambda: self._pending_lines < self.config.queue_size, self.config.essential_timeout):
+                    self._count(path, 'dropped')
+                    return False
+
+            self._pending.append((path, line))
+            self._pending_lines += 1
+            self._pending_bytes += len(line)
+            self._count(path, 'queued')
+            if self._pending_lines > self._stats['queue_high_water']:
+                self._stats['queue_high_water'] = self._pending_lines
+            if self._pending_bytes >= self.config.flush_bytes:
+                self._wakeup.set()
+            self._enqueue_seconds += time.perf_counter() - start
+        return True
+
+    def write_lines(self, path: Path, lines: List[str]):
+        """
+        Queue a whole trace for appending to path
+
+        Used for traces held until their run finished (they are already
+        bounded), so the lines are neither sampled nor dropped.
+        """
+        if not lines:
+            return
+        if self._closed:
+            self._append(path, lines)
+            return
+        with self._cond:
+            self._pending.extend((path, line) for line in lines)
+            self._pending_lines += len(lines)
+            self._pending_bytes += sum(len(line) for line in lines)
+            self._count(path, 'queued', len(lines))
+            if self._pending_lines > self._stats['queue_high_water']:
+                self._stats['queue_high_water'] = self._pending_lines
+        self._wakeup.set()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Write every line queued so far to disk and wait for it
+
+        Args:
+            timeout: Max seconds to wait
+
+        Returns:
+            True if the lines were written within the timeout
+        """
+        if self._closed or not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        with self._cond:
+            self._pending.append((_FLUSH, done))
+        self._wakeup.set()
+        return done.wait(timeout)
+
+    def pop_run_counts(self, path: Path) -> Dict[str, int]:
+        """Queued/sampled-out/dropped steps of a run (forgotten afterwards)"""
+        with self._cond:
+            return self._run_counts.pop(path, {'queued': 0, 'sampled_out': 0, 'dropped': 0})
+
+    def _run(self):
+        """Writer thread: every flush_interval (or when woken), append pending lines per file"""
+        while True:
+            self._wakeup.wait(self.config.flush_interval)
+            self._wakeup.clear()
+            with self._cond:
+                items, self._pending = self._pending, []
+                self._pending_lines = 0
+                self._pending_bytes = 0
+                self._cond.notify_all()
+
+            # Files are written in the order their first line arrived; markers
+            # are handled once everything queued before them is on disk
+            buffers: Dict[Path, List[str]] = {}
+            for target, payload in items:
+                if target is _FLUSH or target is _STOP:
+                    self._write_buffers(buffers)
+                    buffers = {}
+                    payload.set()
+                    if target is _STOP:
+                        return
+                    continue
+                lines = buffers.get(target)
+                if lines is None:
+                    lines = buffers[target] = []
+                lines.append(payload)
+            self._write_buffers(buffers)
+
+    def _write_buffers(self, buffers: Dict[Path, List[str]]):
+        for path, lines in buffers.items():
+            self._append(path, lines)
+
+    def _append(self, path: Path, lines: List[str]):
+        """Append lines to a file in one write"""
+        start = time.perf_counter()
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(''.join(lines))
+            written, errors = len(lines), 0
+        except OSError as e:
+            logger.error(f"Failed to write {len(lines)} telemetry steps to {path}: {e}")
+            written, errors = 0, 1
+        with self._cond:
+            self._stats['written'] += written
+            self._stats['write_errors'] += errors
+            self._stats['flushes'] += 1
+            self._write_seconds += time.perf_counter() - start
+
+    def close(self, timeout: float = 5.0):
+        """Write everything queued and stop the writer thread"""
+        if self._closed:
+            return
+        if self._thread.is_alive():
+            done = threading.Event()
+            with self._cond:
+                self._pending.append((_STOP, done))
+            self._wakeup.set()
+            if not done.wait(timeout):
+                logger.warning("Telemetry writer did not finish writing steps at close")
+        # Later writes go straight to disk
+        self._closed = True
+
+    def get_stats(self) -> Dict:
+        """Counters, queue depth and cost per step (microseconds)"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = self._pending_lines
+            stats['enqueue_us_per_step'] = round(self._enqueue_seconds / max(stats['queued'], 1) * 1e6, 1)
+            stats['write_us_per_step'] = round(self._write_seconds / max(stats['written'], 1) * 1e6, 1)
+            stats['steps_per_flush'] = round(stats['written'] / max(stats['flushes'], 1), 1)
+        return stats
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Look up task runs, whether still in runs/ or packed into runs_archive/
+
+Usage:
+    python inspect_run.py 586                      # list the run's files and final result
+    python inspect_run.py 586 --file steps.jsonl   # print one file
+    python inspect_run.py 586 --extract /tmp/runs  # restore the run directory
+    python inspect_run.py --find --failed --failure-reason timeout
+    python inspect_run.py --archive-now            # one archive + retention pass
+"""
+import argparse
+import json
+import sys
+
+from core.run_archive import get_run_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch task runs from runs/ or the run archive')
+    parser.add_argument('task_id', nargs='?', help='Task ID')
+    parser.add_argument('--file', help='Print this file of the run')
+    parser.add_argument('--extract', metavar='DIR', help='Write the run directory to DIR/<task_id>')
+    parser.add_argument('--find', action='store_true', help='List archived runs')
+    parser.add_argument('--failed', action='store_true', help='With --find: failed runs only')
+    parser.add_argument('--failure-reason', help='With --find: this failure reason only')
+    parser.add_argument('--day', help='With --find: runs finished on YYYY-MM-DD')
+    parser.add_argument('--limit', type=int, default=50, help='With --find: max runs')
+    parser.add_argument('--archive-now', action='store_true', help='Run one archive + retention pass')
+    args = parser.parse_args()
+
+    archive = get_run_archive()
+
+    if args.archive_now:
+        print(json.dumps(archive.run_once()))
+        print(json.dumps(archive.get_stats(), indent=2))
+        return 0
+
+    if args.find:
+        runs = archive.find_runs(success=False if args.failed else None, failure_reason=args.failure_reason,
+                                 day=args.day, limit=args.limit)
+        for run in runs:
+            outcome = 'ok' if run['success'] else (run['failure_reason'] or 'failed')
+            print(f"{run['task_id']:>10}  {run['day']}  {outcome:<20} {run['execution_time']}s  {run['files']} files")
+        return 0
+
+    if not args.task_id:
+        parser.print_help()
+        return 1
+
+    if args.extract:
+        target = archive.extract_run(args.task_id, args.extract)
+        if target is None:
+            print(f"Run {args.task_id} not found")
+            return 1
+        print(target)
+        return 0
+
+    if args.file:
+        data = archive.get_file(args.task_id, args.file)
+        if data is None:
+            print(f"{args.file} not found for run {args.task_id}")
+            return 1
+        sys.stdout.buffer.write(data)
+        return 0
+
+    files = archive.get_run(args.task_id)
+    if files is None:
+        print(f"Run {args.task_id} not found")
+        return 1
+    entry = archive.get_entry(args.task_id)
+    print(f"Run {args.task_id} ({'archived ' + entry['day'] if entry else 'in runs/'})")
+    for name, data in sorted(files.items()):
+        print(f"  {name:<50} {len(data):>10} bytes")
+    if 'final_result.json' in files:
+        print(files['final_result.json'].decode('utf-8'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -79,6 +79,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from urllib.parse import urlparse
 
+from core.outcome_history import OutcomeHistoryTail, OutcomeLogIndex
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -149,6 +151,8 @@ class FeedbackCollector:
         # Track processed task IDs to avoid duplicates
         self.processed_tasks_file = self.dataset_dir / 'processed_tasks.json'
         self.processed_task_ids = self._load_processed_tasks()
+        # Byte offset in the automation log up to which lines were collected
+        self.automation_log_offset = self._load_automation_log_offset()
     
     def _load_processed_tasks(self) -> set:
         """Load set of already processed task IDs"""
@@ -163,6 +167,34 @@ class FeedbackCollector:
                 logger.warning(f"Error loading processed tasks: {e}")
         return set()
     
+    def _load_automation_log_offset(self) -> Optional[int]:
+        """Load where the last collection stopped reading the automation log"""
+        if self.processed_tasks_file.exists():
+            try:
+                with open(self.processed_tasks_file, 'r') as f:
+                    offset = json.load(f).get('automation_log_offset')
+                    return to_int(offset, 0) if offset is not None else None
+            except Exception as e:
+                logger.warning(f"Error loading automation log offset: {e}")
+        return None
+    
+    def _automation_log_start(self, cutoff_date: datetime) -> int:
+        """
+        Byte offset to collect the automation log from
+        
+        The offset saved by the last collection; on the first collection (or
+        after the log was replaced) the first line logged after cutoff_date,
+        looked up in the log's sidecar index.
+        """
+        size = os.path.getsize(self.automation_log_file)
+        if self.automation_log_offset is not None and self.automation_log_offset <= size:
+            return self.automation_log_offset
+        try:
+            return OutcomeLogIndex(str(self.automation_log_file)).offset_at(cutoff_date.isoformat() + 'Z')
+        except Exception as e:
+            logger.warning(f"Automation log index unavailable, reading the whole log: {e}")
+            return 0
+    
     def _save_processed_tasks(self):
         """Save processed task IDs"""
         try:
@@ -171,6 +203,7 @@ class FeedbackCollector:
             with open(self.processed_tasks_file, 'w') as f:
                 json.dump({
                     'task_ids': task_ids,
+                    'automation_log_offset': self.automation_log_offset,
                     'last_updated': datetime.utcnow().isoformat() + 'Z',
                 }, f)
         except Exception as e:
@@ -199,64 +232,62 @@ class FeedbackCollector:
         new_records = []
         
         try:
-            with open(self.automation_log_file, 'r', encoding='utf-8') as f:
-                line_num = 0
-                for line in f:
-                    line_num += 1
-                    if not line.strip():
-                        continue
-                    
-                    try:
-                        entry = json.loads(line)
-                        task_id = entry.get('task_id')
-                        
-                        # Convert task_id to string for consistency
-                        if task_id is not None:
-                            task_id = str(task_id)
-                        
-                        # Skip if already processed
-                        if task_id and task_id in self.processed_task_ids:
-                            continue
-                        
-                        # Check date - use safe conversion
-                        timestamp_str = entry.get('timestamp', '')
-                        if timestamp_str:
-                            try:
-                                # Try ISO format first
-                                timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                                if timestamp < cutoff_date:
-                                    continue
-                            except Exception as date_err:
-                                # Try Unix timestamp if ISO format fails
-                                try:
-                                    ts_int = to_int(timestamp_str, 0)
-                                    if ts_int > 0:
-                                        timestamp = datetime.fromtimestamp(ts_int)
-                                        if timestamp < cutoff_date:
-                                            continue
-                                except Exception as ts_err:
-                                    logger.debug(f"Line {line_num}: Could not parse timestamp '{timestamp_str}': {ts_err}")
-                                    pass
-                        
-                        # Convert to training record
-                        record = self._convert_to_training_record(entry)
-                        if record:
-                            new_records.append(record)
-                            if task_id:
-                                self.processed_task_ids.add(task_id)
-                    
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"Line {line_num}: JSON decode error: {e}")
-                        continue
-                    except Exception as e:
-                        error_detail = format_error_with_location(e, f"processing automation log line {line_num}")
-                        logger.error(error_detail)
-                        continue
+            # Only lines appended since the last collection are read
+            tail = OutcomeHistoryTail(str(self.automation_log_file),
+                                      offset=self._automation_log_start(cutoff_date))
+            entries, _ = tail.read_new()
         except Exception as e:
             error_detail = format_error_with_location(e, "reading automation log file")
             logger.error(error_detail)
             raise
         
+        for entry_num, entry in enumerate(entries, 1):
+            try:
+                task_id = entry.get('task_id')
+                
+                # Convert task_id to string for consistency
+                if task_id is not None:
+                    task_id = str(task_id)
+                
+                # Skip if already processed
+                if task_id and task_id in self.processed_task_ids:
+                    continue
+                
+                # Check date - use safe conversion
+                timestamp_str = entry.get('timestamp', '')
+                if timestamp_str:
+                    try:
+                        # Try ISO format first
+                        timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+                        if timestamp < cutoff_date:
+                            continue
+                    except Exception as date_err:
+                        # Try Unix timestamp if ISO format fails
+                        try:
+                            ts_int = to_int(timestamp_str, 0)
+                            if ts_int > 0:
+                                timestamp = datetime.fromtimestamp(ts_int)
+                                if timestamp < cutoff_date:
+                                    continue
+                        except Exception as ts_err:
+                            logger.debug(f"Entry {entry_num}: Could not parse timestamp '{timestamp_str}': {ts_err}")
+                            pass
+                
+                # Convert to training record
+                record = self._convert_to_training_record(entry)
+                if record:
+                    new_records.append(record)
+                    if task_id:
+                        self.processed_task_ids.add(task_id)
+            
+            except Exception as e:
+                error_detail = format_error_with_location(e, f"processing automation log entry {entry_num}")
+                logger.error(error_detail)
+                continue
+        
+        # Saved with the processed task IDs
+        self.automation_log_offset = tail.offset
+        
         logger.info(f"Collected {len(new_records)} new records from automation logs")
         return new_records
     
@@ -737,6 +768,8 @@ class FeedbackCollector:
                 raise
         else:
             logger.info("No new records to append")
+            # Lines already read needn't be read again
+            self._save_processed_tasks()
             return self.dataset_dir / "training_backlinks_enriched.csv"
 
 
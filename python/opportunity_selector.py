@@ -25,6 +25,13 @@ try:
 except ImportError:
     DECISION_SERVICE_AVAILABLE = False
 
+# Domain memory pre-screen (drop always_blocked/sso_only domains)
+try:
+    from core.domain_memory import get_domain_memory, domain_from_url
+    DOMAIN_MEMORY_AVAILABLE = True
+except ImportError:
+    DOMAIN_MEMORY_AVAILABLE = False
+
 
 class OpportunitySelector:
     """Selects backlink opportunities for campaigns with AI-powered action type selection"""
@@ -110,6 +117,32 @@ class OpportunitySelector:
         # Rules-based fallback (original logic)
         return self._select_with_rules(campaign_id, task_type, site_type)
     
+    def _drop_skipped_domains(self, opportunities: List[Dict]) -> List[Dict]:
+        """
+        Remove opportunities whose domain is flagged always_blocked/sso_only
+        
+        One bulk domain memory query per call; a doomed opportunity would
+        otherwise cost a browser session that can only fail.
+        """
+        if not opportunities or not DOMAIN_MEMORY_AVAILABLE:
+            return opportunities
+        
+        try:
+            domains = [domain_from_url(opp.get('url')) for opp in opportunities]
+            verdicts = get_domain_memory().bulk_should_skip(domains, source='opportunities')
+        except Exception as e:
+            logger.warning(f"Domain pre-screen failed, keeping all opportunities: {e}")
+            return opportunities
+        
+        kept = []
+        for opp, domain in zip(opportunities, domains):
+            should_skip, skip_reason = verdicts.get(domain, (False, None))
+            if should_skip:
+                logger.info(f"Dropping opportunity {opp.get('id')}: domain {domain} is {skip_reason}")
+            else:
+                kept.append(opp)
+        return kept
+    
     def _select_with_shadow_mode(self, campaign_id: int, task_type: str,
                                  site_type: Optional[str]) -> Optional[Dict]:
         """Select opportunity in shadow mode: AI predicts, rules execute"""
@@ -178,6 +211,7 @@ class OpportunitySelector:
             task_type=None,  # Don't filter by type - let AI decide
             site_type=site_type
         )
+        opportunities = self._drop_skipped_domains(opportunities)
         
         if not opportunities:
             logger.warning(f"No opportunities found for campaign {campaign_id}")
@@ -273,11 +307,11 @@ class OpportunitySelector:
         if not opportunities:
             return None
         
-        best_opportunities = self.decision_service.select_best_opportunity(
+        best_opportunities = self._drop_skipped_domains(self.decision_service.select_best_opportunity(
             campaign_id=campaign_id,
             count=1,
             preferred_action_type=task_type if task_type else None
-        )
+        ))
         
         if best_opportunities:
             return best_opportunities[0]
@@ -287,12 +321,22 @@ class OpportunitySelector:
     def _select_with_rules(self, campaign_id: int, task_type: str,
                           site_type: Optional[str]) -> Optional[Dict]:
         """Select opportunity using rules-based logic (fallback)"""
-        opportunities = self.api_client.get_opportunities_for_campaign(
+        candidates = self.api_client.get_opportunities_for_campaign(
             campaign_id=campaign_id,
             count=1,
             task_type=task_type,
             site_type=site_type
         )
+        opportunities = self._drop_skipped_domains(candidates)
+        
+        if candidates and not opportunities:
+            # The one candidate is on a skipped domain - look a little further
+            opportunities = self._drop_skipped_domains(self.api_client.get_opportunities_for_campaign(
+                campaign_id=campaign_id,
+                count=5,
+                task_type=task_type,
+                site_type=site_type
+            ))
         
         if not opportunities:
             logger.warning(f"No opportunities found for campaign {campaign_id}")
@@ -351,12 +395,12 @@ class OpportunitySelector:
         Returns:
             List of opportunity dicts
         """
-        opportunities = self.api_client.get_opportunities_for_campaign(
+        opportunities = self._drop_skipped_domains(self.api_client.get_opportunities_for_campaign(
             campaign_id=campaign_id,
             count=count,
             task_type=task_type,
             site_type=site_type
-        )
+        ))
         
         if not opportunities:
             logger.warning(f"No opportunities found for campaign {campaign_id}")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Check that the single-pass DOM scan and the per-selector fallback of
+StateDetector report the same PageState
+
+Usage:
+    python test_state_detector.py
+"""
+import sys
+
+from playwright.sync_api import sync_playwright
+
+from core.state_detector import StateDetector
+
+PAGES = {
+    'registration': """
+        <html><body>
+          <h1>Create account</h1>
+          <form action="/register" class="signup-form">
+            <input type="text" name="username">
+            <input type="email" name="email">
+            <input type="password" name="password">
+            <input type="password" name="confirm_password" id="confirm_password" class="confirm-input">
+            <button type="submit">Sign up</button>
+          </form>
+        </body></html>
+    """,
+    'email_verification': """
+        <html><body>
+          <div class="verification-notice">Please verify your email. Check your inbox.</div>
+        </body></html>
+    """,
+    'comment': """
+        <html><body>
+          <article>Post</article>
+          <form id="commentform"><textarea name="comment"></textarea></form>
+          <div class="cookie-banner">We use cookies <button>Accept</button></div>
+        </body></html>
+    """,
+}
+
+
+def compare(page, name: str) -> bool:
+    scan = StateDetector._analyze_dom_scan(page).to_dict()
+    legacy = StateDetector._analyze_legacy(page).to_dict()
+    diffs = {
+        flag: (scan[flag], legacy[flag]) for flag in StateDetector.SCAN_FLAGS if scan[flag] != legacy[flag]
+    }
+    if diffs:
+        print(f"✗ {name}: dom_scan and legacy differ (scan, legacy): {diffs}")
+        return False
+    print(f"✓ {name}: same PageState")
+    return True
+
+
+def main():
+    ok = True
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        for name, html in PAGES.items():
+            page.set_content(html)
+            ok = compare(page, name) and ok
+        browser.close()
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,9 +5,12 @@ Main entry point for the Python worker that processes automation tasks
 
 import os
 import time
+import asyncio
+import signal
 import logging
 import sys
 import argparse
+import threading
 import requests
 from dotenv import load_dotenv
 from api_client import LaravelAPIClient
@@ -16,15 +19,29 @@ from automation.profile import ProfileAutomation
 from automation.forum import ForumAutomation
 from automation.guest import GuestPostAutomation
 from automation.email_confirmation import EmailConfirmationAutomation
+from automation.async_comment import AsyncCommentAutomation
+from automation.async_profile import AsyncProfileAutomation
+from automation.async_forum import AsyncForumAutomation
+from automation.async_guest import AsyncGuestPostAutomation
+from automation.async_email_confirmation import AsyncEmailConfirmationAutomation
+from automation.async_engine import AsyncAutomationEngine
 from automation_logger import get_logger
 from shadow_mode_logger import get_shadow_logger
-from core.telemetry import init_run, log_step, save_snapshot, finalize_run
+from core.telemetry import init_run, log_step, save_snapshot, finalize_run, get_telemetry
 from core.failure_mapper import FailureMapper
 from core.failure_enums import FailureReason
 from core.state_detector import StateDetector
 from core.popup_controller import PopupController
 from core.budget_guard import BudgetGuard, BudgetConfig, BudgetExceededException, BudgetExceededReason
-from core.domain_memory import get_domain_memory
+from core.domain_memory import get_domain_memory, domain_from_url, normalize_domain, task_target_url
+from core.browser_pool import get_browser_pool, close_browser_pool
+from core.task_slots import TaskSlotPool
+from core.task_delivery import DELIVERY_MODES, MODE_POLL, TaskDelivery, TaskDeliveryConfig
+from core.fair_scheduler import WeightedFairScheduler
+from core.duration_estimator import DurationEstimator
+from core.domain_limiter import DeferredTasks, get_domain_limiter
+from core.task_prefetch import StartupTrace, TaskLookups
+from core.run_archive import get_run_archive
 from runtime.agent import RuntimeAgent
 from runtime.healer import RuntimeHealer
 
@@ -77,6 +94,40 @@ DEFAULT_POLL_INTERVAL = int(os.getenv('POLL_INTERVAL', '12'))  # seconds
 WORKER_ID = os.getenv('WORKER_ID', f'worker-{os.getpid()}')
 # Shadow mode: AI predicts but rule-based system executes
 SHADOW_MODE = os.getenv('SHADOW_MODE', 'false').lower() in ('true', '1', 'yes')
+# Browser pool: keep warm Chromium instances between tasks instead of launching per task
+BROWSER_POOL_ENABLED = os.getenv('BROWSER_POOL_ENABLED', 'true').lower() in ('true', '1', 'yes')
+# Number of tasks processed at once (each slot runs its own Playwright driver in a thread)
+DEFAULT_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', '1'))
+# Execution engine: 'sync' (thread per task slot) or 'async' (one event loop drives all pages)
+DEFAULT_ENGINE = os.getenv('WORKER_ENGINE', 'sync').lower()
+# How often slot utilisation is logged in concurrent mode
+SLOT_STATS_LOG_INTERVAL = int(os.getenv('SLOT_STATS_LOG_INTERVAL', '300'))  # seconds
+# Send status reports and site account updates from a background queue (persisted to disk)
+API_WRITE_QUEUE_ENABLED = os.getenv('API_WRITE_QUEUE_ENABLED', 'true').lower() in ('true', '1', 'yes')
+# Split each claimed batch between task types/campaigns by weighted fair queuing (history-based weights)
+FAIR_SCHEDULING_ENABLED = os.getenv('FAIR_SCHEDULING_ENABLED', 'true').lower() in ('true', '1', 'yes')
+# Run each batch shortest-expected-job-first (EWMA of past execution times per task type and domain)
+SJF_ORDERING_ENABLED = os.getenv('SJF_ORDERING_ENABLED', 'true').lower() in ('true', '1', 'yes')
+# Task types claimed first, in order, when fair scheduling is off (comment tasks are easier and more likely to succeed)
+TASK_TYPE_PRIORITY = [t.strip() for t in os.getenv('TASK_TYPE_PRIORITY', 'comment').split(',') if t.strip()]
+# How new tasks reach the worker: 'poll' (fixed interval), 'long_poll' (server holds claims) or 'redis' (push)
+DEFAULT_DELIVERY_MODE = os.getenv('TASK_DELIVERY_MODE', 'long_poll').lower()
+# Drop tasks for always_blocked/sso_only domains in one query before dispatching them
+DOMAIN_PRESCREEN_ENABLED = os.getenv('DOMAIN_PRESCREEN_ENABLED', 'true').lower() in ('true', '1', 'yes')
+# Select the opportunity in the background while the browser starts (campaign/proxy lookups always do)
+TASK_PREFETCH_ENABLED = os.getenv('TASK_PREFETCH_ENABLED', 'true').lower() in ('true', '1', 'yes')
+# Cap concurrent tasks and space out task starts per domain (shared by all workers on the host)
+DOMAIN_LIMIT_ENABLED = os.getenv('DOMAIN_LIMIT_ENABLED', 'true').lower() in ('true', '1', 'yes')
+# Pack finished runs/ directories into daily archives and evict old archives (continuous mode)
+RUN_ARCHIVE_ENABLED = os.getenv('RUN_ARCHIVE_ENABLED', 'true').lower() in ('true', '1', 'yes')
+
+# Task types the worker runs (AutomationTask::TYPE_* on the Laravel side)
+TASK_TYPES = ['comment', 'profile', 'forum', 'guest', 'email_confirmation_click']
+# Task types whose automation picks an opportunity with OpportunitySelector
+OPPORTUNITY_TASK_TYPES = ('comment', 'profile', 'forum', 'guest')
+
+# Set by SIGTERM/SIGINT - stops polling and lets in-flight tasks finish
+_stop_event = threading.Event()
 
 
 def get_automation_class(task_type: str):
@@ -92,8 +143,21 @@ def get_automation_class(task_type: str):
     return automation_classes.get(task_type)
 
 
-def process_task(api_client: LaravelAPIClient, task: dict):
-    """Process a single task"""
+def get_async_automation_class(task_type: str):
+    """Get async automation class for task type"""
+    automation_classes = {
+        'comment': AsyncCommentAutomation,
+        'profile': AsyncProfileAutomation,
+        'forum': AsyncForumAutomation,
+        'guest': AsyncGuestPostAutomation,
+        'guestposting': AsyncGuestPostAutomation,  # Alias
+        'email_confirmation_click': AsyncEmailConfirmationAutomation,
+    }
+    return automation_classes.get(task_type)
+
+
+def process_task(api_client: LaravelAPIClient, task: dict, browser_pool=None):
+    """Process a single task (optionally borrowing a warm browser from browser_pool)"""
     task_id = task['id']
     task_type = task['type']
     retry_count = task.get('retry_count', 0)
@@ -142,16 +206,8 @@ def process_task(api_client: LaravelAPIClient, task: dict):
     # Get domain memory
     domain_memory = get_domain_memory()
     
-    # Extract domain from opportunity URL if available
-    domain = None
-    try:
-        opportunity_url = task.get('payload', {}).get('opportunity_url') or task.get('opportunity_url')
-        if opportunity_url:
-            from urllib.parse import urlparse
-            parsed = urlparse(opportunity_url)
-            domain = parsed.netloc or parsed.path.split('/')[0] if parsed.path else None
-    except:
-        pass
+    # Extract domain from the task's target URL if available
+    domain = _task_domain(task)
     
     # Check if domain should be skipped
     if domain:
@@ -175,14 +231,16 @@ def process_task(api_client: LaravelAPIClient, task: dict):
         try:
             # Check if there's a running loop
             loop = asyncio.get_running_loop()
-            logger.error(f"CRITICAL: Running event loop detected before task {task_id}!")
-            logger.error("This should not happen. A library is creating event loops.")
-            logger.error(f"Loop: {loop}")
-            # Can't stop a running loop safely, but we can try to identify it
-            raise RuntimeError(
-                f"Cannot process task {task_id}: Running asyncio event loop detected. "
-                "This prevents Playwright Sync API from working."
-            )
+            # The pooled Playwright driver keeps its own loop registered between tasks - that one is expected
+            if not (browser_pool is not None and browser_pool.owns_event_loop(loop)):
+                logger.error(f"CRITICAL: Running event loop detected before task {task_id}!")
+                logger.error("This should not happen. A library is creating event loops.")
+                logger.error(f"Loop: {loop}")
+                # Can't stop a running loop safely, but we can try to identify it
+                raise RuntimeError(
+                    f"Cannot process task {task_id}: Running asyncio event loop detected. "
+                    "This prevents Playwright Sync API from working."
+                )
         except RuntimeError as e:
             if "no running event loop" not in str(e).lower() and "cannot process task" not in str(e).lower():
                 raise
@@ -217,32 +275,33 @@ def process_task(api_client: LaravelAPIClient, task: dict):
             api_client.update_task_status(task_id, 'failed')
             return
         
-        # Lock task
-        log_step(task_id, 'locking_task')
-        try:
-            BudgetGuard.check_step_retry(task_id, 'lock_task')
-        except BudgetExceededException as e:
-            logger.error(f"Budget exceeded: {e.reason.value}")
-            finalize_run(task_id, {
-                'success': False,
-                'failure_reason': FailureReason.TIMEOUT.value,
-                'error': f"Budget exceeded: {e.reason.value}",
-            })
-            return
-        
-        lock_result = api_client.lock_task(task_id, WORKER_ID)
-        if 'error' in lock_result:
-            logger.warning(f"Failed to lock task {task_id}: {lock_result.get('error')}")
-            finalize_run(task_id, {
-                'success': False,
-                'failure_reason': FailureReason.UNKNOWN.value,
-                'error': 'Failed to lock task',
-            })
-            return
+        # Lock task (claimed tasks are already locked and running)
+        if not task.get('claimed'):
+            log_step(task_id, 'locking_task')
+            try:
+                BudgetGuard.check_step_retry(task_id, 'lock_task')
+            except BudgetExceededException as e:
+                logger.error(f"Budget exceeded: {e.reason.value}")
+                finalize_run(task_id, {
+                    'success': False,
+                    'failure_reason': FailureReason.TIMEOUT.value,
+                    'error': f"Budget exceeded: {e.reason.value}",
+                })
+                return
+            
+            lock_result = api_client.lock_task(task_id, WORKER_ID)
+            if 'error' in lock_result:
+                logger.warning(f"Failed to lock task {task_id}: {lock_result.get('error')}")
+                finalize_run(task_id, {
+                    'success': False,
+                    'failure_reason': FailureReason.UNKNOWN.value,
+                    'error': 'Failed to lock task',
+                })
+                return
 
-        # Update task status to running
-        log_step(task_id, 'task_locked')
-        api_client.update_task_status(task_id, 'running')
+            # Update task status to running
+            log_step(task_id, 'task_locked')
+            api_client.queue_task_status(task_id, 'running')
         log_step(task_id, 'status_set_to_running')
 
         # Get automation class
@@ -256,16 +315,30 @@ def process_task(api_client: LaravelAPIClient, task: dict):
         # This will be set if OpportunitySelector ran in shadow mode
         # We'll log it after we get the opportunity from automation
 
+        # Campaign -> proxy and opportunity selection run in the prefetch pool while this
+        # thread prepares the browser; only the launch waits for the proxy (a launch option)
+        headless_mode = os.getenv('BROWSER_HEADLESS', 'true').lower() in ('true', '1', 'yes')
+        automation = automation_class(api_client, proxy=None, headless=headless_mode, browser_pool=browser_pool)
+        startup_trace = StartupTrace()
+        automation.startup_trace = startup_trace
+        automation.task_lookups = TaskLookups(
+            api_client, task,
+            opportunity_selector=automation.opportunity_selector if _prefetch_opportunity() else None,
+            opportunity_type=task_type if task_type in OPPORTUNITY_TASK_TYPES else None,
+            trace=startup_trace,
+        )
+        try:
+            with startup_trace.span('browser_prepare'):
+                automation.prepare_browser()
+        except Exception as e:
+            # setup_browser() repeats these steps and reports the failure
+            logger.debug(f"Browser preparation failed, retrying at setup: {e}")
+
         # Get proxy if needed - prefer country match from campaign
         log_step(task_id, 'getting_proxy')
         try:
-            campaign = api_client.get_campaign(task['campaign_id'])
-            if not campaign:
-                raise ValueError(f"Campaign {task['campaign_id']} not found")
-
-            campaign_country = campaign.get('company_country') or campaign.get('country_name')
-            proxies = api_client.get_proxies(country=campaign_country, prefer_country=True)
-            proxy = proxies[0] if proxies else None
+            proxy = automation.task_lookups.proxy()
+            automation.proxy = proxy
 
             if proxy:
                 logger.debug(f"Using proxy: {proxy.get('host')}:{proxy.get('port')}")
@@ -278,13 +351,23 @@ def process_task(api_client: LaravelAPIClient, task: dict):
             proxy = None
             log_step(task_id, 'proxy_error', {'error': str(e)})
 
+        # The prefetched opportunity is the page the automation opens; hold its domain before navigating
+        if DOMAIN_LIMIT_ENABLED:
+            started, target_domain = _lease_target_domain(task, automation.task_lookups)
+            if not started:
+                automation.cleanup()
+                _hand_back_busy_domain(api_client, task_id, target_domain)
+                return
+            if target_domain:
+                domain = target_domain
+
         # Execute automation with proper error handling
         log_step(task_id, 'starting_automation_execution')
         try:
-            # Use headless mode in production, allow override via env var for debugging
-            headless_mode = os.getenv('BROWSER_HEADLESS', 'true').lower() in ('true', '1', 'yes')
-            with automation_class(api_client, proxy=proxy, headless=headless_mode) as automation:
+            with automation:
                 log_step(task_id, 'automation_context_entered')
+                if automation.browser_lease is not None:
+                    log_step(task_id, 'browser_acquired', automation.browser_lease.to_dict())
                 
                 # Try to save initial snapshot if page is available
                 try:
@@ -297,6 +380,7 @@ def process_task(api_client: LaravelAPIClient, task: dict):
                 # This must happen before the agent tries to find forms
                 logger.info("Navigating to target URL...")
                 result = automation.execute(task)
+                _log_startup_trace(task_id, startup_trace)
                 
                 # If navigation/execution succeeded, we're done
                 if result.get('success'):
@@ -354,11 +438,9 @@ def process_task(api_client: LaravelAPIClient, task: dict):
                         }
                 log_step(task_id, 'automation_execution_completed', {'success': result.get('success', False)})
                 
-                # Record success/failure in domain memory
+                # Record failures in domain memory (successes once the server accepts the result)
                 if domain:
-                    if result.get('success'):
-                        domain_memory.increment_stat(domain, 'successes', 1)
-                    else:
+                    if not result.get('success'):
                         failure_reason = result.get('failure_reason', FailureReason.UNKNOWN.value)
                         domain_memory.record_failure(domain, failure_reason)
                         
@@ -380,7 +462,7 @@ def process_task(api_client: LaravelAPIClient, task: dict):
                 # Save final snapshot if page is available
                 try:
                     if hasattr(automation, 'page') and automation.page:
-                        save_snapshot(task_id, automation.page, 'final')
+                        save_snapshot(task_id, automation.page, 'final', success=bool(result.get('success')))
                 except Exception as snap_error:
                     logger.debug(f"Could not save final snapshot: {snap_error}")
                 
@@ -410,6 +492,7 @@ def process_task(api_client: LaravelAPIClient, task: dict):
             
             # Map failure reason
             failure_reason = FailureMapper.map(automation_error)
+            _forget_failed_proxy(api_client, proxy, automation_error)
             log_step(task_id, 'automation_error', {
                 'error': error_msg,
                 'failure_reason': failure_reason.value,
@@ -432,14 +515,9 @@ def process_task(api_client: LaravelAPIClient, task: dict):
             except Exception as telem_error:
                 logger.warning(f"Failed to finalize telemetry: {telem_error}")
 
-            # Unlock task and mark as failed
+            # Mark as failed (also releases the lock)
             try:
-                api_client.unlock_task(task_id)
-                api_client.update_task_status(
-                    task_id,
-                    'failed',
-                    error_message=error_msg
-                )
+                api_client.queue_task_status(task_id, 'failed', error_message=error_msg)
             except Exception as update_error:
                 logger.error(f"Failed to update task {task_id} after automation error: {update_error}")
 
@@ -447,6 +525,7 @@ def process_task(api_client: LaravelAPIClient, task: dict):
             try:
                 automation_logger.log_outcome(
                     task_id=task_id,
+                    campaign_id=task.get('campaign_id'),
                     action_attempted=task_type,
                     result=result_status,
                     error_message=error_message,
@@ -475,182 +554,372 @@ def process_task(api_client: LaravelAPIClient, task: dict):
                     'probabilities': opp.get('ai_probabilities', {}),
                 }
         
-        if result.get('success'):
-            log_step(task_id, 'result_success')
-            
-            # Create backlink opportunity (campaign-specific)
-            # backlink_id is required - it references the backlink from the store
-            backlink_id = result.get('backlink_id')
-            if not backlink_id:
-                logger.error(f"Task {task_id} succeeded but no backlink_id in result. Cannot create opportunity.")
-                api_client.update_task_status(
-                    task_id,
-                    'failed',
-                    error_message='Automation succeeded but backlink_id missing from result'
-                )
-                
-                # Log structured outcome
-                try:
-                    automation_logger.log_outcome(
-                        task_id=task_id,
-                        action_attempted=task_type,
-                        result='failed',
-                        error_message='backlink_id missing from result',
-                        execution_time=execution_time,
-                        retry_count=retry_count,
-                        url=result.get('url')
-                    )
-                except Exception as log_error:
-                    logger.warning(f"Failed to log automation outcome: {log_error}")
-                
+        result_url, error_message, result_status = _report_task_result(
+            api_client, task, result, execution_time, ai_prediction=ai_prediction
+        )
+        if domain and result_status == 'success':
+            domain_memory.increment_stat(domain, 'successes', 1)
+
+    except Exception as e:
+        error_msg = str(e)
+        # Include traceback for better debugging (truncate if too long)
+        import traceback
+        tb = traceback.format_exc()
+        full_error = f"{error_msg}\n\nTraceback:\n{tb}"
+
+        # Truncate if too long (API will truncate to 1000 chars, but keep it reasonable)
+        if len(full_error) > 2000:
+            full_error = full_error[:1997] + "..."
+        
+        # Calculate execution time if not already calculated
+        if execution_time is None:
+            execution_time = time.time() - start_time
+        
+        # Map failure reason
+        failure_reason = FailureMapper.map(e)
+        log_step(task_id, 'unhandled_exception', {
+            'error': error_msg,
+            'failure_reason': failure_reason.value,
+        })
+
+        logger.error(f"Error processing task {task_id}: {error_msg}", exc_info=True)
+        try:
+            # Mark as failed (releases the lock and handles retry logic)
+            api_client.queue_task_status(task_id, 'failed', error_message=full_error)
+        except Exception as unlock_error:
+            logger.error(f"Failed to unlock/update task {task_id} after error: {unlock_error}")
+            # Try to unlock at least
+            try:
+                api_client.unlock_task(task_id)
+            except:
+                pass
+        
+        # Finalize telemetry run (exception)
+        try:
+            finalize_run(task_id, {
+                'success': False,
+                'failure_reason': failure_reason.value,
+                'error': error_msg,
+                'execution_time': execution_time,
+                'retry_count': retry_count,
+                'exception': True,
+            })
+        except Exception as telem_error:
+            logger.warning(f"Failed to finalize telemetry: {telem_error}")
+        
+        # Log structured outcome (exception)
+        try:
+            automation_logger.log_outcome(
+                task_id=task_id,
+                campaign_id=task.get('campaign_id'),
+                action_attempted=task_type,
+                result='error',
+                error_message=error_msg,
+                execution_time=execution_time,
+                retry_count=retry_count,
+                url=result_url
+            )
+        except Exception as log_error:
+            logger.warning(f"Failed to log automation outcome: {log_error}")
+        
+        # Log shadow mode result
+        try:
+            shadow_logger.log_result(
+                task_id=task_id,
+                rule_based_action=task_type,
+                task_result='error',
+                execution_time=execution_time,
+                retry_count=retry_count,
+                ai_prediction=ai_prediction
+            )
+        except Exception as log_error:
+            logger.warning(f"Failed to log shadow mode result: {log_error}")
+
+
+async def process_task_async(api_client: LaravelAPIClient, task: dict, engine: AsyncAutomationEngine):
+    """
+    Process a single task on the async engine.
+
+    Same lifecycle as process_task (lock, run, report), but page work is awaited
+    and blocking API calls run in threads, so many tasks share one event loop.
+    Agent/healer recovery is sync-API only and is not run on this path.
+    """
+    task_id = task['id']
+    task_type = task['type']
+    retry_count = task.get('retry_count', 0)
+    start_time = time.time()
+
+    logger.info(f"Processing task {task_id} of type {task_type} (async engine)")
+    proxy = None
+
+    try:
+        init_run(task_id, meta={
+            'task_type': task_type,
+            'campaign_id': task.get('campaign_id'),
+            'retry_count': retry_count,
+            'engine': 'async',
+        })
+        log_step(task_id, 'task_started', {'task_type': task_type})
+        BudgetGuard.init_task(task_id, BudgetConfig(
+            max_runtime_seconds=int(os.getenv('MAX_TASK_RUNTIME_SECONDS', '300')),
+            max_retries_per_step=int(os.getenv('MAX_RETRIES_PER_STEP', '3')),
+            max_popup_dismiss_attempts=int(os.getenv('MAX_POPUP_DISMISS_ATTEMPTS', '5')),
+            max_locator_candidates=int(os.getenv('MAX_LOCATOR_CANDIDATES', '10'))
+        ))
+    except Exception as init_error:
+        logger.warning(f"Failed to initialize telemetry/budget: {init_error}")
+
+    automation_logger = get_logger()
+    domain_memory = get_domain_memory()
+    domain = _task_domain(task)
+    execution_time = None
+
+    try:
+        if domain:
+            should_skip, skip_reason = await asyncio.to_thread(domain_memory.should_skip, domain)
+            if should_skip:
+                logger.warning(f"Domain {domain} should be skipped: {skip_reason}")
+                finalize_run(task_id, {
+                    'success': False,
+                    'failure_reason': FailureReason.BLOCKED.value,
+                    'error': f"Domain skipped: {skip_reason}",
+                })
+                await asyncio.to_thread(api_client.update_task_status, task_id, 'failed')
                 return
-            
-            result_url = result.get('url')
-            opportunity = api_client.create_backlink(
-                campaign_id=task['campaign_id'],
-                url=result_url,
-                task_type=task_type,
-                status='submitted',
-                site_account_id=result.get('site_account_id'),
-                backlink_id=backlink_id,  # Reference to backlink store
+
+        if not task.get('claimed'):
+            lock_result = await asyncio.to_thread(api_client.lock_task, task_id, WORKER_ID)
+            if 'error' in lock_result:
+                logger.warning(f"Failed to lock task {task_id}: {lock_result.get('error')}")
+                finalize_run(task_id, {
+                    'success': False,
+                    'failure_reason': FailureReason.UNKNOWN.value,
+                    'error': 'Failed to lock task',
+                })
+                return
+            await asyncio.to_thread(api_client.queue_task_status, task_id, 'running')
+        log_step(task_id, 'status_set_to_running')
+
+        automation_class = get_async_automation_class(task_type)
+        if not automation_class:
+            raise ValueError(f"Unknown task type: {task_type}")
+
+        headless_mode = os.getenv('BROWSER_HEADLESS', 'true').lower() in ('true', '1', 'yes')
+        automation = automation_class(api_client, browser=None, proxy=None, headless=headless_mode)
+        automation.task_lookups = TaskLookups(
+            api_client, task,
+            opportunity_selector=automation.opportunity_selector if _prefetch_opportunity() else None,
+            opportunity_type=task_type if task_type in OPPORTUNITY_TASK_TYPES else None,
+        )
+
+        try:
+            proxy = await asyncio.to_thread(automation.task_lookups.proxy)
+            automation.proxy = proxy
+        except Exception as e:
+            logger.warning(f"Error getting campaign/proxy info: {e}, continuing without proxy")
+
+        # Hold the selected opportunity's domain before a browser is taken or the page opened
+        if DOMAIN_LIMIT_ENABLED:
+            started, target_domain = await asyncio.to_thread(_lease_target_domain, task, automation.task_lookups)
+            if not started:
+                await asyncio.to_thread(_hand_back_busy_domain, api_client, task_id, target_domain)
+                return
+            if target_domain:
+                domain = target_domain
+
+        automation.browser = await engine.get_browser(automation._build_launch_options())
+
+        max_runtime = int(os.getenv('MAX_TASK_RUNTIME_SECONDS', '300'))
+        async with automation:
+            log_step(task_id, 'automation_context_entered')
+            result = await asyncio.wait_for(automation.execute(task), timeout=max_runtime)
+        log_step(task_id, 'automation_execution_completed', {'success': result.get('success', False)})
+
+        # Record failures in domain memory (successes once the server accepts the result)
+        if domain and not result.get('success'):
+            await asyncio.to_thread(
+                domain_memory.record_failure, domain, result.get('failure_reason', FailureReason.UNKNOWN.value)
             )
 
-            # Mark task as success
+        ai_prediction = None
+        opp = getattr(automation, 'last_opportunity', None)
+        if opp and opp.get('shadow_mode'):
+            ai_prediction = {
+                'action': opp.get('ai_recommended_action_type', task_type),
+                'probability': opp.get('ai_probability', 0.5),
+                'probabilities': opp.get('ai_probabilities', {}),
+            }
+
+        execution_time = time.time() - start_time
+        _, _, result_status = await asyncio.to_thread(
+            _report_task_result, api_client, task, result, execution_time, ai_prediction
+        )
+        if domain and result_status == 'success':
+            await asyncio.to_thread(domain_memory.increment_stat, domain, 'successes', 1)
+
+    except Exception as e:
+        error_msg = str(e) or e.__class__.__name__
+        if execution_time is None:
+            execution_time = time.time() - start_time
+        failure_reason = FailureMapper.map(e)
+        _forget_failed_proxy(api_client, proxy, e)
+        logger.error(f"Error processing task {task_id}: {error_msg}", exc_info=True)
+        log_step(task_id, 'unhandled_exception', {
+            'error': error_msg,
+            'failure_reason': failure_reason.value,
+        })
+        try:
+            await asyncio.to_thread(api_client.queue_task_status, task_id, 'failed', error_message=error_msg)
+        except Exception as update_error:
+            logger.error(f"Failed to unlock/update task {task_id} after error: {update_error}")
+        try:
+            finalize_run(task_id, {
+                'success': False,
+                'failure_reason': failure_reason.value,
+                'error': error_msg,
+                'execution_time': execution_time,
+                'retry_count': retry_count,
+                'exception': True,
+            })
+        except Exception as telem_error:
+            logger.warning(f"Failed to finalize telemetry: {telem_error}")
+        try:
+            automation_logger.log_outcome(
+                task_id=task_id,
+                domain=domain,
+                campaign_id=task.get('campaign_id'),
+                action_attempted=task_type,
+                result='error',
+                failure_reason=failure_reason.value,
+                error_message=error_msg,
+                execution_time=execution_time,
+                retry_count=retry_count,
+            )
+        except Exception as log_error:
+            logger.warning(f"Failed to log automation outcome: {log_error}")
+    finally:
+        BudgetGuard.cleanup_task(task_id)
+        _release_domain_lease(task)
+
+
+def _log_startup_trace(task_id: int, startup_trace: StartupTrace):
+    """Record how long the task took to reach its first navigation, and what it waited for"""
+    trace = startup_trace.to_dict()
+    log_step(task_id, 'startup_trace', trace)
+    if trace['time_to_first_navigation'] is not None:
+        logger.info(
+            f"Task {task_id} first navigation after {trace['time_to_first_navigation']:.2f}s "
+            f"(steps {trace['serial_seconds']:.2f}s serial), critical path: {' -> '.join(trace['critical_path'])}"
+        )
+
+
+def _report_rejection(outcome: dict):
+    """Why the server didn't record a success report (None if it did, or if it was queued for retry)"""
+    if not outcome:
+        return None
+    if outcome.get('backlink_error'):
+        return f"Failed to create backlink: {outcome['backlink_error']}"
+    if not outcome.get('ok', True):
+        return f"Result rejected: {outcome.get('error', 'unknown error')}"
+    if outcome.get('status') not in (None, 'success'):
+        return f"Result not applied (task is {outcome['status']})"
+    return None
+
+
+def _report_task_result(api_client: LaravelAPIClient, task: dict, result: dict, execution_time: float,
+                        ai_prediction: dict = None):
+    """
+    Report an automation result: update the task via the API, finalize telemetry
+    and write the structured/shadow-mode outcome logs.
+
+    Returns:
+        Tuple of (result_url, error_message, result_status)
+    """
+    task_id = task['id']
+    task_type = task['type']
+    retry_count = task.get('retry_count', 0)
+    automation_logger = get_logger()
+    shadow_logger = get_shadow_logger()
+    result_url = None
+    error_message = None
+    result_status = 'success' if result.get('success') else 'failed'
+
+    if result.get('success'):
+        log_step(task_id, 'result_success')
+
+        # Create backlink opportunity (campaign-specific)
+        # backlink_id is required - it references the backlink from the store
+        backlink_id = result.get('backlink_id')
+        if not backlink_id:
+            logger.error(f"Task {task_id} succeeded but no backlink_id in result. Cannot create opportunity.")
             api_client.update_task_status(
                 task_id,
-                'success',
-                result={
-                    'opportunity_id': opportunity.get('opportunity', {}).get('id') if isinstance(opportunity.get('opportunity'), dict) else opportunity.get('id'),
-                    'backlink_id': backlink_id,
-                    'url': result_url,
-                }
+                'failed',
+                error_message='Automation succeeded but backlink_id missing from result'
             )
 
-            logger.info(f"Task {task_id} completed successfully")
-            
-            # Finalize telemetry run (success)
-            try:
-                finalize_run(task_id, {
-                    'success': True,
-                    'execution_time': execution_time,
-                    'retry_count': retry_count,
-                    'url': result_url,
-                    'backlink_id': backlink_id,
-                })
-            except Exception as telem_error:
-                logger.warning(f"Failed to finalize telemetry: {telem_error}")
-            
-            # Log structured outcome (success)
+            # Log structured outcome
             try:
                 automation_logger.log_outcome(
                     task_id=task_id,
+                    campaign_id=task.get('campaign_id'),
                     action_attempted=task_type,
-                    result='success',
+                    result='failed',
+                    error_message='backlink_id missing from result',
                     execution_time=execution_time,
                     retry_count=retry_count,
-                    url=result_url,
-                    result_data=result
+                    url=result.get('url')
                 )
             except Exception as log_error:
                 logger.warning(f"Failed to log automation outcome: {log_error}")
-            
-            # Log shadow mode result
-            try:
-                shadow_logger.log_result(
-                    task_id=task_id,
-                    rule_based_action=task_type,
-                    task_result='success',
-                    execution_time=execution_time,
-                    retry_count=retry_count,
-                    ai_prediction=ai_prediction
-                )
-            except Exception as log_error:
-                logger.warning(f"Failed to log shadow mode result: {log_error}")
-        else:
-            # Mark task as failed
-            error_msg = result.get('error', 'Unknown error')
-            backlink_id = result.get('backlink_id')  # Get backlink_id from result if available
-            result_url = result.get('url')
-            error_message = error_msg
-            result_status = 'failed'
-            
-            # Map failure reason from result or error message
-            failure_reason = FailureReason.UNKNOWN
-            if result.get('failure_reason'):
-                try:
-                    failure_reason = FailureReason.from_string(result.get('failure_reason'))
-                except:
-                    pass
-            else:
-                failure_reason = FailureMapper.map(error_msg)
-            
-            log_step(task_id, 'result_failed', {
-                'error': error_msg,
-                'failure_reason': failure_reason.value,
-            })
-            
-            logger.error(f"Task {task_id} failed: {error_msg}")
 
-            try:
-                # Unlock task first
-                api_client.unlock_task(task_id)
+            return result.get('url'), 'backlink_id missing from result', 'failed'
 
-                # Then mark as failed (this will handle retry logic)
-                # Include backlink_id in result so we can track failures per backlink
-                result_data = {}
-                if backlink_id:
-                    result_data['backlink_id'] = backlink_id
-                
-                api_client.update_task_status(
-                    task_id,
-                    'failed',
-                    error_message=error_msg,
-                    result=result_data if result_data else None
-                )
-            except Exception as update_error:
-                logger.error(f"Failed to update task {task_id} status after failure: {update_error}")
-                # Try to unlock at least
-                try:
-                    api_client.unlock_task(task_id)
-                except:
-                    pass
-            
-            # Finalize telemetry run (failure)
+        result_url = result.get('url')
+
+        # Create backlink opportunity and mark task as success in one write, sent now
+        # so a result the server rejects isn't recorded as a success below
+        outcome = api_client.queue_task_status(
+            task_id,
+            'success',
+            result={
+                'backlink_id': backlink_id,
+                'url': result_url,
+            },
+            backlink={
+                'campaign_id': task['campaign_id'],
+                'backlink_id': backlink_id,  # Reference to backlink store
+                'url': result_url,
+                'type': task_type,
+                'status': 'submitted',
+                'site_account_id': result.get('site_account_id'),
+            },
+            wait=True,
+        )
+        error_msg = _report_rejection(outcome)
+        if error_msg:
+            # The server marked the task failed (with retry) or didn't apply the result
+            logger.error(f"Task {task_id}: {error_msg}")
             try:
                 finalize_run(task_id, {
                     'success': False,
-                    'failure_reason': failure_reason.value,
+                    'failure_reason': FailureReason.UNKNOWN.value,
                     'error': error_msg,
                     'execution_time': execution_time,
                     'retry_count': retry_count,
                     'url': result_url,
                     'backlink_id': backlink_id,
                 })
-            except Exception as telem_error:
-                logger.warning(f"Failed to finalize telemetry: {telem_error}")
-            
-            # Log structured outcome (failure)
-            try:
-                # Extract captcha_type from result if present
-                captcha_type = result.get('captcha_type')
-                
                 automation_logger.log_outcome(
                     task_id=task_id,
+                    campaign_id=task.get('campaign_id'),
                     action_attempted=task_type,
-                    result=result_status,
-                    failure_reason=failure_reason.value,
-                    captcha_type=captcha_type,
-                    error_message=error_message,
+                    result='failed',
+                    error_message=error_msg,
                     execution_time=execution_time,
                     retry_count=retry_count,
-                    url=result_url,
-                    result_data=result
+                    url=result_url
                 )
-            except Exception as log_error:
-                logger.warning(f"Failed to log automation outcome: {log_error}")
-            
-            # Log shadow mode result
-            try:
                 shadow_logger.log_result(
                     task_id=task_id,
                     rule_based_action=task_type,
@@ -660,50 +929,93 @@ def process_task(api_client: LaravelAPIClient, task: dict):
                     ai_prediction=ai_prediction
                 )
             except Exception as log_error:
-                logger.warning(f"Failed to log shadow mode result: {log_error}")
+                logger.warning(f"Failed to log automation outcome: {log_error}")
+            return result_url, error_msg, 'failed'
 
-    except Exception as e:
-        error_msg = str(e)
-        # Include traceback for better debugging (truncate if too long)
-        import traceback
-        tb = traceback.format_exc()
-        full_error = f"{error_msg}\n\nTraceback:\n{tb}"
+        logger.info(f"Task {task_id} completed successfully")
 
-        # Truncate if too long (API will truncate to 1000 chars, but keep it reasonable)
-        if len(full_error) > 2000:
-            full_error = full_error[:1997] + "..."
-        
-        # Calculate execution time if not already calculated
-        if execution_time is None:
-            execution_time = time.time() - start_time
-        
-        # Map failure reason
-        failure_reason = FailureMapper.map(e)
-        log_step(task_id, 'unhandled_exception', {
+        # Finalize telemetry run (success)
+        try:
+            finalize_run(task_id, {
+                'success': True,
+                'execution_time': execution_time,
+                'retry_count': retry_count,
+                'url': result_url,
+                'backlink_id': backlink_id,
+            })
+        except Exception as telem_error:
+            logger.warning(f"Failed to finalize telemetry: {telem_error}")
+
+        # Log structured outcome (success)
+        try:
+            automation_logger.log_outcome(
+                task_id=task_id,
+                campaign_id=task.get('campaign_id'),
+                action_attempted=task_type,
+                result='success',
+                execution_time=execution_time,
+                retry_count=retry_count,
+                url=result_url,
+                result_data=result
+            )
+        except Exception as log_error:
+            logger.warning(f"Failed to log automation outcome: {log_error}")
+
+        # Log shadow mode result
+        try:
+            shadow_logger.log_result(
+                task_id=task_id,
+                rule_based_action=task_type,
+                task_result='success',
+                execution_time=execution_time,
+                retry_count=retry_count,
+                ai_prediction=ai_prediction
+            )
+        except Exception as log_error:
+            logger.warning(f"Failed to log shadow mode result: {log_error}")
+    else:
+        # Mark task as failed
+        error_msg = result.get('error', 'Unknown error')
+        backlink_id = result.get('backlink_id')  # Get backlink_id from result if available
+        result_url = result.get('url')
+        error_message = error_msg
+        result_status = 'failed'
+
+        # Map failure reason from result or error message
+        failure_reason = FailureReason.UNKNOWN
+        if result.get('failure_reason'):
+            try:
+                failure_reason = FailureReason.from_string(result.get('failure_reason'))
+            except:
+                pass
+        else:
+            failure_reason = FailureMapper.map(error_msg)
+
+        log_step(task_id, 'result_failed', {
             'error': error_msg,
             'failure_reason': failure_reason.value,
         })
 
-        logger.error(f"Error processing task {task_id}: {error_msg}", exc_info=True)
-        try:
-            # Unlock task first
-            api_client.unlock_task(task_id)
+        logger.error(f"Task {task_id} failed: {error_msg}")
 
-            # Then mark as failed (this will handle retry logic)
-            api_client.update_task_status(
+        try:
+            # Mark as failed (releases the lock and handles retry logic)
+            # Include backlink_id in result so we can track failures per backlink
+            api_client.queue_task_status(
                 task_id,
                 'failed',
-                error_message=full_error
+                error_message=error_msg,
+                result={'backlink_id': backlink_id} if backlink_id else None
             )
-        except Exception as unlock_error:
-            logger.error(f"Failed to unlock/update task {task_id} after error: {unlock_error}")
+        except Exception as update_error:
+            logger.error(f"Failed to update task {task_id} status after failure: {update_error}")
             # Try to unlock at least
             try:
                 api_client.unlock_task(task_id)
             except:
                 pass
-        
-        # Finalize telemetry run (exception)
+
+        # Finalize telemetry run (failure)
         try:
             finalize_run(task_id, {
                 'success': False,
@@ -711,31 +1023,39 @@ def process_task(api_client: LaravelAPIClient, task: dict):
                 'error': error_msg,
                 'execution_time': execution_time,
                 'retry_count': retry_count,
-                'exception': True,
+                'url': result_url,
+                'backlink_id': backlink_id,
             })
         except Exception as telem_error:
             logger.warning(f"Failed to finalize telemetry: {telem_error}")
-        
-        # Log structured outcome (exception)
+
+        # Log structured outcome (failure)
         try:
+            # Extract captcha_type from result if present
+            captcha_type = result.get('captcha_type')
+
             automation_logger.log_outcome(
                 task_id=task_id,
+                campaign_id=task.get('campaign_id'),
                 action_attempted=task_type,
-                result='error',
-                error_message=error_msg,
+                result=result_status,
+                failure_reason=failure_reason.value,
+                captcha_type=captcha_type,
+                error_message=error_message,
                 execution_time=execution_time,
                 retry_count=retry_count,
-                url=result_url
+                url=result_url,
+                result_data=result
             )
         except Exception as log_error:
             logger.warning(f"Failed to log automation outcome: {log_error}")
-        
+
         # Log shadow mode result
         try:
             shadow_logger.log_result(
                 task_id=task_id,
                 rule_based_action=task_type,
-                task_result='error',
+                task_result='failed',
                 execution_time=execution_time,
                 retry_count=retry_count,
                 ai_prediction=ai_prediction
@@ -744,6 +1064,9 @@ def process_task(api_client: LaravelAPIClient, task: dict):
             logger.warning(f"Failed to log shadow mode result: {log_error}")
 
 
+    return result_url, error_message, result_status
+
+
 def parse_args() -> argparse.Namespace:
     """Parse CLI flags for worker."""
     parser = argparse.ArgumentParser(description="Automation worker")
@@ -756,13 +1079,56 @@ def parse_args() -> argparse.Namespace:
         default=DEFAULT_POLL_INTERVAL,
         help="Seconds to wait between polls when running continuously",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Number of tasks to process at once (one browser slot per task)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["sync", "async"],
+        default=DEFAULT_ENGINE if DEFAULT_ENGINE in ("sync", "async") else "sync",
+        help="sync: thread per task slot; async: one event loop drives up to --concurrency pages",
+    )
+    parser.add_argument(
+        "--delivery",
+        choices=list(DELIVERY_MODES),
+        default=DEFAULT_DELIVERY_MODE if DEFAULT_DELIVERY_MODE in DELIVERY_MODES else "long_poll",
+        help="poll: claim every --poll-interval; long_poll: server holds claims until a task is pending; "
+             "redis: wait for task notifications on Redis",
+    )
     return parser.parse_args()
 
 
-def run_worker(run_once: bool, limit: int, poll_interval: int):
+def _handle_stop_signal(signum, frame):
+    """Stop polling for new tasks; in-flight tasks are allowed to finish"""
+    if _stop_event.is_set():
+        if signum == signal.SIGINT:
+            # A second Ctrl+C stops without waiting
+            raise KeyboardInterrupt
+        logger.warning(f"Received signal {signum} again while draining, still waiting for running tasks")
+        return
+    logger.info(f"Received signal {signum}, draining worker (no new tasks will be started)")
+    _stop_event.set()
+
+
+def _install_signal_handlers():
+    """Install graceful shutdown handlers (only possible from the main thread)"""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    signal.signal(signal.SIGTERM, _handle_stop_signal)
+    signal.signal(signal.SIGINT, _handle_stop_signal)
+
+
+def run_worker(run_once: bool, limit: int, poll_interval: int, concurrency: int = 1,
+               engine: str = 'sync', delivery: str = DEFAULT_DELIVERY_MODE):
     """
     Worker loop that polls for tasks and processes them.
     Can be run in continuous mode or a single pass (run_once).
+    With concurrency > 1, tasks run in parallel task slots; with engine='async'
+    they run as coroutines on one event loop. `delivery` picks how new tasks
+    are picked up (see core.task_delivery).
     """
     # Re-read environment variables to ensure we have the latest values
     # (in case they were set by Process after module import)
@@ -788,8 +1154,8 @@ def run_worker(run_once: bool, limit: int, poll_interval: int):
     logger.info("Starting Auto Backlink Pro Python Worker")
     logger.info(f"Laravel API URL: {api_url}")
     logger.info(f"Worker ID: {WORKER_ID}")
-    logger.info(f"Mode: {'single-pass' if run_once else 'continuous'} | Limit: {limit}")
-    logger.info(f"Poll interval: {poll_interval}s (Rate limit: 300 requests/hour, ~{int(3600/poll_interval)} requests/hour at this interval)")
+    logger.info(f"Mode: {'single-pass' if run_once else 'continuous'} | Limit: {limit} | Concurrency: {concurrency} | Engine: {engine}")
+    logger.info(f"Task delivery: {delivery} | Poll interval: {poll_interval}s (Rate limit: 300 requests/hour, ~{int(3600/poll_interval)} requests/hour when polling at this interval)")
 
     if not api_token:
         logger.error("LARAVEL_API_TOKEN not set! Worker cannot authenticate.")
@@ -801,60 +1167,446 @@ def run_worker(run_once: bool, limit: int, poll_interval: int):
     logger.info(f"API Token: {token_preview} (length: {len(api_token)})")
 
     # Use the corrected API URL and token
-    api_client = LaravelAPIClient(api_url, api_token)
+    api_client = LaravelAPIClient(api_url, api_token, worker_id=WORKER_ID)
+    if API_WRITE_QUEUE_ENABLED:
+        write_queue = api_client.start_write_queue(
+            os.getenv('API_WRITE_QUEUE_PATH') or f'api_write_queue_{WORKER_ID}.json'
+        )
+        logger.info(f"API write queue enabled (persisted to {write_queue.path})")
     os.makedirs('screenshots', exist_ok=True)
 
+    # A single pass never waits for tasks to arrive
+    delivery_config = TaskDeliveryConfig.from_env()
+    delivery_config.mode = MODE_POLL if run_once else delivery
+    duration_estimator = DurationEstimator() if SJF_ORDERING_ENABLED else None
+    fair_scheduler = (WeightedFairScheduler(TASK_TYPES, duration_estimator=duration_estimator)
+                      if FAIR_SCHEDULING_ENABLED else None)
+    task_delivery = TaskDelivery(api_client, WORKER_ID, type_priority=TASK_TYPE_PRIORITY, config=delivery_config,
+                                 fair_scheduler=fair_scheduler, duration_estimator=duration_estimator)
+    deferred = None
+    if DOMAIN_LIMIT_ENABLED:
+        limiter_config = get_domain_limiter().config
+        deferred = DeferredTasks(limiter_config.max_defer_seconds, limiter_config.max_deferred)
+        logger.info(
+            f"Domain limits: {limiter_config.max_concurrent} concurrent task(s) per domain, "
+            f"{limiter_config.min_gap_seconds:.0f}s between starts ({limiter_config.db_path})"
+        )
+
+    if RUN_ARCHIVE_ENABLED and not run_once:
+        run_archive = get_run_archive()
+        run_archive.start(active_task_ids=lambda: list(get_telemetry().active_runs))
+        logger.info(
+            f"Run archive: runs older than {run_archive.config.archive_after_seconds:.0f}s packed into "
+            f"{run_archive.archive_dir}, kept {run_archive.config.max_age_days} days"
+        )
+
+    _stop_event.clear()
+    _install_signal_handlers()
+
+    if concurrency > 1 or engine == 'async':
+        # Create shared singletons up front so slot threads don't race to initialize them
+        get_telemetry()
+        get_domain_memory()
+        get_logger()
+        get_shadow_logger()
+
+        if engine == 'async':
+            slot_pool = AsyncAutomationEngine(
+                concurrency,
+                handler=lambda task, async_engine: process_task_async(api_client, task, async_engine),
+                max_browsers=int(os.getenv('BROWSER_POOL_SIZE', '2')),
+            )
+        else:
+            slot_pool = TaskSlotPool(
+                concurrency,
+                handler=lambda task, pool: _process_leased_task(api_client, task, browser_pool=pool),
+                use_browser_pool=BROWSER_POOL_ENABLED,
+            )
+        drain_timeout = int(os.getenv('MAX_TASK_RUNTIME_SECONDS', '300')) + 60
+        try:
+            _poll_loop(api_client, task_delivery, run_once, limit, poll_interval, slot_pool=slot_pool,
+                       deferred=deferred)
+        finally:
+            logger.info(f"Draining {concurrency} {engine} task slots (timeout: {drain_timeout}s)")
+            slot_pool.drain(timeout=drain_timeout)
+            logger.info(f"Task slot stats: {slot_pool.get_stats()}")
+            if deferred is not None:
+                _release_tasks(api_client, deferred.pop_all())
+            _close_api_client(api_client)
+        return
+
+    browser_pool = get_browser_pool() if BROWSER_POOL_ENABLED else None
+    if browser_pool:
+        logger.info(f"Browser pool enabled: {browser_pool.config}")
+
+    try:
+        _poll_loop(api_client, task_delivery, run_once, limit, poll_interval, browser_pool=browser_pool,
+                   deferred=deferred)
+    finally:
+        if browser_pool:
+            logger.info(f"Browser pool stats: {browser_pool.get_stats()}")
+            close_browser_pool()
+        if deferred is not None:
+            _release_tasks(api_client, deferred.pop_all())
+        _close_api_client(api_client)
+
+
+def _close_api_client(api_client: LaravelAPIClient):
+    """Send queued API writes before exiting"""
+    pending = api_client.write_queue.pending_writes() if api_client.write_queue else 0
+    if pending:
+        logger.info(f"Flushing {pending} queued API writes")
+    api_client.close(timeout=int(os.getenv('API_WRITE_QUEUE_CLOSE_TIMEOUT', '30')))
+    if api_client.write_queue:
+        logger.info(f"API write queue stats: {api_client.get_write_queue_stats()}")
+
+
+def _forget_failed_proxy(api_client: LaravelAPIClient, proxy, error: Exception):
+    """Drop the cached proxy list when a task failed because of its proxy"""
+    if proxy and 'proxy' in str(error).lower():
+        logger.info(f"Proxy {proxy.get('host')} failed, refreshing proxy list on next task")
+        api_client.invalidate_proxies()
+
+
+def _task_domain(task: dict):
+    """Domain of the page the task will open, from its payload (None if it names none)"""
+    return domain_from_url(task_target_url(task))
+
+
+def _prescreen_tasks(api_client: LaravelAPIClient, tasks: list) -> list:
+    """
+    Fail tasks whose domain is flagged always_blocked/sso_only before dispatch
+    
+    One bulk domain memory query for the whole batch, so doomed tasks never
+    get telemetry, a task slot or a browser.
+    
+    Returns:
+        Tasks that should still run
+    """
+    domains = {task.get('id'): _task_domain(task) for task in tasks}
+    if not any(domains.values()):
+        return tasks
+
+    domain_memory = get_domain_memory()
+    try:
+        verdicts = domain_memory.bulk_should_skip(list(domains.values()), source='tasks')
+    except Exception as e:
+        logger.warning(f"Domain pre-screen failed, dispatching all tasks: {e}")
+        return tasks
+
+    runnable = []
+    skipped_reports = []
+    for task in tasks:
+        domain = domains.get(task.get('id'))
+        should_skip, skip_reason = verdicts.get(domain, (False, None))
+        if not should_skip:
+            runnable.append(task)
+            continue
+        logger.warning(f"Pre-screen: skipping task {task.get('id')}, domain {domain} is {skip_reason}")
+        skipped_reports.append({
+            'task_id': task.get('id'), 'status': 'failed', 'error_message': f"Domain skipped: {skip_reason}",
+        })
+
+    if skipped_reports:
+        try:
+            if api_client.write_queue is not None:
+                for report in skipped_reports:
+                    api_client.queue_task_status(report['task_id'], report['status'],
+                                                 error_message=report['error_message'])
+            else:
+                api_client.report_results(skipped_reports)
+        except Exception as e:
+            logger.warning(f"Failed to mark {len(skipped_reports)} pre-screened tasks as failed: {e}")
+
+    if len(runnable) < len(tasks):
+        prescreen_stats = domain_memory.get_prescreen_stats()
+        logger.info(
+            f"Pre-screen skipped {len(tasks) - len(runnable)}/{len(tasks)} tasks "
+            f"(total {prescreen_stats['skipped']}, ~{prescreen_stats['skipped_per_hour']} browser launches saved/hour)"
+        )
+    return runnable
+
+
+def _acquire_domain_lease(task: dict, deferred: DeferredTasks) -> bool:
+    """
+    Take a slot on the task's domain before it gets a browser
+
+    Returns:
+        True if the task may start now, False if it was deferred
+    """
+    domain = _task_domain(task)
+    if not domain:
+        return True
+    lease, retry_after = get_domain_limiter().try_acquire(domain, holder=WORKER_ID)
+    if lease is None:
+        logger.info(f"Domain {domain} busy, deferring task {task.get('id')} for {retry_after:.1f}s")
+        deferred.add(task, retry_after)
+        return False
+    task['_domain_lease'] = lease
+    return True
+
+
+def _prefetch_opportunity():
+    """Select opportunities before the automation starts (the domain limiter leases their domain)"""
+    return TASK_PREFETCH_ENABLED or DOMAIN_LIMIT_ENABLED
+
+
+def _hand_back_busy_domain(api_client: LaravelAPIClient, task_id: int, domain: str):
+    """Put a task whose opportunity's domain stayed busy back in the queue"""
+    logger.warning(f"Domain {domain} still busy, handing task {task_id} back to the queue")
+    log_step(task_id, 'domain_busy', {'domain': domain})
+    finalize_run(task_id, {
+        'success': False,
+        'failure_reason': FailureReason.UNKNOWN.value,
+        'error': f"Domain {domain} busy, task handed back",
+    })
+    api_client.queue_task_status(task_id, 'pending')
+
+
+def _lease_target_domain(task: dict, task_lookups):
+    """
+    Move the task's domain slot to its prefetched opportunity's domain
+
+    The dispatch lease is for the payload URL; when the opportunity selector
+    picked a page on another domain, that domain's slot is taken here, before
+    navigation, waiting up to DOMAIN_LIMIT_MAX_START_WAIT seconds.
+
+    Returns:
+        (started, domain): started is False if the domain stayed busy; domain
+        is the opportunity's domain (None if no opportunity was prefetched)
+    """
+    domain = domain_from_url(task_lookups.opportunity_url()) if task_lookups is not None else None
+    held = task.get('_domain_lease')
+    if not domain or (held is not None and normalize_domain(held.domain) == normalize_domain(domain)):
+        return True, domain
+
+    _release_domain_lease(task)
+    limiter = get_domain_limiter()
+    deadline = time.monotonic() + limiter.config.max_start_wait_seconds
     while True:
+        lease, retry_after = limiter.try_acquire(domain, holder=WORKER_ID)
+        if lease is not None:
+            task['_domain_lease'] = lease
+            return True, domain
+        if _stop_event.is_set() or time.monotonic() + retry_after > deadline:
+            return False, domain
+        logger.info(f"Domain {domain} busy, task {task.get('id')} waits {retry_after:.1f}s before navigating")
+        _stop_event.wait(retry_after)
+
+
+def _release_domain_lease(task: dict):
+    """Free the task's domain slot (no-op if it has none)"""
+    lease = task.pop('_domain_lease', None)
+    if lease is not None:
+        get_domain_limiter().release(lease)
+
+
+def _process_leased_task(api_client: LaravelAPIClient, task: dict, browser_pool=None):
+    """process_task, then free the task's domain slot"""
+    try:
+        process_task(api_client, task, browser_pool=browser_pool)
+    finally:
+        _release_domain_lease(task)
+
+
+def _release_tasks(api_client: LaravelAPIClient, tasks: list):
+    """Hand claimed-but-unstarted tasks back to the queue (resets status and lock)"""
+    claimed = [task for task in tasks if task.get('claimed')]
+    if not claimed:
+        return
+    try:
+        for task in claimed:
+            api_client.queue_task_status(task['id'], 'pending')
+    except Exception as e:
+        logger.warning(f"Failed to release {len(claimed)} claimed tasks: {e}")
+
+
+def _dispatch_tasks(api_client: LaravelAPIClient, tasks: list, browser_pool=None, slot_pool=None,
+                    deferred: DeferredTasks = None, prescreen: bool = True):
+    """
+    Run tasks inline, or hand them to task slots (blocks while all slots are busy)
+
+    With `deferred`, tasks whose domain is at its limits wait there instead of
+    starting; tasks deferred for too long are handed back to the queue.
+    """
+    if prescreen and DOMAIN_PRESCREEN_ENABLED:
+        tasks = _prescreen_tasks(api_client, tasks)
+
+    released = []
+    for task in tasks:
+        if _stop_event.is_set():
+            logger.info(f"Worker draining, leaving task {task.get('id')} pending")
+            released.append(task)
+            continue
+        if slot_pool is not None:
+            # Wait for the slot first, so a domain slot is never held while queued
+            while not slot_pool.wait_for_free_slot(timeout=1):
+                if _stop_event.is_set():
+                    break
+            if _stop_event.is_set():
+                released.append(task)
+                continue
+        if deferred is not None and not _acquire_domain_lease(task, deferred):
+            continue
+        if slot_pool is not None:
+            if not slot_pool.submit(task):
+                _release_domain_lease(task)
+                released.append(task)
+        else:
+            _process_leased_task(api_client, task, browser_pool=browser_pool)
+
+    if deferred is not None:
+        expired = deferred.pop_expired()
+        if expired:
+            logger.info(f"Handing back {len(expired)} tasks deferred for busy domains")
+            released.extend(expired)
+    _release_tasks(api_client, released)
+
+
+def _poll_loop(api_client: LaravelAPIClient, task_delivery: TaskDelivery, run_once: bool, limit: int,
+               poll_interval: int, browser_pool=None, slot_pool=None, deferred: DeferredTasks = None):
+    """Claim pending tasks and process them until stopped"""
+    last_slot_stats_log = time.time()
+
+    while not _stop_event.is_set():
         try:
-            # Prioritize comment tasks first (they're easier and more likely to succeed)
-            # Try to get comment tasks first
-            comment_tasks = api_client.get_pending_tasks(limit=limit, task_type='comment')
-            
-            if comment_tasks:
-                logger.info(f"Found {len(comment_tasks)} pending COMMENT tasks (prioritizing)")
-                for task in comment_tasks:
-                    process_task(api_client, task)
+            if deferred is not None:
+                # Tasks deferred for a busy domain go before new claims
+                ready = deferred.pop_ready()
+                if ready:
+                    _dispatch_tasks(api_client, ready, browser_pool, slot_pool, deferred=deferred, prescreen=False)
+
+            fetch_limit = limit
+            if slot_pool is not None:
+                # Only pull as many tasks as there are free slots, so nothing sits fetched but unstarted
+                while not slot_pool.wait_for_free_slot(timeout=1):
+                    if _stop_event.is_set():
+                        return
+                fetch_limit = max(min(limit, slot_pool.free_slots()), 1)
+
+            # Claim (fetch + lock) a batch in one call, comment tasks first
+            # (they're easier and more likely to succeed)
+            # Don't let the server hold the claim past the next deferred task's turn
+            deferred_wait = deferred.next_ready_in() if deferred is not None else None
+            tasks = task_delivery.claim(fetch_limit, max_wait=deferred_wait)
+            if tasks:
+                logger.info(f"Claimed {len(tasks)} tasks ({sum(1 for t in tasks if t.get('type') == 'comment')} comment)")
+                _dispatch_tasks(api_client, tasks, browser_pool, slot_pool, deferred=deferred)
             else:
-                # If no comment tasks, get any pending tasks
-                tasks = api_client.get_pending_tasks(limit=limit)
-                if tasks:
-                    logger.info(f"Found {len(tasks)} pending tasks (no comments available)")
-                    for task in tasks:
-                        process_task(api_client, task)
-                else:
-                    logger.debug("No pending tasks found")
+                logger.debug("No pending tasks found")
+
+            if browser_pool:
+                logger.debug(f"Browser pool stats: {browser_pool.get_stats()}")
+
+            if time.time() - last_slot_stats_log >= SLOT_STATS_LOG_INTERVAL:
+                if slot_pool is not None:
+                    slot_stats = slot_pool.get_stats()
+                    logger.info(
+                        f"Task slots: {slot_stats['busy_slots']}/{slot_stats['concurrency']} busy, "
+                        f"utilisation {slot_stats['utilisation']:.0%}, "
+                        f"per slot {[s['utilisation'] for s in slot_stats['slots']]}"
+                    )
+                queue_stats = api_client.get_write_queue_stats()
+                if queue_stats:
+                    logger.info(
+                        f"API write queue: {queue_stats['pending']} pending, {queue_stats['sent']} sent in "
+                        f"{queue_stats['requests']} requests, {queue_stats['coalesced']} coalesced, "
+                        f"{queue_stats['retries']} retries, {queue_stats['dropped']} dropped"
+                    )
+                cache_stats = api_client.get_cache_stats()
+                if cache_stats:
+                    logger.info(
+                        f"API cache: hit rate {cache_stats['hit_rate']:.0%} "
+                        f"({cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} entries)"
+                    )
+                delivery_stats = task_delivery.get_stats()
+                logger.info(
+                    f"Task delivery ({delivery_stats['mode']}): {delivery_stats['tasks']} tasks in "
+                    f"{delivery_stats['claims']} claims, {delivery_stats['idle_claims']} idle "
+                    f"({delivery_stats['idle_claims_per_hour']}/hour), {delivery_stats['skipped_for_budget']} "
+                    f"skipped for budget, queue wait p50 {delivery_stats['queue_wait_seconds']['p50']}s "
+                    f"p95 {delivery_stats['queue_wait_seconds']['p95']}s"
+                )
+                telemetry_stats = get_telemetry().get_stats()
+                writer_stats = telemetry_stats.get('writer')
+                if writer_stats:
+                    logger.info(
+                        f"Telemetry: {telemetry_stats['steps_logged']} steps, "
+                        f"{telemetry_stats['log_step_us_per_step']}us per log_step, "
+                        f"{writer_stats['write_us_per_step']}us per step written "
+                        f"({writer_stats['steps_per_flush']} steps/write), "
+                        f"{writer_stats['sampled_out']} sampled out, {writer_stats['dropped']} dropped; "
+                        f"level {telemetry_stats['trace_level']}: {telemetry_stats['runs_traced']} runs traced, "
+                        f"{telemetry_stats['runs_summarized']} summarized "
+                        f"({telemetry_stats['steps_discarded']} steps not written)"
+                    )
+                snapshot_stats = telemetry_stats['snapshots']
+                logger.info(
+                    f"Snapshots: {snapshot_stats['captured']} captured ({snapshot_stats['capture_ms']}ms on the "
+                    f"task thread), {snapshot_stats['written']} written ({snapshot_stats['write_ms']}ms, "
+                    f"{snapshot_stats['bytes_written']} bytes), {snapshot_stats['skipped']} skipped, "
+                    f"{snapshot_stats['discarded']} discarded"
+                )
+                if RUN_ARCHIVE_ENABLED and not run_once:
+                    archive_stats = get_run_archive().get_stats()
+                    logger.info(
+                        f"Run archive: {archive_stats['runs_archived']} runs archived "
+                        f"({archive_stats['bytes_read']} -> {archive_stats['bytes_stored']} bytes), "
+                        f"{archive_stats['runs_indexed']} indexed in {archive_stats['days']} days "
+                        f"({archive_stats['archive_bytes']} bytes), {archive_stats['runs_evicted']} evicted"
+                    )
+                if deferred is not None:
+                    limiter_stats = get_domain_limiter().get_stats()
+                    deferred_stats = deferred.get_stats()
+                    logger.info(
+                        f"Domain limits: {limiter_stats['granted']} starts, "
+                        f"{limiter_stats['deferred_busy']} deferred (busy) / {limiter_stats['deferred_gap']} (gap), "
+                        f"{deferred_stats['held']} tasks waiting, {deferred_stats['handed_back']} handed back, "
+                        f"{limiter_stats['active_leases']} leases on this host"
+                    )
+                if task_delivery.duration_estimator:
+                    duration_stats = task_delivery.duration_estimator.get_stats()
+                    logger.info(
+                        f"Expected task seconds: "
+                        f"{ {t: s['expected_seconds'] for t, s in duration_stats['by_type'].items()} } "
+                        f"({duration_stats['domains']} domains)"
+                    )
+                if task_delivery.fair_scheduler:
+                    fair_stats = task_delivery.fair_scheduler.get_stats()
+                    logger.info(
+                        f"Fair scheduling: {fair_stats['successes_per_browser_minute']} backlinks/browser-minute "
+                        f"over {fair_stats['outcomes']} outcomes, weights "
+                        f"{ {t: s['weight'] for t, s in fair_stats['by_type'].items()} }"
+                    )
+                rate_stats = api_client.get_rate_limit_stats()
+                if rate_stats:
+                    logger.info(
+                        f"API budget: {rate_stats['tokens_available']}/{rate_stats['capacity']} requests left "
+                        f"({rate_stats['requests_per_hour']}/hour), granted {rate_stats['granted']}, "
+                        f"polls skipped {rate_stats['denied']['poll']}, 429s {rate_stats['rate_limited_responses']}"
+                    )
+                last_slot_stats_log = time.time()
 
             if run_once:
                 break
 
-            time.sleep(poll_interval)
+            task_delivery.wait_for_tasks(
+                _stop_event, poll_interval, max_wait=deferred.next_ready_in() if deferred is not None else None
+            )
 
         except KeyboardInterrupt:
             logger.info("Worker stopped by user")
             break
         except requests.exceptions.HTTPError as e:
             # Handle rate limiting specifically
-            if e.response and e.response.status_code == 429:
-                error_msg = str(e)
-                retry_after = 60  # Default wait time
-
-                # Try to extract retry_after from error message
-                if "Retry after" in error_msg:
+            if e.response is not None and e.response.status_code == 429:
+                # The API client's rate limiter already paused task calls for Retry-After
+                retry_after = api_client.rate_limiter.throttled_for('tasks') if api_client.rate_limiter else 0
+                if not retry_after:
                     try:
-                        import re
-                        match = re.search(r'Retry after (\d+) seconds', error_msg)
-                        if match:
-                            retry_after = int(match.group(1))
-                    except:
-                        pass
-
-                # Also try to get retry_after from response JSON
-                try:
-                    if e.response:
-                        error_data = e.response.json()
-                        retry_after = error_data.get('retry_after', retry_after)
-                except:
-                    pass
+                        retry_after = int(e.response.headers.get('Retry-After', 60))
+                    except ValueError:
+                        retry_after = 60
 
                 logger.warning(
                     f"Rate limit exceeded. Waiting {retry_after} seconds before next poll. "
@@ -865,23 +1617,24 @@ def run_worker(run_once: bool, limit: int, poll_interval: int):
                     logger.error("Rate limit exceeded in single-pass mode. Cannot retry.")
                     break
 
-                # Wait for the retry_after period, then continue
+                # No claims until the retry_after period is over
                 # Add a small buffer to ensure rate limit window has reset
                 wait_time = retry_after + 10  # Add 10 seconds buffer
                 logger.info(f"Waiting {wait_time} seconds for rate limit to reset...")
-                time.sleep(wait_time)
+                task_delivery.on_rate_limited(wait_time)
+                task_delivery.wait_for_tasks(_stop_event, poll_interval)
                 continue  # Continue loop without sleeping again
             else:
                 # Other HTTP errors
                 logger.error(f"HTTP error in worker loop: {e}", exc_info=True)
                 if run_once:
                     break
-                time.sleep(poll_interval)
+                _stop_event.wait(poll_interval)
         except Exception as e:
             logger.error(f"Error in worker loop: {e}", exc_info=True)
             if run_once:
                 break
-            time.sleep(poll_interval)
+            _stop_event.wait(poll_interval)
 
 
 if __name__ == "__main__":
@@ -920,5 +1673,6 @@ if __name__ == "__main__":
         logger.info(f"Processing specific task {args.task_id} (type: {task.get('type', 'unknown')})")
         process_task(api_client, task)
     else:
-        run_worker(run_once=args.once, limit=args.limit, poll_interval=args.poll_interval)
+        run_worker(run_once=args.once, limit=args.limit, poll_interval=args.poll_interval,
+                   concurrency=args.concurrency, engine=args.engine, delivery=args.delivery)
 
@@ -56,6 +56,8 @@
     // Task endpoints (for Python workers) - Higher rate limit
     Route::prefix('tasks')->middleware('throttle:1000,1')->group(function () {
         Route::get('/pending', [TaskController::class, 'getPendingTasks']);
+        Route::post('/claim', [TaskController::class, 'claimTasks']);
+        Route::post('/report', [TaskController::class, 'reportResults']);
         Route::post('/{id}/lock', [TaskController::class, 'lockTask']);
         Route::post('/{id}/unlock', [TaskController::class, 'unlockTask']);
         Route::put('/{id}/status', [TaskController::class, 'updateTaskStatus']);
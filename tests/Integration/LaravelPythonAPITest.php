@@ -8,6 +8,7 @@
 use App\Models\User;
 use Illuminate\Foundation\Testing\RefreshDatabase;
 use Illuminate\Support\Facades\Http;
+use Illuminate\Support\Facades\Redis;
 
 class LaravelPythonAPITest extends TestCase
 {
@@ -106,5 +107,265 @@ public function test_python_worker_can_create_backlink()
             'url' => 'https://example.com/backlink',
         ]);
     }
-}
 
+    public function test_python_worker_can_claim_tasks_with_type_priority()
+    {
+        $user = User::factory()->create();
+        $campaign = Campaign::factory()->create(['user_id' => $user->id]);
+        $profileTask = AutomationTask::create([
+            'campaign_id' => $campaign->id,
+            'type' => AutomationTask::TYPE_PROFILE,
+            'status' => AutomationTask::STATUS_PENDING,
+            'payload' => [],
+        ]);
+        $commentTask = AutomationTask::create([
+            'campaign_id' => $campaign->id,
+            'type' => AutomationTask::TYPE_COMMENT,
+            'status' => AutomationTask::STATUS_PENDING,
+            'payload' => [],
+        ]);
+
+        $response = $this->withHeaders([
+            'X-API-Token' => $this->apiToken,
+        ])->postJson('/api/tasks/claim', [
+            'worker_id' => 'test-worker-1',
+            'limit' => 1,
+            'type_priority' => ['comment'],
+        ]);
+
+        $response->assertStatus(200);
+        $response->assertJsonCount(1, 'tasks');
+        $response->assertJsonPath('tasks.0.id', $commentTask->id);
+        $this->assertDatabaseHas('automation_tasks', [
+            'id' => $commentTask->id,
+            'status' => AutomationTask::STATUS_RUNNING,
+            'locked_by' => 'test-worker-1',
+        ]);
+
+        // Claimed tasks are not handed out again
+        $response = $this->withHeaders([
+            'X-API-Token' => $this->apiToken,
+        ])->postJson('/api/tasks/claim', [
+            'worker_id' => 'test-worker-2',
+            'limit' => 5,
+        ]);
+
+        $response->assertStatus(200);
+        $response->assertJsonCount(1, 'tasks');
+        $response->assertJsonPath('tasks.0.id', $profileTask->id);
+    }
+
+    public function test_claim_with_type_weights_does_not_starve_other_types()
+    {
+        $user = User::factory()->create();
+        $campaign = Campaign::factory()->create(['user_id' => $user->id]);
+        foreach (range(1, 6) as $i) {
+            AutomationTask::create([
+                'campaign_id' => $campaign->id,
+                'type' => AutomationTask::TYPE_COMMENT,
+                'status' => AutomationTask::STATUS_PENDING,
+                'payload' => [],
+            ]);
+        }
+        foreach (range(1, 2) as $i) {
+            AutomationTask::create([
+                'campaign_id' => $campaign->id,
+                'type' => AutomationTask::TYPE_PROFILE,
+                'status' => AutomationTask::STATUS_PENDING,
+                'payload' => [],
+            ]);
+        }
+
+        $response = $this->withHeaders([
+            'X-API-Token' => $this->apiToken,
+        ])->postJson('/api/tasks/claim', [
+            'worker_id' => 'test-worker-1',
+            'limit' => 4,
+            'type_weights' => ['comment' => 1, 'profile' => 1],
+        ]);
+
+        $response->assertStatus(200);
+        $response->assertJsonCount(4, 'tasks');
+        $types = collect($response->json('tasks'))->countBy('type');
+        $this->assertEquals(2, $types['comment']);
+        $this->assertEquals(2, $types['profile']);
+    }
+
+    public function test_claim_with_skewed_type_weights_gives_minor_types_their_share()
+    {
+        $user = User::factory()->create();
+        $campaign = Campaign::factory()->create(['user_id' => $user->id]);
+        $pending = [
+            AutomationTask::TYPE_COMMENT => 20,
+            AutomationTask::TYPE_PROFILE => 5,
+            AutomationTask::TYPE_FORUM => 5,
+        ];
+        foreach ($pending as $type => $count) {
+            foreach (range(1, $count) as $i) {
+                AutomationTask::create([
+                    'campaign_id' => $campaign->id,
+                    'type' => $type,
+                    'status' => AutomationTask::STATUS_PENDING,
+                    'payload' => [],
+                ]);
+            }
+        }
+        $weights = ['comment' => 0.8, 'profile' => 0.1, 'forum' => 0.1];
+
+        foreach ([[5, 2], [1, 10]] as [$limit, $claims]) {
+            $types = collect();
+            foreach (range(1, $claims) as $i) {
+                $response = $this->withHeaders([
+                    'X-API-Token' => $this->apiToken,
+                ])->postJson('/api/tasks/claim', [
+                    'worker_id' => 'test-worker-1',
+                    'limit' => $limit,
+                    'type_weights' => $weights,
+                ]);
+
+                $response->assertStatus(200);
+                $response->assertJsonCount($limit, 'tasks');
+                $types = $types->concat(collect($response->json('tasks'))->pluck('type'));
+            }
+
+            // Ten slots either way: 8 comments, and one each for the minor types
+            $counts = $types->countBy();
+            $this->assertEquals(8, $counts['comment'], "limit {$limit}");
+            $this->assertEquals(1, $counts['profile'], "limit {$limit}");
+            $this->assertEquals(1, $counts['forum'], "limit {$limit}");
+        }
+    }
+
+    public function test_claim_long_poll_returns_empty_after_wait()
+    {
+        $start = microtime(true);
+
+        $response = $this->withHeaders([
+            'X-API-Token' => $this->apiToken,
+        ])->postJson('/api/tasks/claim', [
+            'worker_id' => 'test-worker-1',
+            'wait' => 1,
+        ]);
+
+        $response->assertStatus(200);
+        $response->assertJsonCount(0, 'tasks');
+        $this->assertGreaterThanOrEqual(1.0, microtime(true) - $start);
+    }
+
+    public function test_new_pending_task_notifies_redis_workers()
+    {
+        config([
+            'services.task_delivery.redis_notify' => true,
+            'services.task_delivery.redis_key' => 'automation:tasks:ready',
+        ]);
+        $connection = \Mockery::mock();
+        $connection->shouldReceive('rpush')->once()->with('automation:tasks:ready', \Mockery::any());
+        $connection->shouldReceive('ltrim')->once();
+        Redis::shouldReceive('connection')->once()->with('task_notifications')->andReturn($connection);
+
+        $user = User::factory()->create();
+        $campaign = Campaign::factory()->create(['user_id' => $user->id]);
+        AutomationTask::create([
+            'campaign_id' => $campaign->id,
+            'type' => AutomationTask::TYPE_COMMENT,
+            'status' => AutomationTask::STATUS_PENDING,
+            'payload' => [],
+        ]);
+    }
+
+    public function test_python_worker_can_report_results_in_one_call()
+    {
+        $user = User::factory()->create();
+        $campaign = Campaign::factory()->create(['user_id' => $user->id]);
+        $succeeded = AutomationTask::create([
+            'campaign_id' => $campaign->id,
+            'type' => AutomationTask::TYPE_COMMENT,
+            'status' => AutomationTask::STATUS_RUNNING,
+            'payload' => [],
+            'locked_at' => now(),
+            'locked_by' => 'test-worker-1',
+        ]);
+        $failed = AutomationTask::create([
+            'campaign_id' => $campaign->id,
+            'type' => AutomationTask::TYPE_COMMENT,
+            'status' => AutomationTask::STATUS_RUNNING,
+            'payload' => [],
+            'locked_at' => now(),
+            'locked_by' => 'test-worker-1',
+        ]);
+
+        $response = $this->withHeaders([
+            'X-API-Token' => $this->apiToken,
+        ])->postJson('/api/tasks/report', [
+            'results' => [
+                ['task_id' => $succeeded->id, 'status' => 'success', 'result' => ['url' => 'https://example.com/post']],
+                ['task_id' => $failed->id, 'status' => 'failed', 'error_message' => 'Comment form not found'],
+                ['task_id' => 999999, 'status' => 'failed'],
+            ],
+        ]);
+
+        $response->assertStatus(200);
+        $response->assertJsonPath('results.0.ok', true);
+        $response->assertJsonPath('results.1.will_retry', true);
+        $response->assertJsonPath('results.2.ok', false);
+        $this->assertDatabaseHas('automation_tasks', [
+            'id' => $succeeded->id,
+            'status' => AutomationTask::STATUS_SUCCESS,
+            'locked_by' => null,
+        ]);
+        $this->assertDatabaseHas('automation_tasks', [
+            'id' => $failed->id,
+            'status' => AutomationTask::STATUS_PENDING,
+            'retry_count' => 1,
+            'error_message' => 'Comment form not found',
+        ]);
+    }
+
+    public function test_resent_report_is_not_applied_twice()
+    {
+        $user = User::factory()->create();
+        $campaign = Campaign::factory()->create(['user_id' => $user->id]);
+        $task = AutomationTask::create([
+            'campaign_id' => $campaign->id,
+            'type' => AutomationTask::TYPE_COMMENT,
+            'status' => AutomationTask::STATUS_RUNNING,
+            'payload' => [],
+            'locked_at' => now(),
+            'locked_by' => 'test-worker-1',
+        ]);
+        $report = [
+            'results' => [[
+                'task_id' => $task->id,
+                'status' => 'failed',
+                'error_message' => 'Comment form not found',
+                'worker_id' => 'test-worker-1',
+            ]],
+        ];
+
+        $first = $this->withHeaders(['X-API-Token' => $this->apiToken])->postJson('/api/tasks/report', $report);
+        $second = $this->withHeaders(['X-API-Token' => $this->apiToken])->postJson('/api/tasks/report', $report);
+
+        $first->assertJsonPath('results.0.will_retry', true);
+        $second->assertStatus(200);
+        $second->assertJsonPath('results.0.ok', true);
+        $second->assertJsonPath('results.0.duplicate', true);
+        $this->assertDatabaseHas('automation_tasks', [
+            'id' => $task->id,
+            'status' => AutomationTask::STATUS_PENDING,
+            'retry_count' => 1,
+        ]);
+
+        // Re-claimed by another worker: the first worker's late result is refused
+        $task->lock('test-worker-2');
+        $late = $this->withHeaders(['X-API-Token' => $this->apiToken])->postJson('/api/tasks/report', [
+            'results' => [['task_id' => $task->id, 'status' => 'success', 'worker_id' => 'test-worker-1']],
+        ]);
+
+        $late->assertJsonPath('results.0.ok', false);
+        $this->assertDatabaseHas('automation_tasks', [
+            'id' => $task->id,
+            'status' => AutomationTask::STATUS_RUNNING,
+            'locked_by' => 'test-worker-2',
+        ]);
+    }
+}